@@ -0,0 +1,202 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from buttonwood.MarketMetrics.EventListeners.OrderEventCountListener import OrderEventCountListener
+from buttonwood.utils.buckets import BucketedCounter
+from buttonwood.utils.columns import Columns
+
+
+class BucketedOrderEventCountListener(OrderEventCountListener):
+    """
+    An OrderEventCountListener that, along with the cumulative counts, keeps counts in rolling time buckets per
+     (market, user, count type). See buttonwood.utils.buckets.BucketedCounter.
+
+    The windowed metrics (order to trade ratios, cancel ratios, peak message rates) are calculated for every user in a
+     market in one call and returned as Columns, one row per user.
+
+    Order messages are new orders, cancel replaces and cancel requests. Trades are partial and full fills.
+
+    :param logger: logging.Logger
+    :param bucket_interval: float. seconds per bucket
+    :param num_buckets: int. number of buckets retained
+    :param count_types: iterable of int. Optional. Count types, beyond the ones the metrics need, to bucket.
+    """
+
+    # a count type of its own so peak message rates come from a single set of buckets
+    ORDER_MESSAGES = 100
+
+    _ORDER_MESSAGE_TYPES = frozenset([OrderEventCountListener.NEW_ORDER,
+                                      OrderEventCountListener.CANCEL_REPLACE,
+                                      OrderEventCountListener.CANCEL_REQUEST])
+
+    _TRADE_TYPES = (OrderEventCountListener.PARTIAL_FILL, OrderEventCountListener.FULL_FILL)
+
+    def __init__(self, logger, bucket_interval, num_buckets, count_types=None):
+        OrderEventCountListener.__init__(self, logger)
+        self._bucket_interval = bucket_interval
+        self._num_buckets = num_buckets
+        self._bucketed_types = set(self._ORDER_MESSAGE_TYPES)
+        self._bucketed_types.update(self._TRADE_TYPES)
+        self._bucketed_types.add(self.ORDER_MESSAGES)
+        if count_types is not None:
+            self._bucketed_types.update(count_types)
+        # market -> user -> count type -> BucketedCounter
+        self._market_to_user_to_buckets = {}
+        self._market_to_last_time = {}
+
+    def _count(self, market, user_id, count_type, timestamp):
+        OrderEventCountListener._count(self, market, user_id, count_type, timestamp)
+        if count_type in self._bucketed_types:
+            self._add_to_buckets(market, user_id, count_type, timestamp)
+            if count_type in self._ORDER_MESSAGE_TYPES:
+                self._add_to_buckets(market, user_id, self.ORDER_MESSAGES, timestamp)
+
+    def _add_to_buckets(self, market, user_id, count_type, timestamp):
+        user_to_buckets = self._market_to_user_to_buckets.get(market)
+        if user_to_buckets is None:
+            user_to_buckets = {}
+            self._market_to_user_to_buckets[market] = user_to_buckets
+        type_to_buckets = user_to_buckets.get(user_id)
+        if type_to_buckets is None:
+            type_to_buckets = {}
+            user_to_buckets[user_id] = type_to_buckets
+        buckets = type_to_buckets.get(count_type)
+        if buckets is None:
+            buckets = BucketedCounter(self._bucket_interval, self._num_buckets)
+            type_to_buckets[count_type] = buckets
+        buckets.add(timestamp)
+        last_time = self._market_to_last_time.get(market)
+        if last_time is None or timestamp > last_time:
+            self._market_to_last_time[market] = timestamp
+
+    def count_buckets(self, market, user_id, count_type):
+        """
+        :param market: MarketObjects.Market.Market
+        :param user_id: str
+        :param count_type: int
+        :return: buttonwood.utils.buckets.BucketedCounter. None if nothing has been counted.
+        """
+        if count_type not in self._bucketed_types:
+            raise Exception("Count type %s is not bucketed" % count_type)
+        return self._market_to_user_to_buckets.get(market, {}).get(user_id, {}).get(count_type)
+
+    def users(self, market):
+        return list(self._market_to_user_to_buckets.get(market, {}).keys())
+
+    def window_counts(self, market, count_types, window, now=None):
+        """
+        Gets every user's count of the count types in the window of seconds ending at now.
+
+        :param market: MarketObjects.Market.Market
+        :param count_types: iterable of int. The counts of these count types are summed.
+        :param window: float. seconds
+        :param now: float. Optional. Defaults to the most recent counted event in the market.
+        :return: (list of str, array.array of int). user ids and their counts
+        """
+        columns = Columns([("user_id", None), ("count", "q")])
+        self._window_counts(columns, market, (tuple(count_types),), window, now)
+        return columns.column("user_id"), columns.column("count")
+
+    def _window_counts(self, columns, market, count_type_groups, window, now):
+        for count_type in (count_type for group in count_type_groups for count_type in group):
+            if count_type not in self._bucketed_types:
+                raise Exception("Count type %s is not bucketed" % count_type)
+        if now is None:
+            now = self._market_to_last_time.get(market)
+        for user_id, type_to_buckets in self._market_to_user_to_buckets.get(market, {}).items():
+            row = [user_id]
+            for group in count_type_groups:
+                count = 0
+                for count_type in group:
+                    buckets = type_to_buckets.get(count_type)
+                    if buckets is not None:
+                        count += buckets.total_in_last(window, now)
+                row.append(count)
+            columns.append(*row)
+
+    @staticmethod
+    def _ratios(numerators, denominators):
+        return [float(n) / d if d > 0 else float("nan") for n, d in zip(numerators, denominators)]
+
+    def order_to_trade_ratios(self, market, window, now=None):
+        """
+        Gets every user's ratio of order messages to trades in the window of seconds ending at now. NaN for users with
+         no trades in the window.
+
+        :param market: MarketObjects.Market.Market
+        :param window: float. seconds
+        :param now: float. Optional. Defaults to the most recent counted event in the market.
+        :return: buttonwood.utils.columns.Columns with columns user_id, order_messages (int), trades (int) and
+                 ratio (float)
+        """
+        columns = Columns([("user_id", None), ("order_messages", "q"), ("trades", "q")])
+        self._window_counts(columns, market, ((self.ORDER_MESSAGES,), self._TRADE_TYPES), window, now)
+        return self._with_ratios(columns, "order_messages", "trades")
+
+    def cancel_ratios(self, market, window, now=None):
+        """
+        Gets every user's ratio of cancel requests to new orders in the window of seconds ending at now. NaN for users
+         with no new orders in the window.
+
+        :param market: MarketObjects.Market.Market
+        :param window: float. seconds
+        :param now: float. Optional. Defaults to the most recent counted event in the market.
+        :return: buttonwood.utils.columns.Columns with columns user_id, cancels (int), new_orders (int) and
+                 ratio (float)
+        """
+        columns = Columns([("user_id", None), ("cancels", "q"), ("new_orders", "q")])
+        self._window_counts(columns, market, ((self.CANCEL_REQUEST,), (self.NEW_ORDER,)), window, now)
+        return self._with_ratios(columns, "cancels", "new_orders")
+
+    def _with_ratios(self, columns, numerator_name, denominator_name):
+        with_ratios = Columns([("user_id", None), (numerator_name, "q"), (denominator_name, "q"), ("ratio", "d")])
+        ratios = self._ratios(columns.column(numerator_name), columns.column(denominator_name))
+        for i, ratio in enumerate(ratios):
+            with_ratios.append(*(columns.row(i) + (ratio,)))
+        return with_ratios
+
+    def peak_message_rates(self, market):
+        """
+        Gets every user's busiest bucket of order messages out of the retained buckets.
+
+        :param market: MarketObjects.Market.Market
+        :return: buttonwood.utils.columns.Columns with columns user_id, bucket_start (float), order_messages (int) and
+                 rate (float, messages per second)
+        """
+        columns = Columns([("user_id", None), ("bucket_start", "d"), ("order_messages", "q"), ("rate", "d")])
+        for user_id, type_to_buckets in self._market_to_user_to_buckets.get(market, {}).items():
+            buckets = type_to_buckets.get(self.ORDER_MESSAGES)
+            if buckets is None:
+                continue
+            bucket_columns = buckets.to_columns()
+            amounts = bucket_columns.column("amount")
+            peak = max(range(len(amounts)), key=amounts.__getitem__)
+            columns.append(user_id, bucket_columns.column("bucket_start")[peak], amounts[peak],
+                           amounts[peak] / float(self._bucket_interval))
+        return columns
@@ -27,29 +27,63 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+from bisect import bisect_left
+from bisect import bisect_right
+from collections import defaultdict
 from buttonwood.MarketObjects.EventListeners.OrderEventListener import OrderEventListener
 from buttonwood.MarketObjects.MatchSeries import MatchSeries
 
 
 class MatchSeriesTracker(OrderEventListener):
+    """
+    Tracks every MatchSeries by match id, aggressor event id and fill event id.
+
+    MatchSeries are also indexed by their aggressor's side and by their timestamp (time of first fill), so that
+     getting the match series for a side or a time range doesn't scan every series seen.
+    """
 
     def __init__(self, logger):
         OrderEventListener.__init__(self, logger)
         self._aggressor_event_id_to_series = {}
         self._id_to_series = {}
         self._fill_event_id_to_series = {}
+        self._side_to_series = defaultdict(list)
+        # parallel lists, in timestamp order: all series, then per side
+        self._times = []
+        self._series_by_time = []
+        self._side_to_times = defaultdict(list)
+        self._side_to_series_by_time = defaultdict(list)
+
+    @staticmethod
+    def _insert_by_time(times, series_list, series):
+        timestamp = series.timestamp()
+        # fills come in time order so this is almost always an append
+        if len(times) == 0 or times[-1] <= timestamp:
+            times.append(timestamp)
+            series_list.append(series)
+        else:
+            index = bisect_right(times, timestamp)
+            times.insert(index, timestamp)
+            series_list.insert(index, series)
+
+    def _new_series(self, fill):
+        series = MatchSeries(fill.match_id())
+        series.add_fill(fill)
+        side = series.aggressor_side()
+        self._id_to_series[fill.match_id()] = series
+        self._aggressor_event_id_to_series[fill.aggressing_command().event_id()] = series
+        self._side_to_series[side].append(series)
+        self._insert_by_time(self._times, self._series_by_time, series)
+        self._insert_by_time(self._side_to_times[side], self._side_to_series_by_time[side], series)
+        return series
 
     def _handle_fill(self, fill):
         series = self._id_to_series.get(fill.match_id())
         if series is None:
-            series = MatchSeries(fill.match_id())
-            series.add_fill(fill)
-            self._id_to_series[fill.match_id()] = series
-            self._aggressor_event_id_to_series[fill.aggressing_command().event_id()] = series
-            self._fill_event_id_to_series[fill.event_id()] = series
+            series = self._new_series(fill)
         else:
             series.add_fill(fill)
-            self._fill_event_id_to_series[fill.event_id()] = series
+        self._fill_event_id_to_series[fill.event_id()] = series
 
     def match_ids(self):
         return self._id_to_series.keys()
@@ -76,11 +110,25 @@ class MatchSeriesTracker(OrderEventListener):
         :param side: Buttonwood.MarketObjects.Side.Side
         :return: list() of Buttonwood.MarketObjects.MatchSeries.MatchSeries
         """
-        l = []
-        for series in self._id_to_series.values():
-            if series.aggressor_side() == side:
-                l.append(series)
-        return l
+        return list(self._side_to_series[side])
+
+    def match_series_between(self, start_time, end_time, side=None):
+        """
+        Returns a list, in time order, of all MatchSeries with a timestamp (time of first fill) from start_time up to,
+         but not including, end_time. If side is not None only the MatchSeries with that aggressor side are included.
+
+        :param start_time: float
+        :param end_time: float
+        :param side: Buttonwood.MarketObjects.Side.Side. Optional.
+        :return: list() of Buttonwood.MarketObjects.MatchSeries.MatchSeries
+        """
+        if side is None:
+            times = self._times
+            series_list = self._series_by_time
+        else:
+            times = self._side_to_times[side]
+            series_list = self._side_to_series_by_time[side]
+        return series_list[bisect_left(times, start_time):bisect_left(times, end_time)]
 
     def aggressor_match_series(self, aggressor_event_id):
         """
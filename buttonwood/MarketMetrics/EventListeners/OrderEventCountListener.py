@@ -37,7 +37,6 @@ from buttonwood.utils.dicts import NDeepDict
 
 class OrderEventCountListener(OrderEventListener):
 
-    # TODO unit test
     # TODO document listener
 
     # COUNT TYPE
@@ -73,74 +72,85 @@ class OrderEventCountListener(OrderEventListener):
     def get_count(self, market, user_id, count_type):  # get_count(two_year, "user_a", OrderEventCountListener.NEW_FAK)
         return self._event_counts.get([market, user_id, count_type])
 
+    def _increment(self, order_event, count_type):
+        self._count(order_event.market(), order_event.user_id(), count_type, order_event.timestamp())
+
+    def _increment_chain(self, order_event_chain, count_type):
+        self._count(order_event_chain.market(), order_event_chain.user_id(), count_type,
+                    order_event_chain.last_update_time())
+
+    def _count(self, market, user_id, count_type, timestamp):
+        # the one place counts get incremented, so child classes can count in other ways too
+        self._event_counts[[market, user_id, count_type]] += 1
+
     # REQUESTS / COMMANDS IN ######################################
 
     def handle_new_order_command(self, new_order_command, resulting_order_chain):
         # to be optionally implemented by child class
-        self._event_counts[[new_order_command.market(), new_order_command.user_id(), self.NEW_ORDER]] += 1
+        self._increment(new_order_command, self.NEW_ORDER)
 
         # Time In Force Counts
         if new_order_command.time_in_force() == OrderEventConstants.FAR:
-            self._event_counts[[new_order_command.market(), new_order_command.user_id(), self.NEW_FAR]] += 1
+            self._increment(new_order_command, self.NEW_FAR)
         elif new_order_command.time_in_force() == OrderEventConstants.FAK:
-            self._event_counts[[new_order_command.market(), new_order_command.user_id(), self.NEW_FAK]] += 1
+            self._increment(new_order_command, self.NEW_FAK)
         elif new_order_command.time_in_force() == OrderEventConstants.FOK:
-            self._event_counts[[new_order_command.market(), new_order_command.user_id(), self.NEW_FOK]] += 1
+            self._increment(new_order_command, self.NEW_FOK)
 
         # Market and limit
         if new_order_command.is_market_order():
-            self._event_counts[[new_order_command.market(), new_order_command.user_id(), self.NEW_MARKET]] += 1
+            self._increment(new_order_command, self.NEW_MARKET)
         elif new_order_command.is_limit_order():
-            self._event_counts[[new_order_command.market(), new_order_command.user_id(), self.NEW_LIMIT]] += 1
+            self._increment(new_order_command, self.NEW_LIMIT)
 
     def handle_cancel_replace_command(self, cancel_replace_command, resulting_order_chain):
-        self._event_counts[[cancel_replace_command.market(), cancel_replace_command.user_id(), self.CANCEL_REPLACE]] += 1
+        self._increment(cancel_replace_command, self.CANCEL_REPLACE)
 
     def handle_cancel_command(self, cancel_command, resulting_order_chain):
-        self._event_counts[[cancel_command.market(), cancel_command.user_id(), self.CANCEL_REQUEST]] += 1
+        self._increment(cancel_command, self.CANCEL_REQUEST)
 
     # RESPONSES / MESSAGES OUT #####################################
 
     def handle_acknowledgement_report(self, acknowledgement_report, resulting_order_chain):
-        self._event_counts[[acknowledgement_report.market(), acknowledgement_report.user_id(), self.ACK]] += 1
+        self._increment(acknowledgement_report, self.ACK)
         if isinstance(acknowledgement_report.acknowledged_command(), NewOrderCommand):
-            self._event_counts[[acknowledgement_report.market(), acknowledgement_report.user_id(), self.ACK_NEW_ORDERS]] += 1
+            self._increment(acknowledgement_report, self.ACK_NEW_ORDERS)
             # if ack comes back for a FAR for a new order, and there is a partial fill in teh orderchain then partially filled on placement
             if resulting_order_chain.time_in_force() == OrderEventConstants.FAR and resulting_order_chain.has_partial_fill():
-                self._event_counts[[acknowledgement_report.market(), acknowledgement_report.user_id(), self.FARS_PARTIALLY_FILLED_ON_PLACEMENT]] += 1
+                self._increment(acknowledgement_report, self.FARS_PARTIALLY_FILLED_ON_PLACEMENT)
         elif isinstance(acknowledgement_report.acknowledged_command(), CancelReplaceCommand):
-            self._event_counts[[acknowledgement_report.market(), acknowledgement_report.user_id(), self.ACK_CANCEL_REPLACE]] += 1
+            self._increment(acknowledgement_report, self.ACK_CANCEL_REPLACE)
 
     def handle_partial_fill_report(self, partial_fill_report, resulting_order_chain):
-        self._event_counts[[partial_fill_report.market(), partial_fill_report.user_id(), self.PARTIAL_FILL]] += 1
+        self._increment(partial_fill_report, self.PARTIAL_FILL)
 
     def handle_full_fill_report(self, full_fill_report, resulting_order_chain):
-        self._event_countS[[full_fill_report.market(), full_fill_report.user_id(), self.FULL_FILL]] += 1
+        self._increment(full_fill_report, self.FULL_FILL)
 
     def handle_cancel_report(self, cancel_report, resulting_order_chain):
-        self._event_counts[[cancel_report.market(), cancel_report.user_id(), self.CANCEL_CONFIRM]] += 1
+        self._increment(cancel_report, self.CANCEL_CONFIRM)
 
     def handle_reject_report(self, reject_report, resulting_order_chain):
-        self._event_counts[[reject_report.market(), reject_report.user_id(), self.REJECT]] += 1
+        self._increment(reject_report, self.REJECT)
         if isinstance(reject_report.rejected_command(), NewOrderCommand):
-            self._event_counts[[reject_report.market(), reject_report.user_id(), self.REJECT_NEW]] += 1
+            self._increment(reject_report, self.REJECT_NEW)
         elif isinstance(reject_report.rejected_command(), CancelReplaceCommand):
-            self._event_counts[[reject_report.market(), reject_report.user_id(), self.REJECT_CANCEL_REPLACE]] += 1
+            self._increment(reject_report, self.REJECT_CANCEL_REPLACE)
         elif isinstance(reject_report.rejected_command(), CancelCommand):
-            self._event_counts[[reject_report.market(), reject_report.user_id(), self.REJECT_CANCEL]] += 1
+            self._increment(reject_report, self.REJECT_CANCEL)
 
     # CLOSE OUT THE CHAIN ##########################################
 
     def handle_chain_close(self, closed_order_chain):
         if closed_order_chain.has_full_fill():
             if closed_order_chain.time_in_force() == OrderEventConstants.FAK:
-                self._event_counts[[closed_order_chain.market(), closed_order_chain.user_id(), self.FAKS_FULLY_FILLED]] += 1
+                self._increment_chain(closed_order_chain, self.FAKS_FULLY_FILLED)
             elif closed_order_chain.time_in_force() == OrderEventConstants.FOK:
-                self._event_counts[[closed_order_chain.market(), closed_order_chain.user_id(), self.FOKS_FULLY_FILLED]] += 1
+                self._increment_chain(closed_order_chain, self.FOKS_FULLY_FILLED)
             elif closed_order_chain.time_in_force() == OrderEventConstants.FAR:
                 # if a FAR has no acknowledgement when fully filled, then it was fully filled on placement
                 if not closed_order_chain.has_acknowledgement():
-                    self._event_counts[[closed_order_chain.market(), closed_order_chain.user_id(), self.FARS_FULLY_FILLED_ON_PLACEMENT]] += 1
+                    self._increment_chain(closed_order_chain, self.FARS_FULLY_FILLED_ON_PLACEMENT)
         elif closed_order_chain.has_partial_fill():
             if closed_order_chain.time_in_force() == OrderEventConstants.FAK:
-                self._event_counts[[closed_order_chain.market(), closed_order_chain.user_id(), self.FAKS_PARTIALLY_FILLED]] += 1
+                self._increment_chain(closed_order_chain, self.FAKS_PARTIALLY_FILLED)
@@ -0,0 +1,192 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from bisect import bisect_right
+from buttonwood.MarketMetrics.EventListeners.MatchSeriesTracker import MatchSeriesTracker
+from buttonwood.MarketMetrics import TradeStatistics
+from buttonwood.utils.columns import Columns
+
+
+class TradeTape(MatchSeriesTracker):
+    """
+    A tape of trades, one row per match, per market. Built on the MatchSeriesTracker's grouping of fills
+     into MatchSeries.
+
+    A match is written to the tape once it is complete: its aggressive and passive fill qtys balance and the
+     aggressor is done with it (fully filled, acknowledged into the book, cancelled, or has started another match).
+     flush() writes out whatever is still open, ex: at the end of a replay.
+
+    The tape for a market is a Columns with:
+      * timestamp: float. time of the first fill
+      * match_id
+      * sign: int. 1 if the aggressor was a buyer, -1 if a seller
+      * qty: int
+      * vwap: float
+      * levels: int. number of prices the match swept
+      * first_price: float. price of the first aggressive fill
+      * last_price: float. price of the last aggressive fill
+
+    Rows are kept in timestamp order. A match is only written once it completes, so when matches overlap (or on a
+     flush()) a row can be inserted before ones already written.
+    """
+
+    def __init__(self, logger):
+        MatchSeriesTracker.__init__(self, logger)
+        self._market_to_tape = {}
+        self._chain_id_to_open_series = {}  # aggressor chain id -> (market, MatchSeries)
+        self._done_aggressor_chain_ids = set()
+
+    @staticmethod
+    def _new_tape():
+        return Columns([("timestamp", "d"),
+                        ("match_id", None),
+                        ("sign", "b"),
+                        ("qty", "q"),
+                        ("vwap", "d"),
+                        ("levels", "q"),
+                        ("first_price", "d"),
+                        ("last_price", "d")])
+
+    def _tape_for(self, market):
+        tape = self._market_to_tape.get(market)
+        if tape is None:
+            tape = self._new_tape()
+            self._market_to_tape[market] = tape
+        return tape
+
+    def _tape_or_empty(self, market):
+        # for the queries, which shouldn't add a tape for a market that has no trades
+        tape = self._market_to_tape.get(market)
+        return self._new_tape() if tape is None else tape
+
+    def _write(self, market, series):
+        agg_fills = series.aggressive_fills()
+        tape = self._tape_for(market)
+        timestamps = tape.column("timestamp")
+        timestamp = series.timestamp()
+        row = (timestamp,
+               series.series_id(),
+               1 if series.aggressor_side().is_bid() else -1,
+               series.aggressive_qty(),
+               series.average_price(sanity_check=False),
+               len(series.price_to_qty(sanity_check=False)),
+               float(agg_fills[0].fill_price()),
+               float(agg_fills[-1].fill_price()))
+        # matches mostly complete in time order so this is almost always an append
+        if len(timestamps) == 0 or timestamps[-1] <= timestamp:
+            tape.append(*row)
+        else:
+            tape.insert(bisect_right(timestamps, timestamp), *row)
+
+    def _close_if_complete(self, chain_id, force=False):
+        open_series = self._chain_id_to_open_series.get(chain_id)
+        if open_series is None:
+            return
+        market, series = open_series
+        done = chain_id in self._done_aggressor_chain_ids
+        if force or (done and series.balanced_match_qty()):
+            del self._chain_id_to_open_series[chain_id]
+            self._done_aggressor_chain_ids.discard(chain_id)
+            if len(series.aggressive_fills()) > 0:
+                self._write(market, series)
+
+    def _aggressor_done(self, chain_id):
+        if chain_id in self._chain_id_to_open_series:
+            self._done_aggressor_chain_ids.add(chain_id)
+            self._close_if_complete(chain_id)
+
+    def _handle_fill(self, fill):
+        MatchSeriesTracker._handle_fill(self, fill)
+        series = self._id_to_series[fill.match_id()]
+        chain_id = fill.aggressing_command().chain_id()
+        open_series = self._chain_id_to_open_series.get(chain_id)
+        if open_series is None or open_series[1] is not series:
+            if open_series is not None:
+                # the aggressor has moved on to another match, so it is done with the previous one
+                self._aggressor_done(chain_id)
+                self._close_if_complete(chain_id, force=True)
+            self._chain_id_to_open_series[chain_id] = (fill.market(), series)
+        if fill.is_aggressor() and series.aggressor_fully_filled():
+            self._done_aggressor_chain_ids.add(chain_id)
+        self._close_if_complete(chain_id)
+
+    def handle_acknowledgement_report(self, acknowledgement_report, resulting_order_chain):
+        self._aggressor_done(acknowledgement_report.chain_id())
+
+    def handle_cancel_report(self, cancel_report, resulting_order_chain):
+        self._aggressor_done(cancel_report.chain_id())
+
+    def handle_reject_report(self, reject_report, resulting_order_chain):
+        self._aggressor_done(reject_report.chain_id())
+
+    def flush(self):
+        """
+        Writes every match that is still open to the tape.
+        """
+        for chain_id in list(self._chain_id_to_open_series.keys()):
+            self._close_if_complete(chain_id, force=True)
+
+    def markets(self):
+        return self._market_to_tape.keys()
+
+    def tape(self, market):
+        """
+        Gets the tape for the market. None if the market has no trades.
+
+        :param market: MarketObjects.Market.Market
+        :return: buttonwood.utils.columns.Columns
+        """
+        return self._market_to_tape.get(market)
+
+    def volume_by_interval(self, market, interval, start_time=None):
+        """
+        See MarketMetrics.TradeStatistics.volume_by_interval
+        """
+        tape = self._tape_or_empty(market)
+        return TradeStatistics.volume_by_interval(tape.column("timestamp"), tape.column("qty"), interval, start_time)
+
+    def rolling_vwap(self, market, window):
+        """
+        See MarketMetrics.TradeStatistics.rolling_vwap
+        """
+        tape = self._tape_or_empty(market)
+        return TradeStatistics.rolling_vwap(tape.column("timestamp"), tape.column("qty"), tape.column("vwap"), window)
+
+    def trade_sign_autocorrelation(self, market, max_lag):
+        """
+        See MarketMetrics.TradeStatistics.trade_sign_autocorrelation
+        """
+        return TradeStatistics.trade_sign_autocorrelation(self._tape_or_empty(market).column("sign"), max_lag)
+
+    def rolling_realized_volatility(self, market, window):
+        """
+        See MarketMetrics.TradeStatistics.rolling_realized_volatility
+        """
+        tape = self._tape_or_empty(market)
+        return TradeStatistics.rolling_realized_volatility(tape.column("timestamp"), tape.column("vwap"), window)
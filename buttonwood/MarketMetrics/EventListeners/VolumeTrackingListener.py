@@ -29,6 +29,7 @@ SOFTWARE.
 
 from collections import defaultdict
 from buttonwood.MarketObjects.EventListeners.OrderEventListener import OrderEventListener
+from buttonwood.utils.buckets import BucketedCounter
 
 
 class VolumeTracker(object):
@@ -36,12 +37,16 @@ class VolumeTracker(object):
     def __init__(self):
         self._counterparty_to_passive_volume = defaultdict(lambda: 0)
         self._counterparty_to_aggressive_volume = defaultdict(lambda: 0)
+        self._total_passive_volume = 0
+        self._total_aggressive_volume = 0
 
     def add_passive_trade(self, volume, counterparty):
         self._counterparty_to_passive_volume[counterparty] += volume
+        self._total_passive_volume += volume
 
     def add_aggressive_trade(self, volume, counterparty):
         self._counterparty_to_aggressive_volume[counterparty] += volume
+        self._total_aggressive_volume += volume
 
     def total_aggressive_volume_with(self, counterparty):
         return self._counterparty_to_aggressive_volume[counterparty]
@@ -53,26 +58,36 @@ class VolumeTracker(object):
         return self.total_passive_volume_with(counterparty) + self.total_aggressive_volume_with(counterparty)
 
     def total_aggressive_volume(self):
-        total_volume = 0
-        for volume in self._counterparty_to_aggressive_volume.values():
-            total_volume += volume
-        return total_volume
+        return self._total_aggressive_volume
 
     def total_passive_volume(self):
-        total_volume = 0
-        for volume in self._counterparty_to_passive_volume.values():
-            total_volume += volume
-        return total_volume
+        return self._total_passive_volume
 
     def total_volume(self):
         return self.total_passive_volume() + self.total_aggressive_volume()
 
 
 class VolumeTrackingListener(OrderEventListener):
+    """
+    Tracks traded volume per market and user, broken down by counterparty.
 
-    def __init__(self, logger):
+    If bucket_interval and num_buckets are given, volume is also kept in rolling time buckets per market and per
+     (market, user) so that questions like "how much did this user trade in the last 5 minutes" can be answered in
+     O(1). See buttonwood.utils.buckets.BucketedCounter.
+
+    :param logger: logging.Logger
+    :param bucket_interval: float. Optional. seconds per bucket
+    :param num_buckets: int. Optional. number of buckets retained
+    """
+
+    def __init__(self, logger, bucket_interval=None, num_buckets=None):
         OrderEventListener.__init__(self, logger)
         self._market_to_participant_to_volume = defaultdict(lambda: defaultdict(VolumeTracker))  # TODO can I use NDeep dict here?
+        assert (bucket_interval is None) == (num_buckets is None)
+        self._bucket_interval = bucket_interval
+        self._num_buckets = num_buckets
+        self._market_to_buckets = {}
+        self._market_to_participant_to_buckets = defaultdict(dict)
 
     def _handle_fill(self, fill_report):
         # only care about passive fill reports because that way we get both counterparties:
@@ -85,6 +100,19 @@ class VolumeTrackingListener(OrderEventListener):
             market = fill_report.market()
             self._market_to_participant_to_volume[market][passive_user].add_passive_trade(qty, aggressive_user)
             self._market_to_participant_to_volume[market][aggressive_user].add_aggressive_trade(qty, passive_user)
+            if self._bucket_interval is not None:
+                timestamp = fill_report.timestamp()
+                self._buckets_for(self._market_to_buckets, market).add(timestamp, qty)
+                participant_to_buckets = self._market_to_participant_to_buckets[market]
+                self._buckets_for(participant_to_buckets, passive_user).add(timestamp, qty)
+                self._buckets_for(participant_to_buckets, aggressive_user).add(timestamp, qty)
+
+    def _buckets_for(self, key_to_buckets, key):
+        buckets = key_to_buckets.get(key)
+        if buckets is None:
+            buckets = BucketedCounter(self._bucket_interval, self._num_buckets)
+            key_to_buckets[key] = buckets
+        return buckets
 
     def handle_partial_fill_report(self, partial_fill_report, resulting_order_chain):
         self._handle_fill(partial_fill_report)
@@ -98,3 +126,35 @@ class VolumeTrackingListener(OrderEventListener):
             return user_to_volume.get(user_id)
         return None
 
+    def volume_buckets(self, market, user_id=None):
+        """
+        Gets the rolling volume buckets for the market, or for the user in the market if user_id is given.
+
+        :param market: MarketObjects.Market.Market
+        :param user_id: str. Optional.
+        :return: buttonwood.utils.buckets.BucketedCounter. None if there has been no volume.
+        """
+        if self._bucket_interval is None:
+            raise Exception("VolumeTrackingListener was not created with a bucket_interval")
+        if user_id is None:
+            return self._market_to_buckets.get(market)
+        participant_to_buckets = self._market_to_participant_to_buckets.get(market)
+        if participant_to_buckets is not None:
+            return participant_to_buckets.get(user_id)
+        return None
+
+    def volume_in_last(self, market, window, user_id=None, now=None):
+        """
+        Gets the volume traded in the market, or by the user in the market if user_id is given, in the window of
+         seconds ending at now (defaults to the most recent volume).
+
+        :param market: MarketObjects.Market.Market
+        :param window: float. seconds
+        :param user_id: str. Optional.
+        :param now: float. Optional.
+        :return: int
+        """
+        buckets = self.volume_buckets(market, user_id)
+        if buckets is None:
+            return 0
+        return buckets.total_in_last(window, now)
@@ -27,6 +27,10 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+from array import array
+
+NO_VALUE = float("nan")
+
 
 def size_weighted_midpoint(bid_price, bid_qty, ask_price, ask_qty):
     bid_plus_ask_qty = bid_qty + ask_qty
@@ -44,3 +48,121 @@ def size_weighted_midpoint_from_price_levels(bid_price_level, ask_price_level, i
         bid_qty += bid_qty + bid_price_level.hidden_qty()
         ask_qty += ask_qty + ask_price_level.hidden_qty()
     return size_weighted_midpoint(bid_price_level.price(), bid_qty, ask_price_level.price(), ask_qty)
+
+
+def size_weighted_midpoints(bid_prices, bid_qtys, ask_prices, ask_qtys):
+    """
+    size_weighted_midpoint for each row of top of book price and qty columns. Works on floats rather than Prices so it
+     can be run over a full session of updates at once.
+
+    Rows where the bid and ask qty are both 0 are NaN.
+
+    :param bid_prices: sequence of float
+    :param bid_qtys: sequence of int
+    :param ask_prices: sequence of float
+    :param ask_qtys: sequence of int
+    :return: array.array of float
+    """
+    result = array("d")
+    append = result.append
+    for bid_price, bid_qty, ask_price, ask_qty in zip(bid_prices, bid_qtys, ask_prices, ask_qtys):
+        bid_plus_ask_qty = bid_qty + ask_qty
+        if bid_plus_ask_qty == 0:
+            append(NO_VALUE)
+        else:
+            append(((bid_qty * ask_price) + (ask_qty * bid_price)) / bid_plus_ask_qty)
+    return result
+
+
+def order_book_imbalances(bid_qtys, ask_qtys):
+    """
+    The order book imbalance, (bid qty - ask qty) / (bid qty + ask qty), for each row. Goes from -1 (all asks) to 1
+     (all bids). Rows where both qtys are 0 are NaN.
+
+    :param bid_qtys: sequence of int
+    :param ask_qtys: sequence of int
+    :return: array.array of float
+    """
+    result = array("d")
+    append = result.append
+    for bid_qty, ask_qty in zip(bid_qtys, ask_qtys):
+        bid_plus_ask_qty = bid_qty + ask_qty
+        append(NO_VALUE if bid_plus_ask_qty == 0 else float(bid_qty - ask_qty) / bid_plus_ask_qty)
+    return result
+
+
+def _depth_vwap_and_qty(prices, qtys):
+    notional = 0.0
+    total_qty = 0
+    for price, qty in zip(prices, qtys):
+        notional += price * qty
+        total_qty += qty
+    return (notional / total_qty if total_qty > 0 else None), total_qty
+
+
+def depth_row_metrics(bid_prices, bid_qtys, ask_prices, ask_qtys):
+    """
+    The micro price, depth weighted midpoint and order book imbalance of one book update. See depth_metrics for how
+     each is defined. The levels are ordered best to worst and all of them are used.
+
+    A value is None if it can't be calculated: a side of the book is empty, or for the weighted mid, a side has no
+     visible qty.
+
+    :param bid_prices: sequence of float
+    :param bid_qtys: sequence of int
+    :param ask_prices: sequence of float
+    :param ask_qtys: sequence of int
+    :return: (float, float, float). micro price, weighted mid, imbalance
+    """
+    total_bid_qty = sum(bid_qtys)
+    total_ask_qty = sum(ask_qtys)
+    total_qty = total_bid_qty + total_ask_qty
+    imbalance = None if total_qty == 0 else float(total_bid_qty - total_ask_qty) / total_qty
+    if len(bid_qtys) == 0 or len(ask_qtys) == 0:
+        return None, None, imbalance
+    micro_price = size_weighted_midpoint(bid_prices[0], bid_qtys[0], ask_prices[0], ask_qtys[0])
+    bid_vwap, total_bid_qty = _depth_vwap_and_qty(bid_prices, bid_qtys)
+    ask_vwap, total_ask_qty = _depth_vwap_and_qty(ask_prices, ask_qtys)
+    if bid_vwap is None or ask_vwap is None:
+        weighted_mid = None
+    else:
+        weighted_mid = size_weighted_midpoint(bid_vwap, total_bid_qty, ask_vwap, total_ask_qty)
+    return micro_price, weighted_mid, imbalance
+
+
+def depth_metrics(bid_prices, bid_qtys, ask_prices, ask_qtys, depth=None):
+    """
+    Calculates micro price, depth weighted midpoint and order book imbalance for every row of depth-N book data in a
+     single pass.
+
+    Each argument is a sequence of rows (one row per book update) and each row is a sequence of levels ordered best
+     to worst. Rows can be shorter than the depth when a side of the book is thin.
+
+    * micro price: size_weighted_midpoint of the top levels
+    * weighted mid: size_weighted_midpoint where each side is the volume weighted price and total qty of its top N
+       levels. With a depth of 1 this is the same as the micro price.
+    * imbalance: (bid qty - ask qty) / (bid qty + ask qty) over the top N levels
+
+    :param bid_prices: sequence of sequences of float
+    :param bid_qtys: sequence of sequences of int
+    :param ask_prices: sequence of sequences of float
+    :param ask_qtys: sequence of sequences of int
+    :param depth: int. Optional. The number of levels to use. None uses all the levels in each row.
+    :return: (array.array of float, array.array of float, array.array of float). micro prices, weighted mids, imbalances
+    """
+    assert depth is None or (isinstance(depth, int) and depth > 0)
+    micro_prices = array("d")
+    weighted_mids = array("d")
+    imbalances = array("d")
+    for row_bid_prices, row_bid_qtys, row_ask_prices, row_ask_qtys in zip(bid_prices, bid_qtys, ask_prices, ask_qtys):
+        if depth is not None:
+            row_bid_prices = row_bid_prices[:depth]
+            row_bid_qtys = row_bid_qtys[:depth]
+            row_ask_prices = row_ask_prices[:depth]
+            row_ask_qtys = row_ask_qtys[:depth]
+        micro_price, weighted_mid, imbalance = depth_row_metrics(row_bid_prices, row_bid_qtys,
+                                                                 row_ask_prices, row_ask_qtys)
+        micro_prices.append(NO_VALUE if micro_price is None else micro_price)
+        weighted_mids.append(NO_VALUE if weighted_mid is None else weighted_mid)
+        imbalances.append(NO_VALUE if imbalance is None else imbalance)
+    return micro_prices, weighted_mids, imbalances
@@ -27,19 +27,46 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+from array import array
 from buttonwood.MarketObjects.OrderBookListeners.OrderLevelBookListener import OrderLevelBookListener
 from buttonwood.MarketObjects.EventListeners.OrderEventListener import OrderEventListener
-from buttonwood.MarketObjects.MatchSeries import MatchSeries
-from buttonwood.utils.dicts import NDeepDict
-from collections import defaultdict
+from buttonwood.utils.columns import Columns
 
 
-class AggressiveAct(MatchSeries):
+class AggressiveAct(object):
+    """
+    The aggressive act of one aggressing command, built up incrementally from its fills.
+
+    The first time a fill comes in at a price, the passive side's total qty at that price is snapshotted. Event
+     listeners hear about a fill before the order books apply it, so that is the depth at the price before the
+     aggression. The impact is then kept as a running sum over the prices filled of min(1, qty filled / pre-aggression
+     depth), so it never needs to look at the order book again.
+
+    :param match_id: the match id of the first fill
+    :param aggressing_command: MarketObjects.Events.OrderEvents.OrderCommand
+    """
 
-    def __init__(self, match_id):
-        MatchSeries.__init__(self, match_id)
-        self._total_aggressive_qty = 0
-        self._impact = None
+    def __init__(self, match_id, aggressing_command):
+        self._match_id = match_id
+        self._aggressor = aggressing_command
+        self._timestamp = None
+        self._price_to_depth = {}
+        self._price_to_consumed = {}
+        self._aggressive_qty = 0
+        self._passive_qty = 0
+        self._pre_aggression_depth = 0
+        self._levels_consumed = 0
+        self._impact = 0.0
+        self._best_price = None
+        self._worst_price = None
+        self._aggressor_done = False
+        self._closed = False
+
+    def match_id(self):
+        return self._match_id
+
+    def aggressing_command(self):
+        return self._aggressor
 
     def aggressing_user_id(self):
         return self._aggressor.user_id()
@@ -50,29 +77,105 @@ class AggressiveAct(MatchSeries):
     def requested_qty(self):
         return self._aggressor.qty()
 
-    def calculate(self, order_book):
-        if self.balanced_match_qty():
-            impact = 0.0
-            passive_side = self._aggressor.side().other_side()
-            passive_tob = order_book.best_level(passive_side)
-            # if the opposite tob is worse than the last fill price, then there is no impact on top of book. This can
-            #  happen at venues that have stupidly bad self trade prevention.
-            for fill_price, fill_qty in self._agg_price_to_qty.items():
-                if passive_tob is not None and fill_price == passive_tob.price():
-                    total_qty = passive_tob.total_qty() + fill_qty
-                    impact += float(fill_qty) / total_qty
-                elif passive_tob is None or fill_price.better_than(passive_tob.price(), passive_side):
-                    impact += 1
-            self._impact = impact
+    def timestamp(self):
+        """
+        Time of the first fill.
+        """
+        return self._timestamp
 
+    def _level_impact(self, price):
+        depth = self._price_to_depth[price]
+        consumed = self._price_to_consumed[price]
+        # a level with no depth before the aggression (ex: hidden liquidity not in the book) counts as taken out
+        if depth <= 0 or consumed >= depth:
+            return 1.0
+        return float(consumed) / depth
+
+    def add_fill(self, fill_event, order_book):
+        """
+        Adds the fill to the aggressive act. The order book must not have had the fill applied to it yet.
+
+        :param fill_event: MarketObjects.Events.OrderEvents.FillReport
+        :param order_book: MarketObjects.OrderBooks.OrderLevelBook.OrderLevelBook
+        """
+        if self._timestamp is None:
+            self._timestamp = fill_event.timestamp()
+        price = fill_event.fill_price()
+        if price not in self._price_to_depth:
+            passive_side = self._aggressor.side().other_side()
+            depth = order_book.visible_qty_at_price(passive_side, price) + \
+                order_book.hidden_qty_at_price(passive_side, price)
+            self._price_to_depth[price] = depth
+            self._price_to_consumed[price] = 0
+            self._pre_aggression_depth += depth
+            if self._best_price is None or price.better_than(self._best_price, self._aggressor.side()):
+                self._best_price = price
+            if self._worst_price is None or price.worse_than(self._worst_price, self._aggressor.side()):
+                self._worst_price = price
+        if fill_event.is_aggressor():
+            self._aggressive_qty += fill_event.fill_qty()
+            previous_impact = self._level_impact(price) if self._price_to_consumed[price] > 0 else 0.0
+            was_consumed = self._price_to_consumed[price] >= self._price_to_depth[price]
+            self._price_to_consumed[price] += fill_event.fill_qty()
+            self._impact += self._level_impact(price) - previous_impact
+            if not was_consumed and self._price_to_consumed[price] >= self._price_to_depth[price]:
+                self._levels_consumed += 1
         else:
-            raise Exception("Cannot calculated aggressive impact because match qty not balanced.")
+            self._passive_qty += fill_event.fill_qty()
+
+    def set_aggressor_done(self):
+        """
+        Called when the aggressing command will not get any more fills from this aggression (it was acknowledged into
+         the book, fully filled or cancelled).
+        """
+        self._aggressor_done = True
+
+    def aggressor_done(self):
+        return self._aggressor_done
+
+    def aggressive_qty(self):
+        return self._aggressive_qty
+
+    def passive_qty(self):
+        return self._passive_qty
+
+    def balanced_match_qty(self):
+        return self._aggressive_qty == self._passive_qty
+
+    def match_qty(self):
+        return self._aggressive_qty
+
+    def levels_touched(self):
+        return len(self._price_to_depth)
+
+    def levels_consumed(self):
+        """
+        The number of price levels the aggression took out entirely.
+        """
+        return self._levels_consumed
+
+    def ticks_moved(self, market):
+        """
+        The number of ticks between the best and worst fill prices.
+
+        :param market: MarketObjects.Market.Market
+        :return: int
+        """
+        if self._best_price is None:
+            return 0
+        return int(abs(self._worst_price - self._best_price) / market.mpi())
+
+    def pre_aggression_depth(self):
+        """
+        The total qty, before the aggression, at the prices the aggression filled at.
+        """
+        return self._pre_aggression_depth
 
     def is_closed(self):
-        return self._impact is not None
+        return self._closed
 
-    def add_fill(self, fill_event):
-        MatchSeries.add_fill(self, fill_event)
+    def close(self):
+        self._closed = True
 
     def impact(self):
         return self._impact
@@ -80,11 +183,11 @@ class AggressiveAct(MatchSeries):
 
 class AggressiveImpactListener(OrderLevelBookListener, OrderEventListener):
     """
-    Tracks the Aggressive Impact of each subchain.
+    Tracks the Aggressive Impact of each aggressing command.
 
-    The aggressive impact of a subchain is how many levels of the order book
-     that the subchain took out upon open. The left of the decimal is how many
-     entire price levels the subchain took out and the right of the decimal is
+    The aggressive impact of an aggressing command is how many levels of the
+     order book that it took out. The left of the decimal is how many
+     entire price levels were taken out and the right of the decimal is
      the percentage of the next level.
 
     Aggressive impact value examples:
@@ -92,107 +195,161 @@ class AggressiveImpactListener(OrderLevelBookListener, OrderEventListener):
       * 80% of top of book only --> 0.8
       * 4 levels exactly --> 4.0
       * doesn't aggress --> 0.0
+
+    The impact is calculated incrementally from the fills (see AggressiveAct), so the order book is never walked.
+     An aggressive act is closed once the aggressor is done (acknowledged, fully filled or cancelled) and the
+     aggressive and passive fill qtys balance. Closed acts are written to a Columns store, one row per act:
+      * market
+      * event_id: the aggressing command's event id
+      * timestamp: float. time of the first fill
+      * levels_touched: int
+      * levels_consumed: int
+      * ticks_moved: int
+      * qty: int
+      * pre_aggression_depth: int
+      * impact: float
     """
 
     # TODO UNIT TEST
     def __init__(self, logger):
         OrderLevelBookListener.__init__(self, logger)
         OrderEventListener.__init__(self, logger)
-        self._market_event_id_aggressive_act = NDeepDict(depth=2)
-        self._market_to_orderbook = defaultdict(lambda: None)
-        self._market_to_agg_acts_to_close = defaultdict(set)
+        self._market_to_orderbook = {}
+        self._open_acts = {}  # (market, event_id) -> AggressiveAct
+        self._results = Columns([("market", None),
+                                 ("event_id", None),
+                                 ("timestamp", "d"),
+                                 ("levels_touched", "q"),
+                                 ("levels_consumed", "q"),
+                                 ("ticks_moved", "q"),
+                                 ("qty", "q"),
+                                 ("pre_aggression_depth", "q"),
+                                 ("impact", "d")])
+        self._key_to_row = {}
+
+    def _close_if_done(self, key, agg_act):
+        if agg_act.aggressor_done() and agg_act.balanced_match_qty():
+            market = key[0]
+            agg_act.close()
+            self._key_to_row[key] = len(self._results)
+            self._results.append(market, key[1], agg_act.timestamp(), agg_act.levels_touched(),
+                                 agg_act.levels_consumed(), agg_act.ticks_moved(market), agg_act.match_qty(),
+                                 agg_act.pre_aggression_depth(), agg_act.impact())
+            del self._open_acts[key]
+
+    def _aggressor_done(self, market, event_id):
+        key = (market, event_id)
+        agg_act = self._open_acts.get(key)
+        if agg_act is not None:
+            agg_act.set_aggressor_done()
+            self._close_if_done(key, agg_act)
 
     def handle_acknowledgement_report(self, acknowledgement_report, resulting_order_chain):
-        event_id = acknowledgement_report.causing_command().event_id()
-
-        market = acknowledgement_report.market()
-        if market not in self._market_to_orderbook:
-            return
-        agg_event = self._market_event_id_aggressive_act.get([market, event_id])
-        #if aggressor is acked then all fills on both sides shoud be done and we can calculate
-        if agg_event:
-            agg_event.calculate(self._market_to_orderbook[market])
+        # if aggressor is acked then it is resting and won't get any more fills from this aggression
+        self._aggressor_done(acknowledgement_report.market(), acknowledgement_report.causing_command().event_id())
 
     def _handle_fill(self, fill, resulting_order_chain):
-        match_id = fill.match_id()
         market = fill.market()
-        if market not in self._market_to_orderbook:
+        order_book = self._market_to_orderbook.get(market)
+        if order_book is None:
             return
-        event_id = fill.causing_command().event_id()
-
-        agg_act = self._market_event_id_aggressive_act.get([market, event_id])
+        key = (market, fill.aggressing_command().event_id())
+        agg_act = self._open_acts.get(key)
         # if the event_id of the aggressor does not already exist, we create it
-        if not agg_act:
-            agg_act = AggressiveAct(match_id)
-            self._market_event_id_aggressive_act[[market, event_id]] = agg_act
-        agg_act.add_fill(fill)
+        if agg_act is None:
+            if key in self._key_to_row:
+                self._logger.error("%s: Fill %s for aggressive act %s that is already closed. Ignoring." %
+                                   (self.__class__.__name__, str(fill.event_id()), str(key[1])))
+                return
+            agg_act = AggressiveAct(fill.match_id(), fill.aggressing_command())
+            self._open_acts[key] = agg_act
+        agg_act.add_fill(fill, order_book)
+        # passive fills can trail the aggressor being done, so check on every fill
+        self._close_if_done(key, agg_act)
 
     def handle_partial_fill_report(self, partial_fill_report, resulting_order_chain):
         self._handle_fill(partial_fill_report, resulting_order_chain)
 
     def handle_full_fill_report(self, full_fill_report, resulting_order_chain):
-
-        market = full_fill_report.market()
-        if market not in self._market_to_orderbook:
-            return
         self._handle_fill(full_fill_report, resulting_order_chain)
-        # on an aggressive full fill we close out the open order chain
+        # on an aggressive full fill the aggressor is done
         if full_fill_report.is_aggressor():
-            event_id = full_fill_report.causing_command().event_id()
-            agg_act = self._market_event_id_aggressive_act[[market, event_id]]
-            if agg_act is not None:
-                # if full fill and qty balanced we should be able to do the impact calculation right now because book up to date
-                if agg_act.balanced_match_qty():
-                    agg_act.calculate(self._market_to_orderbook[market])
-                else: # we need to get the order level books after all the updates are done.
-                    self._market_to_agg_acts_to_close[market].add(self._market_event_id_aggressive_act.get([market, event_id]))
-            else:
-                raise Exception("Got an aggressive full fill but not tracking aggressive acts for event: %s" % str(event_id))
+            self._aggressor_done(full_fill_report.market(), full_fill_report.aggressing_command().event_id())
 
     def handle_cancel_report(self, cancel_report, resulting_order_chain):
-        # on a cancel we close out the open order chain because of FAKs
-        market = cancel_report.market()
-        if market not in self._market_to_orderbook:
-            return
-        event_id = cancel_report.causing_command().event_id()
-        agg_event = self._market_event_id_aggressive_act.get([market, event_id])
-        # if aggressor is cancelled then all fills on both sides should be done and we can calculate
-        if agg_event:
-            agg_event.calculate(self._market_to_orderbook[market])
+        # on a cancel the aggressor is done because of FAKs
+        self._aggressor_done(cancel_report.market(), cancel_report.causing_command().event_id())
 
     def clean_up(self, order_chain):
         """
         If clean_up is called with an order_chain than this will go through the
-         order chain's subchain IDs and delete each one from the maps that store
-         the aggressive acts for a subchain.
+         order chain's events and stop tracking any aggressive acts for them.
 
         WARNING: once this is called, the get_aggressive_impact and
          get_aggressive_qty will no longer return the values that are
-         meaningful; rather, you'll get the 0 values
+         meaningful; rather, you'll get the 0 values. The rows already
+         written to aggressive_impacts_table() are not removed.
 
         :param order_chain: MarketObjects.Events.EventChains.OrderEventChain
         """
         market = order_chain.market()
         for event in order_chain.events():
-            del self._market_event_id_aggressive_act[[market,event.event_id()]]
+            key = (market, event.event_id())
+            self._open_acts.pop(key, None)
+            self._key_to_row.pop(key, None)
 
     def notify_book_update(self, order_book, causing_order_chain, tob_updated):
-        market = order_book.market()
-        self._market_to_orderbook[market] = order_book
-        remove_set = set()
-        agg_acts_to_close = self._market_to_agg_acts_to_close[market]
-        for agg_act in agg_acts_to_close:
-            if agg_act.balanced_match_qty():
-                agg_act.calculate(order_book)
-        self._market_to_agg_acts_to_close[market] = agg_acts_to_close.difference(remove_set)
+        self._market_to_orderbook[order_book.market()] = order_book
+
+    def clean_up_order_chain(self, order_chain):
+        pass  # nothing kept per order chain for book updates
+
+    def aggressive_act(self, market, event_id):
+        """
+        Gets the open AggressiveAct for the aggressing event id. None if there isn't one open.
+
+        :param market: MarketObjects.Market.Market
+        :param event_id: unique identifier of the aggressing event
+        :return: AggressiveAct
+        """
+        return self._open_acts.get((market, event_id))
+
+    def _result(self, market, event_id, column_name, default):
+        key = (market, event_id)
+        row = self._key_to_row.get(key)
+        if row is not None:
+            return self._results.column(column_name)[row]
+        agg_act = self._open_acts.get(key)
+        if agg_act is not None:
+            return agg_act.impact() if column_name == "impact" else agg_act.match_qty()
+        return default
 
     def get_aggressive_impact(self, market, event_id):
-        if self._market_event_id_aggressive_act.get([market, event_id]) is not None:
-            impact = self._market_event_id_aggressive_act.get((market, event_id)).impact()
-            return impact
-        return 0.0
+        return self._result(market, event_id, "impact", 0.0)
 
     def get_aggressive_qty(self, market, event_id):
-        if self._market_event_id_aggressive_act.get([market, event_id]) is not None:
-            return self._market_event_id_aggressive_act.get([market, event_id]).match_qty()
-        return 0
+        return self._result(market, event_id, "qty", 0)
+
+    def aggressive_impacts(self, market, event_ids):
+        """
+        Gets the aggressive impact for many aggressing event ids at once. Event ids that did not aggress are 0.0.
+
+        :param market: MarketObjects.Market.Market
+        :param event_ids: iterable of event ids
+        :return: array.array of float
+        """
+        impacts = self._results.column("impact")
+        key_to_row = self._key_to_row
+        result = array("d")
+        for event_id in event_ids:
+            row = key_to_row.get((market, event_id))
+            result.append(impacts[row] if row is not None else self.get_aggressive_impact(market, event_id))
+        return result
+
+    def aggressive_impacts_table(self):
+        """
+        Gets the closed aggressive acts as columns. See the class doc for the columns.
+
+        :return: buttonwood.utils.columns.Columns
+        """
+        return self._results
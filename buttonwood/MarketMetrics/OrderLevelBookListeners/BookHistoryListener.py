@@ -0,0 +1,231 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from bisect import bisect_right
+from buttonwood.MarketMetrics.OrderLevelBookListeners.TopOfBookSeriesListener import NO_PRICE
+from buttonwood.MarketMetrics.OrderLevelBookListeners.TopOfBookSeriesListener import TopOfBookSeriesListener
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.utils.columns import Columns
+
+BID = 0
+ASK = 1
+
+
+class BookState(object):
+    """
+    The depth of an order book at a point in time: for each side, price -> (visible qty, hidden qty, number of orders).
+
+    The getters mirror the ones on OrderLevelBook so code that reads a live book can read a BookState too.
+    """
+
+    def __init__(self, timestamp, bid_levels, ask_levels):
+        self._timestamp = timestamp
+        self._side_levels = (bid_levels, ask_levels)
+
+    def timestamp(self):
+        return self._timestamp
+
+    def _levels(self, side):
+        return self._side_levels[BID if side.is_bid() else ASK]
+
+    def prices(self, side):
+        """
+        :param side: MarketObjects.Side.Side
+        :return: list of MarketObjects.Price.Price. best price first
+        """
+        return sorted(self._levels(side).keys(), reverse=side.is_bid())
+
+    def best_price(self, side):
+        levels = self._levels(side)
+        if len(levels) == 0:
+            return None
+        return max(levels) if side.is_bid() else min(levels)
+
+    def visible_qty_at_price(self, side, price):
+        level = self._levels(side).get(price)
+        return 0 if level is None else level[0]
+
+    def hidden_qty_at_price(self, side, price):
+        level = self._levels(side).get(price)
+        return 0 if level is None else level[1]
+
+    def num_orders_at_price(self, side, price):
+        level = self._levels(side).get(price)
+        return 0 if level is None else level[2]
+
+
+class _BookHistory(object):
+
+    def __init__(self):
+        # one row per price level change, with the state of the level after the change
+        self.deltas = Columns([("timestamp", "d"),
+                               ("side", "b"),
+                               ("price", None),
+                               ("visible_qty", "q"),
+                               ("hidden_qty", "q"),
+                               ("num_orders", "q")])
+        # snapshots are (number of deltas applied, timestamp, bid levels, ask levels)
+        self.snapshot_delta_counts = []
+        self.snapshots = []
+        self.chain_id_to_price = {}
+
+
+class BookHistoryListener(TopOfBookSeriesListener):
+    """
+    Keeps a time indexed history of each order book it listens to so the book can be queried as of any time, without
+     replaying events into a fresh OrderLevelBook:
+      * every book update records the new state of the price levels it changed, as a delta
+      * every snapshot_every deltas the full depth of the book is snapshotted
+      * the top of book series is recorded as in TopOfBookSeriesListener
+
+    book_at(market, timestamp) starts from the nearest snapshot at or before the timestamp and applies at most
+     snapshot_every deltas. tob_at(market, timestamps) binary searches the top of book series for each timestamp.
+
+    The levels an update changed are the price the causing order chain was last seen resting at and the price it is
+     at now; the listener keeps the former per chain.
+
+    :param logger: logging.Logger
+    :param snapshot_every: int. number of deltas between full depth snapshots
+    """
+
+    def __init__(self, logger, snapshot_every=1000):
+        TopOfBookSeriesListener.__init__(self, logger)
+        assert isinstance(snapshot_every, int) and snapshot_every > 0
+        self._snapshot_every = snapshot_every
+        self._market_to_history = {}
+
+    def notify_book_update(self, order_book, causing_order_chain, tob_updated):
+        TopOfBookSeriesListener.notify_book_update(self, order_book, causing_order_chain, tob_updated)
+        market = order_book.market()
+        history = self._market_to_history.get(market)
+        if history is None:
+            history = _BookHistory()
+            self._market_to_history[market] = history
+        timestamp = order_book.last_update_time()
+        side = causing_order_chain.side()
+        chain_id = causing_order_chain.chain_id()
+
+        touched_prices = set()
+        previous_price = history.chain_id_to_price.pop(chain_id, None)
+        if previous_price is not None:
+            touched_prices.add(previous_price)
+        current_price = causing_order_chain.current_price()
+        # only an open, acknowledged FAR can be resting in the book
+        if current_price is not None and causing_order_chain.is_open() and causing_order_chain.is_far() and \
+                causing_order_chain.has_acknowledgement():
+            touched_prices.add(current_price)
+            history.chain_id_to_price[chain_id] = current_price
+
+        side_index = BID if side.is_bid() else ASK
+        for price in touched_prices:
+            history.deltas.append(timestamp, side_index, price,
+                                  order_book.visible_qty_at_price(side, price),
+                                  order_book.hidden_qty_at_price(side, price),
+                                  order_book.num_orders_at_price(side, price))
+
+        num_deltas = len(history.deltas)
+        if len(history.snapshots) == 0 or num_deltas - history.snapshot_delta_counts[-1] >= self._snapshot_every:
+            history.snapshot_delta_counts.append(num_deltas)
+            history.snapshots.append((timestamp, self._depth(order_book, BID_SIDE), self._depth(order_book, ASK_SIDE)))
+
+    @staticmethod
+    def _depth(order_book, side):
+        levels = {}
+        for price in order_book.prices(side):
+            levels[price] = (order_book.visible_qty_at_price(side, price),
+                             order_book.hidden_qty_at_price(side, price),
+                             order_book.num_orders_at_price(side, price))
+        return levels
+
+    def clean_up_order_chain(self, order_chain):
+        history = self._market_to_history.get(order_chain.market())
+        if history is not None:
+            history.chain_id_to_price.pop(order_chain.chain_id(), None)
+
+    def book_at(self, market, timestamp):
+        """
+        Gets the state of the market's book as of the timestamp: after every update at or before it.
+
+        :param market: MarketObjects.Market.Market
+        :param timestamp: float
+        :return: BookState. None if the book had not been updated by the timestamp.
+        """
+        history = self._market_to_history.get(market)
+        if history is None:
+            return None
+        num_deltas = bisect_right(history.deltas.column("timestamp"), timestamp)
+        snapshot_index = bisect_right(history.snapshot_delta_counts, num_deltas) - 1
+        if snapshot_index < 0:
+            return None
+        snapshot_timestamp, bid_levels, ask_levels = history.snapshots[snapshot_index]
+        if snapshot_timestamp > timestamp:
+            return None
+        side_levels = (dict(bid_levels), dict(ask_levels))
+        deltas = history.deltas
+        sides = deltas.column("side")
+        prices = deltas.column("price")
+        visible_qtys = deltas.column("visible_qty")
+        hidden_qtys = deltas.column("hidden_qty")
+        num_orders = deltas.column("num_orders")
+        for i in range(history.snapshot_delta_counts[snapshot_index], num_deltas):
+            levels = side_levels[sides[i]]
+            if num_orders[i] == 0 and visible_qtys[i] == 0 and hidden_qtys[i] == 0:
+                levels.pop(prices[i], None)
+            else:
+                levels[prices[i]] = (visible_qtys[i], hidden_qtys[i], num_orders[i])
+        return BookState(timestamp, side_levels[BID], side_levels[ASK])
+
+    def tob_at(self, market, timestamps):
+        """
+        Gets the top of book as of each of the timestamps.
+
+        :param market: MarketObjects.Market.Market
+        :param timestamps: sequence of float
+        :return: buttonwood.utils.columns.Columns with one row per timestamp and columns timestamp, bid, bid_qty, ask
+                 and ask_qty, as in TopOfBookSeries. NaN prices and 0 qtys before the first top of book.
+        """
+        tob = Columns([("timestamp", "d"), ("bid", "d"), ("bid_qty", "q"), ("ask", "d"), ("ask_qty", "q")])
+        series = self.series(market)
+        if series is None:
+            for timestamp in timestamps:
+                tob.append(timestamp, NO_PRICE, 0, NO_PRICE, 0)
+            return tob
+        tob_timestamps = series.timestamps()
+        bids = series.bid_prices()
+        bid_qtys = series.bid_qtys()
+        asks = series.ask_prices()
+        ask_qtys = series.ask_qtys()
+        for timestamp in timestamps:
+            i = bisect_right(tob_timestamps, timestamp) - 1
+            if i < 0:
+                tob.append(timestamp, NO_PRICE, 0, NO_PRICE, 0)
+            else:
+                tob.append(timestamp, bids[i], bid_qtys[i], asks[i], ask_qtys[i])
+        return tob
@@ -0,0 +1,456 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+Incremental depth (L2 delta) output for order level books.
+
+Rather than the whole book, DepthDeltaListener emits, for each book update, only the price levels the update touched:
+ (side, price, visible qty, hidden qty, number of orders), where a level that emptied out has all zeros. The deltas for
+ an update are batched together with the event id and timestamp of the event that caused it and written out in a
+ compact binary format, suitable for a file or a socket. DepthDeltaDecoder turns the bytes back into DepthDeltaBatches.
+
+The stream is a series of frames, each a type byte, a varint payload length and the payload:
+
+  BOOK frame   varint book id, string book name, string market name, string min price increment
+  DELTA frame  varint book id, event id, timestamp (float64, NaN if None), varint number of deltas, then the deltas
+
+A BOOK frame is written the first time a book shows up, before any of its DELTA frames. Strings are a varint length
+ followed by utf-8. Event ids are a tag byte (none, int or str) followed by a zigzag varint or a string. Each delta is
+ a varint of the price in ticks (zigzag encoded, shifted left one with the low bit set for asks) followed by varints of
+ visible qty, hidden qty and number of orders plus one (0 when the book doesn't know the number of orders).
+"""
+
+from decimal import Decimal
+import struct
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import FillReport
+from buttonwood.MarketObjects.OrderBookListeners.OrderLevelBookListener import OrderLevelBookListener
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.MarketObjects.Side import BID_SIDE
+
+BOOK_FRAME = 1
+DELTA_FRAME = 2
+
+_NO_EVENT_ID = 0
+_INT_EVENT_ID = 1
+_STR_EVENT_ID = 2
+
+_DOUBLE = struct.Struct("<d")
+_NAN = float("nan")
+
+
+def _write_varint(out, value):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, position):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+def _zigzag(value):
+    return value << 1 if value >= 0 else ((-value) << 1) - 1
+
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def _write_string(out, string):
+    encoded = string.encode("utf-8")
+    _write_varint(out, len(encoded))
+    out += encoded
+
+
+def _read_string(data, position):
+    length, position = _read_varint(data, position)
+    return bytes(data[position:position + length]).decode("utf-8"), position + length
+
+
+class DepthDeltaBatch(object):
+    """
+    The levels touched by one book update. Each delta is a tuple (side, price, visible qty, hidden qty, number of
+     orders), where number of orders can be None if the book didn't know it. An emptied level is all zeros.
+    """
+
+    def __init__(self, book_name, market_name, event_id, timestamp, deltas):
+        self._book_name = book_name
+        self._market_name = market_name
+        self._event_id = event_id
+        self._timestamp = timestamp
+        self._deltas = deltas
+
+    def book_name(self):
+        return self._book_name
+
+    def market_name(self):
+        return self._market_name
+
+    def event_id(self):
+        return self._event_id
+
+    def timestamp(self):
+        return self._timestamp
+
+    def deltas(self):
+        return self._deltas
+
+    def __str__(self):
+        return "%s %s %s %s: %s" % (self._market_name, self._book_name, str(self._event_id), str(self._timestamp),
+                                    ", ".join("%s %s %d/%d/%s" % (str(side), str(price), visible, hidden, str(orders))
+                                              for side, price, visible, hidden, orders in self._deltas))
+
+
+class DepthDeltaEncoder(object):
+    """
+    Encodes batches of depth deltas into frames. Keeps the book ids and price to tick conversions for the stream, so
+     use one encoder per output stream.
+    """
+
+    def __init__(self):
+        self._book_to_id = {}
+        self._book_to_mpi = {}
+        self._price_to_ticks = {}
+
+    def _book_id(self, order_book, out):
+        book_id = self._book_to_id.get(order_book)
+        if book_id is None:
+            book_id = len(self._book_to_id)
+            self._book_to_id[order_book] = book_id
+            market = order_book.market()
+            self._book_to_mpi[order_book] = market.mpi()
+            payload = bytearray()
+            _write_varint(payload, book_id)
+            _write_string(payload, order_book.name())
+            _write_string(payload, str(market))
+            _write_string(payload, str(market.mpi()))
+            out.append(BOOK_FRAME)
+            _write_varint(out, len(payload))
+            out += payload
+        return book_id
+
+    def _ticks(self, price, mpi):
+        ticks = self._price_to_ticks.get((price, mpi))
+        if ticks is None:
+            ticks = int((Decimal(str(price)) / mpi).to_integral_value())
+            self._price_to_ticks[(price, mpi)] = ticks
+        return ticks
+
+    def encode(self, order_book, event_id, timestamp, deltas, out=None):
+        """
+        Encodes the deltas for one update of order_book, appending to out (and a BOOK frame first, if this is the
+         first time the encoder has seen order_book).
+
+        :param order_book: MarketObjects.OrderBooks.OrderLevelBook.OrderLevelBook
+        :param event_id: int or str. Can be None
+        :param timestamp: float. Can be None
+        :param deltas: list of (Side, Price, int, int, int) tuples
+        :param out: bytearray. Optional, a new one is created if None
+        :return: bytearray
+        """
+        if out is None:
+            out = bytearray()
+        book_id = self._book_id(order_book, out)
+        mpi = self._book_to_mpi[order_book]
+        payload = bytearray()
+        _write_varint(payload, book_id)
+        if event_id is None:
+            payload.append(_NO_EVENT_ID)
+        elif isinstance(event_id, int):
+            payload.append(_INT_EVENT_ID)
+            _write_varint(payload, _zigzag(event_id))
+        else:
+            payload.append(_STR_EVENT_ID)
+            _write_string(payload, str(event_id))
+        payload += _DOUBLE.pack(_NAN if timestamp is None else timestamp)
+        _write_varint(payload, len(deltas))
+        for side, price, visible_qty, hidden_qty, num_orders in deltas:
+            _write_varint(payload, (_zigzag(self._ticks(price, mpi)) << 1) | (0 if side.is_bid() else 1))
+            _write_varint(payload, visible_qty)
+            _write_varint(payload, hidden_qty)
+            _write_varint(payload, 0 if num_orders is None else num_orders + 1)
+        out.append(DELTA_FRAME)
+        _write_varint(out, len(payload))
+        out += payload
+        return out
+
+
+class DepthDeltaDecoder(object):
+    """
+    Decodes a depth delta stream. Bytes can be fed in arbitrary chunks, as they come off a socket for example; frames
+     that are not complete yet are held until the rest arrives.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._books = {}
+        self._ticks_to_price = {}
+
+    def _decode_book(self, payload):
+        book_id, position = _read_varint(payload, 0)
+        book_name, position = _read_string(payload, position)
+        market_name, position = _read_string(payload, position)
+        mpi, position = _read_string(payload, position)
+        self._books[book_id] = (book_name, market_name, Decimal(mpi))
+
+    def _price(self, ticks, mpi):
+        price = self._ticks_to_price.get((ticks, mpi))
+        if price is None:
+            price = Price(mpi * ticks)
+            self._ticks_to_price[(ticks, mpi)] = price
+        return price
+
+    def _decode_deltas(self, payload):
+        book_id, position = _read_varint(payload, 0)
+        book = self._books.get(book_id)
+        if book is None:
+            raise Exception("Depth delta frame for book id %d before its book frame" % book_id)
+        book_name, market_name, mpi = book
+        tag = payload[position]
+        position += 1
+        if tag == _NO_EVENT_ID:
+            event_id = None
+        elif tag == _INT_EVENT_ID:
+            event_id, position = _read_varint(payload, position)
+            event_id = _unzigzag(event_id)
+        else:
+            event_id, position = _read_string(payload, position)
+        timestamp = _DOUBLE.unpack_from(payload, position)[0]
+        position += _DOUBLE.size
+        num_deltas, position = _read_varint(payload, position)
+        deltas = []
+        for _ in range(num_deltas):
+            key, position = _read_varint(payload, position)
+            visible_qty, position = _read_varint(payload, position)
+            hidden_qty, position = _read_varint(payload, position)
+            num_orders, position = _read_varint(payload, position)
+            deltas.append((ASK_SIDE if key & 1 else BID_SIDE, self._price(_unzigzag(key >> 1), mpi), visible_qty,
+                           hidden_qty, None if num_orders == 0 else num_orders - 1))
+        return DepthDeltaBatch(book_name, market_name, event_id, None if timestamp != timestamp else timestamp, deltas)
+
+    def decode(self, data):
+        """
+        Adds data to the stream and returns the DepthDeltaBatches for all the DELTA frames completed by it.
+
+        :param data: bytes
+        :return: list of DepthDeltaBatch
+        """
+        buf = self._buffer
+        buf += data
+        batches = []
+        position = 0
+        end = len(buf)
+        while position < end:
+            frame_type = buf[position]
+            # the varint length may itself be split across chunks
+            length_end = position + 1
+            while length_end < end and buf[length_end] & 0x80:
+                length_end += 1
+            if length_end >= end:
+                break
+            length, payload_start = _read_varint(buf, position + 1)
+            payload_end = payload_start + length
+            if payload_end > end:
+                break
+            payload = memoryview(buf)[payload_start:payload_end]
+            if frame_type == BOOK_FRAME:
+                self._decode_book(payload)
+            elif frame_type == DELTA_FRAME:
+                batches.append(self._decode_deltas(payload))
+            else:
+                payload.release()
+                raise Exception("Unknown depth delta frame type %d" % frame_type)
+            payload.release()
+            position = payload_end
+        del buf[:position]
+        return batches
+
+    def pending_bytes(self):
+        """
+        Number of bytes held waiting for the rest of a frame.
+
+        :return: int
+        """
+        return len(self._buffer)
+
+
+def read_depth_deltas(path, chunk_size=1 << 16):
+    """
+    Generator of the DepthDeltaBatches in a file written by a DepthDeltaListener.
+
+    :param path: str
+    :param chunk_size: int. Bytes read at a time.
+    """
+    decoder = DepthDeltaDecoder()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            for batch in decoder.decode(chunk):
+                yield batch
+    if decoder.pending_bytes() > 0:
+        raise Exception("%s ends part way through a frame (%d bytes left over)" % (path, decoder.pending_bytes()))
+
+
+class DepthDeltaListener(OrderLevelBookListener):
+    """
+    Emits the price levels touched by each book update as a DELTA frame.
+
+    The listener keeps its own copy of the level quantities of each book it listens to and only emits levels that
+     actually changed. It assumes it sees every update of a book from when the book was empty; a listener added to a
+     book that already has orders in it, or a consumer joining a stream part way through, should start from
+     write_snapshot().
+
+    Frames are written to writer, anything with a write(bytes) method such as a file opened "wb" or a socket's
+     makefile("wb"). Without a writer they are kept in memory; see encoded().
+    """
+
+    def __init__(self, logger, writer=None):
+        OrderLevelBookListener.__init__(self, logger)
+        self._writer = writer
+        self._encoder = DepthDeltaEncoder()
+        self._out = bytearray()
+        self._book_to_levels = {}
+        self._num_batches = 0
+        self._num_deltas = 0
+        self._num_bytes = 0
+
+    def _levels(self, order_book):
+        levels = self._book_to_levels.get(order_book)
+        if levels is None:
+            levels = {BID_SIDE: {}, ASK_SIDE: {}}
+            self._book_to_levels[order_book] = levels
+        return levels
+
+    @staticmethod
+    def _touched_prices(order_chain):
+        prices = set()
+        event = order_chain.most_recent_event()
+        if isinstance(event, AcknowledgementReport):
+            prices.add(event.price())
+            cancel_replace_info = order_chain.cancel_replace_information(event.event_id())
+            if cancel_replace_info is not None:
+                prices.add(cancel_replace_info.previous_exposure().price())
+        elif isinstance(event, FillReport):
+            prices.add(event.fill_price())
+        price = order_chain.current_price()
+        if price is not None:
+            prices.add(price)
+        price = order_chain.price_at_close()
+        if price is not None:
+            prices.add(price)
+        return prices
+
+    def _emit(self, order_book, event_id, timestamp, deltas):
+        out = self._encoder.encode(order_book, event_id, timestamp, deltas,
+                                   bytearray() if self._writer is not None else self._out)
+        self._num_batches += 1
+        self._num_deltas += len(deltas)
+        if self._writer is not None:
+            self._writer.write(out)
+            self._num_bytes += len(out)
+        else:
+            self._num_bytes = len(self._out)
+
+    def notify_book_update(self, order_book, causing_order_chain, tob_updated):
+        side = causing_order_chain.side()
+        known_levels = self._levels(order_book)[side]
+        deltas = []
+        for price in self._touched_prices(causing_order_chain):
+            visible_qty = order_book.visible_qty_at_price(side, price)
+            hidden_qty = order_book.hidden_qty_at_price(side, price)
+            num_orders = order_book.num_orders_at_price(side, price)
+            level = (visible_qty, hidden_qty, num_orders)
+            if visible_qty == 0 and hidden_qty == 0:
+                if known_levels.pop(price, None) is None:
+                    continue
+                level = (0, 0, 0)
+            elif known_levels.get(price) == level:
+                continue
+            else:
+                known_levels[price] = level
+            deltas.append((side, price) + level)
+        if deltas:
+            event = causing_order_chain.most_recent_event()
+            self._emit(order_book, event.event_id(), event.timestamp(), deltas)
+
+    def write_snapshot(self, order_book):
+        """
+        Emits every live level of order_book as one batch with no event id, and resets what the listener knows of the
+         book to match. Consumers that apply the batch to an empty book end up with the full depth.
+
+        :param order_book: MarketObjects.OrderBooks.OrderLevelBook.OrderLevelBook
+        """
+        levels = {BID_SIDE: {}, ASK_SIDE: {}}
+        deltas = []
+        for side in [BID_SIDE, ASK_SIDE]:
+            for price in order_book.prices(side):
+                level = (order_book.visible_qty_at_price(side, price), order_book.hidden_qty_at_price(side, price),
+                         order_book.num_orders_at_price(side, price))
+                levels[side][price] = level
+                deltas.append((side, price) + level)
+        self._book_to_levels[order_book] = levels
+        self._emit(order_book, None, order_book.last_update_time(), deltas)
+
+    def clean_up_order_chain(self, order_chain):
+        pass
+
+    def encoded(self):
+        """
+        The frames emitted so far, when the listener has no writer.
+
+        :return: bytes
+        """
+        return bytes(self._out)
+
+    def num_batches(self):
+        return self._num_batches
+
+    def num_deltas(self):
+        return self._num_deltas
+
+    def num_bytes(self):
+        """
+        Total number of bytes emitted.
+
+        :return: int
+        """
+        return self._num_bytes
@@ -33,8 +33,7 @@ from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand, CancelR
 from buttonwood.MarketObjects.Events.EventChains import OrderEventChain
 from buttonwood.MarketObjects.Side import ASK_SIDE
 from buttonwood.MarketObjects.Side import BID_SIDE
-from buttonwood.utils.dicts import NDeepDict
-import operator
+from buttonwood.utils.fenwick import PrefixMaxFenwickTree
 
 
 class LastTimeTOBListener(OrderLevelBookListener, OrderEventListener):
@@ -46,24 +45,48 @@ class LastTimeTOBListener(OrderLevelBookListener, OrderEventListener):
     If you use the same price but the other side, you get when the last time the
      price would have crossed the book.
 
+    Every time a price is top of book its time is also recorded, by the price's
+     tick, in a prefix max fenwick tree per market and side. The ticks are
+     ordered so that the prices at or through a price make up a prefix, which
+     makes the last time crossed an O(log ticks) query.
+
     This is designed so it can work with multiple order books at once.
     """
+
+    # ticks are offset so that negative prices still get a positive index
+    TICK_OFFSET = 2 ** 40
+
     # TODO UNIT TEST
     def __init__(self, logger):
         OrderLevelBookListener.__init__(self, logger)
         OrderEventListener.__init__(self, logger)
-        self._market_to_side_prev_price = NDeepDict(depth=2)
-        self._market_side_price_time = NDeepDict(depth=3)  # market to side to price to last time it was top of book
-        self._market_side_best_price = NDeepDict(depth=2)
+        self._market_side_to_prev_price = {}  # (market, side) -> previous best price
+        self._market_side_price_to_time = {}  # (market, side, price) -> last time it was top of book
+        self._market_side_to_best_price = {}  # (market, side) -> best price seen
+        self._market_side_to_time_index = {}  # (market, side) -> PrefixMaxFenwickTree of tick index to time
         self._event_id_to_last_time_crossed = {}
         self._event_id_to_last_time_tob = {}
 
+    def _tick_index(self, market, side, price):
+        # for asks the prices at or through a price are the lower ones; for bids the higher ones. So the bids' ticks
+        #  are reversed to make them a prefix as well
+        ticks = int(price / market.mpi())
+        return self.TICK_OFFSET - ticks if side.is_bid() else self.TICK_OFFSET + ticks
+
+    def _set_time(self, market, side, price, time):
+        self._market_side_price_to_time[(market, side, price)] = time
+        time_index = self._market_side_to_time_index.get((market, side))
+        if time_index is None:
+            time_index = PrefixMaxFenwickTree(2 * self.TICK_OFFSET)
+            self._market_side_to_time_index[(market, side)] = time_index
+        time_index.update(self._tick_index(market, side, price), time)
+
     def _update_based_on_new_event(self, market, time):
         for side in [BID_SIDE, ASK_SIDE]:
             # TODO could also loop over every market if we needed to do so here but that impacts performance for what I think is minimal gain
-            prev_best_price = self._market_to_side_prev_price.get([market, side])
+            prev_best_price = self._market_side_to_prev_price.get((market, side))
             if prev_best_price is not None:
-                self._market_side_price_time[market, side, prev_best_price] = time
+                self._set_time(market, side, prev_best_price, time)
 
     def handle_new_order_command(self, new_order_command, resulting_order_chain):
         assert isinstance(new_order_command, NewOrderCommand)
@@ -120,19 +143,20 @@ class LastTimeTOBListener(OrderLevelBookListener, OrderEventListener):
         side = causing_order_chain.side()
 
         best_price = order_book.best_price(side)
+        key = (market, side)
         # if current book best price is not none then need to set its time
         if best_price is not None:
-            self._market_side_price_time[market, side, best_price] = time
-            prev_best_price = self._market_side_best_price.get([market, side])
+            self._set_time(market, side, best_price, time)
+            prev_best_price = self._market_side_to_best_price.get(key)
             if prev_best_price is None or best_price.better_than(prev_best_price, side):
-                self._market_side_best_price[market, side] = best_price
+                self._market_side_to_best_price[key] = best_price
         # if previous best price is not none and is different than new best price then need to set its time to
         #  update it to include previous price period since it was best price until the change
-        prev_best_price = self._market_to_side_prev_price.get([market, side])
+        prev_best_price = self._market_side_to_prev_price.get(key)
         if prev_best_price is not None and prev_best_price != best_price:
-            self._market_side_price_time[market, side, prev_best_price] = time
+            self._set_time(market, side, prev_best_price, time)
         # set previous best price to be the current best price
-        self._market_to_side_prev_price[market, side] = best_price
+        self._market_side_to_prev_price[key] = best_price
 
     def _last_time_was_tob(self, market, side, price):
         """
@@ -145,7 +169,7 @@ class LastTimeTOBListener(OrderLevelBookListener, OrderEventListener):
         :param price: MarketObjects.Price.Price
         :return: float. (Could be None)
         """
-        return self._market_side_price_time.get([market, side, price])
+        return self._market_side_price_to_time.get((market, side, price))
 
     def _last_time_crossed(self, market, side, price):
         """
@@ -163,22 +187,16 @@ class LastTimeTOBListener(OrderLevelBookListener, OrderEventListener):
         # if book hasn't been established yet, so return None
 
         # there are a lot of messages that come in that never would have crossed. so just tracking a "best bid and best
-        # offer seen all day" would keep us from doing the below sorting and iterating for these and save a ton of time
-        best_resting_price = self._market_side_best_price.get([market, resting_side])
+        # offer seen all day" saves the index query for these
+        best_resting_price = self._market_side_to_best_price.get((market, resting_side))
         if best_resting_price is None or price.worse_than(best_resting_price, side):
             return None
-        else:
-
-            resting_prices_to_time = self._market_side_price_time.get([market, resting_side])
-
-            # sort list based on time, where most recent time (highest number) is first
-            sorted_x = sorted(resting_prices_to_time.items(), key=operator.itemgetter(1), reverse=True)
-            for x in sorted_x:
-                if price.better_or_same_as(x[0], side):
-                    return x[1]
-        self._logger.error("last_time_crossed has a price that would have crossed today but still has no cross time value. Something is broken!")
-        # failsafe return?
-        return None
+        # the resting prices at or through the price are a prefix of the resting side's index
+        last_time = self._market_side_to_time_index[(market, resting_side)].prefix_max(
+            self._tick_index(market, resting_side, price))
+        if last_time is None:
+            self._logger.error("last_time_crossed has a price that would have crossed today but still has no cross time value. Something is broken!")
+        return last_time
 
     def clean_up(self, order_chain):
         # if order chain events in map, clean up
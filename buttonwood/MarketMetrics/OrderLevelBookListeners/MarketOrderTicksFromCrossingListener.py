@@ -29,10 +29,14 @@ SOFTWARE.
 
 from buttonwood.MarketObjects.EventListeners.OrderEventListener import OrderEventListener
 from buttonwood.MarketObjects.OrderBookListeners.OrderLevelBookListener import OrderLevelBookListener
-from buttonwood.MarketObjects.Side import BID_SIDE, ASK_SIDE
-from buttonwood.utils.dicts import NDeepDict
+from buttonwood.utils.resultstores import DictResultStore
+from buttonwood.utils.resultstores import ResultCodec
+from buttonwood.utils.resultstores import ResultStore
 from collections import defaultdict
 
+# codec for the ticks this listener stores, for use with a SpillToDiskResultStore
+TICKS_CODEC = ResultCodec("d", lambda ticks: (float(ticks),), lambda row: row[0])
+
 
 class MarketOrderTicksFromCrossing(OrderLevelBookListener, OrderEventListener):
     """
@@ -47,15 +51,18 @@ class MarketOrderTicksFromCrossing(OrderLevelBookListener, OrderEventListener):
      subchain hasn't been created yet (doesn't get created until the execution
      report) so does not have a subchain id to use.
 
+    Results are kept in a result store keyed by (market, chain id), which defaults to a DictResultStore. Use
+     TICKS_CODEC if handing it a SpillToDiskResultStore.
+
     This is designed so it can work with mulitiple order books at once.
     """
     # TODO UNIT TEST
-    def __init__(self, logger):
+    def __init__(self, logger, result_store=None):
         OrderLevelBookListener.__init__(self, logger)
-        self._market_chain_id_ticks = NDeepDict(2)
-        self._market_side_tob = {}
-        self._market_side_tob[BID_SIDE] = defaultdict()
-        self._market_side_tob[ASK_SIDE] = defaultdict()
+        OrderEventListener.__init__(self, logger)
+        assert result_store is None or isinstance(result_store, ResultStore)
+        self._market_chain_id_ticks = DictResultStore() if result_store is None else result_store
+        self._market_side_tob = defaultdict(dict)
 
     def handle_new_order_command(self, new_order_command, resulting_order_chain):
         # only applies to new order commands
@@ -64,9 +71,13 @@ class MarketOrderTicksFromCrossing(OrderLevelBookListener, OrderEventListener):
             price = new_order_command.price()
             market = new_order_command.market()
             mpi = market.mpi()
-            opp_price = self._market_side_tob[market][side.other_side()]
-            ticks_away = ((opp_price - price) if side.is_bid() else (price - opp_price)) / mpi
-            self._market_chain_id_ticks[market, new_order_command.chain_id()] = ticks_away
+            opp_price = self._market_side_tob[market].get(side.other_side())
+            if opp_price is None:
+                ticks_away = None
+            else:
+                ticks_away = ((opp_price - price) if side.is_bid() else (price - opp_price)) / mpi
+            self._market_chain_id_ticks.put((market, new_order_command.chain_id()), ticks_away,
+                                            new_order_command.timestamp())
 
     def notify_book_update(self, order_book, causing_order_chain, tob_updated):
         """
@@ -91,4 +102,10 @@ class MarketOrderTicksFromCrossing(OrderLevelBookListener, OrderEventListener):
         :param chain_id: order chain's unique identifier
         :return: int
         """
-        return self._market_chain_id_ticks.get([market, chain_id])
+        return self._market_chain_id_ticks.get((market, chain_id))
+
+    def clean_up_order_chain(self, order_chain):
+        self._market_chain_id_ticks.remove((order_chain.market(), order_chain.chain_id()))
+
+    def clean_up(self, order_chain):
+        self.clean_up_order_chain(order_chain)
@@ -0,0 +1,104 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from buttonwood.MarketMetrics.MicroPrice import depth_row_metrics
+from buttonwood.MarketObjects.OrderBookListeners.OrderLevelBookListener import OrderLevelBookListener
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects.Side import ASK_SIDE
+
+
+class MicroPriceListener(OrderLevelBookListener):
+    """
+    Keeps the current micro price, depth weighted midpoint and order book imbalance of each market it listens to up to
+     date as the books change. See MarketMetrics.MicroPrice.depth_metrics for how each is defined.
+
+    The values are calculated straight off the book's prices and visible qtys as floats, so no PriceLevels get built.
+     With a depth of 1 only top of book updates cause a recalculation. With a deeper depth every book update does, as
+     the levels behind the top of book can change without the top of book changing.
+
+    A value is None if it can't be calculated, ex: a side of the book is empty, or for the weighted mid, a side has no
+     visible qty within the depth.
+
+    This is designed so it can work with multiple order books at once.
+    """
+
+    def __init__(self, logger, depth=1):
+        OrderLevelBookListener.__init__(self, logger)
+        assert isinstance(depth, int) and depth > 0
+        self._depth = depth
+        self._market_to_micro_price = {}
+        self._market_to_weighted_mid = {}
+        self._market_to_imbalance = {}
+
+    def depth(self):
+        return self._depth
+
+    def _side_prices_and_qtys(self, order_book, side):
+        if self._depth == 1:
+            price = order_book.best_price(side)
+            if price is None:
+                return [], []
+            return [float(price)], [order_book.visible_qty_at_price(side, price)]
+        prices = order_book.prices(side)[:self._depth]
+        return [float(price) for price in prices], [order_book.visible_qty_at_price(side, price) for price in prices]
+
+    def notify_book_update(self, order_book, causing_order_chain, tob_updated):
+        if self._depth == 1 and not tob_updated:
+            return
+        market = order_book.market()
+        bid_prices, bid_qtys = self._side_prices_and_qtys(order_book, BID_SIDE)
+        ask_prices, ask_qtys = self._side_prices_and_qtys(order_book, ASK_SIDE)
+        micro_price, weighted_mid, imbalance = depth_row_metrics(bid_prices, bid_qtys, ask_prices, ask_qtys)
+        self._market_to_micro_price[market] = micro_price
+        self._market_to_weighted_mid[market] = weighted_mid
+        self._market_to_imbalance[market] = imbalance
+
+    def clean_up_order_chain(self, order_chain):
+        pass  # nothing is kept per order chain
+
+    def micro_price(self, market):
+        """
+        :param market: MarketObjects.Market.Market
+        :return: float. None if it can't be calculated or the market hasn't had a book update.
+        """
+        return self._market_to_micro_price.get(market)
+
+    def weighted_mid(self, market):
+        """
+        :param market: MarketObjects.Market.Market
+        :return: float. None if it can't be calculated or the market hasn't had a book update.
+        """
+        return self._market_to_weighted_mid.get(market)
+
+    def imbalance(self, market):
+        """
+        :param market: MarketObjects.Market.Market
+        :return: float. None if it can't be calculated or the market hasn't had a book update.
+        """
+        return self._market_to_imbalance.get(market)
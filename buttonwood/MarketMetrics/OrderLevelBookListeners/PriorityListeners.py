@@ -27,11 +27,14 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+from math import isnan
 from buttonwood.MarketObjects.OrderBookListeners.OrderLevelBookListener import OrderLevelBookListener
 from buttonwood.MarketObjects.EventListeners.OrderEventListener import OrderEventListener
 from buttonwood.MarketObjects.Events.OrderEvents import CancelReplaceCommand
 from buttonwood.MarketObjects.OrderBooks.OrderLevelOrderBookQueries import modified_qty_at_price
-from buttonwood.utils.dicts import NDeepDict
+from buttonwood.utils.resultstores import DictResultStore
+from buttonwood.utils.resultstores import ResultCodec
+from buttonwood.utils.resultstores import ResultStore
 
 
 class Priority(object):
@@ -110,6 +113,23 @@ class Priority(object):
                self.ticks_from_opposite_tob() == other_priority.ticks_from_opposite_tob() and self.size_ahead_at_price() < other_priority.size_ahead_at_price())
 
 
+def _priority_to_row(priority):
+    ticks_from_opposite_tob = priority.ticks_from_opposite_tob()
+    return (float(priority.ticks_from_tob()),
+            float("nan") if ticks_from_opposite_tob is None else float(ticks_from_opposite_tob),
+            priority.size_ahead_at_price())
+
+
+def _priority_from_row(row):
+    ticks_from_tob, ticks_from_opposite_tob, size_ahead_at_price = row
+    return Priority(ticks_from_tob, None if isnan(ticks_from_opposite_tob) else ticks_from_opposite_tob,
+                    size_ahead_at_price)
+
+
+# codec for Priority, for use with a SpillToDiskResultStore. Ticks come back as floats.
+PRIORITY_CODEC = ResultCodec("ddq", _priority_to_row, _priority_from_row)
+
+
 class EventPriorityListener(OrderLevelBookListener, OrderEventListener):
     """
 
@@ -119,16 +139,23 @@ class EventPriorityListener(OrderLevelBookListener, OrderEventListener):
 
     priority at command is what the priority was before the event .
 
+    Priorities are kept in result stores keyed by (market, event id): one for the priority of the event and one for
+     the priority before the event. Both default to a DictResultStore. Use PRIORITY_CODEC if handing it a
+     SpillToDiskResultStore.
+
     Designed to work with the order books of multiple markets.
     """
 
     # TODO UNIT TEST!
-    def __init__(self, logger, handle_market_orders=False):
+    def __init__(self, logger, handle_market_orders=False, priority_store=None, priority_before_store=None):
         OrderLevelBookListener.__init__(self, logger)
         OrderEventListener.__init__(self, logger)
+        assert priority_store is None or isinstance(priority_store, ResultStore)
+        assert priority_before_store is None or isinstance(priority_before_store, ResultStore)
         self._market_to_order_book = {}
-        self._market_to_event_to_priority = NDeepDict(depth=2)
-        self._market_to_event_to_priority_before = NDeepDict(depth=2)
+        self._market_to_event_to_priority = DictResultStore() if priority_store is None else priority_store
+        self._market_to_event_to_priority_before = \
+            DictResultStore() if priority_before_store is None else priority_before_store
         self._handle_market_orders = handle_market_orders
 
     def _calculate_priority_not_in_book(self, price, side, market, ignore_order_ids=set()):
@@ -169,16 +196,9 @@ class EventPriorityListener(OrderLevelBookListener, OrderEventListener):
                 return Priority(ticks_from_tob, ticks_from_opposite_tob, qty_ahead)
 
     def _best_price(self, order_book, side, order_chain_ids):
-        prices = order_book.prices(side)
-        best_price = None
-        for price in prices:
-            for order_chain in order_book.iter_order_chains_at_price(side, price):
-                if order_chain.chain_id() not in order_chain_ids:
-                    best_price = price
-                    break
-            if best_price is not None:
-                break
-        return best_price
+        if len(order_chain_ids) == 0:
+            return order_book.best_price(side)
+        return order_book.best_price_excluding(side, order_chain_ids)
 
     def _calculate_priority_in_book(self, order_chain):
         """
@@ -208,11 +228,10 @@ class EventPriorityListener(OrderLevelBookListener, OrderEventListener):
             else:  # if best price is not None then we need to calculate
                 ticks_from_tob = price.ticks_behind(best_price, side, market)
                 # assuming visible qty gets priority over hidden so only want visible qty for qty ahead
-                qty_ahead = 0
-                for chain in order_book.iter_order_chains_at_price(side, price):
-                    if chain.chain_id() == order_chain.chain_id():
-                        break
-                    qty_ahead += chain.visible_qty()
+                qty_ahead = order_book.visible_qty_ahead(side, price, order_chain.chain_id())
+                # if the order chain is not at the price then everything at the price is ahead of it
+                if qty_ahead is None:
+                    qty_ahead = order_book.visible_qty_at_price(side, price)
                 return Priority(ticks_from_tob, ticks_from_opposite_tob, qty_ahead)
 
     def handle_new_order_command(self, new_order_command, resulting_order_chain):
@@ -228,7 +247,7 @@ class EventPriorityListener(OrderLevelBookListener, OrderEventListener):
             return
         # new orders are not in the book so calculate what priority *would be*
         priority = self._calculate_priority_not_in_book(price, side, market)
-        self._market_to_event_to_priority[[market, event_id]] = priority
+        self._market_to_event_to_priority.put((market, event_id), priority, new_order_command.timestamp())
         # No need to set priority before event on new orders
 
     def handle_cancel_replace_command(self, cancel_replace_command, resulting_order_chain):
@@ -244,7 +263,8 @@ class EventPriorityListener(OrderLevelBookListener, OrderEventListener):
             exposure = resulting_order_chain.current_exposure()
 
         before_event_priority = self._calculate_priority_in_book(resulting_order_chain)
-        self._market_to_event_to_priority_before[[market, event_id]] = before_event_priority
+        self._market_to_event_to_priority_before.put((market, event_id), before_event_priority,
+                                                     cancel_replace_command.timestamp())
 
         # cancel_replace_same_priority is True if cancel replace down and same price
         cancel_replace_same_priority = (price == exposure.price() and exposure.qty() > cancel_replace_command.qty())
@@ -256,7 +276,7 @@ class EventPriorityListener(OrderLevelBookListener, OrderEventListener):
             # ignore itself so that we do include it as in front of itself on cancel replace up in size
             priority = self._calculate_priority_not_in_book(price, side, market,
                                                             ignore_order_ids={cancel_replace_command.chain_id()})
-        self._market_to_event_to_priority[[market, event_id]] = priority
+        self._market_to_event_to_priority.put((market, event_id), priority, cancel_replace_command.timestamp())
 
     def handle_cancel_command(self, cancel_command, resulting_order_chain):
         """
@@ -267,9 +287,9 @@ class EventPriorityListener(OrderLevelBookListener, OrderEventListener):
         if market not in self._market_to_order_book:
             return
         priority = self._calculate_priority_in_book(resulting_order_chain)
-        self._market_to_event_to_priority[[market, event_id]] = priority
+        self._market_to_event_to_priority.put((market, event_id), priority, cancel_command.timestamp())
         # priority before the event is the same calculated aftet event for cancel command
-        self._market_to_event_to_priority_before[[market, event_id]] = priority
+        self._market_to_event_to_priority_before.put((market, event_id), priority, cancel_command.timestamp())
 
     def handle_acknowledgement_report(self, acknowledgement_report, resulting_order_chain):
         event_id = acknowledgement_report.event_id()
@@ -279,12 +299,13 @@ class EventPriorityListener(OrderLevelBookListener, OrderEventListener):
             return
         # acks are in the book already and no need to do anything fancy with ignoring orders
         priority = self._calculate_priority_in_book(resulting_order_chain)
-        self._market_to_event_to_priority[[market, event_id]] = priority
+        self._market_to_event_to_priority.put((market, event_id), priority, acknowledgement_report.timestamp())
 
         # if acking a new order no priority before, so use default of None.
         #  Calculate for cancel replace with current priority since hasn't been applied to book yet
         if isinstance(acknowledgement_report.causing_command(), CancelReplaceCommand):
-            self._market_to_event_to_priority_before[[market, event_id]] = priority
+            self._market_to_event_to_priority_before.put((market, event_id), priority,
+                                                         acknowledgement_report.timestamp())
 
 
     def _priority_at_fill(self, fill_event, resulting_order_chain):
@@ -305,10 +326,10 @@ class EventPriorityListener(OrderLevelBookListener, OrderEventListener):
         if opposite_best_price is not None:  # if it is None then ticks from opposite is None
             ticks_from_opposite_tob = abs((opposite_best_price - fill_event.fill_price()) / market.mpi())
         priority = Priority(0, ticks_from_opposite_tob, 0)
-        self._market_to_event_to_priority[[market, event_id]] = priority
+        self._market_to_event_to_priority.put((market, event_id), priority, fill_event.timestamp())
 
         # for a fill, priority before fill is always 0
-        self._market_to_event_to_priority_before[[market, event_id]] = priority
+        self._market_to_event_to_priority_before.put((market, event_id), priority, fill_event.timestamp())
 
     def handle_partial_fill_report(self, partial_fill_report, resulting_order_chain):
         self._priority_at_fill(partial_fill_report, resulting_order_chain)
@@ -331,8 +352,8 @@ class EventPriorityListener(OrderLevelBookListener, OrderEventListener):
             return
         event_id = cancel_report.event_id()
         priority = self._calculate_priority_in_book(resulting_order_chain)
-        self._market_to_event_to_priority[[market, event_id]] = priority
-        self._market_to_event_to_priority_before[[market, event_id]] = priority
+        self._market_to_event_to_priority.put((market, event_id), priority, cancel_report.timestamp())
+        self._market_to_event_to_priority_before.put((market, event_id), priority, cancel_report.timestamp())
 
     def notify_book_update(self, order_book, causing_order_chain, tob_updated):
         """
@@ -349,7 +370,7 @@ class EventPriorityListener(OrderLevelBookListener, OrderEventListener):
         :param event_id: unique identifier of event
         :return: MarketMetrics.OrderLevelBookListeners.PriorityListeners.Priority
         """
-        return self._market_to_event_to_priority.get([market, event_id])
+        return self._market_to_event_to_priority.get((market, event_id))
 
     def priority_before_event(self, market, event_id):
         """
@@ -360,7 +381,7 @@ class EventPriorityListener(OrderLevelBookListener, OrderEventListener):
         :param event_id: unique identifier of event
         :return: MarketMetrics.OrderLevelBookListeners.PriorityListeners.Priority
         """
-        return self._market_to_event_to_priority_before.get([market, event_id])
+        return self._market_to_event_to_priority_before.get((market, event_id))
 
     def clean_up(self, order_chain):
         """
@@ -375,6 +396,5 @@ class EventPriorityListener(OrderLevelBookListener, OrderEventListener):
         market = order_chain.market()
         events = order_chain.events()
         for event in events:
-            del self._market_to_event_to_priority[[market, event.event_id()]]
-            if event.event_id() in self._market_to_event_to_priority_before.get([market]):
-                del self._market_to_event_to_priority_before[[market, event.event_id()]]
+            self._market_to_event_to_priority.remove((market, event.event_id()))
+            self._market_to_event_to_priority_before.remove((market, event.event_id()))
@@ -0,0 +1,364 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+Publishes top of book and the first N price levels of each market into a multiprocessing.shared_memory segment, so
+ that other processes (risk, dashboards, strategies) can read the reconstructed book without any serialization.
+
+Segment layout (all little endian):
+
+  header     64 bytes: magic, layout version, max markets, depth, number of markets in use
+  directory  max markets * 64 bytes: utf-8 market name (str(market)) for each slot, NUL padded
+  slots      max markets * slot size: one seqlock protected record per market
+
+Each slot starts with an 8 byte sequence number followed by the record: timestamp (double), update count (int64),
+ number of live bid levels (uint32), number of live ask levels (uint32), then depth bid levels and depth ask levels of
+ (price double, visible qty int64, hidden qty int64, number of orders int64), best level first. Unused levels have a
+ NaN price.
+
+The sequence number is odd while the single writer is part way through a record and even once it is done, so a reader
+ that sees the same even sequence number before and after copying the record out has a consistent snapshot.
+"""
+
+from math import isnan
+import struct
+from multiprocessing import shared_memory
+from buttonwood.MarketObjects.OrderBookListeners.OrderLevelBookListener import OrderLevelBookListener
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.PriceLevel import PriceLevel
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects.Side import ASK_SIDE
+
+MAGIC = b"BWTOB\x00\x00\x01"
+LAYOUT_VERSION = 1
+
+_HEADER = struct.Struct("<8sIIII")
+_HEADER_SIZE = 64
+_NAME_SIZE = 64
+_SEQUENCE = struct.Struct("<Q")
+_NUM_MARKETS_OFFSET = 20
+_NUM_MARKETS = struct.Struct("<I")
+_EMPTY_LEVEL = (float("nan"), 0, 0, 0)
+
+
+def _record_struct(depth):
+    return struct.Struct("<dqII" + "dqqq" * (2 * depth))
+
+
+def _slot_size(depth):
+    # keep each slot on its own cache lines so markets don't share lines between writes
+    size = _SEQUENCE.size + _record_struct(depth).size
+    return (size + 63) // 64 * 64
+
+
+def _untrack(shm):
+    # SharedMemory registers every segment it creates or attaches to with the process's resource tracker, which
+    #  unlinks it when the process exits; for a reader that means pulling the segment out from under the publisher.
+    #  The publisher owns the segment and unlinks it explicitly, so neither side leaves it to the tracker.
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except (ImportError, AttributeError):
+        pass
+
+
+def _track(shm):
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.register(shm._name, "shared_memory")
+    except (ImportError, AttributeError):
+        pass
+
+
+def segment_size(max_markets, depth):
+    """
+    Number of bytes needed for a segment holding max_markets markets at the given depth.
+
+    :param max_markets: int
+    :param depth: int
+    :return: int
+    """
+    return _HEADER_SIZE + max_markets * _NAME_SIZE + max_markets * _slot_size(depth)
+
+
+class SharedMemoryTopOfBookListener(OrderLevelBookListener):
+    """
+    Writes the top depth price levels of every order book it listens to into a shared memory segment. Markets get a
+     slot the first time one of their books updates; once max_markets slots are used further markets are logged
+     and ignored.
+
+    This is the only writer of the segment and should be the only one; there is no locking between writers. It owns
+     the segment: call unlink() when done publishing so the operating system can reclaim it. The segment is not
+     removed automatically when the process exits, so readers can still see the last published state.
+    """
+
+    def __init__(self, logger, name=None, depth=5, max_markets=16):
+        """
+        :param logger: logging.Logger
+        :param name: str. Name of the shared memory segment. If None a random name is created; see name().
+        :param depth: int. Number of price levels to publish per side.
+        :param max_markets: int. Number of market slots in the segment.
+        """
+        OrderLevelBookListener.__init__(self, logger)
+        assert isinstance(depth, int) and depth > 0
+        assert isinstance(max_markets, int) and max_markets > 0
+        self._depth = depth
+        self._max_markets = max_markets
+        self._record = _record_struct(depth)
+        self._slot_size = _slot_size(depth)
+        self._slots_offset = _HEADER_SIZE + max_markets * _NAME_SIZE
+        self._shm = shared_memory.SharedMemory(name=name, create=True, size=segment_size(max_markets, depth))
+        _untrack(self._shm)
+        self._buf = self._shm.buf
+        _HEADER.pack_into(self._buf, 0, MAGIC, LAYOUT_VERSION, max_markets, depth, 0)
+        self._market_to_slot = {}
+        self._market_to_update_count = {}
+        self._values = [0.0, 0, 0, 0] + list(_EMPTY_LEVEL) * (2 * depth)
+
+    def name(self):
+        """
+        The name of the shared memory segment, for handing to SharedMemoryTopOfBookReader.
+
+        :return: str
+        """
+        return self._shm.name
+
+    def depth(self):
+        return self._depth
+
+    def _add_market(self, market):
+        slot = len(self._market_to_slot)
+        if slot >= self._max_markets:
+            self._logger.error("SharedMemoryTopOfBookListener %s: no free slot for %s, already publishing %d markets" %
+                               (self.name(), str(market), self._max_markets))
+            self._market_to_slot[market] = None
+            return None
+        offset = self._slots_offset + slot * self._slot_size
+        market_name = str(market).encode("utf-8")[:_NAME_SIZE - 1]
+        struct.pack_into("%ds" % _NAME_SIZE, self._buf, _HEADER_SIZE + slot * _NAME_SIZE, market_name)
+        _SEQUENCE.pack_into(self._buf, offset, 0)
+        self._record.pack_into(self._buf, offset + _SEQUENCE.size, *self._values)
+        self._market_to_slot[market] = offset
+        self._market_to_update_count[market] = 0
+        # publish the market count last so readers never see a slot before its name is written
+        _NUM_MARKETS.pack_into(self._buf, _NUM_MARKETS_OFFSET, slot + 1)
+        return offset
+
+    def _fill_side(self, order_book, side, start):
+        values = self._values
+        prices = order_book.prices(side)[:self._depth]
+        i = start
+        for price in prices:
+            values[i] = float(price)
+            values[i + 1] = order_book.visible_qty_at_price(side, price)
+            values[i + 2] = order_book.hidden_qty_at_price(side, price)
+            num_orders = order_book.num_orders_at_price(side, price)
+            values[i + 3] = -1 if num_orders is None else num_orders
+            i += 4
+        end = start + 4 * self._depth
+        while i < end:
+            values[i:i + 4] = _EMPTY_LEVEL
+            i += 4
+        return len(prices)
+
+    def notify_book_update(self, order_book, causing_order_chain, tob_updated):
+        # with depth 1 an update away from the top of book can't change anything that is published
+        if self._depth == 1 and not tob_updated:
+            return
+        market = order_book.market()
+        offset = self._market_to_slot.get(market, -1)
+        if offset == -1:
+            offset = self._add_market(market)
+        if offset is None:
+            return
+        update_count = self._market_to_update_count[market] + 1
+        self._market_to_update_count[market] = update_count
+        values = self._values
+        timestamp = order_book.last_update_time()
+        values[0] = float("nan") if timestamp is None else float(timestamp)
+        values[1] = update_count
+        values[2] = self._fill_side(order_book, BID_SIDE, 4)
+        values[3] = self._fill_side(order_book, ASK_SIDE, 4 + 4 * self._depth)
+        buf = self._buf
+        sequence = _SEQUENCE.unpack_from(buf, offset)[0]
+        _SEQUENCE.pack_into(buf, offset, sequence + 1)
+        self._record.pack_into(buf, offset + 8, *values)
+        _SEQUENCE.pack_into(buf, offset, sequence + 2)
+
+    def clean_up_order_chain(self, order_chain):
+        pass
+
+    def close(self):
+        """
+        Detaches from the segment. Readers that are already attached keep working until the segment is unlinked.
+        """
+        self._buf = None
+        self._shm.close()
+
+    def unlink(self):
+        """
+        Removes the segment from the system. Should be called once, by the publishing process, when done.
+        """
+        # SharedMemory.unlink() unregisters from the resource tracker too, so give it something to unregister
+        _track(self._shm)
+        self._shm.unlink()
+
+
+class SharedMemoryTopOfBookReader(object):
+    """
+    Reads the snapshots published by a SharedMemoryTopOfBookListener, usually from another process.
+
+    Reads never block the writer: a reader copies a market's record straight out of the shared buffer and retries if
+     the writer was part way through updating it.
+    """
+
+    def __init__(self, name, max_retries=100000):
+        """
+        :param name: str. Name of the segment, from SharedMemoryTopOfBookListener.name()
+        :param max_retries: int. How many times to retry a read that raced with the writer before giving up.
+        """
+        self._shm = shared_memory.SharedMemory(name=name, create=False)
+        _untrack(self._shm)
+        self._buf = self._shm.buf
+        magic, version, max_markets, depth, _ = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            raise Exception("Shared memory segment %s is not a version %d top of book segment" %
+                            (name, LAYOUT_VERSION))
+        self._max_markets = max_markets
+        self._depth = depth
+        self._max_retries = max_retries
+        self._record = _record_struct(depth)
+        self._slot_size = _slot_size(depth)
+        self._slots_offset = _HEADER_SIZE + max_markets * _NAME_SIZE
+        self._market_to_slot = {}
+        self._retries = 0
+
+    def depth(self):
+        return self._depth
+
+    def retries(self):
+        """
+        Number of times a read raced with the writer and had to be retried.
+
+        :return: int
+        """
+        return self._retries
+
+    def markets(self):
+        """
+        Names (str(market)) of the markets currently being published, in slot order.
+
+        :return: list of str
+        """
+        num_markets = _NUM_MARKETS.unpack_from(self._buf, _NUM_MARKETS_OFFSET)[0]
+        names = []
+        for slot in range(num_markets):
+            start = _HEADER_SIZE + slot * _NAME_SIZE
+            names.append(bytes(self._buf[start:start + _NAME_SIZE]).rstrip(b"\x00").decode("utf-8"))
+        return names
+
+    def _slot_offset(self, market_name):
+        offset = self._market_to_slot.get(market_name)
+        if offset is None:
+            # the market may have been added since the last look
+            for slot, name in enumerate(self.markets()):
+                self._market_to_slot[name] = self._slots_offset + slot * self._slot_size
+            offset = self._market_to_slot.get(market_name)
+        return offset
+
+    def _read(self, offset):
+        buf = self._buf
+        unpack_sequence = _SEQUENCE.unpack_from
+        unpack_record = self._record.unpack_from
+        record_offset = offset + 8
+        for _ in range(self._max_retries):
+            before = unpack_sequence(buf, offset)[0]
+            if not before & 1:
+                record = unpack_record(buf, record_offset)
+                if unpack_sequence(buf, offset)[0] == before:
+                    return record
+            self._retries += 1
+        raise Exception("Could not get a consistent read of slot at %d after %d tries" % (offset, self._max_retries))
+
+    def update_count(self, market_name):
+        """
+        Number of updates published for the market. A cheap way to poll for changes before taking a snapshot. None if
+         the market is not being published.
+
+        :param market_name: str
+        :return: int
+        """
+        offset = self._slot_offset(market_name)
+        if offset is None:
+            return None
+        return self._read(offset)[1]
+
+    def snapshot(self, market_name):
+        """
+        Consistent snapshot of the market as (timestamp, update count, bid levels, ask levels), where each side is a
+         list, best first, of (price, visible qty, hidden qty, number of orders) tuples. Prices are floats and number
+         of orders is -1 if the book did not know it. None if the market is not being published.
+
+        :param market_name: str
+        :return: (float, int, list, list)
+        """
+        offset = self._slot_offset(market_name)
+        if offset is None:
+            return None
+        record = self._read(offset)
+        bids_start = 4
+        asks_start = 4 + 4 * self._depth
+        bids = [record[i:i + 4] for i in range(bids_start, bids_start + 4 * record[2], 4)]
+        asks = [record[i:i + 4] for i in range(asks_start, asks_start + 4 * record[3], 4)]
+        timestamp = record[0]
+        return None if isnan(timestamp) else timestamp, record[1], bids, asks
+
+    def best_levels(self, market_name):
+        """
+        Top of book as (bid PriceLevel, ask PriceLevel), in the same form as the other top of book listeners. Either
+         side can be None if it is empty; None instead of a tuple if the market is not being published.
+
+        :param market_name: str
+        :return: (Buttonwood.MarketObjects.PriceLevel.PriceLevel, Buttonwood.MarketObjects.PriceLevel.PriceLevel)
+        """
+        snapshot = self.snapshot(market_name)
+        if snapshot is None:
+            return None
+        # repr gives the shortest string that round trips, so the Price comes back as the tick it was published as
+        return tuple(None if len(levels) == 0 else
+                     PriceLevel(Price(repr(levels[0][0])), levels[0][1], levels[0][2],
+                                None if levels[0][3] < 0 else levels[0][3])
+                     for levels in snapshot[2:])
+
+    def close(self):
+        """
+        Detaches from the segment. Does not remove it; that is left to the publisher.
+        """
+        self._buf = None
+        self._shm.close()
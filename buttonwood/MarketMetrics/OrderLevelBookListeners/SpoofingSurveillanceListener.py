@@ -0,0 +1,321 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from collections import deque
+from collections import OrderedDict
+from buttonwood.MarketObjects.OrderBookListeners.OrderLevelBookListener import OrderLevelBookListener
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReport
+from buttonwood.MarketObjects.Events.OrderEvents import FillReport
+from buttonwood.MarketObjects.Events.OrderEvents import FullFillReport
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects.Side import ASK_SIDE
+
+BID = 0
+ASK = 1
+
+
+def _side_index(side):
+    return BID if side.is_bid() else ASK
+
+
+class SpoofingAlert(object):
+    """
+    A user that, within the window, had orders resting away from the top of book on one side (the spoof side) that
+     were quickly cancelled while getting filled on the other side.
+    """
+
+    def __init__(self, timestamp, market, user_id, spoof_side, cancel_count, cancelled_qty, opposite_fill_qty,
+                 size_imbalance):
+        self._timestamp = timestamp
+        self._market = market
+        self._user_id = user_id
+        self._spoof_side = spoof_side
+        self._cancel_count = cancel_count
+        self._cancelled_qty = cancelled_qty
+        self._opposite_fill_qty = opposite_fill_qty
+        self._size_imbalance = size_imbalance
+
+    def timestamp(self):
+        return self._timestamp
+
+    def market(self):
+        return self._market
+
+    def user_id(self):
+        return self._user_id
+
+    def spoof_side(self):
+        return self._spoof_side
+
+    def cancel_count(self):
+        return self._cancel_count
+
+    def cancelled_qty(self):
+        return self._cancelled_qty
+
+    def opposite_fill_qty(self):
+        return self._opposite_fill_qty
+
+    def size_imbalance(self):
+        """
+        (bid qty placed - ask qty placed) / total qty placed, in the window. Positive when the user placed more on the
+         bid.
+        """
+        return self._size_imbalance
+
+    def __str__(self):
+        return "%s %s %s: %d quick away cancels for %d on %s with %d filled on the other side. Imbalance %.2f" % \
+               (str(self._timestamp), str(self._market), str(self._user_id), self._cancel_count, self._cancelled_qty,
+                str(self._spoof_side), self._opposite_fill_qty, self._size_imbalance)
+
+
+class _WindowedSums(object):
+    # a running per side sum of qty over a sliding time window. Each entry is added and expired exactly once, so
+    #  the cost is amortized O(1) per entry and memory is bounded by the entries in the window.
+
+    def __init__(self):
+        self._entries = deque()
+        self.qtys = [0, 0]
+        self.counts = [0, 0]
+
+    def add(self, timestamp, side_index, qty):
+        self._entries.append((timestamp, side_index, qty))
+        self.qtys[side_index] += qty
+        self.counts[side_index] += 1
+
+    def expire(self, oldest_time):
+        entries = self._entries
+        while entries and entries[0][0] < oldest_time:
+            _, side_index, qty = entries.popleft()
+            self.qtys[side_index] -= qty
+            self.counts[side_index] -= 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _UserState(object):
+
+    def __init__(self):
+        # chain id -> (time placed away from the top of book, side index, qty)
+        self.away_orders = {}
+        # (time placed, chain id), in time order, so placements too old to be quickly cancelled can be dropped
+        self.away_order_times = deque()
+        self.quick_away_cancels = _WindowedSums()
+        self.fills = _WindowedSums()
+        self.placed = _WindowedSums()
+        self.last_alert_time = [None, None]
+
+    def expire(self, timestamp, window, cancel_window):
+        oldest_time = timestamp - window
+        self.quick_away_cancels.expire(oldest_time)
+        self.fills.expire(oldest_time)
+        self.placed.expire(oldest_time)
+        oldest_placement = timestamp - cancel_window
+        times = self.away_order_times
+        while times and times[0][0] < oldest_placement:
+            placed_time, chain_id = times.popleft()
+            away_order = self.away_orders.get(chain_id)
+            if away_order is not None and away_order[0] == placed_time:
+                del self.away_orders[chain_id]
+
+
+class SpoofingSurveillanceListener(OrderLevelBookListener):
+    """
+    Streaming spoofing / layering surveillance. For each (market, user) it keeps sliding window features:
+      * orders placed at least min_ticks_away ticks behind the top of book on their side that were cancelled within
+        cancel_window seconds of being placed ("quick away cancels")
+      * fills on each side, passive or aggressive
+      * qty placed on each side, for the size imbalance. An amend only counts the qty it adds
+
+    An alert is raised when, within the window, a user's quick away cancels on one side reach min_cancel_count and
+     min_cancelled_qty and the user also has fills on the other side. After an alert the same user, market and side
+     won't alert again until a window has passed.
+
+    Every event costs amortized O(1): features are running sums over deques that each entry enters and leaves once.
+     Memory is bounded: each user only holds what is in their windows, at most max_users users are tracked (the
+     least recently active are dropped) and at most max_alerts alerts are held for pop_alerts.
+
+    Aggressive fills never change the book, so they are picked up from the passive side of the match: the passive
+     chain's fill carries the aggressing command and so the aggressing user.
+
+    :param logger: logging.Logger
+    :param window: float. seconds for the feature windows
+    :param cancel_window: float. seconds from placement within which a cancel counts as quick
+    :param min_ticks_away: int. how far behind the top of book an order has to be placed to count as away
+    :param min_cancel_count: int.
+    :param min_cancelled_qty: int.
+    :param max_users: int. maximum number of (market, user) states kept
+    :param max_alerts: int. maximum number of alerts held until pop_alerts is called. Oldest dropped first.
+    """
+
+    def __init__(self, logger, window, cancel_window, min_ticks_away=1, min_cancel_count=3, min_cancelled_qty=1,
+                 max_users=10000, max_alerts=10000):
+        OrderLevelBookListener.__init__(self, logger)
+        assert window > 0 and cancel_window > 0
+        assert min_ticks_away > 0
+        self._window = window
+        self._cancel_window = cancel_window
+        self._min_ticks_away = min_ticks_away
+        self._min_cancel_count = min_cancel_count
+        self._min_cancelled_qty = min_cancelled_qty
+        self._max_users = max_users
+        self._user_states = OrderedDict()  # (market, user id) -> _UserState, least recently active first
+        self._alerts = deque(maxlen=max_alerts)
+
+    def _user_state(self, market, user_id, timestamp):
+        key = (market, user_id)
+        state = self._user_states.get(key)
+        if state is None:
+            state = _UserState()
+            self._user_states[key] = state
+            if len(self._user_states) > self._max_users:
+                self._user_states.popitem(last=False)
+        else:
+            self._user_states.move_to_end(key)
+        state.expire(timestamp, self._window, self._cancel_window)
+        return state
+
+    def _ticks_away(self, order_book, order_chain):
+        side = order_chain.side()
+        best_price = order_book.best_price_excluding(side, [order_chain.chain_id()])
+        if best_price is None:
+            return 0
+        price = order_chain.current_price()
+        ticks = (best_price - price) if side.is_bid() else (price - best_price)
+        return int(ticks / order_book.market().mpi())
+
+    def notify_book_update(self, order_book, causing_order_chain, tob_updated):
+        event = causing_order_chain.most_recent_event()
+        if isinstance(event, AcknowledgementReport):
+            self._handle_ack(order_book, causing_order_chain, event)
+        elif isinstance(event, CancelReport):
+            self._handle_cancel(causing_order_chain, event)
+        elif isinstance(event, FillReport):
+            self._handle_fill(causing_order_chain, event)
+
+    def _handle_ack(self, order_book, order_chain, ack):
+        timestamp = ack.timestamp()
+        state = self._user_state(order_book.market(), order_chain.user_id(), timestamp)
+        side_index = _side_index(order_chain.side())
+        qty = order_chain.visible_qty() + order_chain.hidden_qty()
+        chain_id = order_chain.chain_id()
+        cancel_replace_info = order_chain.cancel_replace_information(ack.event_id())
+        if cancel_replace_info is None:
+            state.placed.add(timestamp, side_index, qty)
+        else:
+            # an amend only places whatever it adds to the order, not the whole order again
+            qty_increase = cancel_replace_info.new_exposure().qty() - cancel_replace_info.previous_exposure().qty()
+            if qty_increase > 0:
+                state.placed.add(timestamp, side_index, qty_increase)
+        if self._ticks_away(order_book, order_chain) >= self._min_ticks_away:
+            away_order = state.away_orders.get(chain_id)
+            if away_order is not None and cancel_replace_info is not None and \
+                    not cancel_replace_info.is_price_change():
+                # amending the qty doesn't restart the clock on how quickly the order is cancelled
+                state.away_orders[chain_id] = (away_order[0], side_index, qty)
+            else:
+                state.away_orders[chain_id] = (timestamp, side_index, qty)
+                state.away_order_times.append((timestamp, chain_id))
+        else:
+            state.away_orders.pop(chain_id, None)
+
+    def _handle_cancel(self, order_chain, cancel_report):
+        timestamp = cancel_report.timestamp()
+        state = self._user_state(cancel_report.market(), order_chain.user_id(), timestamp)
+        away_order = state.away_orders.pop(order_chain.chain_id(), None)
+        if away_order is not None:
+            placed_time, side_index, qty = away_order
+            # expire has already dropped anything placed longer than cancel_window ago
+            state.quick_away_cancels.add(timestamp, side_index, qty)
+            self._check_for_alert(cancel_report.market(), order_chain.user_id(), state, side_index, timestamp)
+
+    def _handle_fill(self, order_chain, fill):
+        if fill.is_aggressor():
+            # the book only notifies for an aggressor's fill when a cancel replace crossed and took it out of the book.
+            #  Both users' fills get counted off the passive side's fill.
+            if isinstance(fill, FullFillReport):
+                self._user_state(fill.market(), order_chain.user_id(), fill.timestamp()).away_orders.pop(
+                    order_chain.chain_id(), None)
+            return
+        timestamp = fill.timestamp()
+        market = fill.market()
+        qty = fill.fill_qty()
+        passive_user = order_chain.user_id()
+        passive_side_index = _side_index(order_chain.side())
+        state = self._user_state(market, passive_user, timestamp)
+        state.fills.add(timestamp, passive_side_index, qty)
+        if isinstance(fill, FullFillReport):
+            state.away_orders.pop(order_chain.chain_id(), None)
+        self._check_for_alert(market, passive_user, state, 1 - passive_side_index, timestamp)
+
+        aggressive_user = fill.aggressing_command().user_id()
+        state = self._user_state(market, aggressive_user, timestamp)
+        state.fills.add(timestamp, 1 - passive_side_index, qty)
+        self._check_for_alert(market, aggressive_user, state, passive_side_index, timestamp)
+
+    def _check_for_alert(self, market, user_id, state, spoof_side_index, timestamp):
+        cancels = state.quick_away_cancels
+        if cancels.counts[spoof_side_index] < self._min_cancel_count or \
+                cancels.qtys[spoof_side_index] < self._min_cancelled_qty:
+            return
+        opposite_fill_qty = state.fills.qtys[1 - spoof_side_index]
+        if opposite_fill_qty <= 0:
+            return
+        last_alert_time = state.last_alert_time[spoof_side_index]
+        if last_alert_time is not None and timestamp - last_alert_time < self._window:
+            return
+        state.last_alert_time[spoof_side_index] = timestamp
+        placed = state.placed.qtys
+        total_placed = placed[BID] + placed[ASK]
+        imbalance = float(placed[BID] - placed[ASK]) / total_placed if total_placed > 0 else 0.0
+        alert = SpoofingAlert(timestamp, market, user_id, BID_SIDE if spoof_side_index == BID else ASK_SIDE,
+                              cancels.counts[spoof_side_index], cancels.qtys[spoof_side_index], opposite_fill_qty,
+                              imbalance)
+        self._logger.info("Possible spoofing: %s" % str(alert))
+        self._alerts.append(alert)
+
+    def pop_alerts(self):
+        """
+        Gets the alerts raised since the last call, oldest first.
+
+        :return: list of SpoofingAlert
+        """
+        alerts = list(self._alerts)
+        self._alerts.clear()
+        return alerts
+
+    def num_tracked_users(self):
+        return len(self._user_states)
+
+    def clean_up_order_chain(self, order_chain):
+        state = self._user_states.get((order_chain.market(), order_chain.user_id()))
+        if state is not None:
+            state.away_orders.pop(order_chain.chain_id(), None)
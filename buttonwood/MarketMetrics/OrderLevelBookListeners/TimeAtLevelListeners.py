@@ -43,13 +43,14 @@ class SubchainTimeAtTopPriorityListener(OrderLevelBookListener):
         every time an order book updates, for the side of the causing order chain check the top priority subchain and
          track the amount of time that subchain is at top priority.
          
-        Top priority means it is the next to be filled.
+        Top priority means it is the next to be filled, as decided by the market's allocation (see
+         OrderLevelBook.best_priority_chain).
         """
         side = causing_order_chain.side()
         top_priority_subchain_id = None
-        chains = order_book.order_chains_at_price(side, order_book.best_price(side))
-        if len(chains) > 0:
-            top_priority_subchain_id = chains[0].most_recent_subchain().subchain_id()
+        top_priority_chain = order_book.best_priority_chain(side)
+        if top_priority_chain is not None:
+            top_priority_subchain_id = top_priority_chain.most_recent_subchain().subchain_id()
         market = order_book.market()
         use_time = order_book.last_update_time()
         prev_top_priority_subchain_id = self._market_to_side_to_prev_tob_subchain_id.get([market, side])
@@ -0,0 +1,143 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from buttonwood.MarketObjects.OrderBookListeners.OrderLevelBookListener import OrderLevelBookListener
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.utils.columns import Columns
+
+NO_PRICE = float("nan")
+
+
+class TopOfBookSeries(object):
+    """
+    The top of book of one market recorded as a time series of columns:
+      * timestamp: float
+      * event_id: the event that caused the top of book to change
+      * bid: float. NaN if there was no bid
+      * bid_qty: int. visible qty at the bid. 0 if there was no bid
+      * ask: float. NaN if there was no ask
+      * ask_qty: int. visible qty at the ask. 0 if there was no ask
+
+    Each row is the state of the top of book from its timestamp until the timestamp of the next row. The columns are
+     what the functions in MarketMetrics.TopOfBookStatistics work on.
+    """
+
+    def __init__(self, market):
+        self._market = market
+        self._columns = Columns([("timestamp", "d"),
+                                 ("event_id", None),
+                                 ("bid", "d"),
+                                 ("bid_qty", "q"),
+                                 ("ask", "d"),
+                                 ("ask_qty", "q")])
+
+    def market(self):
+        return self._market
+
+    def append(self, timestamp, event_id, bid, bid_qty, ask, ask_qty):
+        self._columns.append(timestamp, event_id, bid, bid_qty, ask, ask_qty)
+
+    def timestamps(self):
+        return self._columns.column("timestamp")
+
+    def event_ids(self):
+        return self._columns.column("event_id")
+
+    def bid_prices(self):
+        return self._columns.column("bid")
+
+    def bid_qtys(self):
+        return self._columns.column("bid_qty")
+
+    def ask_prices(self):
+        return self._columns.column("ask")
+
+    def ask_qtys(self):
+        return self._columns.column("ask_qty")
+
+    def columns(self):
+        """
+        Gets the underlying Columns so all the columns can be pulled at once (ex: columns().to_dict())
+
+        :return: buttonwood.utils.columns.Columns
+        """
+        return self._columns
+
+    def __len__(self):
+        return len(self._columns)
+
+
+class TopOfBookSeriesListener(OrderLevelBookListener):
+    """
+    Records the top of book of every market it listens to as a TopOfBookSeries. A row is appended every time the top
+     of book updates; book updates that don't touch the top of book are not recorded.
+
+    Unlike the TopOfBookBeforeEventListener / TopOfBookAfterEventListener, this does not keep a dict of event_id to
+     PriceLevels. It is meant for whole session statistics, where the series gets handed to the functions in
+     MarketMetrics.TopOfBookStatistics.
+
+    This is designed so it can work with multiple order books at once.
+    """
+
+    def __init__(self, logger):
+        OrderLevelBookListener.__init__(self, logger)
+        self._market_to_series = {}
+
+    def notify_book_update(self, order_book, causing_order_chain, tob_updated):
+        if not tob_updated:
+            return
+        market = order_book.market()
+        series = self._market_to_series.get(market)
+        if series is None:
+            series = TopOfBookSeries(market)
+            self._market_to_series[market] = series
+        bid_price = order_book.best_price(BID_SIDE)
+        ask_price = order_book.best_price(ASK_SIDE)
+        series.append(order_book.last_update_time(),
+                      causing_order_chain.most_recent_event().event_id(),
+                      NO_PRICE if bid_price is None else float(bid_price),
+                      0 if bid_price is None else order_book.visible_qty_at_price(BID_SIDE, bid_price),
+                      NO_PRICE if ask_price is None else float(ask_price),
+                      0 if ask_price is None else order_book.visible_qty_at_price(ASK_SIDE, ask_price))
+
+    def clean_up_order_chain(self, order_chain):
+        pass  # the series is the whole session so nothing is kept per order chain
+
+    def series(self, market):
+        """
+        Gets the TopOfBookSeries for the market. None if the market has not had a top of book update.
+
+        :param market: MarketObjects.Market.Market
+        :return: TopOfBookSeries
+        """
+        return self._market_to_series.get(market)
+
+    def markets(self):
+        return self._market_to_series.keys()
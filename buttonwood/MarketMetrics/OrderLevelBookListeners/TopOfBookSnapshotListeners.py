@@ -27,37 +27,65 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+from math import isnan
 from buttonwood.MarketObjects.OrderBookListeners.OrderLevelBookListener import OrderLevelBookListener
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.PriceLevel import PriceLevel
 from buttonwood.MarketObjects.Side import BID_SIDE
 from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.utils.resultstores import DictResultStore
+from buttonwood.utils.resultstores import ResultCodec
+from buttonwood.utils.resultstores import ResultStore
+
+
+def _price_level_to_row(price_level):
+    if price_level is None:
+        return float("nan"), 0, 0, 0
+    num_orders = price_level.number_of_orders()
+    return (float(price_level.price()), price_level.visible_qty(), price_level.hidden_qty(),
+            -1 if num_orders is None else num_orders)
+
+
+def _price_level_from_row(price, visible_qty, hidden_qty, num_orders):
+    if isnan(price):
+        return None
+    return PriceLevel(Price(price), visible_qty, hidden_qty, None if num_orders < 0 else num_orders)
+
+
+# codec for the (bid PriceLevel, ask PriceLevel) tuples these listeners store, for use with a SpillToDiskResultStore
+TOB_CODEC = ResultCodec("dqqqdqqq",
+                        lambda tob: _price_level_to_row(tob[0]) + _price_level_to_row(tob[1]),
+                        lambda row: (_price_level_from_row(*row[:4]), _price_level_from_row(*row[4:])))
 
 
 class TopOfBookBeforeEventListener(OrderLevelBookListener):
     """
-    Tracks top of book before an event for the market the event occurred in. Keeps track in dict of 
+    Tracks top of book before an event for the market the event occurred in. Keeps track in a result store of
       event_id -> (PriceLevel, PriceLevel), where the first PriceLevel is the bid and second is the ask
-        
+
+    The result store defaults to a DictResultStore. Use TOB_CODEC if handing it a SpillToDiskResultStore.
     """
 
     # TODO UNIT TEST
-    def __init__(self, logger):
+    def __init__(self, logger, result_store=None):
         OrderLevelBookListener.__init__(self, logger)
-        self._event_id_to_tob = {}
+        assert result_store is None or isinstance(result_store, ResultStore)
+        self._event_id_to_tob = DictResultStore() if result_store is None else result_store
         self._market_to_previous_tob = {}
 
     def notify_book_update(self, order_book, causing_order_chain, tob_updated):
         # set the event to the previous tob
         market = order_book.market()
         tob = self._market_to_previous_tob.get(market)
-        event_id = causing_order_chain.most_recent_event().event_id()
-        self._event_id_to_tob[event_id] = tob
+        event = causing_order_chain.most_recent_event()
+        self._event_id_to_tob.put(event.event_id(), tob, event.timestamp())
         # set the previous tob to the new tob (but only do it if TOB changed
         if tob_updated:
             self._market_to_previous_tob[market] = (order_book.best_level(BID_SIDE), order_book.best_level(ASK_SIDE))
 
     def clean_up_order_chain(self, order_chain):
         for event in order_chain.events():
-            del self._event_id_to_tob[event.event_id()]
+            self._event_id_to_tob.remove(event.event_id())
 
     def tob_before_event(self, event_id):
         """
@@ -75,26 +103,29 @@ class TopOfBookBeforeEventListener(OrderLevelBookListener):
 
 class TopOfBookAfterEventListener(OrderLevelBookListener):
     """
-    Tracks top of book after an event for the market the event occurred in. Keeps track in dict of 
+    Tracks top of book after an event for the market the event occurred in. Keeps track in a result store of
       event_id -> (PriceLevel, PriceLevel), where the first PriceLevel is the bid and second is the ask
 
       if event does not impact the book it doesn't end up getting tracked.
+
+    The result store defaults to a DictResultStore. Use TOB_CODEC if handing it a SpillToDiskResultStore.
     """
 
     # TODO UNIT TEST
-    def __init__(self, logger):
+    def __init__(self, logger, result_store=None):
         OrderLevelBookListener.__init__(self, logger)
-        self._event_id_to_tob = {}
+        assert result_store is None or isinstance(result_store, ResultStore)
+        self._event_id_to_tob = DictResultStore() if result_store is None else result_store
 
     def notify_book_update(self, order_book, causing_order_chain, tob_updated):
-        event_id = causing_order_chain.most_recent_event().event_id()
-        self._event_id_to_tob[event_id] = (order_book.best_level(BID_SIDE), order_book.best_level(ASK_SIDE))
+        event = causing_order_chain.most_recent_event()
+        self._event_id_to_tob.put(event.event_id(), (order_book.best_level(BID_SIDE), order_book.best_level(ASK_SIDE)),
+                                  event.timestamp())
 
     def clean_up_order_chain(self, order_chain):
         for event in order_chain.events():
-            # not all events cause notify_book_update to be called
-            if event.event_id() in self._event_id_to_tob:
-                del self._event_id_to_tob[event.event_id()]
+            # not all events cause notify_book_update to be called, but remove is fine with that
+            self._event_id_to_tob.remove(event.event_id())
 
     def tob_after_event(self, event_id):
         """
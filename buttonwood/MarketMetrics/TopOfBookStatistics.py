@@ -0,0 +1,159 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+Whole session statistics over a recorded top of book time series, such as the columns of a
+ MarketMetrics.OrderLevelBookListeners.TopOfBookSeriesListener.TopOfBookSeries.
+
+Every function takes the columns as sequences (array.array, list, numpy arrays, etc.) where row i is the state of the
+ top of book from timestamps[i] until timestamps[i + 1]. The last row has no next timestamp, so it is only counted if
+ an end_time is passed in. Missing prices are NaN.
+"""
+
+from array import array
+from math import isnan
+from buttonwood.MarketMetrics.MicroPrice import size_weighted_midpoints
+
+
+def durations(timestamps, end_time=None):
+    """
+    How long each row of a time series was in effect.
+
+    :param timestamps: sequence of float. must be in non-decreasing order.
+    :param end_time: float. Optional. The time the last row is in effect until. If None the last row gets 0.
+    :return: array.array of float
+    """
+    n = len(timestamps)
+    result = array("d", [0.0]) * n
+    if n == 0:
+        return result
+    for i in range(n - 1):
+        result[i] = timestamps[i + 1] - timestamps[i]
+    if end_time is not None:
+        if end_time < timestamps[-1]:
+            raise Exception("end_time %0.6f is before the last timestamp %0.6f" % (end_time, timestamps[-1]))
+        result[-1] = end_time - timestamps[-1]
+    return result
+
+
+def _time_weighted_average(weights, values):
+    total_weight = 0.0
+    total = 0.0
+    for weight, value in zip(weights, values):
+        if weight > 0 and value is not None and not isnan(value):
+            total_weight += weight
+            total += weight * value
+    if total_weight == 0:
+        return None
+    return total / total_weight
+
+
+def spreads(bid_prices, ask_prices):
+    """
+    The spread (ask - bid) for each row. NaN when either side is missing.
+
+    :return: array.array of float
+    """
+    return array("d", (ask - bid for bid, ask in zip(bid_prices, ask_prices)))
+
+
+def micro_prices(bid_prices, bid_qtys, ask_prices, ask_qtys):
+    """
+    The size weighted midpoint for each row. NaN when either side is missing.
+
+    :return: array.array of float
+    """
+    return size_weighted_midpoints(bid_prices, bid_qtys, ask_prices, ask_qtys)
+
+
+def time_weighted_spread(timestamps, bid_prices, ask_prices, end_time=None):
+    """
+    The average spread weighted by how long each spread was in effect. Rows missing either side are left out.
+
+    Returns None if there is no time with both sides of the book.
+
+    :return: float. Can be None
+    """
+    return _time_weighted_average(durations(timestamps, end_time), spreads(bid_prices, ask_prices))
+
+
+def time_weighted_micro_price(timestamps, bid_prices, bid_qtys, ask_prices, ask_qtys, end_time=None):
+    """
+    The average size weighted midpoint weighted by how long each was in effect. Rows missing either side are left out.
+
+    Returns None if there is no time with both sides of the book.
+
+    :return: float. Can be None
+    """
+    return _time_weighted_average(durations(timestamps, end_time),
+                                  micro_prices(bid_prices, bid_qtys, ask_prices, ask_qtys))
+
+
+def crossed_time(timestamps, bid_prices, ask_prices, end_time=None, include_locked=True):
+    """
+    The total time the book was crossed (bid > ask). If include_locked is True, which is the default, a locked book
+     (bid == ask) counts as crossed as well.
+
+    :return: float
+    """
+    total = 0.0
+    for duration, bid, ask in zip(durations(timestamps, end_time), bid_prices, ask_prices):
+        # comparisons with NaN are always False, so one sided books never count
+        if bid > ask or (include_locked and bid == ask):
+            total += duration
+    return total
+
+
+def quote_lifetimes(timestamps, prices, end_time=None):
+    """
+    How long each top of book price lasted for one side of the book. A run of rows with the same price is one quote;
+     qty changes at the same price do not end a quote. Time with no price on the side is not a quote.
+
+    Put together this is the quote lifetime distribution for the side.
+
+    :param timestamps: sequence of float
+    :param prices: sequence of float. The top of book prices of one side.
+    :param end_time: float. Optional. If None the last quote ends at the last timestamp.
+    :return: array.array of float
+    """
+    lifetimes = array("d")
+    current_price = None
+    current_lifetime = 0.0
+    for duration, price in zip(durations(timestamps, end_time), prices):
+        if current_price is not None and price != current_price:
+            lifetimes.append(current_lifetime)
+            current_price = None
+        if not isnan(price):
+            if current_price is None:
+                current_price = price
+                current_lifetime = 0.0
+            current_lifetime += duration
+    if current_price is not None:
+        lifetimes.append(current_lifetime)
+    return lifetimes
@@ -0,0 +1,154 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+Statistics over a trade tape, such as the columns of a MarketMetrics.EventListeners.TradeTape.TradeTape.
+
+Every function takes the columns as sequences (array.array, list, numpy arrays, etc.), one entry per trade, with the
+ timestamps in non-decreasing order.
+"""
+
+from array import array
+from collections import deque
+from math import floor
+from math import log
+from math import sqrt
+
+
+def volume_by_interval(timestamps, qtys, interval, start_time=None):
+    """
+    Total qty traded in each interval. Intervals start at start_time (the earliest timestamp if None) and every
+     interval up to the latest trade is included, even if nothing traded in it.
+
+    Unlike the other functions, the timestamps don't need to be in order.
+
+    :param timestamps: sequence of float
+    :param qtys: sequence of int
+    :param interval: float. seconds
+    :param start_time: float. Optional.
+    :return: (array.array of float, array.array of int). interval start times, volume per interval
+    """
+    assert interval > 0
+    starts = array("d")
+    volumes = array("q")
+    if len(timestamps) == 0:
+        return starts, volumes
+    if start_time is None:
+        start_time = min(timestamps)
+    last_time = max(timestamps)
+    if last_time < start_time:
+        return starts, volumes
+    num_intervals = int(floor((last_time - start_time) / interval)) + 1
+    volumes = array("q", [0]) * num_intervals
+    for timestamp, qty in zip(timestamps, qtys):
+        if timestamp >= start_time:
+            volumes[int((timestamp - start_time) / interval)] += qty
+    starts = array("d", (start_time + i * interval for i in range(num_intervals)))
+    return starts, volumes
+
+
+def rolling_vwap(timestamps, qtys, prices, window):
+    """
+    For each trade, the volume weighted average price of the trades in the window of seconds ending at, and
+     including, that trade.
+
+    :param timestamps: sequence of float
+    :param qtys: sequence of int
+    :param prices: sequence of float. the price of each trade (ex: each match's vwap)
+    :param window: float. seconds
+    :return: array.array of float
+    """
+    assert window > 0
+    result = array("d")
+    in_window = deque()
+    qty_sum = 0
+    notional_sum = 0.0
+    for timestamp, qty, price in zip(timestamps, qtys, prices):
+        in_window.append((timestamp, qty, price))
+        qty_sum += qty
+        notional_sum += qty * price
+        while in_window[0][0] <= timestamp - window:
+            _, old_qty, old_price = in_window.popleft()
+            qty_sum -= old_qty
+            notional_sum -= old_qty * old_price
+        result.append(notional_sum / qty_sum if qty_sum > 0 else float("nan"))
+    return result
+
+
+def trade_sign_autocorrelation(signs, max_lag):
+    """
+    The autocorrelation of trade signs (1 for buyer initiated, -1 for seller initiated) at lags 1 to max_lag.
+
+    :param signs: sequence of int
+    :param max_lag: int
+    :return: array.array of float. entry i is the autocorrelation at lag i + 1. NaN if it can't be calculated.
+    """
+    assert max_lag > 0
+    n = len(signs)
+    result = array("d")
+    if n == 0:
+        return array("d", [float("nan")]) * max_lag
+    mean = float(sum(signs)) / n
+    centered = [sign - mean for sign in signs]
+    variance = sum(c * c for c in centered)
+    for lag in range(1, max_lag + 1):
+        if variance == 0 or lag >= n:
+            result.append(float("nan"))
+        else:
+            result.append(sum(centered[i] * centered[i + lag] for i in range(n - lag)) / variance)
+    return result
+
+
+def rolling_realized_volatility(timestamps, prices, window):
+    """
+    For each trade, the realized volatility over the window of seconds ending at that trade: the square root of the
+     sum of the squared log returns between consecutive trades, for the returns that end at a trade
+     in the window. Not annualized.
+
+    :param timestamps: sequence of float
+    :param prices: sequence of float. must be positive
+    :param window: float. seconds
+    :return: array.array of float
+    """
+    assert window > 0
+    result = array("d")
+    returns = deque()  # (timestamp, squared log return) of the return that ends at the trade at timestamp
+    sum_squared = 0.0
+    previous_price = None
+    for timestamp, price in zip(timestamps, prices):
+        if previous_price is not None:
+            squared = log(price / previous_price) ** 2
+            returns.append((timestamp, squared))
+            sum_squared += squared
+        previous_price = price
+        # a return is in the window if the trade it ends at is in the window
+        while returns and returns[0][0] <= timestamp - window:
+            sum_squared -= returns.popleft()[1]
+        result.append(sqrt(max(sum_squared, 0.0)))
+    return result
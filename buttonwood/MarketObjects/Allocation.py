@@ -0,0 +1,260 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+How an aggressive qty gets split among the orders resting at a price level.
+
+Every allocation works on the level as a sequence of order qtys in time priority order (first in line first), plus
+ the orders' user ids for the allocations that care about who the order belongs to, and returns the qty allocated to
+ each order in one pass over the level rather than order by order.
+
+A Market has one Allocation (FIFOAllocation by default), which the order books and simulation use for that market.
+"""
+
+
+def _fifo(qty, order_qtys):
+    allocated = []
+    append = allocated.append
+    for order_qty in order_qtys:
+        fill = order_qty if order_qty < qty else qty
+        append(fill)
+        qty -= fill
+    return allocated
+
+
+def _pro_rata(qty, order_qtys, min_allocation):
+    total = sum(order_qtys)
+    if total <= qty:
+        return list(order_qtys)
+    # everyone gets their share rounded down, shares under the minimum go to 0
+    allocated = [share if share >= min_allocation else 0
+                 for share in (qty * order_qty // total for order_qty in order_qtys)]
+    leftover = qty - sum(allocated)
+    # and what's left from rounding goes out in time priority
+    if leftover > 0:
+        for i, extra in enumerate(_fifo(leftover, [order_qty - a for order_qty, a in zip(order_qtys, allocated)])):
+            if extra:
+                allocated[i] += extra
+    return allocated
+
+
+class Allocation(object):
+    """
+    Base class for allocations.
+    """
+
+    def is_time_priority(self):
+        """
+        True if the allocation is pure time priority, which lets order books use their faster time priority queries.
+
+        :return: bool
+        """
+        return False
+
+    def allocate(self, qty, order_qtys, user_ids=None):
+        """
+        Splits the aggressive qty among the orders at a level.
+
+        :param qty: int. aggressive qty
+        :param order_qtys: sequence of int. qty of each order in time priority order
+        :param user_ids: sequence of user ids, one per order. Optional for allocations that don't use them.
+        :return: list of int. qty allocated to each order. Sums to min(qty, sum(order_qtys)).
+        """
+        raise NotImplementedError("allocate to be implemented by inheriting class.")
+
+    def qty_ahead(self, order_qtys, index, user_ids=None):
+        """
+        The qty of other orders at the level that trades ahead of, or alongside, the order at index before it is
+         completely filled. Under time priority that is the qty in front of it; when every order shares in every
+         fill it is everything else at the level.
+
+        :param order_qtys: sequence of int. qty of each order in time priority order
+        :param index: int. the order's position in time priority
+        :param user_ids: sequence of user ids, one per order. Optional.
+        :return: int
+        """
+        return sum(order_qtys) - order_qtys[index]
+
+    def top_priority_index(self, order_qtys, user_ids=None):
+        """
+        The position, in time priority, of the order that gets the most from the next aggressive order.
+
+        :param order_qtys: sequence of int. qty of each order in time priority order
+        :param user_ids: sequence of user ids, one per order. Optional.
+        :return: int. None if there are no orders
+        """
+        raise NotImplementedError("top_priority_index to be implemented by inheriting class.")
+
+
+class FIFOAllocation(Allocation):
+    """
+    Price-time priority: orders are filled completely, one at a time, in the order they got in line.
+    """
+
+    def is_time_priority(self):
+        return True
+
+    def allocate(self, qty, order_qtys, user_ids=None):
+        return _fifo(qty, order_qtys)
+
+    def qty_ahead(self, order_qtys, index, user_ids=None):
+        return sum(order_qtys[:index])
+
+    def top_priority_index(self, order_qtys, user_ids=None):
+        return 0 if len(order_qtys) > 0 else None
+
+
+class ProRataAllocation(Allocation):
+    """
+    Each order gets its share of the aggressive qty in proportion to its size, rounded down. Shares smaller than
+     min_allocation are dropped, and what is left over goes out in time priority.
+
+    :param min_allocation: int. smallest pro rata share an order can get. Defaults to 1.
+    """
+
+    def __init__(self, min_allocation=1):
+        assert isinstance(min_allocation, int) and min_allocation >= 1
+        self._min_allocation = min_allocation
+
+    def min_allocation(self):
+        return self._min_allocation
+
+    def allocate(self, qty, order_qtys, user_ids=None):
+        return _pro_rata(qty, order_qtys, self._min_allocation)
+
+    def top_priority_index(self, order_qtys, user_ids=None):
+        if len(order_qtys) == 0:
+            return None
+        # largest order, ties going to time priority
+        return max(range(len(order_qtys)), key=lambda i: (order_qtys[i], -i))
+
+
+class TopOrderProRataAllocation(Allocation):
+    """
+    The first order in time priority (the top order) is filled first, up to top_order_max if given, and the rest is
+     allocated pro rata over everything still resting, including what's left of the top order.
+
+    :param top_order_max: int. Optional. Most the top order gets before the pro rata allocation. None for no limit.
+    :param min_allocation: int. smallest pro rata share an order can get. Defaults to 1.
+    """
+
+    def __init__(self, top_order_max=None, min_allocation=1):
+        assert top_order_max is None or (isinstance(top_order_max, int) and top_order_max > 0)
+        assert isinstance(min_allocation, int) and min_allocation >= 1
+        self._top_order_max = top_order_max
+        self._min_allocation = min_allocation
+
+    def top_order_max(self):
+        return self._top_order_max
+
+    def min_allocation(self):
+        return self._min_allocation
+
+    def allocate(self, qty, order_qtys, user_ids=None):
+        if len(order_qtys) == 0:
+            return []
+        top = min(qty, order_qtys[0])
+        if self._top_order_max is not None:
+            top = min(top, self._top_order_max)
+        remaining_qtys = list(order_qtys)
+        remaining_qtys[0] -= top
+        allocated = _pro_rata(qty - top, remaining_qtys, self._min_allocation)
+        allocated[0] += top
+        return allocated
+
+    def qty_ahead(self, order_qtys, index, user_ids=None):
+        if index == 0 and (self._top_order_max is None or self._top_order_max >= order_qtys[0]):
+            return 0
+        return Allocation.qty_ahead(self, order_qtys, index, user_ids)
+
+    def top_priority_index(self, order_qtys, user_ids=None):
+        return 0 if len(order_qtys) > 0 else None
+
+
+class LMMAllocation(Allocation):
+    """
+    Lead market maker carve out: the lead market makers' orders are allocated carve_out of the aggressive qty first,
+     split among them by the underlying allocation, and then the rest is allocated over every order's remaining qty
+     by the underlying allocation.
+
+    :param lmm_user_ids: iterable of the lead market makers' user ids
+    :param carve_out: float. fraction, 0 to 1, of the aggressive qty carved out for the lead market makers
+    :param allocation: Allocation. Optional. The underlying allocation. Defaults to ProRataAllocation.
+    """
+
+    def __init__(self, lmm_user_ids, carve_out, allocation=None):
+        assert 0 <= carve_out <= 1
+        assert allocation is None or isinstance(allocation, Allocation)
+        self._lmm_user_ids = frozenset(lmm_user_ids)
+        self._carve_out = carve_out
+        self._allocation = ProRataAllocation() if allocation is None else allocation
+
+    def lmm_user_ids(self):
+        return self._lmm_user_ids
+
+    def carve_out(self):
+        return self._carve_out
+
+    def underlying_allocation(self):
+        return self._allocation
+
+    def _lmm_indexes(self, user_ids):
+        if user_ids is None:
+            return []
+        lmm_user_ids = self._lmm_user_ids
+        return [i for i, user_id in enumerate(user_ids) if user_id in lmm_user_ids]
+
+    def allocate(self, qty, order_qtys, user_ids=None):
+        lmm_indexes = self._lmm_indexes(user_ids)
+        if len(lmm_indexes) == 0:
+            return self._allocation.allocate(qty, order_qtys, user_ids)
+        lmm_qtys = [order_qtys[i] for i in lmm_indexes]
+        carve_out_qty = min(int(qty * self._carve_out), sum(lmm_qtys))
+        remaining_qtys = list(order_qtys)
+        allocated = [0] * len(order_qtys)
+        for i, fill in zip(lmm_indexes, self._allocation.allocate(carve_out_qty, lmm_qtys,
+                                                                   [user_ids[i] for i in lmm_indexes])):
+            allocated[i] = fill
+            remaining_qtys[i] -= fill
+        for i, fill in enumerate(self._allocation.allocate(qty - carve_out_qty, remaining_qtys, user_ids)):
+            allocated[i] += fill
+        return allocated
+
+    def qty_ahead(self, order_qtys, index, user_ids=None):
+        if len(self._lmm_indexes(user_ids)) == 0:
+            return self._allocation.qty_ahead(order_qtys, index, user_ids)
+        return Allocation.qty_ahead(self, order_qtys, index, user_ids)
+
+    def top_priority_index(self, order_qtys, user_ids=None):
+        lmm_indexes = self._lmm_indexes(user_ids)
+        if len(lmm_indexes) == 0 or self._carve_out == 0:
+            return self._allocation.top_priority_index(order_qtys, user_ids)
+        lmm_top = self._allocation.top_priority_index([order_qtys[i] for i in lmm_indexes],
+                                                      [user_ids[i] for i in lmm_indexes])
+        return lmm_indexes[lmm_top]
@@ -28,6 +28,7 @@ SOFTWARE.
 """
 
 import json
+from buttonwood.utils.validation import VALIDATION
 
 
 class BasicEvent(object):
@@ -41,7 +42,8 @@ class BasicEvent(object):
         :param timestamp: float. The time of the event in standard python representation of microseconds where left of 
                             the decimal is the number of seconds and to the right of the decimal is the number of us.
         """
-        assert isinstance(timestamp, float)
+        if VALIDATION.enabled:
+            assert isinstance(timestamp, float)
         self._event_id = event_id
         self._timestamp = timestamp
 
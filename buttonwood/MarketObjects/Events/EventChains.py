@@ -42,8 +42,12 @@ from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
 from buttonwood.MarketObjects.Events.OrderEvents import PartialFillReport
 from buttonwood.MarketObjects.Events.OrderEvents import RejectReport
 from buttonwood.utils.IDGenerators import IDGenerator
+from buttonwood.utils.tracing import ADD_TO_SUBCHAIN
+from buttonwood.utils.tracing import NEW_CHAIN
+from buttonwood.utils.tracing import NEW_SUBCHAIN
+from buttonwood.utils.tracing import default_trace_hook
+from buttonwood.utils.tracing import no_trace
 
-import logging
 import json
 
 
@@ -151,7 +155,7 @@ class SubChain(object):
     FULLY_FILLED = 70  # close
     CANCEL_REPLACE_TO_ZERO = 80  # close
 
-    def __init__(self, subchain_id, opening_cmd, open_reason, logger):
+    def __init__(self, subchain_id, opening_cmd, open_reason, logger, trace=no_trace):
         """
         Subchain objects track the data around a subchain, including all the events, the open reason and the close
          reason.
@@ -173,13 +177,12 @@ class SubChain(object):
         :param subchain_id: unique identifier of the subchain
         :param opening_cmd: buttonwood.MarketObjects.Events.OrderEvents.OrderCommand
         :param open_reason: int. Should be one of the reasons defined in Subchain constants
+        :param logger: logger.
+        :param trace: the trace hook of the order chain the subchain belongs to. See utils.tracing.
         """
         assert isinstance(opening_cmd, OrderCommand), "A subchain must be opened with an OrderCommand"
         self._logger = logger
-        if 'debug_logging' not in globals():
-            global debug_logging
-            debug_logging = self._logger.isEnabledFor(logging.DEBUG)
-        self._debug = debug_logging
+        self._trace = trace
 
         self._events = []
         self._chain_id = opening_cmd.chain_id()
@@ -189,18 +192,14 @@ class SubChain(object):
         self._close_reason = None
         self._subchain_id = subchain_id
         self._fill_events = []
-        if self._debug:
-            self._logger.debug("OrderChain %s: Created new SubChain %s" % (self._chain_id, self.subchain_id()))
+        trace("SubChain", NEW_SUBCHAIN, opening_cmd.event_id(), self._chain_id, None, None)
         self.add_event(opening_cmd)
 
     def add_event(self, event):
         if not self.is_open():
             raise Exception("Adding event to closed Subchain. EventID %s, Chain %s, SubChain %s" %
                             event.event_id(), event.chain_id(), self._subchain_id)
-        if self._debug:
-            self._logger.debug("OrderChain %s: Add %s %s to SubChain %s" %
-                               (self._chain_id, event.event_type_str(), event.event_id(),
-                                self.subchain_id()))
+        self._trace("SubChain", ADD_TO_SUBCHAIN, event.event_id(), self._chain_id, None, None)
         self._events.append(event)
         if isinstance(event, ExecutionReport):
             if self._first_execution_report is None:
@@ -255,7 +254,7 @@ class SubChain(object):
 
 
 class OrderEventChain(object):
-    def __init__(self, new_order_command, logger, subchain_id_generator):
+    def __init__(self, new_order_command, logger, subchain_id_generator, trace=None):
         """
         OrderEventChain is data structure to track a complete chain of events that concern one order. This includes
          Commands, such as:
@@ -299,14 +298,13 @@ class OrderEventChain(object):
         :param new_order_command: MarketObjects.Events.OrderEvents.NewOrderCommand. NewOrderCommand that starts the chain.
         :param logger: logger.
         :param subchain_id_generator: the IDGenerator to be used for creating subchain_IDs
+        :param trace: trace hook (see utils.tracing), usually the event handler's. Optional. Defaults to tracing to
+                      the logger if it is enabled for DEBUG.
         """
         assert isinstance(new_order_command, NewOrderCommand)
         assert isinstance(subchain_id_generator, IDGenerator)
         self._logger = logger  # TODO add debug logging throughout
-        if 'debug_logging' not in globals():
-            global debug_logging
-            debug_logging = self._logger.isEnabledFor(logging.DEBUG)
-        self._debug = debug_logging
+        self._trace = default_trace_hook(None, logger) if trace is None else trace
 
         # keeping this state local, rather than looking it up in self._new_order_command all the time speeds things up
         #  (only doing it for a select few that tend to get called more than others)
@@ -331,9 +329,8 @@ class OrderEventChain(object):
         # add to list of events
         self._events = [new_order_command]
         self._filled_price_to_qty = defaultdict(int)
-        if self._debug:
-            self._logger.debug("New %s created, OrderChainID %s Market %s" %
-                               (self.__class__.__name__, str(self._chain_id), str(self.market())))
+        self._trace("OrderEventChain", NEW_CHAIN, new_order_command.event_id(), self._chain_id,
+                    new_order_command.price(), new_order_command.qty())
         # New Orders start new subchains, so start subchain and put it in list of subchains
         self._sub_chains = []
         self._visible_qty = 0  # an unack'd order has no qty showing on the book
@@ -709,7 +706,7 @@ class OrderEventChain(object):
         self.most_recent_subchain().close_subchain(subchain_close_reason)
 
     def _open_new_subchain(self, opening_cmd, open_reason):
-        new_subchain = SubChain(self._subchain_id_generator.id(), opening_cmd, open_reason, self._logger)
+        new_subchain = SubChain(self._subchain_id_generator.id(), opening_cmd, open_reason, self._logger, self._trace)
         self._sub_chains.append(new_subchain)
 
     def apply_acknowledgement_report(self, ack):
@@ -41,27 +41,88 @@ from buttonwood.MarketObjects.Events.OrderEvents import CancelReport
 from buttonwood.MarketObjects.Events.EventChains import OrderEventChain
 from buttonwood.MarketObjects.OrderBooks.BasicOrderBook import BasicOrderBook
 from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import AggregateOrderLevelBook
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
 from buttonwood.MarketObjects.Market import Market
+from buttonwood.utils.histograms import LogHistogram
 from buttonwood.utils.IDGenerators import MonotonicIntID
+from buttonwood.utils.tracing import APPLY_TO_BOOK
+from buttonwood.utils.tracing import PROCESS
+from buttonwood.utils.tracing import default_trace_hook
+from buttonwood.utils.tracing import no_trace
 from collections import OrderedDict
-from collections import defaultdict
-import logging
+from time import perf_counter_ns
+
+# the listener notifications that get timed when the handler is instrumented, and the listener method each calls
+_TIMED_NOTIFICATIONS = (("_new_order_command_notification", "handle_new_order_command"),
+                        ("_cancel_replace_command_notification", "handle_cancel_replace_command"),
+                        ("_cancel_command_notification", "handle_cancel_command"),
+                        ("_acknowledgement_report_notification", "handle_acknowledgement_report"),
+                        ("_partial_fill_report_notification", "handle_partial_fill_report"),
+                        ("_full_fill_report_notification", "handle_full_fill_report"),
+                        ("_cancel_report_notification", "handle_cancel_report"),
+                        ("_reject_report_notification", "handle_reject_report"),
+                        ("_notify_chain_close_listeners", "handle_chain_close"),
+                        )
+
+# the execution reports that get applied to order books, and the order book method each is applied with
+_BOOK_HANDLER_METHODS = ((AcknowledgementReport, "handle_acknowledgement_report"),
+                         (CancelReport, "handle_cancel_report"),
+                         (PartialFillReport, "handle_partial_fill_report"),
+                         (FullFillReport, "handle_full_fill_report"),
+                         )
 
 
 class OrderEventHandler(object):
-    def __init__(self, logger):
+    def __init__(self, logger, tracer=None, instrument=False, dump_stats_every=None):
+        """
+        With instrument on, the wall time of each stage of processing an event is recorded in a
+         utils.histograms.LogHistogram per stage and event type (the event's class name). The stages are:
+          * "total": all of process()
+          * "chain": the handler's own dispatch plus updating the order chain; what is left of total after the rest
+          * "listener:<event listener id>": each registered OrderEventListener
+          * "book:<market>:<order book id>": each registered order book, not counting its listeners
+          * "book listener:<market>:<order book id>:<listener id>": each OrderLevelBookListener of each OrderLevelBook
+         stats() gives a snapshot of them. Instrumenting swaps in timed versions of process(), the notification methods
+         and the order book handlers, so without it there are no timing calls at all.
+
+        :param logger: logging.Logger
+        :param tracer: utils.tracing.Tracer. Optional. Traces the events processed, their application to order books
+                        and the order chains they build. Without one, those are traced to the logger only if it is
+                        enabled for DEBUG when the handler is created.
+        :param instrument: bool. Defaults to False.
+        :param dump_stats_every: int. Optional. When instrumented, log format_stats() at INFO every this many events.
+        """
+        assert dump_stats_every is None or (isinstance(dump_stats_every, int) and dump_stats_every > 0)
         self._event_listeners = OrderedDict()
         self._chain_id_to_chain = {}
         self._market_book_id_to_book = {}
-        self._market_to_registered_books = defaultdict(set)
+        self._market_to_registered_books = {}  # market -> list of order books, in registration order
+        self._market_to_book_routes = {}  # market -> {event class -> tuple of order book handlers, in update order}
         self._logger = logger
         self._sub_chain_id_generator = MonotonicIntID()
+        self._trace = default_trace_hook(tracer, logger)
+        self._instrumented = instrument
+        self._dump_stats_every = dump_stats_every
+        self._stage_histograms = {}  # (stage, event type) -> LogHistogram
+        self._events_processed = 0
+        self._event_type = None  # of the event being processed
+        self._timed_ns = 0  # time spent in listeners and order books for the event being processed
+        self._book_listener_ns = 0  # time spent in order book listeners for the book being applied to
+        if instrument:
+            self._untimed_process = self.process  # the class's own, which may be a subclass's override
+            self.process = self._instrumented_process
+            for notification, listener_method in _TIMED_NOTIFICATIONS:
+                setattr(self, notification, self._timed_notification(listener_method))
 
     def register_orderbook(self, market, order_book_id, order_book):
         """
         Allows you to register an order book for a market with a given order book identifier. The identifier allows you
         to name the order book so it is easily retrievable later.
 
+        Order books for a market are updated in the order they were registered, except that aggregate order books
+        are updated after all the others, so their component books are always up to date first. Registering the same
+        order book again under another id doesn't update it twice.
+
         If the orderbook id already exists for the market an error will be thrown with message "<order book id> is
         already registered for <market name>".  This will prevent overriding an order book that has already been
         registered and populated.
@@ -85,7 +146,70 @@ class OrderEventHandler(object):
             self._market_book_id_to_book[market][order_book_id] = order_book
         else:
             raise Exception("%s is already registered for %s" % (order_book_id, str(market)))
-        self._market_to_registered_books[market].add(order_book)
+        order_books = self._market_to_registered_books.setdefault(market, [])
+        if not any(registered_book is order_book for registered_book, _ in order_books):
+            order_books.append((order_book, order_book_id))
+            if self._instrumented and isinstance(order_book, OrderLevelBook):
+                order_book.time_listeners(self._book_listener_timer(self._book_stage(market, order_book_id)))
+            self._compile_book_routes(market)
+
+    def order_books(self, market):
+        """
+        The order books registered for the market, in the order they are updated.
+
+        :param market: MarketObjects.Market.Market
+        :return: tuple of MarketObjects.OrderBooks.BasicOrderBook
+        """
+        return tuple(order_book for order_book, _ in self._registered_books_in_order(market))
+
+    def _registered_books_in_order(self, market):
+        # (order book, order book id) in the order they are updated
+        return sorted(self._market_to_registered_books.get(market, []),
+                      key=lambda registered: isinstance(registered[0], AggregateOrderLevelBook))
+
+    @staticmethod
+    def _book_stage(market, order_book_id):
+        return "%s:%s" % (str(market), order_book_id)
+
+    def _compile_book_routes(self, market):
+        # for each execution report type, the handlers of the market's order books in the order they're updated in,
+        #  so applying an event is a dict lookup and a loop, without checking the event type for every book
+        registered_books = self._registered_books_in_order(market)
+        routes = {}
+        for report_class, method_name in _BOOK_HANDLER_METHODS:
+            routes[report_class] = tuple(self._book_handler(market, order_book, order_book_id, method_name)
+                                         for order_book, order_book_id in registered_books)
+        self._market_to_book_routes[market] = routes
+
+    def _book_handler(self, market, order_book, order_book_id, method_name):
+        handler = getattr(order_book, method_name)
+        if self._trace is not no_trace:
+            handler = self._traced_book_handler(order_book.name(), handler)
+        if self._instrumented:
+            handler = self._timed_book_handler(self._book_stage(market, order_book_id), handler)
+        return handler
+
+    def _traced_book_handler(self, order_book_name, handler):
+        trace = self._trace
+
+        def traced(event, order_chain):
+            trace(order_book_name, APPLY_TO_BOOK, event.event_id(), event.chain_id(), None, None)
+            return handler(event, order_chain)
+        return traced
+
+    def _book_handlers(self, routes, event):
+        # an event class that isn't routed yet: a subclass of one that is or something books don't get applied
+        handlers = ()
+        for report_class, method_name in _BOOK_HANDLER_METHODS:
+            if isinstance(event, report_class):
+                handlers = routes[report_class]
+                break
+        else:
+            if not isinstance(event, RejectReport):
+                self._logger.warning("%s: don't know how to handle %s when applying to order book." %
+                                     (self.__class__.__name__, event.__class__.__name__))
+        routes[event.__class__] = handlers
+        return handlers
 
     def order_book(self, market, order_book_id):
         if market in self._market_book_id_to_book:
@@ -131,17 +255,13 @@ class OrderEventHandler(object):
         return self._event_listeners.get(event_listener_id)
 
     def process(self, event):
-        # even though there might not be a handler that is set to debug, the string gets formatted either way,
-        #  which is particularly expensive since str(event) actually formats JSON. Thus, the extra level of DEBUG check.
-        if logging.DEBUG >= self._logger.getEffectiveLevel():
-            self._logger.debug("%s: Processing chain %s event %s: %s" %
-                               (self.__class__.__name__, str(event.chain_id()), str(event.event_id()), str(event)))
+        self._trace("OrderEventHandler", PROCESS, event.event_id(), event.chain_id(), None, None)
         order_chain, updated_markets = self._handle_event(event)
         return order_chain, updated_markets
 
     def _create_new_event_chain(self, new_order_command):
         order_chain = OrderEventChain(new_order_command, self._logger,
-                                      subchain_id_generator=self._sub_chain_id_generator)
+                                      subchain_id_generator=self._sub_chain_id_generator, trace=self._trace)
         return order_chain
 
     def _handle_new_order_command(self, new_order_command):
@@ -205,26 +325,13 @@ class OrderEventHandler(object):
         markets_updated = set()
         if order_chain is not None:
             market = event.market()
-            if market in self._market_to_registered_books:
-                for order_book in self._market_to_registered_books[market]:
-                    self._logger.debug("%s: applying %s chain %s event %s to orderbook %s" %
-                                       (self.__class__.__name__,
-                                        event.__class__.__name__,
-                                        str(event.chain_id()),
-                                        str(event.event_id()),
-                                        order_book.name()))
-                    order_book_updated = False
-                    if isinstance(event, AcknowledgementReport):
-                        order_book_updated, tob_updated = order_book.handle_acknowledgement_report(event, order_chain)
-                    elif isinstance(event, CancelReport):
-                        order_book_updated, tob_updated = order_book.handle_cancel_report(event, order_chain)
-                    elif isinstance(event, PartialFillReport):
-                        order_book_updated, tob_updated = order_book.handle_partial_fill_report(event, order_chain)
-                    elif isinstance(event, FullFillReport):
-                        order_book_updated, tob_updated = order_book.handle_full_fill_report(event, order_chain)
-                    else:
-                        self._logger.warning("%s: don't know how to handle %s when applying to order book." %
-                                             (self.__class__.__name__, event.__class__.__name__))
+            routes = self._market_to_book_routes.get(market)
+            if routes is not None:
+                handlers = routes.get(event.__class__)
+                if handlers is None:
+                    handlers = self._book_handlers(routes, event)
+                for handler in handlers:
+                    order_book_updated, tob_updated = handler(event, order_chain)
                     if order_book_updated:
                         markets_updated.add(market)
         return markets_updated
@@ -333,13 +440,16 @@ class OrderEventHandler(object):
 
     def _reject_report_notification(self, reject_report, resulting_order_chain):
         for listener in self._event_listeners.values():
-            listener.notify_reject_reort(reject_report, resulting_order_chain)
+            listener.handle_reject_report(reject_report, resulting_order_chain)
 
     def _close_chain_notification(self, closed_order_chain):
         if closed_order_chain.is_open():
             self._logger.error("%s: _close_chain_notification called for order chain %s and it is NOT closed! Not notifying listeners." %
                                (self.__class__.__name__, str(closed_order_chain.chain_id())))
             return
+        self._notify_chain_close_listeners(closed_order_chain)
+
+    def _notify_chain_close_listeners(self, closed_order_chain):
         for listener in self._event_listeners.values():
             listener.handle_chain_close(closed_order_chain)
 
@@ -348,3 +458,99 @@ class OrderEventHandler(object):
 
     def order_chain(self, chain_id):
         return self._chain_id_to_chain.get(chain_id)
+
+    def _record_stage(self, stage, event_type, elapsed_ns):
+        histogram = self._stage_histograms.get((stage, event_type))
+        if histogram is None:
+            histogram = LogHistogram()
+            self._stage_histograms[(stage, event_type)] = histogram
+        histogram.record(elapsed_ns)
+
+    def _instrumented_process(self, event):
+        event_type = event.__class__.__name__
+        self._event_type = event_type
+        self._timed_ns = 0
+        start = perf_counter_ns()
+        result = self._untimed_process(event)
+        elapsed = perf_counter_ns() - start
+        self._record_stage("total", event_type, elapsed)
+        self._record_stage("chain", event_type, max(0, elapsed - self._timed_ns))
+        self._events_processed += 1
+        if self._dump_stats_every is not None and self._events_processed % self._dump_stats_every == 0:
+            self.dump_stats()
+        return result
+
+    def _timed_book_handler(self, book_stage, handler):
+        stage = "book:%s" % book_stage
+
+        def timed(event, order_chain):
+            self._book_listener_ns = 0
+            start = perf_counter_ns()
+            result = handler(event, order_chain)
+            elapsed = perf_counter_ns() - start
+            self._timed_ns += elapsed
+            self._record_stage(stage, self._event_type, max(0, elapsed - self._book_listener_ns))
+            return result
+        return timed
+
+    def _timed_notification(self, listener_method):
+        def notification(*args):
+            event_type = self._event_type
+            for listener_id, listener in self._event_listeners.items():
+                start = perf_counter_ns()
+                getattr(listener, listener_method)(*args)
+                elapsed = perf_counter_ns() - start
+                self._timed_ns += elapsed
+                self._record_stage("listener:%s" % listener_id, event_type, elapsed)
+        return notification
+
+    def _book_listener_timer(self, book_stage):
+        def timer(listener_id, elapsed_ns):
+            self._book_listener_ns += elapsed_ns
+            self._record_stage("book listener:%s:%s" % (book_stage, listener_id), self._event_type, elapsed_ns)
+        return timer
+
+    def is_instrumented(self):
+        return self._instrumented
+
+    def stage_histogram(self, stage, event_type):
+        """
+        The histogram of nanoseconds for the stage and event type. See the constructor for the stages.
+
+        :param stage: str
+        :param event_type: str. the event's class name, e.g. "AcknowledgementReport"
+        :return: utils.histograms.LogHistogram. None if nothing recorded
+        """
+        return self._stage_histograms.get((stage, event_type))
+
+    def stats(self):
+        """
+        A snapshot of the instrumentation: for each stage and event type, the count and the min, max, mean and
+         percentiles in nanoseconds. Empty if the handler isn't instrumented.
+
+        :return: dict of stage -> dict of event type -> dict (see utils.histograms.LogHistogram.summary)
+        """
+        stats = {}
+        for (stage, event_type), histogram in self._stage_histograms.items():
+            stats.setdefault(stage, {})[event_type] = histogram.summary()
+        return stats
+
+    def format_stats(self):
+        """
+        :return: str. a table of stats(), one line per stage and event type, times in microseconds
+        """
+        lines = ["%-60s %-24s %10s %10s %10s %10s %10s" % ("stage", "event", "count", "mean us", "p50 us", "p99 us",
+                                                            "max us")]
+        for (stage, event_type) in sorted(self._stage_histograms):
+            summary = self._stage_histograms[(stage, event_type)].summary()
+            lines.append("%-60s %-24s %10d %10.2f %10.2f %10.2f %10.2f" %
+                         (stage, event_type, summary["count"], summary["mean"] / 1000.0, summary["p50"] / 1000.0,
+                          summary["p99"] / 1000.0, summary["max"] / 1000.0))
+        return "\n".join(lines)
+
+    def dump_stats(self):
+        self._logger.info("%s: stats after %d events\n%s" %
+                          (self.__class__.__name__, self._events_processed, self.format_stats()))
+
+    def reset_stats(self):
+        self._stage_histograms = {}
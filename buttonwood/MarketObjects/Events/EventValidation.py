@@ -0,0 +1,218 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from collections import defaultdict
+from buttonwood.MarketObjects.Events import OrderEventConstants
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReplaceCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReport
+from buttonwood.MarketObjects.Events.OrderEvents import FillReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Events.OrderEvents import OrderEvent
+from buttonwood.MarketObjects.Events.OrderEvents import PartialFillReport
+from buttonwood.MarketObjects.Events.OrderEvents import RejectReport
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Side import Side
+
+_ID_TYPES = (str, int)
+_TIMES_IN_FORCE = frozenset(OrderEventConstants.TIME_IN_FORCE_STRINGS.keys())
+_ORDER_TYPES = frozenset([OrderEventConstants.LIMIT, OrderEventConstants.MARKET])
+
+
+class EventStreamError(object):
+    """
+    A problem validate_event_stream found with an event.
+
+    :param index: int. the event's position in the stream
+    :param event_id: the event's id. None if the event isn't an OrderEvent.
+    :param message: str
+    """
+
+    def __init__(self, index, event_id, message):
+        self._index = index
+        self._event_id = event_id
+        self._message = message
+
+    def index(self):
+        return self._index
+
+    def event_id(self):
+        return self._event_id
+
+    def message(self):
+        return self._message
+
+    def __str__(self):
+        return "Event %d (id %s): %s" % (self._index, str(self._event_id), self._message)
+
+
+def _check_column(errors, events, indexes, values, is_valid, message):
+    # checks each distinct value once, then reports every event with an invalid one
+    invalid = set()
+    checked = set()
+    for value in values:
+        key = (type(value), value)
+        if key not in checked:
+            checked.add(key)
+            if not is_valid(value):
+                invalid.add(key)
+    if invalid:
+        for index, value in zip(indexes, values):
+            if (type(value), value) in invalid:
+                errors.append(EventStreamError(index, events[index].event_id(), message % (str(value),)))
+
+
+def _check_prices(errors, events, indexes, markets, prices, allow_none=False):
+    invalid = set()
+    checked = set()
+    for market, price in zip(markets, prices):
+        key = (market, price)
+        if key not in checked:
+            checked.add(key)
+            if price is None:
+                if not allow_none:
+                    invalid.add(key)
+            elif not isinstance(price, Price) or not market.is_valid_price(price):
+                invalid.add(key)
+    if invalid:
+        for index, market, price in zip(indexes, markets, prices):
+            if (market, price) in invalid:
+                errors.append(EventStreamError(index, events[index].event_id(),
+                                               "price %s is not a valid price for %s" % (str(price), str(market))))
+
+
+def validate_event_stream(events, max_errors=None):
+    """
+    Checks a whole stream of order events in one go, in place of the per event checks that are skipped in trusted
+     input mode (see utils.validation). The events are split into columns by field and each column is checked once
+     per distinct value, so a price is checked against its market once for the stream rather than once per event.
+
+    What is checked:
+      * every event is an OrderEvent, with a float timestamp, in timestamp order
+      * chain ids and user ids are ints or strs and markets are Markets
+      * sides, times in force and order types are valid, and prices are valid for their market
+      * new order qtys are positive ints, cancel replace and acknowledged qtys are non-negative ints, fill qtys are
+        positive ints and iceberg peak qtys, when given, are non-negative ints
+      * cancel types, cancel reasons and reject reasons are ints, and match ids are ints or strs
+      * every event other than a new order belongs to a chain started by an earlier new order, and no new order
+        reuses a chain id
+
+    :param events: sequence of MarketObjects.Events.OrderEvents.OrderEvent
+    :param max_errors: int. Optional. Return at most this many problems, the earliest in the stream.
+    :return: list of EventStreamError in stream order. Empty if the stream is valid.
+    """
+    events = events if isinstance(events, list) else list(events)
+    errors = []
+    # class -> field -> column of values, with the column of stream indexes under "index"
+    columns = defaultdict(lambda: defaultdict(list))
+    seen_chain_ids = set()
+    last_timestamp = None
+    for index, event in enumerate(events):
+        if not isinstance(event, OrderEvent):
+            errors.append(EventStreamError(index, None, "%s is not an OrderEvent" % event.__class__.__name__))
+            continue
+        timestamp = event.timestamp()
+        if not isinstance(timestamp, float):
+            errors.append(EventStreamError(index, event.event_id(), "timestamp %s is not a float" % str(timestamp)))
+        elif last_timestamp is not None and timestamp < last_timestamp:
+            errors.append(EventStreamError(index, event.event_id(), "timestamp %s is before the previous event's %s" %
+                                           (str(timestamp), str(last_timestamp))))
+        else:
+            last_timestamp = timestamp
+        chain_id = event.chain_id()
+        if isinstance(event, NewOrderCommand):
+            if chain_id in seen_chain_ids:
+                errors.append(EventStreamError(index, event.event_id(), "chain id %s is already used" % str(chain_id)))
+            seen_chain_ids.add(chain_id)
+        elif chain_id not in seen_chain_ids:
+            errors.append(EventStreamError(index, event.event_id(),
+                                           "chain id %s has no earlier new order" % str(chain_id)))
+        column = columns[event.__class__]
+        column["index"].append(index)
+        column["chain_id"].append(chain_id)
+        column["user_id"].append(event.user_id())
+        column["market"].append(event.market())
+
+    for event_class, column in columns.items():
+        indexes = column["index"]
+        _check_column(errors, events, indexes, column["chain_id"], lambda v: isinstance(v, _ID_TYPES),
+                      "chain id %s is not an int or str")
+        _check_column(errors, events, indexes, column["user_id"], lambda v: isinstance(v, _ID_TYPES),
+                      "user id %s is not an int or str")
+        _check_column(errors, events, indexes, column["market"], lambda v: isinstance(v, Market),
+                      "market %s is not a Market")
+        markets = column["market"]
+        if not all(isinstance(market, Market) for market in set(markets)):
+            continue  # prices can't be checked against something that isn't a market
+        class_events = [events[index] for index in indexes]
+        if issubclass(event_class, NewOrderCommand):
+            _check_prices(errors, events, indexes, markets, [event.price() for event in class_events])
+            _check_column(errors, events, indexes, [event.side() for event in class_events],
+                          lambda v: isinstance(v, Side), "side %s is not a Side")
+            _check_column(errors, events, indexes, [event.qty() for event in class_events],
+                          lambda v: isinstance(v, int) and v > 0, "qty %s is not a positive int")
+            _check_column(errors, events, indexes, [event.iceberg_peak_qty() for event in class_events],
+                          lambda v: isinstance(v, int) and v >= 0, "iceberg peak qty %s is not a non-negative int")
+            _check_column(errors, events, indexes, [event.time_in_force() for event in class_events],
+                          lambda v: v in _TIMES_IN_FORCE, "time in force %s is not known")
+            _check_column(errors, events, indexes, [event.limit_or_market() for event in class_events],
+                          lambda v: v in _ORDER_TYPES, "order type %s is not limit or market")
+        elif issubclass(event_class, CancelReplaceCommand):
+            _check_prices(errors, events, indexes, markets, [event.price() for event in class_events])
+            _check_column(errors, events, indexes, [event.qty() for event in class_events],
+                          lambda v: isinstance(v, int) and v >= 0, "qty %s is not a non-negative int")
+        elif issubclass(event_class, CancelCommand):
+            _check_column(errors, events, indexes, [event.cancel_type() for event in class_events],
+                          lambda v: isinstance(v, int), "cancel type %s is not an int")
+        elif issubclass(event_class, AcknowledgementReport):
+            _check_prices(errors, events, indexes, markets, [event.price() for event in class_events])
+            _check_column(errors, events, indexes, [event.qty() for event in class_events],
+                          lambda v: isinstance(v, int) and v >= 0, "qty %s is not a non-negative int")
+        elif issubclass(event_class, RejectReport):
+            _check_column(errors, events, indexes, [event.reject_reason() for event in class_events],
+                          lambda v: isinstance(v, int), "reject reason %s is not an int")
+        elif issubclass(event_class, CancelReport):
+            _check_column(errors, events, indexes, [event.cancel_reason() for event in class_events],
+                          lambda v: isinstance(v, int), "cancel reason %s is not an int")
+        elif issubclass(event_class, FillReport):
+            _check_prices(errors, events, indexes, markets, [event.fill_price() for event in class_events])
+            _check_column(errors, events, indexes, [event.fill_qty() for event in class_events],
+                          lambda v: isinstance(v, int) and v > 0, "fill qty %s is not a positive int")
+            _check_column(errors, events, indexes, [event.side() for event in class_events],
+                          lambda v: isinstance(v, Side), "side %s is not a Side")
+            _check_column(errors, events, indexes, [event.match_id() for event in class_events],
+                          lambda v: isinstance(v, _ID_TYPES), "match id %s is not an int or str")
+            if issubclass(event_class, PartialFillReport):
+                _check_column(errors, events, indexes, [event.leaves_qty() for event in class_events],
+                              lambda v: isinstance(v, int) and v >= 0, "leaves qty %s is not a non-negative int")
+
+    errors.sort(key=lambda error: error.index())
+    return errors if max_errors is None else errors[:max_errors]
@@ -34,6 +34,7 @@ from buttonwood.MarketObjects.Market import Market
 from buttonwood.MarketObjects.RejectReasons import REJECT_REASON_STRINGS
 from buttonwood.MarketObjects.Side import Side
 from buttonwood.MarketObjects.Events import OrderEventConstants
+from buttonwood.utils.validation import VALIDATION
 
 
 class OrderEvent(BasicEvent):
@@ -83,11 +84,12 @@ class OrderEvent(BasicEvent):
         :param market: MarketObjects.Market
         :param other_key_values: dict
         """
-        assert isinstance(chain_id, str) or isinstance(chain_id, int)
-        assert isinstance(user_id, str) or isinstance(user_id, int)
-        assert isinstance(market, Market)
-        assert other_key_values is None or isinstance(other_key_values,
-                                                      dict), "other_key_values must be none or of type dict"
+        if VALIDATION.enabled:
+            assert isinstance(chain_id, str) or isinstance(chain_id, int)
+            assert isinstance(user_id, str) or isinstance(user_id, int)
+            assert isinstance(market, Market)
+            assert other_key_values is None or isinstance(other_key_values,
+                                                          dict), "other_key_values must be none or of type dict"
         BasicEvent.__init__(self, event_id, timestamp)
         self._user_id = user_id
         self._chain_id = chain_id
@@ -172,17 +174,19 @@ class NewOrderCommand(OrderCommand):
     def __init__(self, event_id, timestamp, chain_id, user_id, market, side, time_in_force,
                  price, qty, iceberg_peak_qty=None, limit_or_market=OrderEventConstants.LIMIT, other_key_values=None):
         # TODO documentation
-        assert isinstance(side, Side)
-        assert isinstance(price, Price)
-        assert isinstance(qty, int)
-        assert isinstance(limit_or_market, int)
-        assert limit_or_market in [OrderEventConstants.MARKET, OrderEventConstants.LIMIT]
-        assert iceberg_peak_qty is None or isinstance(iceberg_peak_qty, int)
-        assert isinstance(time_in_force, int)
-        assert qty > 0, "Qty must be greater than 0"
-        assert iceberg_peak_qty is None or iceberg_peak_qty >= 0, "Iceberg Peak Qty must be None or an int >= 0"
+        if VALIDATION.enabled:
+            assert isinstance(side, Side)
+            assert isinstance(price, Price)
+            assert isinstance(qty, int)
+            assert isinstance(limit_or_market, int)
+            assert limit_or_market in [OrderEventConstants.MARKET, OrderEventConstants.LIMIT]
+            assert iceberg_peak_qty is None or isinstance(iceberg_peak_qty, int)
+            assert isinstance(time_in_force, int)
+            assert qty > 0, "Qty must be greater than 0"
+            assert iceberg_peak_qty is None or iceberg_peak_qty >= 0, "Iceberg Peak Qty must be None or an int >= 0"
         OrderCommand.__init__(self, event_id, timestamp, chain_id, user_id, market, other_key_values=other_key_values)
-        assert market.is_valid_price(price), "Price %s is not valid for Product %s" % (str(price), str(market))
+        if VALIDATION.enabled:
+            assert market.is_valid_price(price), "Price %s is not valid for Product %s" % (str(price), str(market))
 
         self._side = side
         self._price = price
@@ -257,6 +261,14 @@ class NewOrderCommand(OrderCommand):
         """
         return self._time_in_force == OrderEventConstants.FOK
 
+    def limit_or_market(self):
+        """
+        Gets the integer that identifies whether the new order is a limit or market order.
+
+        :return: int. OrderEventConstants.LIMIT or OrderEventConstants.MARKET
+        """
+        return self._limit_or_market
+
     def is_limit_order(self):
         """
         Returns True if the new order is a limit order; false if it is not.
@@ -296,12 +308,13 @@ class CancelReplaceCommand(OrderCommand):
     def __init__(self, event_id, timestamp, chain_id, user_id, market, side, price, qty, iceberg_peak_qty=None,
                  other_key_values=None):
         # TODO document
-        assert isinstance(price, Price)
-        assert isinstance(qty, int)
-        assert iceberg_peak_qty is None or isinstance(iceberg_peak_qty, int)
-        assert iceberg_peak_qty is None or iceberg_peak_qty >= 0, "iceberg_peak_qty cannot be negative."
-        assert qty >= 0, "Qty must be greater than 0"
-        assert market.is_valid_price(price), "Price %s is not valid for Market %s" % (str(price), str(market))
+        if VALIDATION.enabled:
+            assert isinstance(price, Price)
+            assert isinstance(qty, int)
+            assert iceberg_peak_qty is None or isinstance(iceberg_peak_qty, int)
+            assert iceberg_peak_qty is None or iceberg_peak_qty >= 0, "iceberg_peak_qty cannot be negative."
+            assert qty >= 0, "Qty must be greater than 0"
+            assert market.is_valid_price(price), "Price %s is not valid for Market %s" % (str(price), str(market))
         OrderCommand.__init__(self, event_id, timestamp, chain_id, user_id, market, other_key_values=other_key_values)
         self._side = side
         self._price = price
@@ -366,7 +379,8 @@ class CancelReplaceCommand(OrderCommand):
 class CancelCommand(OrderCommand):
     def __init__(self, event_id, timestamp, chain_id, user_id, market, cancel_type, other_key_values=None):
         # TODO document
-        assert isinstance(cancel_type, int)
+        if VALIDATION.enabled:
+            assert isinstance(cancel_type, int)
         OrderCommand.__init__(self, event_id, timestamp, chain_id, user_id, market, other_key_values=other_key_values)
         self._cancel_type = cancel_type
 
@@ -453,9 +467,10 @@ class AcknowledgementReport(ExecutionReport):
         """
         # TODO finish param documentation above
         # TODO finish asserts below
-        assert isinstance(price, Price)
-        assert isinstance(qty, int)
-        assert iceberg_peak_qty is None or isinstance(iceberg_peak_qty, int)
+        if VALIDATION.enabled:
+            assert isinstance(price, Price)
+            assert isinstance(qty, int)
+            assert iceberg_peak_qty is None or isinstance(iceberg_peak_qty, int)
         ExecutionReport.__init__(self, event_id, timestamp, chain_id, user_id, market, response_to_command,
                                  other_key_values=other_key_values)
         self._price = price
@@ -523,7 +538,8 @@ class RejectReport(ExecutionReport):
     def __init__(self, event_id, timestamp, chain_id, user_id, market, response_to_command, reject_reason,
                  other_key_values=None):
         # TODO document
-        assert isinstance(reject_reason, int)
+        if VALIDATION.enabled:
+            assert isinstance(reject_reason, int)
         ExecutionReport.__init__(self, event_id, timestamp, chain_id, user_id, market, response_to_command,
                                  other_key_values=other_key_values)
         self._reject_reason = reject_reason
@@ -580,7 +596,8 @@ class CancelReport(ExecutionReport):
     def __init__(self, event_id, timestamp, chain_id, user_id, market, cancel_command, cancel_reason,
                  other_key_values=None):
         # TODO document
-        assert isinstance(cancel_reason, int)
+        if VALIDATION.enabled:
+            assert isinstance(cancel_reason, int)
         ExecutionReport.__init__(self, event_id, timestamp, chain_id, user_id, market, cancel_command,
                                  other_key_values=other_key_values)
         self._cancel_reason = cancel_reason
@@ -637,10 +654,11 @@ class FillReport(ExecutionReport):
     def __init__(self, event_id, timestamp, chain_id, user_id, market, aggressing_command, fill_qty, fill_price,
                  side, match_id, other_key_values=None):
         # TODO document
-        assert isinstance(fill_price, Price)
-        assert isinstance(fill_qty, int)
-        assert isinstance(match_id, int) or isinstance(match_id, str)
-        assert isinstance(side, Side)
+        if VALIDATION.enabled:
+            assert isinstance(fill_price, Price)
+            assert isinstance(fill_qty, int)
+            assert isinstance(match_id, int) or isinstance(match_id, str)
+            assert isinstance(side, Side)
         ExecutionReport.__init__(self, event_id, timestamp, chain_id, user_id, market, aggressing_command,
                                  other_key_values=other_key_values)
         self._fill_price = fill_price
@@ -724,7 +742,8 @@ class PartialFillReport(FillReport):
     def __init__(self, event_id, timestamp, chain_id, user_id, market, aggressing_command, fill_qty, fill_price,
                  side, match_id, leaves_qty, other_key_values=None):
         # TODO document
-        assert isinstance(leaves_qty, int)
+        if VALIDATION.enabled:
+            assert isinstance(leaves_qty, int)
         FillReport.__init__(self, event_id, timestamp, chain_id, user_id, market, aggressing_command, fill_qty,
                             fill_price, side, match_id, other_key_values=other_key_values)
         self._leaves_qty = leaves_qty
@@ -27,6 +27,8 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+from buttonwood.MarketObjects.Allocation import Allocation
+from buttonwood.MarketObjects.Allocation import FIFOAllocation
 from buttonwood.MarketObjects.Endpoint import Endpoint
 from buttonwood.MarketObjects.Price import PriceFactory
 from buttonwood.MarketObjects.Product import Product
@@ -34,7 +36,8 @@ import sys
 
 class Market(object):
 
-    def __init__(self, product, endpoint, price_factory, min_qty=1, max_qty=sys.maxsize, qty_increment=1):
+    def __init__(self, product, endpoint, price_factory, min_qty=1, max_qty=sys.maxsize, qty_increment=1,
+                 allocation=None):
         """
         Contains all the information needed about a Market.
 
@@ -46,16 +49,19 @@ class Market(object):
         :param price_factory: Price.PriceFactory
         :param min_qty: int. the minimum qty that can be traded in the market. Defaults to 1
         :param qty_increment: int. the increment of qty that is allowed in the market. Defaults to 1
+        :param allocation: Allocation.Allocation. how fills are allocated at a price level. Defaults to FIFOAllocation
         """
         assert isinstance(product, Product)
         assert isinstance(endpoint, Endpoint)
         assert isinstance(price_factory, PriceFactory)
+        assert allocation is None or isinstance(allocation, Allocation)
         self._price_factory = price_factory
         self._product = product
         self._endpoint = endpoint
         self._min_qty = min_qty
         self._max_qty = max_qty
         self._qty_increment = qty_increment
+        self._allocation = FIFOAllocation() if allocation is None else allocation
         self._hash = hash((self._product, self._endpoint))
 
     def product(self):
@@ -122,6 +128,14 @@ class Market(object):
     def qty_increment(self):
         return self._qty_increment
 
+    def allocation(self):
+        """
+        How fills are allocated among the orders at a price level.
+
+        :return: Allocation.Allocation
+        """
+        return self._allocation
+
     def is_valid_qty(self, qty):
         return self._min_qty <= qty <= self._max_qty and (qty - self._min_qty) % self._qty_increment == 0
 
@@ -29,6 +29,7 @@ SOFTWARE.
 
 from buttonwood.MarketObjects.Events.OrderEvents import FillReport
 from buttonwood.MarketObjects.Events.OrderEvents import FullFillReport
+from buttonwood.utils.validation import VALIDATION
 from collections import defaultdict
 
 
@@ -59,6 +60,10 @@ class MatchSeries(object):
      
      The only requirement when sanity checks are run on the MatchSeries is that the total size per price are equal
       on both sides of the match.
+
+     Qty and notional totals are kept as fills are added, along with the set of prices where the aggressive and
+      passive qty don't match yet, so the accessors and their sanity checks don't re-walk the fills.
+      run_sanity_checks() does the full checks from scratch.
       
      Also, it uses internal functions for checking that they all equal get_buys(price) get_sells(price) to do the 
       checks. This let's people overwrite those functions in order to have "fuzzy matches" across asset classes or
@@ -78,6 +83,11 @@ class MatchSeries(object):
         self._series_id = match_series_id
         self._match_time = None
         self._agg_fully_filled = False
+        self._agg_full_fill_count = 0
+        self._agg_qty = 0
+        self._pas_qty = 0
+        self._agg_notional = 0.0
+        self._unbalanced_prices = set()
 
     def series_id(self):
         return self._series_id
@@ -92,10 +102,11 @@ class MatchSeries(object):
         :param fill_event: Buttonwood.MarketObject.Events.OrderEvents.FillEvent 
         :return: 
         """
-        assert (fill_event is not None)
-        assert (isinstance(fill_event, FillReport)), "%s is not a FillReport" % type(fill_event)
-        assert (fill_event.aggressing_command() is not None)
-        assert (fill_event.match_id() == self.series_id()), "The FillEvent's match id needs to match the series' match id"
+        if VALIDATION.enabled:
+            assert (fill_event is not None)
+            assert (isinstance(fill_event, FillReport)), "%s is not a FillReport" % type(fill_event)
+            assert (fill_event.aggressing_command() is not None)
+            assert (fill_event.match_id() == self.series_id()), "The FillEvent's match id needs to match the series' match id"
 
         # only check the aggressor if it isn't the first one
         if self._aggressor is None:
@@ -105,20 +116,45 @@ class MatchSeries(object):
             self._match_time = fill_event.timestamp()
 
         if fill_event.is_aggressor():
-            assert (fill_event.side() == self._aggressor.side()), "An aggressive fill should have same side as aggressor event."
+            if VALIDATION.enabled:
+                assert (fill_event.side() == self._aggressor.side()), "An aggressive fill should have same side as aggressor event."
             self._agg_price_to_qty[fill_event.fill_price()] += fill_event.fill_qty()
             self._agg_fills.append(fill_event)
+            self._agg_qty += fill_event.fill_qty()
+            self._agg_notional += float(fill_event.fill_price()) * fill_event.fill_qty()
             if isinstance(fill_event, FullFillReport):
                 self._agg_fully_filled = True
+                self._agg_full_fill_count += 1
         else:
-            assert (fill_event.side() != self._aggressor.side()), "A passive fill should have different side than aggressor event."
+            if VALIDATION.enabled:
+                assert (fill_event.side() != self._aggressor.side()), "A passive fill should have different side than aggressor event."
             self._pas_price_to_qty[fill_event.fill_price()] += fill_event.fill_qty()
             self._pas_fills.append(fill_event)
+            self._pas_qty += fill_event.fill_qty()
+        price = fill_event.fill_price()
+        if self._agg_price_to_qty.get(price) == self._pas_price_to_qty.get(price):
+            self._unbalanced_prices.discard(price)
+        else:
+            self._unbalanced_prices.add(price)
 
     def aggressor_side(self):
         return None if self._aggressor is None else self._aggressor.side()
 
     def _price_qty_sanity_check(self):
+        # only the prices that didn't balance as fills came in need to be looked at
+        if not self._unbalanced_prices:
+            return
+        for price in self._unbalanced_prices:
+            if price not in self._agg_price_to_qty or price not in self._pas_price_to_qty:
+                raise Exception("Match Series {}: does not have same prices. Agg: {}. Pas: {}"
+                                .format(str(self.series_id()), str(self._agg_price_to_qty.keys()),
+                                        str(self._pas_price_to_qty.keys())))
+        price = next(iter(self._unbalanced_prices))
+        raise Exception("Match Series %s: does not have same qty at price %s. Agg: %d. Pas: %d" %
+                        (str(self.series_id()), str(price), self._agg_price_to_qty[price],
+                         self._pas_price_to_qty[price]))
+
+    def _full_price_qty_sanity_check(self):
         # should have same passive and aggressive prices
         if set(self._agg_price_to_qty.keys()) != set(self._pas_price_to_qty.keys()):
             raise Exception("Match Series {}: does not have same prices. Agg: {}. Pas: {}"
@@ -138,6 +174,8 @@ class MatchSeries(object):
             raise Exception("Match Series %s: has no aggressive fills." % str(self.series_id()))
         if len(self._pas_fills) == 0:
             raise Exception("Match Series %s: has no passive fills." % str(self.series_id()))
+        if self._agg_full_fill_count <= 1:
+            return
         for fill in self._agg_fills:
             if isinstance(fill, FullFillReport):
                 full_fills.append(fill)
@@ -148,7 +186,7 @@ class MatchSeries(object):
     def qty_at_price(self, price, sanity_check=True):
         if sanity_check:
             self._price_qty_sanity_check()
-        return self._agg_price_to_qty[price]
+        return self._agg_price_to_qty.get(price, 0)
 
     def price_to_qty(self, sanity_check=True):
         if sanity_check:
@@ -161,19 +199,23 @@ class MatchSeries(object):
         return self.aggressive_qty()
 
     def aggressive_qty(self):
-        qty = 0
-        for fill in self._agg_fills:
-            qty += fill.fill_qty()
-        return qty
+        return self._agg_qty
 
     def passive_qty(self):
-        qty = 0
-        for fill in self._pas_fills:
-            qty += fill.fill_qty()
-        return qty
+        return self._pas_qty
 
     def balanced_match_qty(self):
-        return self.aggressive_qty() == self.passive_qty()
+        return self._agg_qty == self._pas_qty
+
+    def notional(self, sanity_check=True):
+        """
+        Sum of price * qty over the aggressive fills.
+
+        :return: float
+        """
+        if sanity_check:
+            self._price_qty_sanity_check()
+        return self._agg_notional
 
     def prices(self, sanity_check=True):
         if sanity_check:
@@ -183,12 +225,7 @@ class MatchSeries(object):
     def average_price(self, sanity_check=True):
         if sanity_check:
             self._price_qty_sanity_check()
-        total_qty = 0
-        price_weighted_qty = 0.0
-        for price, qty in self._agg_price_to_qty.items():
-            total_qty += qty
-            price_weighted_qty += float(price * qty)
-        return price_weighted_qty / total_qty
+        return self._agg_notional / self._agg_qty
 
     def price_in_series(self, price, sanity_check=True):
         if sanity_check:
@@ -209,4 +246,4 @@ class MatchSeries(object):
 
     def run_sanity_checks(self):
         self._fills_sanity_check()
-        self._price_qty_sanity_check()
+        self._full_price_qty_sanity_check()
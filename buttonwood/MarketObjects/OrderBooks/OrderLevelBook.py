@@ -28,6 +28,7 @@ SOFTWARE.
 """
 
 from collections import OrderedDict
+from time import perf_counter_ns
 from buttonwood.MarketObjects.EventListeners.OrderEventListener import OrderEventListener
 from buttonwood.MarketObjects.Events import OrderEventConstants as TIF
 from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
@@ -37,18 +38,45 @@ from buttonwood.MarketObjects.PriceLevel import PriceLevel
 from buttonwood.MarketObjects.Side import BID_SIDE
 from buttonwood.MarketObjects.Side import ASK_SIDE
 from buttonwood.MarketObjects.OrderBookListeners.OrderLevelBookListener import OrderLevelBookListener
+from buttonwood.utils.fenwick import FenwickTree
+from buttonwood.utils.tracing import ACK_NEW_ORDER
+from buttonwood.utils.tracing import ACK_PRICE_CHANGE
+from buttonwood.utils.tracing import ACK_QTY_DECREASE
+from buttonwood.utils.tracing import ACK_QTY_INCREASE
+from buttonwood.utils.tracing import ACK_QTY_TO_ZERO
+from buttonwood.utils.tracing import ADD_TO_LEVEL
+from buttonwood.utils.tracing import CANCEL_CONFIRM
+from buttonwood.utils.tracing import PASSIVE_FULL_FILL
+from buttonwood.utils.tracing import PASSIVE_PARTIAL_FILL
+from buttonwood.utils.tracing import REMOVE_FROM_LEVEL
+from buttonwood.utils.tracing import REMOVE_NO_VISIBLE_QTY
+from buttonwood.utils.tracing import VISIBLE_QTY_REFRESH
+from buttonwood.utils.tracing import default_trace_hook
+from buttonwood.utils.tracing import no_trace
 
 
 class TimePriorityOrderLevel(object):
     # TODO document
     # TODO unit test
-    def __init__(self, logger):
+
+    # once there are more than this many removed positions, and they outnumber the live ones, the positions get compacted
+    COMPACT_MIN_DEAD_SLOTS = 32
+
+    def __init__(self, logger, trace=no_trace):
         self._order_chains = OrderedDict()
         self._logger = logger
+        self._trace = trace  # the trace hook of the order book the level belongs to
         self._dirty = False
         self._visible_qty = 0
         self._hidden_qty = 0
         self._num_orders = 0
+        # each order chain gets a position (slot) in time priority order when added to the level. The visible qty of
+        #  each slot is kept in a fenwick tree so that the visible qty ahead of an order chain is a prefix sum.
+        #  Removed order chains leave a 0 qty slot behind until the slots get compacted.
+        self._chain_id_to_slot = {}
+        self._slot_visible_qty = FenwickTree()
+        self._chain_id_to_hidden_qty = {}
+        self._dead_slots = 0
 
     def order_chains(self):
         return list(self._order_chains.values())
@@ -60,10 +88,10 @@ class TimePriorityOrderLevel(object):
         if self.is_empty():
             self._logger.warning("%s: first() called on TimePriorityOrderLevel empty level." % self.__class__.__name__)
             return None
-        return self.order_chains()[0]
+        return next(iter(self._order_chains.values()))
 
     def is_empty(self):
-        return True if len(self.order_chains()) == 0 else False
+        return len(self._order_chains) == 0
 
     def has_order_chain(self, chain_id):
         return chain_id in self._order_chains
@@ -78,15 +106,16 @@ class TimePriorityOrderLevel(object):
                                 str(order_chain.chain_id()),
                                 str(order_chain.current_exposure().price())))
         else:
-            self._order_chains[order_chain.chain_id()] = order_chain
-            # self._dirty = True
-            self._visible_qty += order_chain.visible_qty()
-            self._hidden_qty += order_chain.hidden_qty()
+            chain_id = order_chain.chain_id()
+            visible_qty = order_chain.visible_qty()
+            hidden_qty = order_chain.hidden_qty()
+            self._order_chains[chain_id] = order_chain
+            self._chain_id_to_slot[chain_id] = self._slot_visible_qty.append(visible_qty)
+            self._chain_id_to_hidden_qty[chain_id] = hidden_qty
+            self._visible_qty += visible_qty
+            self._hidden_qty += hidden_qty
             self._num_orders += 1
-            self._logger.debug("%s: Added %s to %s." %
-                               (self.__class__.__name__,
-                                str(order_chain.chain_id()),
-                                str(order_chain.current_exposure().price())))
+            self._trace("TimePriorityOrderLevel", ADD_TO_LEVEL, None, chain_id, None, visible_qty)
 
     def remove_from_level(self, order_chain):
         if not self.has_order_chain(order_chain.chain_id()):
@@ -95,19 +124,56 @@ class TimePriorityOrderLevel(object):
                                 str(order_chain.chain_id()),
                                 str(order_chain.current_exposure().price())))
         else:
-            del self._order_chains[order_chain.chain_id()]
+            chain_id = order_chain.chain_id()
+            del self._order_chains[chain_id]
             # removes not as easy as adds because if orderchain is already closed visible and hidden quantities are 0.
-            #  so can't just subtract out out the chain's quantities in order to maintain level sizes
-            self._dirty = True
-            self._logger.debug("%s: Removed %s from %s." %
+            #  so can't just subtract out out the chain's quantities in order to maintain level sizes. Instead
+            #  subtract out what the level last knew the chain's quantities to be.
+            slot = self._chain_id_to_slot.pop(chain_id)
+            self._visible_qty -= self._slot_visible_qty.value(slot)
+            self._hidden_qty -= self._chain_id_to_hidden_qty.pop(chain_id)
+            self._num_orders -= 1
+            self._slot_visible_qty.set(slot, 0)
+            self._dead_slots += 1
+            if self._dead_slots > self.COMPACT_MIN_DEAD_SLOTS and self._dead_slots > len(self._order_chains):
+                self._compact_slots()
+            self._trace("TimePriorityOrderLevel", REMOVE_FROM_LEVEL, None, chain_id, None, None)
+
+    def update_order_chain(self, order_chain):
+        """
+        Updates the level with the order chain's current visible and hidden qty, without changing its time priority.
+
+        Needs to be called by whatever calls add_to_level and remove_from_level when an order chain's qty changes
+         while it stays in the level, such as a cancel replace down in qty or a partial fill.
+
+        :param order_chain: MarketObjects.Events.EventChains.OrderEventChain
+        """
+        chain_id = order_chain.chain_id()
+        slot = self._chain_id_to_slot.get(chain_id)
+        if slot is None:
+            self._logger.error("%s: Cannot update %s at %s. Does not exist at price." %
                                (self.__class__.__name__,
-                                str(order_chain.chain_id()),
+                                str(chain_id),
                                 str(order_chain.current_exposure().price())))
+            return
+        visible_qty = order_chain.visible_qty()
+        hidden_qty = order_chain.hidden_qty()
+        self._visible_qty += visible_qty - self._slot_visible_qty.value(slot)
+        self._hidden_qty += hidden_qty - self._chain_id_to_hidden_qty[chain_id]
+        self._slot_visible_qty.set(slot, visible_qty)
+        self._chain_id_to_hidden_qty[chain_id] = hidden_qty
+
+    def _compact_slots(self):
+        chain_ids = list(self._order_chains.keys())
+        visible_qtys = [self._slot_visible_qty.value(self._chain_id_to_slot[chain_id]) for chain_id in chain_ids]
+        self._chain_id_to_slot = dict(zip(chain_ids, range(len(chain_ids))))
+        self._slot_visible_qty = FenwickTree(visible_qtys)
+        self._dead_slots = 0
 
     def force_dirty(self):
-        # this function needs to exist because if there is a cancel replace down in qty or a partial fill this class
-        #  will never know, so whatever calls add_to_level and remove_from_level needs to be responsible for forcing
-        #  the dirty flag to true
+        # if there is a cancel replace down in qty or a partial fill this class will never know, so whatever calls
+        #  add_to_level and remove_from_level needs to be responsible for calling update_order_chain. force_dirty is
+        #  the heavy handed alternative: all the level's quantities get recalculated from the order chains.
         self._dirty = True
 
     def _set_level_quantities(self):
@@ -121,6 +187,12 @@ class TimePriorityOrderLevel(object):
         self._num_orders = num_orders
         self._visible_qty = visible_qty
         self._hidden_qty = hidden_qty
+        chain_ids = list(self._order_chains.keys())
+        self._chain_id_to_slot = dict(zip(chain_ids, range(len(chain_ids))))
+        self._slot_visible_qty = FenwickTree(chain.visible_qty() for chain in self._order_chains.values())
+        self._chain_id_to_hidden_qty = dict((chain_id, chain.hidden_qty())
+                                            for chain_id, chain in self._order_chains.items())
+        self._dead_slots = 0
         self._dirty = False
 
     def visible_qty(self):
@@ -143,6 +215,76 @@ class TimePriorityOrderLevel(object):
             self._set_level_quantities()
         return self._num_orders
 
+    def visible_qty_ahead(self, chain_id, allocation=None):
+        """
+        The visible qty of all the order chains ahead of the order chain. O(log n) for time priority.
+
+        With an allocation that isn't time priority, "ahead" is as defined by Allocation.qty_ahead and it is a pass
+         over the level.
+
+        :param chain_id: the order chain's chain id
+        :param allocation: MarketObjects.Allocation.Allocation. Optional. Defaults to time priority.
+        :return: int. None if the order chain is not in the level
+        """
+        if allocation is not None and not allocation.is_time_priority():
+            if chain_id not in self._order_chains:
+                return None
+            chains = self.order_chains()
+            index = next(i for i, chain in enumerate(chains) if chain.chain_id() == chain_id)
+            return allocation.qty_ahead([chain.visible_qty() for chain in chains], index,
+                                        [chain.user_id() for chain in chains])
+        if self._dirty:
+            self._set_level_quantities()
+        slot = self._chain_id_to_slot.get(chain_id)
+        if slot is None:
+            return None
+        return self._slot_visible_qty.prefix_sum(slot)
+
+    def top_priority(self, allocation=None):
+        """
+        The order chain that gets the most of the next aggressive order: the first in line under time priority.
+
+        :param allocation: MarketObjects.Allocation.Allocation. Optional. Defaults to time priority.
+        :return: MarketObjects.Events.EventChains.OrderEventChain
+        """
+        if allocation is None or allocation.is_time_priority() or self.is_empty():
+            return self.first()
+        chains = self.order_chains()
+        return chains[allocation.top_priority_index([chain.visible_qty() for chain in chains],
+                                                    [chain.user_id() for chain in chains])]
+
+    def qty_excluding(self, chain_ids, include_hidden):
+        """
+        The qty of the level leaving out the qty of the order chains with the given chain ids. O(len(chain_ids)).
+
+        :param chain_ids: iterable of chain ids
+        :param include_hidden: bool
+        :return: int
+        """
+        if self._dirty:
+            self._set_level_quantities()
+        qty = self._visible_qty + self._hidden_qty if include_hidden else self._visible_qty
+        for chain_id in chain_ids:
+            slot = self._chain_id_to_slot.get(chain_id)
+            if slot is not None:
+                qty -= self._slot_visible_qty.value(slot)
+                if include_hidden:
+                    qty -= self._chain_id_to_hidden_qty[chain_id]
+        return qty
+
+    def has_order_chains_excluding(self, chain_ids):
+        """
+        True if the level has any order chain that doesn't have one of the given chain ids. O(len(chain_ids)).
+
+        :param chain_ids: iterable of chain ids
+        :return: bool
+        """
+        excluded = 0
+        for chain_id in chain_ids:
+            if chain_id in self._order_chains:
+                excluded += 1
+        return len(self._order_chains) > excluded
+
     def __len__(self):
         return len(self._order_chains)
 
@@ -199,18 +341,219 @@ class SideDict(dict):
             return self._sorted
 
 
+class DenseSideLadder(object):
+    """
+    A drop in for SideDict for products whose prices stay within a band of ticks: the levels are kept in a list
+     indexed by the price's tick offset from an anchor, with a bitmap of the occupied ticks so the best price and the
+     next level over are found with bit operations rather than by sorting or scanning.
+
+    When a price falls outside the band the anchor is moved to re-center the band on the live prices, if they still
+     fit in it. If they don't, the ladder switches to a SideDict for as long as it has levels in it and goes back to
+     being dense once it is empty.
+
+    :param mpi: Decimal. The market's min price increment.
+    :param band: int. Number of ticks in the band.
+    """
+
+    def __init__(self, mpi, band=4096):
+        assert isinstance(band, int) and band > 0
+        self._mpi = mpi
+        self._band = band
+        self._anchor = None
+        self._slots = [None] * band
+        # the Price used as the key for each occupied slot
+        self._slot_prices = [None] * band
+        self._occupied = 0
+        self._count = 0
+        self._price_to_tick = {}
+        self._sparse = None
+        self._sort_dirty = False
+        self._sorted = []
+
+    def _tick(self, price):
+        tick = self._price_to_tick.get(price)
+        if tick is None:
+            tick = int(price / self._mpi)
+            self._price_to_tick[price] = tick
+        return tick
+
+    def _index(self, price):
+        # slot index for the price, or -1 if it is outside the band
+        if self._anchor is None:
+            return -1
+        index = self._tick(price) - self._anchor
+        return index if 0 <= index < self._band else -1
+
+    def is_dense(self):
+        return self._sparse is None
+
+    def _recenter(self, tick):
+        # moves the band so it covers tick and all the live ticks. Returns False if they don't fit.
+        if self._count == 0:
+            self._anchor = tick - self._band // 2
+            return True
+        occupied = self._occupied
+        low = min(self._anchor + (occupied & -occupied).bit_length() - 1, tick)
+        high = max(self._anchor + occupied.bit_length() - 1, tick)
+        span = high - low + 1
+        if span > self._band:
+            return False
+        anchor = low - (self._band - span) // 2
+        shift = self._anchor - anchor
+        slots = [None] * self._band
+        slot_prices = [None] * self._band
+        for index in self._occupied_indexes():
+            slots[index + shift] = self._slots[index]
+            slot_prices[index + shift] = self._slot_prices[index]
+        self._slots = slots
+        self._slot_prices = slot_prices
+        self._occupied = occupied << shift if shift >= 0 else occupied >> -shift
+        self._anchor = anchor
+        return True
+
+    def _to_sparse(self):
+        sparse = SideDict()
+        for index in self._occupied_indexes():
+            sparse[self._slot_prices[index]] = self._slots[index]
+            self._slots[index] = None
+            self._slot_prices[index] = None
+        self._occupied = 0
+        self._count = 0
+        self._sparse = sparse
+
+    def _occupied_indexes(self):
+        # occupied slot indexes from low to high
+        indexes = []
+        bits = self._occupied
+        while bits:
+            lowest = bits & -bits
+            indexes.append(lowest.bit_length() - 1)
+            bits ^= lowest
+        return indexes
+
+    def __setitem__(self, price, level):
+        if self._sparse is not None:
+            self._sparse[price] = level
+            return
+        index = self._index(price)
+        if index < 0:
+            if not self._recenter(self._tick(price)):
+                self._to_sparse()
+                self._sparse[price] = level
+                return
+            index = self._index(price)
+        if self._slots[index] is None:
+            self._occupied |= 1 << index
+            self._count += 1
+            self._sort_dirty = True
+        self._slots[index] = level
+        self._slot_prices[index] = price
+
+    def __delitem__(self, price):
+        if self._sparse is not None:
+            del self._sparse[price]
+            if len(self._sparse) == 0:
+                self._sparse = None
+                self._anchor = None
+                self._sort_dirty = True
+            return
+        index = self._index(price)
+        if index < 0 or self._slots[index] is None:
+            raise KeyError(price)
+        self._slots[index] = None
+        self._slot_prices[index] = None
+        self._occupied &= ~(1 << index)
+        self._count -= 1
+        self._sort_dirty = True
+
+    def __getitem__(self, price):
+        if self._sparse is not None:
+            return self._sparse[price]
+        index = self._index(price)
+        level = None if index < 0 else self._slots[index]
+        if level is None:
+            raise KeyError(price)
+        return level
+
+    def get(self, price, default=None):
+        if self._sparse is not None:
+            return self._sparse.get(price, default)
+        index = self._index(price)
+        level = None if index < 0 else self._slots[index]
+        return default if level is None else level
+
+    def __contains__(self, price):
+        if self._sparse is not None:
+            return price in self._sparse
+        index = self._index(price)
+        return index >= 0 and self._slots[index] is not None
+
+    def __len__(self):
+        return len(self._sparse) if self._sparse is not None else self._count
+
+    def __iter__(self):
+        return iter(self.sorted_prices())
+
+    def items(self):
+        if self._sparse is not None:
+            return list(self._sparse.items())
+        return [(self._slot_prices[index], self._slots[index]) for index in self._occupied_indexes()]
+
+    def max_price(self):
+        if self._sparse is not None:
+            return self._sparse.max_price()
+        if self._occupied == 0:
+            return None
+        return self._slot_prices[self._occupied.bit_length() - 1]
+
+    def min_price(self):
+        if self._sparse is not None:
+            return self._sparse.min_price()
+        occupied = self._occupied
+        if occupied == 0:
+            return None
+        return self._slot_prices[(occupied & -occupied).bit_length() - 1]
+
+    def sorted_prices(self, reverse=False):
+        if self._sparse is not None:
+            return self._sparse.sorted_prices(reverse)
+        if self._sort_dirty:
+            slot_prices = self._slot_prices
+            self._sorted = [slot_prices[index] for index in self._occupied_indexes()]
+            self._sort_dirty = False
+        if reverse:
+            return self._sorted[::-1]
+        else:
+            return self._sorted
+
+
 class OrderLevelBook(BasicOrderBook, OrderEventListener):
     # TODO document class
     # TODO unit test
 
-    def __init__(self, market, logger, name=None):
+    def __init__(self, market, logger, name=None, tracer=None, dense_band=None):
+        """
+        :param market: MarketObjects.Market.Market
+        :param logger: logging.Logger
+        :param name: str. Optional. Defaults to "OrderLevelOrderBook"
+        :param tracer: utils.tracing.Tracer. Optional. Without one, book changes are traced to the logger only if it
+                        is enabled for DEBUG when the book is created.
+        :param dense_band: int. Optional. If given, each side keeps its levels in a DenseSideLadder this many ticks
+                           wide instead of a SideDict. Worth it for products that trade in a narrow band of ticks.
+        """
         BasicOrderBook.__init__(self, market, logger)
         OrderEventListener.__init__(self, logger)
         self._listeners = OrderedDict()
-        self._bid_price_to_level = SideDict()
-        self._ask_price_to_level = SideDict()
+        if dense_band is None:
+            self._bid_price_to_level = SideDict()
+            self._ask_price_to_level = SideDict()
+        else:
+            self._bid_price_to_level = DenseSideLadder(market.mpi(), dense_band)
+            self._ask_price_to_level = DenseSideLadder(market.mpi(), dense_band)
         self._last_update_time = None
         self._name = "OrderLevelOrderBook" if name is None else name
+        self._trace = default_trace_hook(tracer, logger)
+        self._listener_timer = None
 
     def name(self):
         """
@@ -265,15 +608,36 @@ class OrderLevelBook(BasicOrderBook, OrderEventListener):
         for listener in self._listeners.values():
             listener.notify_book_update(self, order_chain, tob_updated)
 
+    def _timed_notify_listeners(self, order_chain, tob_updated):
+        timer = self._listener_timer
+        for listener_id, listener in self._listeners.items():
+            start = perf_counter_ns()
+            listener.notify_book_update(self, order_chain, tob_updated)
+            timer(listener_id, perf_counter_ns() - start)
+
+    def time_listeners(self, timer):
+        """
+        Times each listener's notify_book_update, calling timer(listener_id, elapsed nanoseconds) after each. A timer
+         of None stops the timing. Without a timer the listeners are notified without any timing calls.
+
+        :param timer: callable. Can be None.
+        """
+        self._listener_timer = timer
+        if timer is None:
+            self.__dict__.pop("_notify_listeners", None)
+        else:
+            self._notify_listeners = self._timed_notify_listeners
+
     def best_priority_chain(self, side):
         """
-        Get the best priority live chain for the given side of the book.
+        Get the best priority live chain for the given side of the book, according to the market's allocation.
 
         :return: MarketObjects.Events.EventChains.OrderEventChain
         """
         best_price = self.best_price(side)
         if best_price is not None:
-            return (self._bid_price_to_level if side.is_bid() else self._ask_price_to_level)[best_price].first()
+            level = (self._bid_price_to_level if side.is_bid() else self._ask_price_to_level)[best_price]
+            return level.top_priority(self._market.allocation())
         return None
 
     def prices(self, side):
@@ -398,6 +762,54 @@ class OrderLevelBook(BasicOrderBook, OrderEventListener):
                           self.hidden_qty_at_price(side, price),
                           self.num_orders_at_price(side, price))
 
+    def visible_qty_ahead(self, side, price, chain_id):
+        """
+        Gets the visible qty ahead of the order chain at the given price and side. Under time priority this is the
+         visible qty that would need to be filled before the order chain gets a fill at that price. Otherwise it is
+         as defined by the market's Allocation.qty_ahead.
+
+        Returns None if the order chain is not in the book at that price and side.
+
+        :param side: MarketObjects.Side.Side
+        :param price: MarketObjects.Price.Price
+        :param chain_id: the order chain's chain id
+        :return: int. Can be None
+        """
+        level = (self._bid_price_to_level if side.is_bid() else self._ask_price_to_level).get(price)
+        return None if level is None else level.visible_qty_ahead(chain_id, self._market.allocation())
+
+    def qty_at_price_excluding(self, side, price, chain_ids, include_hidden=True):
+        """
+        Gets the qty at the price on the specified side of the market, leaving out the qty of all the order chains
+         with a chain id in chain_ids. If there are no orders at that price on that side, then will return 0.
+
+        :param side: MarketObjects.Side.Side
+        :param price: MarketObjects.Price.Price
+        :param chain_ids: iterable of chain ids
+        :param include_hidden: bool. Optional. Defaults to True.
+        :return: int
+        """
+        level = (self._bid_price_to_level if side.is_bid() else self._ask_price_to_level).get(price)
+        return 0 if level is None else level.qty_excluding(chain_ids, include_hidden)
+
+    def best_price_excluding(self, side, chain_ids):
+        """
+        Returns the best price for the specified side as if all the order chains with a chain id in chain_ids were
+         not in the book. Will return None if there is nothing else on that side.
+
+        :param side: MarketObjects.Side.Side
+        :param chain_ids: iterable of chain ids
+        :return: MarketObjects.Price.Price. Can be None
+        """
+        price_to_level = self._bid_price_to_level if side.is_bid() else self._ask_price_to_level
+        best_price = self.best_price(side)
+        if best_price is None or price_to_level[best_price].has_order_chains_excluding(chain_ids):
+            return best_price
+        for price in self.prices(side):
+            if price_to_level[price].has_order_chains_excluding(chain_ids):
+                return price
+        return None
+
     def to_json(self):
         ob_json = {}
         for side in [BID_SIDE, ASK_SIDE]:
@@ -440,8 +852,10 @@ class OrderLevelBook(BasicOrderBook, OrderEventListener):
         if isinstance(acknowledgement_report.acknowledged_command(), NewOrderCommand):
             pre_add_best_price = price_to_level.max_price() if is_bid else price_to_level.min_price()
             if acknowledgement_report.price() not in price_to_level:
-                price_to_level[acknowledgement_report.price()] = TimePriorityOrderLevel(self._logger)
+                price_to_level[acknowledgement_report.price()] = TimePriorityOrderLevel(self._logger, self._trace)
             price_to_level[acknowledgement_report.price()].add_to_level(resulting_order_chain)
+            self._trace(self._name, ACK_NEW_ORDER, acknowledgement_report.event_id(), acknowledgement_report.chain_id(),
+                        acknowledgement_report.price(), acknowledgement_report.qty())
             if is_bid:
                 if pre_add_best_price is None or acknowledgement_report.price() >= pre_add_best_price:
                     tob_updated = True
@@ -463,19 +877,15 @@ class OrderLevelBook(BasicOrderBook, OrderEventListener):
                 # on price changes remove from old price and apply to new price.
                 prev_exposure_price = cr_hist.previous_exposure().price()
                 new_exposure_price = cr_hist.new_exposure().price()
-                self._logger.debug("%s: OrderChain %s Cancel Replace Ack %s. From %s to %s." %
-                                   (self.name(),
-                                    str(acknowledgement_report.chain_id()),
-                                    str(acknowledgement_report.event_id()),
-                                    str(prev_exposure_price),
-                                    str(new_exposure_price)))
+                self._trace(self._name, ACK_PRICE_CHANGE, acknowledgement_report.event_id(),
+                            acknowledgement_report.chain_id(), new_exposure_price, acknowledgement_report.qty())
                 price_to_level[prev_exposure_price].remove_from_level(resulting_order_chain)
                 if prev_exposure_price == pre_cr_best_price:
                     tob_updated = True
                 if len(price_to_level[prev_exposure_price]) == 0:
                     del price_to_level[prev_exposure_price]
                 if new_exposure_price not in price_to_level:
-                    price_to_level[new_exposure_price] = TimePriorityOrderLevel(self._logger)
+                    price_to_level[new_exposure_price] = TimePriorityOrderLevel(self._logger, self._trace)
                 price_to_level[new_exposure_price].add_to_level(resulting_order_chain)
                 if is_bid:
                     if new_exposure_price >= pre_cr_best_price:
@@ -486,46 +896,39 @@ class OrderLevelBook(BasicOrderBook, OrderEventListener):
                 order_book_updated = True
             elif cr_hist.is_qty_increase():
                 # increased qty means move the back of the line, so remove from the price and then add back to the price
-                self._logger.debug("%s: OrderChain %s Cancel Replace Ack %s. Qty increased from %d to %d at %s." %
-                                   (self.name(),
-                                    str(acknowledgement_report.chain_id()),
-                                    str(acknowledgement_report.event_id()),
-                                    cr_hist.previous_exposure().qty(),
-                                    cr_hist.new_exposure().qty(),
-                                    str(price)))
+                self._trace(self._name, ACK_QTY_INCREASE, acknowledgement_report.event_id(),
+                            acknowledgement_report.chain_id(), price, acknowledgement_report.qty())
                 price_to_level[price].remove_from_level(resulting_order_chain)
                 if price not in price_to_level:
-                    price_to_level[price] = TimePriorityOrderLevel(self._logger)
+                    price_to_level[price] = TimePriorityOrderLevel(self._logger, self._trace)
                 price_to_level[price].add_to_level(resulting_order_chain)
                 if price == pre_cr_best_price:
                     tob_updated = True
                 order_book_updated = True
             elif cr_hist.is_qty_decrease():
                 if acknowledgement_report.qty() == 0:
-                    self._logger.debug(
-                        "%s: OrderChain %s Cancel Replace Ack %s. Qty decreased from %d to %d at %s. No more qty so removing from level." %
-                        (self.name(),
-                         str(acknowledgement_report.chain_id()),
-                         str(acknowledgement_report.event_id()),
-                         cr_hist.previous_exposure().qty(),
-                         cr_hist.new_exposure().qty(),
-                         str(price)))
+                    self._trace(self._name, ACK_QTY_TO_ZERO, acknowledgement_report.event_id(),
+                                acknowledgement_report.chain_id(), price, 0)
                     price_to_level[acknowledgement_report.price()].remove_from_level(resulting_order_chain)
                     # TODO don't I need to delete level if now nothing?
                     if price == pre_cr_best_price:
                         tob_updated = True
                     order_book_updated = True
                 else:
-                    self._logger.debug(
-                        "%s: OrderChain %s Cancel Replace Ack %s. Qty decreased from %d to %d at %s. No priority changes." %
-                        (self.name(),
-                         str(acknowledgement_report.chain_id()),
-                         str(acknowledgement_report.event_id()),
-                         cr_hist.previous_exposure().qty(),
-                         cr_hist.new_exposure().qty(),
-                         str(price)))
-                    # need to force the dirty flag at the price level
-                    price_to_level[price].force_dirty()
+                    self._trace(self._name, ACK_QTY_DECREASE, acknowledgement_report.event_id(),
+                                acknowledgement_report.chain_id(), price, acknowledgement_report.qty())
+                    # qty changed without a priority change, so just update the chain's qty at the price level
+                    price_to_level[price].update_order_chain(resulting_order_chain)
+                    if price == pre_cr_best_price:
+                        tob_updated = True
+                    order_book_updated = True
+            elif price in price_to_level:
+                # same price and qty, but the visible and hidden split can still change, ex: an iceberg's peak removed
+                level = price_to_level[price]
+                pre_visible_qty = level.visible_qty()
+                pre_hidden_qty = level.hidden_qty()
+                level.update_order_chain(resulting_order_chain)
+                if level.visible_qty() != pre_visible_qty or level.hidden_qty() != pre_hidden_qty:
                     if price == pre_cr_best_price:
                         tob_updated = True
                     order_book_updated = True
@@ -548,26 +951,18 @@ class OrderLevelBook(BasicOrderBook, OrderEventListener):
         if not partial_fill_report.is_aggressor():
             if resulting_order_chain.visible_qty() > 0:
                 price = resulting_order_chain.current_price()
-                self._logger.debug("%s: OrderChain %s Partial Fill %s. Updated exposure %d (%d) @ %s." %
-                                   (self.name(),
-                                    str(partial_fill_report.chain_id()),
-                                    str(partial_fill_report.event_id()),
-                                    resulting_order_chain.visible_qty(),
-                                    resulting_order_chain.hidden_qty(),
-                                    str(price)))
+                self._trace(self._name, PASSIVE_PARTIAL_FILL, partial_fill_report.event_id(),
+                            partial_fill_report.chain_id(), price, resulting_order_chain.visible_qty())
                 # a partial fill might not result in any modification of the level, but requires that visible/hidden be
-                #  recalculated so force the dirty flag
-                price_to_level[price].force_dirty()
+                #  updated for the order chain
+                price_to_level[price].update_order_chain(resulting_order_chain)
                 # if the visible qty replenished from hidden reserve then need to move to back of line
                 if resulting_order_chain.caused_visible_qty_refresh(partial_fill_report.event_id()):
-                    self._logger.debug(
-                        "%s: OrderChain %s Partial Fill %s resulted in visible qty refresh. Moving priority to back." %
-                        (self.name(),
-                         str(partial_fill_report.chain_id()),
-                         str(partial_fill_report.event_id())))
+                    self._trace(self._name, VISIBLE_QTY_REFRESH, partial_fill_report.event_id(),
+                                partial_fill_report.chain_id(), price, resulting_order_chain.visible_qty())
                     price_to_level[price].remove_from_level(resulting_order_chain)
                     if price not in price_to_level:
-                        price_to_level[price] = TimePriorityOrderLevel(self._logger)
+                        price_to_level[price] = TimePriorityOrderLevel(self._logger, self._trace)
                     price_to_level[price].add_to_level(resulting_order_chain)
 
                 order_book_updated = True
@@ -579,14 +974,8 @@ class OrderLevelBook(BasicOrderBook, OrderEventListener):
                         tob_updated = True
             else:
                 price = partial_fill_report.fill_price()
-                self._logger.debug(
-                    "%s: OrderChain %s Partial Fill %s. Resulted in no visible qty %d (%d) @ %s. Removing from order book." %
-                    (self.name(),
-                     str(partial_fill_report.chain_id()),
-                     str(partial_fill_report.event_id()),
-                     resulting_order_chain.visible_qty(),
-                     resulting_order_chain.hidden_qty(),
-                     str(price)))
+                self._trace(self._name, REMOVE_NO_VISIBLE_QTY, partial_fill_report.event_id(),
+                            partial_fill_report.chain_id(), price, 0)
                 if price_to_level[price].has_order_chain(partial_fill_report.chain_id()):
                     price_to_level[price].remove_from_level(resulting_order_chain)
                 else:
@@ -632,11 +1021,8 @@ class OrderLevelBook(BasicOrderBook, OrderEventListener):
         tob_updated = False
         if not full_fill_report.is_aggressor():
             fill_price = full_fill_report.fill_price()
-            self._logger.debug("%s: OrderChain %s Full Fill %s. Removing order from price %s." %
-                               (self.name(),
-                                str(full_fill_report.chain_id()),
-                                str(full_fill_report.event_id()),
-                                str(fill_price)))
+            self._trace(self._name, PASSIVE_FULL_FILL, full_fill_report.event_id(), full_fill_report.chain_id(),
+                        fill_price, full_fill_report.fill_qty())
             if price_to_level[fill_price].has_order_chain(full_fill_report.chain_id()):
                 price_to_level[fill_price].remove_from_level(resulting_order_chain)
                 order_book_updated = True
@@ -681,11 +1067,8 @@ class OrderLevelBook(BasicOrderBook, OrderEventListener):
             level = price_to_level.get(price)
             if level.has_order_chain(resulting_order_chain.chain_id()):
                 level.remove_from_level(resulting_order_chain)
-                self._logger.debug("%s: OrderChain %s Cancel Confirm %s. Removed from %s." %
-                                   (self.name(),
-                                    str(cancel_report.chain_id()),
-                                    str(cancel_report.event_id()),
-                                    str(price)))
+                self._trace(self._name, CANCEL_CONFIRM, cancel_report.event_id(), cancel_report.chain_id(), price,
+                            None)
                 if len(price_to_level[price].order_chains()) == 0:
                     del price_to_level[price]
                 if price == pre_cancel_best_price:
@@ -997,6 +1380,43 @@ class AggregateOrderLevelBook(OrderLevelBook, OrderLevelBookListener):
         """
         raise Exception("level_at_price: order_chains_at_price: To be implemented by implementation of AggregateOrderLevelBook")
 
+    def visible_qty_ahead(self, side, price, chain_id):
+        """
+        Gets the visible qty ahead of the order chain, in time priority, at the given price and side.
+
+        Returns None if the order chain is not in the book at that price and side.
+
+        :param side: MarketObjects.Side.Side
+        :param price: MarketObjects.Price.Price
+        :param chain_id: the order chain's chain id
+        :return: int. Can be None
+        """
+        raise Exception("visible_qty_ahead: To be implemented by implementation of AggregateOrderLevelBook")
+
+    def qty_at_price_excluding(self, side, price, chain_ids, include_hidden=True):
+        """
+        Gets the qty at the price on the specified side of the market, leaving out the qty of all the order chains
+         with a chain id in chain_ids.
+
+        :param side: MarketObjects.Side.Side
+        :param price: MarketObjects.Price.Price
+        :param chain_ids: iterable of chain ids
+        :param include_hidden: bool. Optional. Defaults to True.
+        :return: int
+        """
+        raise Exception("qty_at_price_excluding: To be implemented by implementation of AggregateOrderLevelBook")
+
+    def best_price_excluding(self, side, chain_ids):
+        """
+        Returns the best price for the specified side as if all the order chains with a chain id in chain_ids were
+         not in the book.
+
+        :param side: MarketObjects.Side.Side
+        :param chain_ids: iterable of chain ids
+        :return: MarketObjects.Price.Price. Can be None
+        """
+        raise Exception("best_price_excluding: To be implemented by implementation of AggregateOrderLevelBook")
+
     def to_json(self):
         ob_json = {}
         for side in [BID_SIDE, ASK_SIDE]:
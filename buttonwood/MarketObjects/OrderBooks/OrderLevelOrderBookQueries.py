@@ -49,7 +49,7 @@ def modified_qty_at_price(order_book, side, price, ignore_order_ids, ignore_hidd
     :param order_book: Buttonwood.MarketObjects.OrderBooks.OrderLevelOrderBook.OrderLevelOrderBook
     :param side: Buttonwood.MarketObjects.Side.Side
     :param price: Buttonwood.MarketObjects.Price.Price
-    :param ignore_order_ids: set, list or any other collection that allows for "in" query
+    :param ignore_order_ids: set, list or any other iterable collection of chain ids. Can be None
     :param ignore_hidden: bool
     :return: 
     """
@@ -59,18 +59,11 @@ def modified_qty_at_price(order_book, side, price, ignore_order_ids, ignore_hidd
     assert isinstance(price, Price)
     assert isinstance(ignore_hidden, bool)
     if ignore_order_ids is not None:
-        use_ignore_order_ids = ignore_order_ids
-
-        chains = order_book.iter_order_chains_at_price(side, price)
-        qty = 0
-        for chain in chains:
-            if chain.chain_id() not in use_ignore_order_ids:
-                qty += chain.visible_qty()
-                if not ignore_hidden:
-                    qty += chain.hidden_qty()
-
-    else:  # do this else to take advantage of any precalculation that might be done
-        qty = order_book.level_at_price(side, price).total_qty()
+        qty = order_book.qty_at_price_excluding(side, price, ignore_order_ids, include_hidden=not ignore_hidden)
+    elif ignore_hidden:
+        qty = order_book.visible_qty_at_price(side, price)
+    else:
+        qty = order_book.visible_qty_at_price(side, price) + order_book.hidden_qty_at_price(side, price)
     return qty
 
 
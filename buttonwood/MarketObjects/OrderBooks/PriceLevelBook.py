@@ -0,0 +1,474 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from array import array
+from collections import OrderedDict
+from buttonwood.MarketObjects.OrderBookListeners.OrderLevelBookListener import OrderLevelBookListener
+from buttonwood.MarketObjects.OrderBooks.BasicOrderBook import BasicOrderBook
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.PriceLevel import PriceLevel
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.MarketObjects.Side import BID_SIDE
+
+
+class PriceLevelBookUpdate(object):
+    """
+    What a PriceLevelBook hands its listeners as the causing_order_chain: the batch of level updates that was applied.
+     There are no order chains behind aggregated data, so this only stands in for the parts of an order chain that
+     book level listeners rely on: most_recent_event() (which is the update itself), event_id() and timestamp().
+
+    Listeners that only look at the book and at the most recent event's id and timestamp (MicroPriceListener, the
+     top of book listeners, SharedMemoryTopOfBookListener, ...) work the same on a PriceLevelBook as on an
+     OrderLevelBook. Listeners that follow individual orders do not.
+    """
+
+    __slots__ = ("_market", "_event_id", "_timestamp", "_updates")
+
+    def __init__(self, market, event_id, timestamp, updates):
+        self._market = market
+        self._event_id = event_id
+        self._timestamp = timestamp
+        self._updates = updates
+
+    def market(self):
+        return self._market
+
+    def event_id(self):
+        return self._event_id
+
+    def timestamp(self):
+        return self._timestamp
+
+    def updates(self):
+        """
+        The level updates applied, as (side, price, visible qty, hidden qty, number of orders) tuples.
+
+        :return: list of tuples
+        """
+        return self._updates
+
+    def most_recent_event(self):
+        return self
+
+    def chain_id(self):
+        return None
+
+
+class _Ladder(object):
+    # One side of the book. Ticks in the window are kept in arrays indexed by tick - base, with a bytearray marking the
+    #  live slots so the next live level is found with bytearray.find / rfind instead of a python loop over the gap.
+    #  The window grows as needed up to max_size ticks. Levels that don't fit in it (ex: stub quotes far away from the
+    #  rest of the book) are kept in outside, a dict of tick -> (visible, hidden, orders), until the window covers them.
+    #  Orders is the number of orders + 1, so 0 means not known. best is the tick of the best live level, or None if
+    #  the side is empty.
+    __slots__ = ("is_bid", "base", "size", "max_size", "visible", "hidden", "orders", "live", "num_inside", "outside",
+                 "best")
+
+    def __init__(self, is_bid, size, max_size):
+        self.is_bid = is_bid
+        self.base = 0
+        self.size = size
+        self.max_size = max_size
+        self.visible = array("q", bytes(8 * size))
+        self.hidden = array("q", bytes(8 * size))
+        self.orders = array("q", bytes(8 * size))
+        self.live = bytearray(size)
+        self.num_inside = 0
+        self.outside = {}
+        self.best = None
+
+    def num_levels(self):
+        return self.num_inside + len(self.outside)
+
+    def _is_better(self, tick, other):
+        return other is None or (tick > other if self.is_bid else tick < other)
+
+    def level(self, tick):
+        # (visible, hidden, orders) of the live level at the tick, or None
+        index = tick - self.base
+        if 0 <= index < self.size:
+            if self.live[index]:
+                return self.visible[index], self.hidden[index], self.orders[index]
+            return None
+        return self.outside.get(tick)
+
+    def set(self, tick, visible_qty, hidden_qty, num_orders):
+        is_live = visible_qty > 0 or hidden_qty > 0
+        orders = 0 if num_orders is None else num_orders + 1
+        index = tick - self.base
+        if not 0 <= index < self.size:
+            if not is_live:
+                # nothing in the window to remove, so no reason to move it
+                if self.outside.pop(tick, None) is not None and tick == self.best:
+                    self.best = self._find_best()
+                return
+            if not self._cover(tick):
+                self.outside[tick] = (visible_qty, hidden_qty, orders)
+                if self._is_better(tick, self.best):
+                    self.best = tick
+                return
+            index = tick - self.base
+        if is_live:
+            self.visible[index] = visible_qty
+            self.hidden[index] = hidden_qty
+            self.orders[index] = orders
+            if not self.live[index]:
+                self.live[index] = 1
+                self.num_inside += 1
+                if self._is_better(tick, self.best):
+                    self.best = tick
+        elif self.live[index]:
+            self.visible[index] = 0
+            self.hidden[index] = 0
+            self.orders[index] = 0
+            self.live[index] = 0
+            self.num_inside -= 1
+            if tick == self.best:
+                self.best = self._find_best()
+
+    def _find_best(self):
+        best = None
+        if self.num_inside > 0:
+            best = self.base + (self.live.rfind(1) if self.is_bid else self.live.find(1))
+        if self.outside:
+            outside_best = max(self.outside) if self.is_bid else min(self.outside)
+            if self._is_better(outside_best, best):
+                best = outside_best
+        return best
+
+    def _cover(self, tick):
+        # moves and grows the window to cover the tick and the live levels in it. False if they'd need more than
+        #  max_size ticks.
+        if self.num_inside == 0:
+            # nothing to keep, so just center the window on the tick
+            self._move(tick - self.size // 2, self.size)
+            return True
+        low = min(self.base + self.live.find(1), tick)
+        high = max(self.base + self.live.rfind(1), tick)
+        span = high - low + 1
+        if span > self.max_size:
+            return False
+        size = self.size
+        while size < 2 * span and size < self.max_size:
+            size *= 2
+        size = min(size, self.max_size)
+        self._move(low - (size - span) // 2, size)
+        return True
+
+    def _move(self, base, size):
+        if self.num_inside > 0 or size != self.size:
+            # the live levels are all in the overlap of the old and new windows
+            low = max(base, self.base)
+            high = min(base + size, self.base + self.size)
+            for name in ("visible", "hidden", "orders", "live"):
+                old = getattr(self, name)
+                new = bytearray(size) if name == "live" else array("q", bytes(8 * size))
+                if low < high:
+                    new[low - base:high - base] = old[low - self.base:high - self.base]
+                setattr(self, name, new)
+        self.base = base
+        self.size = size
+        # levels kept outside that the window now covers go in it
+        for tick in [tick for tick in self.outside if 0 <= tick - base < size]:
+            index = tick - base
+            self.visible[index], self.hidden[index], self.orders[index] = self.outside.pop(tick)
+            self.live[index] = 1
+            self.num_inside += 1
+
+    def live_ticks(self, depth=None):
+        # ticks of the live levels from best to worst
+        ticks = []
+        live = self.live
+        base = self.base
+        remaining = self.num_inside if depth is None else min(depth, self.num_inside)
+        if self.is_bid:
+            index = self.size
+            while remaining > 0:
+                index = live.rfind(1, 0, index)
+                ticks.append(base + index)
+                remaining -= 1
+        else:
+            index = -1
+            while remaining > 0:
+                index = live.find(1, index + 1)
+                ticks.append(base + index)
+                remaining -= 1
+        if self.outside:
+            ticks.extend(self.outside)
+            ticks.sort(reverse=self.is_bid)
+            if depth is not None:
+                del ticks[depth:]
+        return ticks
+
+    def clear(self):
+        for tick in self.live_ticks():
+            index = tick - self.base
+            if 0 <= index < self.size:
+                self.visible[index] = 0
+                self.hidden[index] = 0
+                self.orders[index] = 0
+                self.live[index] = 0
+        self.num_inside = 0
+        self.outside.clear()
+        self.best = None
+
+
+class PriceLevelBook(BasicOrderBook):
+    """
+    An order book for aggregated (L2) data: quantities and order counts per price, with no orders behind them.
+
+    Each side is a ladder of arrays indexed by the price's tick offset, so applying a level update or looking up a
+     price is a dict lookup and some array indexing, and the best price is always known without sorting. The ladders
+     start ladder_size ticks wide, centered on the first price seen, and grow if prices go outside of them, up to
+     max_ladder_size ticks. Levels that would take a ladder past that, such as stub quotes far away from the rest of
+     the book, are kept in a dict alongside it instead.
+
+    Updates come in as (side, price, visible qty, hidden qty, number of orders) tuples, where the qtys are the level's
+     new totals and number of orders can be None if the feed doesn't give it. A level with no visible or hidden qty is
+     removed. These are the same tuples as the deltas in a DepthDeltaBatch, so a depth delta stream can be applied as
+     is. Listeners are notified once per applied batch with a PriceLevelBookUpdate; see that class for which
+     listeners make sense on aggregated data.
+
+    The book takes the feed at its word and does not check for a crossed book.
+
+    :param market: MarketObjects.Market.Market
+    :param logger: logging.Logger
+    :param name: str. Optional. Defaults to "PriceLevelBook"
+    :param ladder_size: int. Initial number of ticks in each side's ladder.
+    :param max_ladder_size: int. Most ticks a side's ladder grows to.
+    """
+
+    def __init__(self, market, logger, name=None, ladder_size=1024, max_ladder_size=65536):
+        BasicOrderBook.__init__(self, market, logger)
+        assert isinstance(ladder_size, int) and ladder_size > 0
+        assert isinstance(max_ladder_size, int) and max_ladder_size >= ladder_size
+        self._name = "PriceLevelBook" if name is None else name
+        self._mpi = market.mpi()
+        self._ladders = {BID_SIDE: _Ladder(True, ladder_size, max_ladder_size),
+                         ASK_SIDE: _Ladder(False, ladder_size, max_ladder_size)}
+        self._price_to_tick = {}
+        self._tick_to_price = {}
+        self._listeners = OrderedDict()
+        self._last_update_time = None
+
+    def name(self):
+        return self._name
+
+    def last_update_time(self):
+        return self._last_update_time
+
+    def add_order_level_book_listener(self, listener_id, order_level_book_listener):
+        """
+        Adds a listener that gets notified each time a batch of updates is applied. Same contract as
+         OrderLevelBook.add_order_level_book_listener, with a PriceLevelBookUpdate as the causing order chain.
+
+        :param listener_id: str
+        :param order_level_book_listener: MarketObjects.OrderBookListeners.OrderLevelBookListener.OrderLevelBookListener
+        """
+        assert isinstance(listener_id, str)
+        assert isinstance(order_level_book_listener, OrderLevelBookListener)
+        if listener_id in self._listeners:
+            raise Exception("%s is already registered" % listener_id)
+        self._listeners[listener_id] = order_level_book_listener
+
+    def order_level_book_listener(self, listener_id):
+        return self._listeners.get(listener_id)
+
+    def _tick(self, price):
+        tick = self._price_to_tick.get(price)
+        if tick is None:
+            tick = int(price / self._mpi)
+            self._price_to_tick[price] = tick
+            self._tick_to_price.setdefault(tick, price)
+        return tick
+
+    def _price(self, tick):
+        price = self._tick_to_price.get(tick)
+        if price is None:
+            price = Price(self._mpi * tick)
+            self._tick_to_price[tick] = price
+        return price
+
+    def _top(self):
+        # what listeners consider the top of book: best price and qty of each side
+        tops = []
+        for ladder in (self._ladders[BID_SIDE], self._ladders[ASK_SIDE]):
+            best = ladder.best
+            tops.append(None if best is None else (best,) + ladder.level(best))
+        return tops
+
+    def _apply(self, updates):
+        ladders = self._ladders
+        tick = self._tick
+        for side, price, visible_qty, hidden_qty, num_orders in updates:
+            ladders[side].set(tick(price), visible_qty, hidden_qty, num_orders)
+
+    def _notify_listeners(self, event_id, timestamp, updates, tob_updated):
+        update = PriceLevelBookUpdate(self._market, event_id, timestamp, updates)
+        for listener in self._listeners.values():
+            listener.notify_book_update(self, update, tob_updated)
+
+    def apply_updates(self, updates, timestamp, event_id=None):
+        """
+        Applies a batch of level updates and then notifies the listeners once.
+
+        :param updates: list of (MarketObjects.Side.Side, MarketObjects.Price.Price, int, int, int) tuples
+        :param timestamp: float. Market time of the updates.
+        :param event_id: Optional id of the feed message, handed on to listeners.
+        :return: bool. Whether the top of book changed.
+        """
+        before = self._top()
+        self._apply(updates)
+        self._last_update_time = timestamp
+        tob_updated = self._top() != before
+        if self._listeners:
+            self._notify_listeners(event_id, timestamp, updates, tob_updated)
+        return tob_updated
+
+    def apply_level(self, side, price, visible_qty, hidden_qty, num_orders, timestamp, event_id=None):
+        """
+        Applies a single level update. The same as apply_updates with one update.
+
+        :return: bool. Whether the top of book changed.
+        """
+        return self.apply_updates([(side, price, visible_qty, hidden_qty, num_orders)], timestamp, event_id)
+
+    def apply_snapshot(self, levels, timestamp, event_id=None):
+        """
+        Replaces the whole book with the levels given and then notifies the listeners once.
+
+        :param levels: list of (MarketObjects.Side.Side, MarketObjects.Price.Price, int, int, int) tuples
+        :param timestamp: float. Market time of the snapshot.
+        :param event_id: Optional id of the feed message, handed on to listeners.
+        :return: bool. Whether the top of book changed.
+        """
+        before = self._top()
+        for ladder in self._ladders.values():
+            ladder.clear()
+        self._apply(levels)
+        self._last_update_time = timestamp
+        tob_updated = self._top() != before
+        if self._listeners:
+            self._notify_listeners(event_id, timestamp, levels, tob_updated)
+        return tob_updated
+
+    def prices(self, side):
+        """
+        All the prices on the given side that are currently live in the book, from best price to worse.
+
+        :param side: MarketObjects.Side.Side
+        :return: list of MarketObjects.Price.Price
+        """
+        return [self._price(tick) for tick in self._ladders[side].live_ticks()]
+
+    def levels(self, side, depth=None):
+        """
+        The live levels on the given side as (price, visible qty, hidden qty, number of orders) tuples, best first.
+         Number of orders is None if not known.
+
+        :param side: MarketObjects.Side.Side
+        :param depth: int. Optional, the most levels to return.
+        :return: list of tuples
+        """
+        ladder = self._ladders[side]
+        levels = []
+        for tick in ladder.live_ticks(depth):
+            visible_qty, hidden_qty, orders = ladder.level(tick)
+            levels.append((self._price(tick), visible_qty, hidden_qty, None if orders == 0 else orders - 1))
+        return levels
+
+    def num_levels(self, side):
+        return self._ladders[side].num_levels()
+
+    def best_price(self, side):
+        best = self._ladders[side].best
+        if best is None:
+            return None
+        return self._price(best)
+
+    def best_level(self, side):
+        """
+        Gets the best PriceLevel for the given side. Can be None if side is empty.
+
+        :return: MarketObjects.PriceLevel.PriceLevel
+        """
+        price = self.best_price(side)
+        if price is None:
+            return None
+        return self.level_at_price(side, price)
+
+    def _level(self, side, price):
+        # (visible, hidden, orders) at the price, or None if there is nothing there
+        return self._ladders[side].level(self._tick(price))
+
+    def visible_qty_at_price(self, side, price):
+        level = self._level(side, price)
+        return 0 if level is None else level[0]
+
+    def hidden_qty_at_price(self, side, price):
+        level = self._level(side, price)
+        return 0 if level is None else level[1]
+
+    def num_orders_at_price(self, side, price):
+        """
+        Get the number of orders at a price for the given side. 0 if the price is empty and None if the feed didn't
+         give the number of orders for the level.
+
+        :param side: MarketObjects.Side.Side.
+        :param price: MarketObjects.Price.Price.
+        :return: int. Can be None
+        """
+        level = self._level(side, price)
+        if level is None:
+            return 0
+        return None if level[2] == 0 else level[2] - 1
+
+    def level_at_price(self, side, price):
+        """
+        Gets the PriceLevel at the price for the given side. None if there is nothing at that price.
+
+        :param side: MarketObjects.Side.Side
+        :param price: MarketObjects.Price.Price
+        :return: MarketObjects.PriceLevel.PriceLevel
+        """
+        level = self._level(side, price)
+        if level is None:
+            return None
+        visible_qty, hidden_qty, orders = level
+        return PriceLevel(price, visible_qty, hidden_qty, None if orders == 0 else orders - 1)
+
+    def __str__(self):
+        lines = ["%s %s" % (self._name, str(self._market))]
+        for side in [ASK_SIDE, BID_SIDE]:
+            levels = self.levels(side)
+            if side is ASK_SIDE:
+                levels.reverse()
+            for price, visible_qty, hidden_qty, num_orders in levels:
+                lines.append("%s %s %d (%d) %s" % (str(side), str(price), visible_qty, hidden_qty, str(num_orders)))
+        return "\n".join(lines)
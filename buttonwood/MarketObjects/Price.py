@@ -32,6 +32,7 @@ import decimal
 from decimal import Decimal
 from buttonwood.MarketObjects.Side import Side
 from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.utils.validation import VALIDATION
 
 
 class InvalidPriceException(Exception):
@@ -325,7 +326,8 @@ class PriceFactory(object):
 
     def get_price(self, price_value):
         price = price_value if isinstance(price_value, Price) else Price(price_value)
-        if not self.is_valid_price(price):
+        # in trusted input mode prices are assumed valid (see utils.validation)
+        if VALIDATION.enabled and not self.is_valid_price(price):
             raise InvalidPriceException("%s is not valid price with min %s max %s and mpi %s" %
                                         (str(price_value), str(self._min_price), str(self._max_price), str(self._mpi)))
         return price
@@ -29,6 +29,7 @@ SOFTWARE.
 
 from buttonwood.MarketObjects.Price import Price
 from buttonwood.MarketObjects.Side import Side
+from buttonwood.utils.validation import VALIDATION
 
 
 class PriceLevel(object):
@@ -53,14 +54,15 @@ class PriceLevel(object):
         :param hidden_qty: int. quantity that is at the price and hidden. Optional. Defaults to 0.
         :param num_orders: int. the number of orders that makes up the price level. Optional. Defaults to None.
         """
-        assert isinstance(price, Price)
-        assert isinstance(visible_qty, int)
-        assert isinstance(hidden_qty, int)
-        assert visible_qty > 0
-        assert hidden_qty >= 0
-        assert num_orders is None or isinstance(num_orders, int)
-        assert num_orders is None or num_orders <= visible_qty + hidden_qty
-        assert num_orders is None or num_orders > 0
+        if VALIDATION.enabled:
+            assert isinstance(price, Price)
+            assert isinstance(visible_qty, int)
+            assert isinstance(hidden_qty, int)
+            assert visible_qty > 0
+            assert hidden_qty >= 0
+            assert num_orders is None or isinstance(num_orders, int)
+            assert num_orders is None or num_orders <= visible_qty + hidden_qty
+            assert num_orders is None or num_orders > 0
         self._price = price
         self._visible_qty = visible_qty
         self._hidden_qty = hidden_qty
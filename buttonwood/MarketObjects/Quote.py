@@ -31,6 +31,7 @@ from buttonwood.MarketObjects.PriceLevel import PriceLevel
 from buttonwood.MarketObjects.Side import Side
 from buttonwood.MarketObjects.Market import Market
 from buttonwood.MarketObjects.Price import Price
+from buttonwood.utils.validation import VALIDATION
 
 
 class Quote(object):
@@ -45,19 +46,21 @@ class Quote(object):
         :param visible_qty: int. Must be greater than 0
         :param hidden_qty: int. Must be 0 or more. Optional. Defaults to 0.
         """
-        assert isinstance(price, Price) or isinstance(price, str)
-        assert isinstance(side, Side)
-        assert isinstance(market, Market)
-        assert isinstance(visible_qty, int)
-        assert isinstance(hidden_qty, int)
-        assert visible_qty > 0, "A quote's visible qty must be greater than 0"
-        assert hidden_qty >= 0, "A quote's hidden qty must be greater than or equal to 0"
+        if VALIDATION.enabled:
+            assert isinstance(price, Price) or isinstance(price, str)
+            assert isinstance(side, Side)
+            assert isinstance(market, Market)
+            assert isinstance(visible_qty, int)
+            assert isinstance(hidden_qty, int)
+            assert visible_qty > 0, "A quote's visible qty must be greater than 0"
+            assert hidden_qty >= 0, "A quote's hidden qty must be greater than or equal to 0"
         use_price = price
         if not isinstance(price, Price):
             use_price = Price(price)
-        assert market.is_valid_price(use_price), \
-            "%s is not a valid price for a product with minimum price increment %s" % \
-            (str(use_price), str(market.mpi()))
+        if VALIDATION.enabled:
+            assert market.is_valid_price(use_price), \
+                "%s is not a valid price for a product with minimum price increment %s" % \
+                (str(use_price), str(market.mpi()))
         self._side = side
         self._market = market
         self._price_level = PriceLevel(use_price, visible_qty, hidden_qty, num_orders=1)
@@ -0,0 +1,395 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import heapq
+import itertools
+from buttonwood.MarketObjects.CancelReasons import USER_CANCEL
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEventConstants import LIMIT
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReplaceCommand
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Events.OrderEvents import OrderCommand
+from buttonwood.MarketObjects.OrderBookListeners.OrderLevelBookListener import OrderLevelBookListener
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.Simulation.MatchingEngine import MatchingEngine
+from buttonwood.utils.IDGenerators import MonotonicIntID
+
+# what the scheduler's heap entries are for
+_COMMAND_ARRIVAL = 0
+_REPORT_DELIVERY = 1
+_TIMER = 2
+
+
+class LatencyModel(object):
+    """
+    How long, in seconds, it takes a strategy's command to get to the venue and a venue's report to get back to the
+     strategy.
+    """
+
+    def latency(self, now, in_flight):
+        """
+        :param now: float. the time the command or report is sent
+        :param in_flight: int. the number of the strategy's commands sent but not yet at the venue
+        :return: float. seconds
+        """
+        raise NotImplementedError("latency to be implemented by inheriting class.")
+
+
+class FixedLatency(LatencyModel):
+    """
+    The same latency every time.
+
+    :param seconds: float
+    """
+
+    def __init__(self, seconds):
+        assert seconds >= 0
+        self._seconds = seconds
+
+    def latency(self, now, in_flight):
+        return self._seconds
+
+
+class SampledLatency(LatencyModel):
+    """
+    Latency drawn from a distribution, for example random.Random(seed).expovariate bound to a rate, or a function
+     picking from observed latencies. Negative samples are treated as 0.
+
+    :param sampler: callable taking no arguments and returning seconds
+    """
+
+    def __init__(self, sampler):
+        assert callable(sampler)
+        self._sampler = sampler
+
+    def latency(self, now, in_flight):
+        return max(0.0, self._sampler())
+
+
+class QueueDependentLatency(LatencyModel):
+    """
+    A base latency plus a fixed amount for each of the strategy's commands already on the way to the venue, for
+     order entry that slows down as the strategy sends bursts of commands.
+
+    :param base: float. seconds
+    :param per_in_flight: float. seconds added per command in flight
+    """
+
+    def __init__(self, base, per_in_flight):
+        assert base >= 0
+        assert per_in_flight >= 0
+        self._base = base
+        self._per_in_flight = per_in_flight
+
+    def latency(self, now, in_flight):
+        return self._base + self._per_in_flight * in_flight
+
+
+class Strategy(object):
+    """
+    Base class for strategies run by the Backtester. Every callback is optional and gets the backtester, which is how
+     the strategy sends commands, sets timers and gets to the order book and event handler.
+    """
+
+    def __init__(self, logger):
+        self._logger = logger
+
+    def on_start(self, backtester):
+        """
+        Called before any events are run. The backtester's time is already the run's start, so orders can be sent.
+        """
+        pass
+
+    def on_book_update(self, backtester, order_book, causing_order_chain, tob_updated):
+        """
+        Called after each order book update, unless the strategy is idle (see Backtester.idle_until).
+        """
+        pass
+
+    def on_report(self, backtester, report):
+        """
+        Called with each execution report for one of the strategy's orders, once the report gets back to the strategy.
+        """
+        pass
+
+    def on_timer(self, backtester, timestamp, payload):
+        pass
+
+    def on_end(self, backtester):
+        pass
+
+
+class _StrategyBookListener(OrderLevelBookListener):
+
+    def __init__(self, logger, backtester):
+        OrderLevelBookListener.__init__(self, logger)
+        self._backtester = backtester
+
+    def notify_book_update(self, order_book, causing_order_chain, tob_updated):
+        self._backtester._notify_book_update(order_book, causing_order_chain, tob_updated)
+
+    def clean_up_order_chain(self, order_chain):
+        pass
+
+
+class Backtester(object):
+    """
+    A discrete event simulator that runs a strategy against a historical event stream for one market.
+
+    The historical events (in timestamp order) are merged with what the strategy schedules -- its commands getting to
+     the venue, reports getting back to it and its timers -- which are kept in a heap. Historical events are handled
+     one after another without touching the heap until the next scheduled item is due, so while the strategy is idle
+     the replay runs at the speed of the event handler and order book. On a tie, historical events go first.
+
+    Routing:
+      * With use_matching_engine (the default) the historical commands and the strategy's commands are matched by a
+        MatchingEngine and the reports it sends back are what build the order book. The historical reports are
+        dropped, since once the strategy trades, history plays out differently.
+      * Without it the historical events are applied to the order book as they are and the strategy's commands only
+        go to the event handler, so nothing is ever filled. That is for strategies that only watch the book.
+
+    The strategy's commands are stamped with the time they get to the venue, and get chain ids and event ids counting
+     down from -1 so they can't clash with the (positive) historical ids. Book updates are seen by the strategy as
+     they happen; latency applies to order entry and to the strategy's own reports.
+
+    :param market: MarketObjects.Market.Market
+    :param strategy: Strategy
+    :param logger: logging.Logger
+    :param latency_model: LatencyModel. Optional. Defaults to no latency.
+    :param user_id: the user id on the strategy's commands. Defaults to "backtest".
+    :param use_matching_engine: bool. Defaults to True.
+    """
+
+    def __init__(self, market, strategy, logger, latency_model=None, user_id="backtest", use_matching_engine=True):
+        assert isinstance(strategy, Strategy)
+        assert latency_model is None or isinstance(latency_model, LatencyModel)
+        self._market = market
+        self._strategy = strategy
+        self._logger = logger
+        self._latency_model = FixedLatency(0) if latency_model is None else latency_model
+        self._user_id = user_id
+        self._ids = MonotonicIntID(increment=-1, max_id=0)
+        self._engine = MatchingEngine(market, logger, event_id_generator=self._ids) if use_matching_engine else None
+        self._event_handler = OrderEventHandler(logger)
+        self._order_book = OrderLevelBook(market, logger)
+        self._event_handler.register_orderbook(market, "backtest", self._order_book)
+        self._order_book.add_order_level_book_listener("backtest strategy", _StrategyBookListener(logger, self))
+        self._heap = []
+        self._sequence = 0
+        self._now = None
+        self._idle_until = None
+        self._in_flight = 0
+        self._chain_id_to_side = {}  # every order the strategy has sent
+        self._open_chain_ids = set()
+        self._historical_events = 0
+
+    def market(self):
+        return self._market
+
+    def order_book(self):
+        return self._order_book
+
+    def event_handler(self):
+        """
+        The event handler behind the order book, to register OrderEventListeners with.
+
+        :return: MarketObjects.Events.EventHandler.OrderEventHandler
+        """
+        return self._event_handler
+
+    def now(self):
+        """
+        :return: float. the current simulation time. None before run() is called.
+        """
+        return self._now
+
+    def in_flight(self):
+        """
+        :return: int. the number of the strategy's commands sent but not yet at the venue
+        """
+        return self._in_flight
+
+    def open_chain_ids(self):
+        """
+        :return: list of the chain ids of the strategy's orders that haven't been closed at the venue
+        """
+        return list(self._open_chain_ids)
+
+    def historical_event_count(self):
+        return self._historical_events
+
+    def idle_until(self, timestamp):
+        """
+        Stops book updates going to the strategy until timestamp. Reports and timers still go to the strategy.
+
+        :param timestamp: float
+        """
+        self._idle_until = timestamp
+
+    def schedule_timer(self, timestamp, payload=None):
+        """
+        Has Strategy.on_timer called at timestamp, with the payload.
+
+        :param timestamp: float
+        :param payload: anything. Optional.
+        """
+        self._schedule(timestamp, _TIMER, payload)
+
+    def new_order(self, side, price, qty, time_in_force=FAR, iceberg_peak_qty=None, limit_or_market=LIMIT):
+        """
+        Sends a new order for the strategy.
+
+        :return: the new order's chain id
+        """
+        chain_id = self._ids.id()
+        self._chain_id_to_side[chain_id] = side
+        self._open_chain_ids.add(chain_id)
+        self._send(lambda timestamp: NewOrderCommand(self._ids.id(), timestamp, chain_id, self._user_id, self._market,
+                                                     side, time_in_force, price, qty,
+                                                     iceberg_peak_qty=iceberg_peak_qty,
+                                                     limit_or_market=limit_or_market))
+        return chain_id
+
+    def cancel_replace(self, chain_id, price, qty, iceberg_peak_qty=None):
+        """
+        Sends a cancel replace for one of the strategy's orders. If the order has closed by the time the cancel replace
+         gets to the venue it is rejected.
+        """
+        side = self._chain_id_to_side.get(chain_id)
+        if side is None:
+            raise Exception("Chain %s is not an order of the strategy" % str(chain_id))
+        self._send(lambda timestamp: CancelReplaceCommand(self._ids.id(), timestamp, chain_id, self._user_id,
+                                                          self._market, side, price, qty,
+                                                          iceberg_peak_qty=iceberg_peak_qty))
+
+    def cancel(self, chain_id, cancel_type=USER_CANCEL):
+        """
+        Sends a cancel for one of the strategy's orders. If the order has closed by the time the cancel gets to the
+         venue it is rejected.
+        """
+        if chain_id not in self._chain_id_to_side:
+            raise Exception("Chain %s is not an order of the strategy" % str(chain_id))
+        self._send(lambda timestamp: CancelCommand(self._ids.id(), timestamp, chain_id, self._user_id, self._market,
+                                                   cancel_type))
+
+    def run(self, historical_events, end_time=None, start_time=None):
+        """
+        Runs the strategy over the historical events, which need to be in timestamp order. Once they run out, what is
+         still scheduled is run, up to end_time if given.
+
+        The simulation starts at start_time or, if that isn't given, the first historical event's timestamp. Strategy
+         on_start is called at that time.
+
+        :param historical_events: iterable of MarketObjects.Events.OrderEvents.OrderEvent
+        :param end_time: float. Optional. Nothing after end_time is run.
+        :param start_time: float. Optional.
+        """
+        heap = self._heap
+        run_scheduled = self._run_scheduled
+        handle_historical = self._handle_historical
+        historical_events = iter(historical_events)
+        first_event = next(historical_events, None)
+        if first_event is not None:
+            historical_events = itertools.chain([first_event], historical_events)
+        if start_time is not None:
+            self._now = start_time
+        elif first_event is not None:
+            self._now = first_event.timestamp()
+        self._strategy.on_start(self)
+        for event in historical_events:
+            timestamp = event.timestamp()
+            if end_time is not None and timestamp > end_time:
+                break
+            while heap and heap[0][0] < timestamp:
+                run_scheduled()
+            self._now = timestamp
+            handle_historical(event)
+        while heap and (end_time is None or heap[0][0] <= end_time):
+            run_scheduled()
+        self._strategy.on_end(self)
+
+    def _schedule(self, timestamp, kind, payload):
+        self._sequence += 1
+        heapq.heappush(self._heap, (timestamp, self._sequence, kind, payload))
+
+    def _send(self, make_command):
+        now = self._now
+        if now is None:
+            raise Exception("Cannot send a command before the simulation has a time. Give run() a start_time or "
+                            "historical events.")
+        arrival = now + self._latency_model.latency(now, self._in_flight)
+        self._in_flight += 1
+        self._schedule(arrival, _COMMAND_ARRIVAL, make_command)
+
+    def _run_scheduled(self):
+        timestamp, _, kind, payload = heapq.heappop(self._heap)
+        self._now = timestamp
+        if kind == _COMMAND_ARRIVAL:
+            self._in_flight -= 1
+            self._execute(payload(timestamp))
+        elif kind == _REPORT_DELIVERY:
+            self._strategy.on_report(self, payload)
+        else:
+            self._strategy.on_timer(self, timestamp, payload)
+
+    def _handle_historical(self, event):
+        self._historical_events += 1
+        if self._engine is None:
+            self._process(event)
+        elif isinstance(event, OrderCommand):
+            self._execute(event)
+
+    def _process(self, event):
+        # once the matching engine and history disagree the handler can be sent events for chains it has closed, which
+        #  it can't handle, so those are left out
+        if isinstance(event, NewOrderCommand) or self._event_handler.order_chain(event.chain_id()) is not None:
+            self._event_handler.process(event)
+
+    def _execute(self, command):
+        self._process(command)
+        if self._engine is None:
+            return
+        chain_id_to_side = self._chain_id_to_side
+        now = self._now
+        for report in self._engine.process(command):
+            self._process(report)
+            chain_id = report.chain_id()
+            if chain_id in chain_id_to_side:
+                self._schedule(now + self._latency_model.latency(now, self._in_flight), _REPORT_DELIVERY, report)
+                if chain_id in self._open_chain_ids and not self._engine.is_resting(chain_id):
+                    self._open_chain_ids.discard(chain_id)
+
+    def _notify_book_update(self, order_book, causing_order_chain, tob_updated):
+        if self._idle_until is not None:
+            if self._now < self._idle_until:
+                return
+            self._idle_until = None
+        self._strategy.on_book_update(self, order_book, causing_order_chain, tob_updated)
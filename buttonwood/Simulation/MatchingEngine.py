@@ -0,0 +1,382 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from bisect import bisect_left
+from bisect import insort
+from collections import deque
+from buttonwood.MarketObjects import CancelReasons
+from buttonwood.MarketObjects import RejectReasons
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReplaceCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReport
+from buttonwood.MarketObjects.Events.OrderEvents import FullFillReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Events.OrderEvents import PartialFillReport
+from buttonwood.MarketObjects.Events.OrderEvents import RejectReport
+from buttonwood.utils.IDGenerators import MonotonicIntID
+
+BID = 0
+ASK = 1
+
+
+class _RestingOrder(object):
+    __slots__ = ("chain_id", "user_id", "side", "tick", "open_qty", "visible_qty", "peak_qty", "alive")
+
+    def __init__(self, chain_id, user_id, side, tick, open_qty, peak_qty):
+        self.chain_id = chain_id
+        self.user_id = user_id
+        self.side = side
+        self.tick = tick
+        self.open_qty = open_qty
+        self.peak_qty = peak_qty
+        self.visible_qty = min(peak_qty, open_qty)
+        self.alive = True
+
+
+class _Level(object):
+    # orders that are cancelled or lose priority are marked dead and left in the queue, to be dropped when they get to
+    #  the front, so removing an order from the middle of a level is O(1)
+    __slots__ = ("orders", "qty", "num_orders")
+
+    def __init__(self):
+        self.orders = deque()
+        self.qty = 0  # visible and hidden qty of the live orders
+        self.num_orders = 0
+
+
+class MatchingEngine(object):
+    """
+    A price-time priority matching engine for one market. It takes the order commands (NewOrderCommand,
+     CancelReplaceCommand, CancelCommand) and returns the execution reports a venue would send back
+     (AcknowledgementReport, PartialFillReport, FullFillReport, CancelReport, RejectReport). The commands and reports
+     can be fed straight into an OrderEventHandler to build order chains and order books, as if they came from a
+     venue.
+
+    Matching rules, which follow what OrderEventChain and OrderLevelBook expect:
+      * An aggressive order gets one fill per resting order it matches, at the resting order's price, followed by
+        the resting order's fill. All the fills of one command share a match id.
+      * At each price the aggressive qty is split among the resting orders' visible qty by the market's Allocation
+        (MarketObjects.Allocation). Under the default FIFOAllocation that is price-time priority.
+      * FAR: what doesn't fill is acknowledged, with the remaining qty, and rests. Market orders never rest.
+      * FAK: what doesn't fill is cancelled with CancelReasons.FAK_REMAINDER.
+      * FOK: fills completely or is cancelled with CancelReasons.FOK_CANCEL without any fills.
+      * Icebergs only show their peak qty. When the visible qty is filled it is refreshed from the hidden qty and the
+        order goes to the back of its level. Fully hidden orders (an iceberg peak of 0) are treated as fully visible.
+      * Cancel replace qty is the new open qty. A new price or a larger qty goes to the back of the level, a smaller
+        qty keeps its priority. A cancel replace to a crossing price matches as an aggressor first. A cancel replace
+        to 0 is cancelled with CancelReasons.CANCEL_REPLACE_TO_ZERO.
+      * Cancels and cancel replaces for orders that aren't resting are rejected with RejectReasons.ORDER_CLOSED, as
+        are new orders whose chain id is already resting.
+
+    Prices are held as integer ticks (multiples of the market's mpi); the Price objects that came in on commands are
+     cached per tick and reused on reports. Resting orders are slotted records in a deque per level and the levels'
+     ticks are kept sorted so the best price is always at the end of the list.
+
+    Reports get event ids from event_id_generator. So reports don't reuse the event ids of commands, commands should
+     be created with ids from the same generator.
+
+    :param market: MarketObjects.Market.Market
+    :param logger: logging.Logger
+    :param event_id_generator: buttonwood.utils.IDGenerators.IDGenerator. Optional. Defaults to a MonotonicIntID.
+    :param match_id_generator: buttonwood.utils.IDGenerators.IDGenerator. Optional. Defaults to a MonotonicIntID.
+    """
+
+    def __init__(self, market, logger, event_id_generator=None, match_id_generator=None):
+        self._market = market
+        self._logger = logger
+        self._mpi = market.mpi()
+        self._event_ids = MonotonicIntID() if event_id_generator is None else event_id_generator
+        self._match_ids = MonotonicIntID() if match_id_generator is None else match_id_generator
+        self._allocation = market.allocation()
+        self._levels = ({}, {})  # per side, tick -> _Level
+        # per side, sorted keys of the levels with the best at the end: tick for bids and -tick for asks
+        self._keys = ([], [])
+        self._chain_id_to_order = {}
+        self._price_to_tick = {}
+        self._tick_to_price = {}
+        self._handlers = {NewOrderCommand: self._handle_new_order,
+                          CancelReplaceCommand: self._handle_cancel_replace,
+                          CancelCommand: self._handle_cancel}
+
+    def market(self):
+        return self._market
+
+    def process(self, command):
+        """
+        Processes the command and returns the execution reports it causes, in the order they happen.
+
+        :param command: MarketObjects.Events.OrderEvents.OrderCommand
+        :return: list of MarketObjects.Events.OrderEvents.ExecutionReport
+        """
+        handler = self._handlers.get(type(command))
+        if handler is None:
+            raise Exception("MatchingEngine cannot process %s" % type(command).__name__)
+        assert command.market() == self._market, "%s is for %s, not %s" % \
+            (str(command.event_id()), str(command.market()), str(self._market))
+        reports = []
+        handler(command, reports)
+        return reports
+
+    def _tick(self, price):
+        tick = self._price_to_tick.get(price)
+        if tick is None:
+            tick = int(price / self._mpi)
+            self._price_to_tick[price] = tick
+            self._tick_to_price[tick] = price
+        return tick
+
+    def _crosses(self, aggressor_side, limit_tick, passive_tick):
+        if limit_tick is None:
+            return True
+        return passive_tick <= limit_tick if aggressor_side == BID else passive_tick >= limit_tick
+
+    def _available_qty(self, aggressor_side, limit_tick, qty):
+        passive_side = 1 - aggressor_side
+        levels = self._levels[passive_side]
+        available = 0
+        for key in reversed(self._keys[passive_side]):
+            tick = key if passive_side == BID else -key
+            if not self._crosses(aggressor_side, limit_tick, tick):
+                break
+            available += levels[tick].qty
+            if available >= qty:
+                break
+        return available
+
+    def _fill(self, command, order, fill_qty, remaining, price, match_id, level, reports):
+        # reports the aggressor's fill then the resting order's. Returns True if the resting order's visible qty was
+        #  refreshed from its hidden qty, so it needs to go to the back of the level.
+        market = self._market
+        timestamp = command.timestamp()
+        next_event_id = self._event_ids.id
+        order.open_qty -= fill_qty
+        order.visible_qty -= fill_qty
+        level.qty -= fill_qty
+        if remaining == 0:
+            reports.append(FullFillReport(next_event_id(), timestamp, command.chain_id(), command.user_id(), market,
+                                          command, fill_qty, price, command.side(), match_id))
+        else:
+            reports.append(PartialFillReport(next_event_id(), timestamp, command.chain_id(), command.user_id(), market,
+                                             command, fill_qty, price, command.side(), match_id, remaining))
+        if order.open_qty == 0:
+            reports.append(FullFillReport(next_event_id(), timestamp, order.chain_id, order.user_id, market, command,
+                                          fill_qty, price, order.side, match_id))
+            order.alive = False
+            level.num_orders -= 1
+            del self._chain_id_to_order[order.chain_id]
+            return False
+        reports.append(PartialFillReport(next_event_id(), timestamp, order.chain_id, order.user_id, market, command,
+                                         fill_qty, price, order.side, match_id, order.open_qty))
+        if order.visible_qty == 0:
+            order.visible_qty = min(order.peak_qty, order.open_qty)
+            return True
+        return False
+
+    def _match(self, command, aggressor_side, limit_tick, qty, reports):
+        passive_side = 1 - aggressor_side
+        levels = self._levels[passive_side]
+        keys = self._keys[passive_side]
+        time_priority = self._allocation.is_time_priority()
+        match_id = None
+        remaining = qty
+        while remaining > 0 and keys:
+            tick = keys[-1] if passive_side == BID else -keys[-1]
+            if not self._crosses(aggressor_side, limit_tick, tick):
+                break
+            if match_id is None:
+                match_id = self._match_ids.id()
+            price = self._tick_to_price[tick]
+            level = levels[tick]
+            if time_priority:
+                remaining = self._match_time_priority(command, level, remaining, price, match_id, reports)
+            else:
+                remaining = self._match_allocated(command, level, remaining, price, match_id, reports)
+            if level.num_orders == 0:
+                del levels[tick]
+                keys.pop()
+        return remaining
+
+    def _match_time_priority(self, command, level, remaining, price, match_id, reports):
+        orders = level.orders
+        while remaining > 0 and level.num_orders > 0:
+            order = orders[0]
+            if not order.alive:
+                orders.popleft()
+                continue
+            fill_qty = remaining if remaining < order.visible_qty else order.visible_qty
+            remaining -= fill_qty
+            refreshed = self._fill(command, order, fill_qty, remaining, price, match_id, level, reports)
+            if refreshed or not order.alive:
+                orders.popleft()
+                if refreshed:
+                    orders.append(order)
+        return remaining
+
+    def _match_allocated(self, command, level, remaining, price, match_id, reports):
+        # the whole level's visible qty is allocated at once. Icebergs refreshed by that go to the back and, if there
+        #  is still qty to fill, the level is allocated again.
+        while remaining > 0 and level.num_orders > 0:
+            live = [order for order in level.orders if order.alive]
+            allocated = self._allocation.allocate(remaining, [order.visible_qty for order in live],
+                                                  [order.user_id for order in live])
+            refreshed = []
+            for order, fill_qty in zip(live, allocated):
+                if fill_qty > 0:
+                    remaining -= fill_qty
+                    if self._fill(command, order, fill_qty, remaining, price, match_id, level, reports):
+                        refreshed.append(order)
+            refreshed_ids = set(id(order) for order in refreshed)
+            level.orders = deque(order for order in live if order.alive and id(order) not in refreshed_ids)
+            level.orders.extend(refreshed)
+        return remaining
+
+    def _rest(self, order):
+        side = BID if order.side.is_bid() else ASK
+        levels = self._levels[side]
+        level = levels.get(order.tick)
+        if level is None:
+            level = _Level()
+            levels[order.tick] = level
+            insort(self._keys[side], order.tick if side == BID else -order.tick)
+        level.orders.append(order)
+        level.qty += order.open_qty
+        level.num_orders += 1
+        self._chain_id_to_order[order.chain_id] = order
+
+    def _remove(self, order):
+        side = BID if order.side.is_bid() else ASK
+        levels = self._levels[side]
+        level = levels[order.tick]
+        order.alive = False
+        level.qty -= order.open_qty
+        level.num_orders -= 1
+        if level.num_orders == 0:
+            del levels[order.tick]
+            keys = self._keys[side]
+            del keys[bisect_left(keys, order.tick if side == BID else -order.tick)]
+        del self._chain_id_to_order[order.chain_id]
+
+    def _reject(self, command, reject_reason, reports):
+        reports.append(RejectReport(self._event_ids.id(), command.timestamp(), command.chain_id(), command.user_id(),
+                                    self._market, command, reject_reason))
+
+    def _handle_new_order(self, command, reports):
+        if command.chain_id() in self._chain_id_to_order:
+            self._reject(command, RejectReasons.ORDER_CLOSED, reports)
+            return
+        side = BID if command.side().is_bid() else ASK
+        price = command.price()
+        tick = self._tick(price)
+        limit_tick = None if command.is_market_order() else tick
+        qty = command.qty()
+        if command.is_fok() and self._available_qty(side, limit_tick, qty) < qty:
+            reports.append(CancelReport(self._event_ids.id(), command.timestamp(), command.chain_id(),
+                                        command.user_id(), self._market, None, CancelReasons.FOK_CANCEL))
+            return
+        remaining = self._match(command, side, limit_tick, qty, reports)
+        if remaining == 0:
+            return
+        if command.is_far() and limit_tick is not None:
+            peak_qty = command.iceberg_peak_qty() if command.iceberg_peak_qty() > 0 else qty
+            reports.append(AcknowledgementReport(self._event_ids.id(), command.timestamp(), command.chain_id(),
+                                                 command.user_id(), self._market, command, price, remaining,
+                                                 peak_qty))
+            self._rest(_RestingOrder(command.chain_id(), command.user_id(), command.side(), tick, remaining,
+                                     peak_qty))
+        else:
+            reports.append(CancelReport(self._event_ids.id(), command.timestamp(), command.chain_id(),
+                                        command.user_id(), self._market, None, CancelReasons.FAK_REMAINDER))
+
+    def _handle_cancel_replace(self, command, reports):
+        order = self._chain_id_to_order.get(command.chain_id())
+        if order is None:
+            self._reject(command, RejectReasons.ORDER_CLOSED, reports)
+            return
+        qty = command.qty()
+        peak_qty = command.iceberg_peak_qty() if command.iceberg_peak_qty() > 0 else qty
+        if qty == 0:
+            self._remove(order)
+            reports.append(CancelReport(self._event_ids.id(), command.timestamp(), command.chain_id(),
+                                        command.user_id(), self._market, command,
+                                        CancelReasons.CANCEL_REPLACE_TO_ZERO))
+            return
+        price = command.price()
+        tick = self._tick(price)
+        if tick == order.tick and qty <= order.open_qty:
+            # keeps its priority, only the qty changes
+            level = self._levels[BID if order.side.is_bid() else ASK][tick]
+            level.qty += qty - order.open_qty
+            order.open_qty = qty
+            order.peak_qty = peak_qty
+            order.visible_qty = min(peak_qty, qty)
+            reports.append(AcknowledgementReport(self._event_ids.id(), command.timestamp(), command.chain_id(),
+                                                 command.user_id(), self._market, command, price, qty, peak_qty))
+            return
+        self._remove(order)
+        remaining = qty
+        if tick != order.tick:
+            remaining = self._match(command, BID if order.side.is_bid() else ASK, tick, qty, reports)
+        if remaining > 0:
+            reports.append(AcknowledgementReport(self._event_ids.id(), command.timestamp(), command.chain_id(),
+                                                 command.user_id(), self._market, command, price, remaining,
+                                                 peak_qty))
+            self._rest(_RestingOrder(order.chain_id, order.user_id, order.side, tick, remaining, peak_qty))
+
+    def _handle_cancel(self, command, reports):
+        order = self._chain_id_to_order.get(command.chain_id())
+        if order is None:
+            self._reject(command, RejectReasons.ORDER_CLOSED, reports)
+            return
+        self._remove(order)
+        reports.append(CancelReport(self._event_ids.id(), command.timestamp(), command.chain_id(), command.user_id(),
+                                    self._market, command, CancelReasons.USER_REQUESTED))
+
+    def best_price(self, side):
+        """
+        :param side: MarketObjects.Side.Side
+        :return: MarketObjects.Price.Price. None if the side is empty
+        """
+        side_index = BID if side.is_bid() else ASK
+        keys = self._keys[side_index]
+        if not keys:
+            return None
+        return self._tick_to_price[keys[-1] if side_index == BID else -keys[-1]]
+
+    def qty_at_price(self, side, price):
+        """
+        :param side: MarketObjects.Side.Side
+        :param price: MarketObjects.Price.Price
+        :return: int. visible and hidden qty resting at the price
+        """
+        level = self._levels[BID if side.is_bid() else ASK].get(self._tick(price))
+        return 0 if level is None else level.qty
+
+    def is_resting(self, chain_id):
+        return chain_id in self._chain_id_to_order
@@ -0,0 +1,354 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+Turns a market by order (L3) feed into Buttonwood order events.
+
+Public MBO feeds say what happened to each resting order (added, modified, deleted, executed) but not who sent what,
+ and there are no execution reports. MarketByOrderAdapter synthesizes the commands and execution reports that would
+ have produced the same book, so MBO data can go through OrderEventHandler and OrderLevelBook like anything else:
+
+  ADD      NewOrderCommand (FAR) and its AcknowledgementReport
+  MODIFY   CancelReplaceCommand and its AcknowledgementReport; a modify to 0 is handled as a delete
+  DELETE   CancelCommand and its CancelReport
+  EXECUTE  fills of the resting order against a synthesized aggressor
+
+Feeds only report the resting side of a trade, so consecutive executions that belong to the same aggressor are
+ grouped: by the message's match group when the feed gives one (a trade or aggressor id), otherwise by timestamp and
+ side. Each group gets one aggressing FAK NewOrderCommand for the group's total qty, limited at the worst execution
+ price, then, for each execution, the aggressor's fill and the resting order's fill, with one match id for the group.
+ The events for a group come out once the group is complete, which is when the next message doesn't belong to it.
+
+The adapter only keeps state for live orders and the execution group in progress, so memory stays flat no matter how
+ long the session is.
+"""
+
+from buttonwood.MarketObjects.CancelReasons import USER_CANCEL
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAK
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReplaceCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReport
+from buttonwood.MarketObjects.Events.OrderEvents import FullFillReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Events.OrderEvents import PartialFillReport
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.Streaming.Pipeline import MessageDecoder
+from buttonwood.utils.IDGenerators import MonotonicIntID
+
+ADD = 1
+MODIFY = 2
+DELETE = 3
+EXECUTE = 4
+
+ACTION_STRINGS = {ADD: "Add", MODIFY: "Modify", DELETE: "Delete", EXECUTE: "Execute"}
+
+
+class MarketByOrderMessage(object):
+    """
+    A venue neutral MBO message. Per venue glue only has to fill one of these in.
+
+    :param action: int. ADD, MODIFY, DELETE or EXECUTE
+    :param timestamp: float
+    :param order_id: int or str. the venue's id for the resting order
+    :param side: MarketObjects.Side.Side. Only needed for ADD.
+    :param price: MarketObjects.Price.Price. The order's price for ADD and MODIFY; for EXECUTE the execution price,
+                  which defaults to the resting order's price if None. Not needed for DELETE.
+    :param qty: int. The order's new open qty for ADD and MODIFY; the executed qty for EXECUTE.
+    :param match_group: int or str. Optional, for EXECUTE. Executions with the same match group were one aggressor's.
+    """
+
+    __slots__ = ("_action", "_timestamp", "_order_id", "_side", "_price", "_qty", "_match_group")
+
+    def __init__(self, action, timestamp, order_id, side=None, price=None, qty=0, match_group=None):
+        self._action = action
+        self._timestamp = timestamp
+        self._order_id = order_id
+        self._side = side
+        self._price = price
+        self._qty = qty
+        self._match_group = match_group
+
+    def action(self):
+        return self._action
+
+    def timestamp(self):
+        return self._timestamp
+
+    def order_id(self):
+        return self._order_id
+
+    def side(self):
+        return self._side
+
+    def price(self):
+        return self._price
+
+    def qty(self):
+        return self._qty
+
+    def match_group(self):
+        return self._match_group
+
+    def __str__(self):
+        return "%s %s %s %s %s %s %s" % (ACTION_STRINGS.get(self._action, self._action), str(self._timestamp),
+                                         str(self._order_id), str(self._side), str(self._price), str(self._qty),
+                                         str(self._match_group))
+
+
+class _LiveOrder(object):
+    __slots__ = ("side", "price", "open_qty")
+
+    def __init__(self, side, price, open_qty):
+        self.side = side
+        self.price = price
+        self.open_qty = open_qty
+
+
+class MarketByOrderAdapter(MessageDecoder):
+    """
+    A streaming stage from MarketByOrderMessages to order events for a single market. Use process() (or adapt() for
+     an iterable) directly, or hand it to a StreamingPipeline as its decoder.
+
+    Messages for orders the adapter has never seen added (a feed joined part way through the session, for example)
+     are logged, counted and skipped.
+    """
+
+    def __init__(self, market, logger, user_id="mbo", event_id_generator=None, aggressor_chain_id_generator=None,
+                 match_id_generator=None):
+        """
+        :param market: MarketObjects.Market.Market
+        :param logger: logging.Logger
+        :param user_id: str. The user id on all synthesized events; MBO feeds are anonymous.
+        :param event_id_generator: utils.IDGenerators.IDGenerator. Defaults to a MonotonicIntID.
+        :param aggressor_chain_id_generator: utils.IDGenerators.IDGenerator. Chain ids for synthesized aggressors,
+                                             which must not collide with the feed's order ids. Defaults to negative
+                                             ints.
+        :param match_id_generator: utils.IDGenerators.IDGenerator. Match ids for execution groups without a match
+                                   group. Defaults to a MonotonicIntID.
+        """
+        self._market = market
+        self._logger = logger
+        self._user_id = user_id
+        self._event_ids = MonotonicIntID() if event_id_generator is None else event_id_generator
+        self._aggressor_chain_ids = MonotonicIntID(increment=-1, max_id=0) if aggressor_chain_id_generator is None \
+            else aggressor_chain_id_generator
+        self._match_ids = MonotonicIntID() if match_id_generator is None else match_id_generator
+        self._order_id_to_order = {}
+        # the execution group in progress: its key, match group and a list of
+        #  (timestamp, order id, side, price, qty, leaves qty) tuples
+        self._group_key = None
+        self._group_match_id = None
+        self._group = []
+        self._num_messages = 0
+        self._num_events = 0
+        self._num_unknown_orders = 0
+        self._handlers = {ADD: self._add, MODIFY: self._modify, DELETE: self._delete, EXECUTE: self._execute}
+
+    def process(self, message):
+        """
+        :param message: MarketByOrderMessage
+        :return: list of MarketObjects.Events.OrderEvents.OrderEvent. Can be empty, for example while an execution
+                 group is still in progress.
+        """
+        self._num_messages += 1
+        events = []
+        if self._group and (message.action() != EXECUTE or self._execution_key(message) != self._group_key):
+            self._flush_group(events)
+        handler = self._handlers.get(message.action())
+        if handler is None:
+            self._logger.error("%s: unknown market by order action %s" %
+                               (self.__class__.__name__, str(message.action())))
+        else:
+            handler(message, events)
+        self._num_events += len(events)
+        return events
+
+    def decode(self, message):
+        return self.process(message)
+
+    def flush(self):
+        """
+        Events for the execution group in progress, if there is one. Call at the end of the stream.
+
+        :return: list of MarketObjects.Events.OrderEvents.OrderEvent
+        """
+        events = []
+        if self._group:
+            self._flush_group(events)
+        self._num_events += len(events)
+        return events
+
+    def adapt(self, messages):
+        """
+        Generator of the order events for an iterable of MarketByOrderMessages, flushed at the end.
+
+        :param messages: iterable of MarketByOrderMessage
+        """
+        process = self.process
+        for message in messages:
+            for event in process(message):
+                yield event
+        for event in self.flush():
+            yield event
+
+    def _live_order(self, message):
+        order = self._order_id_to_order.get(message.order_id())
+        if order is None:
+            self._num_unknown_orders += 1
+            self._logger.warning("%s: %s for unknown order %s" %
+                                 (self.__class__.__name__, ACTION_STRINGS[message.action()], str(message.order_id())))
+        return order
+
+    def _add(self, message, events):
+        order_id = message.order_id()
+        if order_id in self._order_id_to_order:
+            self._logger.warning("%s: Add for order %s, which is already live. Ignoring it." %
+                                 (self.__class__.__name__, str(order_id)))
+            return
+        timestamp = message.timestamp()
+        price = message.price()
+        qty = message.qty()
+        command = NewOrderCommand(self._event_ids.id(), timestamp, order_id, self._user_id, self._market,
+                                  message.side(), FAR, price, qty)
+        events.append(command)
+        events.append(AcknowledgementReport(self._event_ids.id(), timestamp, order_id, self._user_id, self._market,
+                                            command, price, qty, qty))
+        self._order_id_to_order[order_id] = _LiveOrder(message.side(), price, qty)
+
+    def _modify(self, message, events):
+        if message.qty() == 0:
+            self._delete(message, events)
+            return
+        order = self._live_order(message)
+        if order is None:
+            return
+        timestamp = message.timestamp()
+        order_id = message.order_id()
+        price = order.price if message.price() is None else message.price()
+        qty = message.qty()
+        command = CancelReplaceCommand(self._event_ids.id(), timestamp, order_id, self._user_id, self._market,
+                                       order.side, price, qty)
+        events.append(command)
+        events.append(AcknowledgementReport(self._event_ids.id(), timestamp, order_id, self._user_id, self._market,
+                                            command, price, qty, qty))
+        order.price = price
+        order.open_qty = qty
+
+    def _delete(self, message, events):
+        order = self._live_order(message)
+        if order is None:
+            return
+        timestamp = message.timestamp()
+        order_id = message.order_id()
+        command = CancelCommand(self._event_ids.id(), timestamp, order_id, self._user_id, self._market, USER_CANCEL)
+        events.append(command)
+        events.append(CancelReport(self._event_ids.id(), timestamp, order_id, self._user_id, self._market, command,
+                                   USER_CANCEL))
+        del self._order_id_to_order[order_id]
+
+    def _execution_key(self, message):
+        match_group = message.match_group()
+        if match_group is not None:
+            return match_group
+        order = self._order_id_to_order.get(message.order_id())
+        return message.timestamp(), None if order is None else order.side
+
+    def _execute(self, message, events):
+        order = self._live_order(message)
+        if order is None:
+            return
+        order_id = message.order_id()
+        qty = message.qty()
+        if qty > order.open_qty:
+            self._logger.warning("%s: Execute of %d for order %s, which only has %d open. Filling %d." %
+                                 (self.__class__.__name__, qty, str(order_id), order.open_qty, order.open_qty))
+            qty = order.open_qty
+        if not self._group:
+            self._group_key = self._execution_key(message)
+            self._group_match_id = message.match_group()
+        # the order's state moves on now, so later messages in the group see what is left of it
+        order.open_qty -= qty
+        if order.open_qty == 0:
+            del self._order_id_to_order[order_id]
+        price = order.price if message.price() is None else message.price()
+        self._group.append((message.timestamp(), order_id, order.side, price, qty, order.open_qty))
+
+    def _flush_group(self, events):
+        group = self._group
+        self._group = []
+        self._group_key = None
+        match_id = self._group_match_id
+        if match_id is None:
+            match_id = self._match_ids.id()
+        passive_side = group[0][2]
+        aggressor_side = ASK_SIDE if passive_side.is_bid() else BID_SIDE
+        total_qty = 0
+        # the aggressor's limit has to reach every execution price, so it is the one furthest through the book
+        limit_price = group[0][3]
+        for _, _, _, price, qty, _ in group:
+            total_qty += qty
+            if (price > limit_price) if aggressor_side.is_bid() else (price < limit_price):
+                limit_price = price
+        market = self._market
+        user_id = self._user_id
+        next_event_id = self._event_ids.id
+        aggressor = NewOrderCommand(next_event_id(), group[0][0], self._aggressor_chain_ids.id(), user_id, market,
+                                    aggressor_side, FAK, limit_price, total_qty)
+        aggressor_chain_id = aggressor.chain_id()
+        events.append(aggressor)
+        remaining = total_qty
+        for timestamp, order_id, _, price, qty, leaves_qty in group:
+            remaining -= qty
+            if remaining == 0:
+                events.append(FullFillReport(next_event_id(), timestamp, aggressor_chain_id, user_id, market,
+                                             aggressor, qty, price, aggressor_side, match_id))
+            else:
+                events.append(PartialFillReport(next_event_id(), timestamp, aggressor_chain_id, user_id, market,
+                                                aggressor, qty, price, aggressor_side, match_id, remaining))
+            if leaves_qty == 0:
+                events.append(FullFillReport(next_event_id(), timestamp, order_id, user_id, market, aggressor, qty,
+                                             price, passive_side, match_id))
+            else:
+                events.append(PartialFillReport(next_event_id(), timestamp, order_id, user_id, market, aggressor,
+                                                qty, price, passive_side, match_id, leaves_qty))
+
+    def num_messages(self):
+        return self._num_messages
+
+    def num_events(self):
+        return self._num_events
+
+    def num_unknown_orders(self):
+        return self._num_unknown_orders
+
+    def num_live_orders(self):
+        return len(self._order_id_to_order)
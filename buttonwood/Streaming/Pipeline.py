@@ -0,0 +1,442 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import time
+from buttonwood.MarketObjects.OrderBookListeners.OrderLevelBookListener import OrderLevelBookListener
+
+# marks the end of the stream on the pipeline's queues
+_END = object()
+
+
+class MessageDecoder(object):
+    """
+    Turns raw feed messages (bytes, lines, dicts, whatever the feed gives) into order events. Decoding is run off the
+     event loop, in the pipeline's executor, a batch of messages at a time. Batches are decoded one after another, so
+     a decoder can keep state from message to message.
+    """
+
+    def decode(self, message):
+        """
+        :param message: a raw message
+        :return: iterable of MarketObjects.Events.OrderEvents.OrderEvent. Can be empty for messages that aren't order
+                  events (heartbeats, for example).
+        """
+        raise NotImplementedError("decode to be implemented by inheriting class.")
+
+    def decode_batch(self, messages, errors):
+        """
+        Decodes the messages, skipping any that fail so one bad message doesn't lose the rest of the batch.
+
+        :param messages: list of raw messages
+        :param errors: list. (message, exception) is appended for each message that failed to decode
+        :return: list of MarketObjects.Events.OrderEvents.OrderEvent, in message order
+        """
+        events = []
+        extend = events.extend
+        decode = self.decode
+        for message in messages:
+            try:
+                extend(decode(message))
+            except Exception as e:
+                errors.append((message, e))
+        return events
+
+    def flush(self):
+        """
+        Called once at the end of the stream, for decoders that hold on to messages until they know what they add up
+         to.
+
+        :return: list of MarketObjects.Events.OrderEvents.OrderEvent
+        """
+        return []
+
+
+class FunctionDecoder(MessageDecoder):
+    """
+    A MessageDecoder from a function that takes a raw message and returns an iterable of order events.
+
+    :param function: callable
+    """
+
+    def __init__(self, function):
+        assert callable(function)
+        self._function = function
+
+    def decode(self, message):
+        return self._function(message)
+
+
+class BookUpdate(object):
+    """
+    What a book subscriber gets: the state of the book after a micro-batch that changed it. Updates within a batch are
+     coalesced, so a subscriber gets at most one BookUpdate per book per batch.
+
+    :param order_book: MarketObjects.OrderBooks.OrderLevelBook.OrderLevelBook
+    :param timestamp: float. the book's last update time
+    :param num_updates: int. how many book updates were coalesced
+    :param tob_updated: bool. whether any of them updated the top of book
+    """
+
+    def __init__(self, order_book, timestamp, num_updates, tob_updated):
+        self._order_book = order_book
+        self._timestamp = timestamp
+        self._num_updates = num_updates
+        self._tob_updated = tob_updated
+
+    def order_book(self):
+        return self._order_book
+
+    def timestamp(self):
+        return self._timestamp
+
+    def num_updates(self):
+        return self._num_updates
+
+    def tob_updated(self):
+        return self._tob_updated
+
+
+class _Subscriber(object):
+    # a bounded queue that drops its oldest item rather than making the pipeline wait on a slow subscriber
+    __slots__ = ("queue", "dropped")
+
+    def __init__(self, maxsize):
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def publish(self, item):
+        queue = self.queue
+        if queue.full():
+            queue.get_nowait()
+            self.dropped += 1
+        queue.put_nowait(item)
+
+
+class _BookUpdateCollector(OrderLevelBookListener):
+
+    def __init__(self, logger):
+        OrderLevelBookListener.__init__(self, logger)
+        self.num_updates = 0
+        self.tob_updated = False
+
+    def notify_book_update(self, order_book, causing_order_chain, tob_updated):
+        self.num_updates += 1
+        if tob_updated:
+            self.tob_updated = True
+
+    def clean_up_order_chain(self, order_chain):
+        pass
+
+
+class StreamingPipeline(object):
+    """
+    An asyncio front end for an OrderEventHandler: raw messages go on a bounded queue, are decoded in batches off
+     the event loop, and the decoded events are fed to the handler in micro-batches.
+
+    Back pressure: put() waits while the raw message queue is full, and the decoder waits while there are
+     max_pending_batches decoded batches the handler hasn't got to, so a feed can't get further ahead of the handler
+     than that.
+
+    The handler is fed a whole micro-batch at a time, in a tight loop on the event loop, so its throughput is what it
+     is without the pipeline. After each batch, subscribers get what it changed: book subscribers a BookUpdate per
+     changed book and event subscribers the list of events in the batch. A subscriber that falls behind loses its
+     oldest items rather than holding up the pipeline.
+
+    Everything other than put() and the subscriber queues is meant to be used from the pipeline's event loop.
+
+    :param handler: MarketObjects.Events.EventHandler.OrderEventHandler
+    :param decoder: MessageDecoder
+    :param logger: logging.Logger
+    :param max_queue_size: int. most raw messages waiting to be decoded. Defaults to 10000.
+    :param batch_size: int. most messages decoded, and so events processed, at a time. Defaults to 500.
+    :param max_pending_batches: int. most decoded batches waiting for the handler. Defaults to 4.
+    :param executor: concurrent.futures.Executor. Optional. What decoding runs in. Defaults to the loop's default
+                     executor.
+    """
+
+    def __init__(self, handler, decoder, logger, max_queue_size=10000, batch_size=500, max_pending_batches=4,
+                 executor=None):
+        assert isinstance(decoder, MessageDecoder)
+        assert isinstance(max_queue_size, int) and max_queue_size > 0
+        assert isinstance(batch_size, int) and batch_size > 0
+        assert isinstance(max_pending_batches, int) and max_pending_batches > 0
+        self._handler = handler
+        self._decoder = decoder
+        self._logger = logger
+        self._max_queue_size = max_queue_size
+        self._batch_size = batch_size
+        self._max_pending_batches = max_pending_batches
+        self._executor = executor
+        self._raw_queue = None
+        self._decoded_queue = None
+        self._tasks = []
+        self._book_collectors = []  # (order book, collector, subscribers)
+        self._event_subscribers = []
+        # metrics
+        self._received = 0
+        self._decoded = 0
+        self._processed = 0
+        self._batches = 0
+        self._decode_errors = 0
+        self._process_errors = 0
+        self._last_event_timestamp = None
+        self._last_pipeline_lag = None
+        self._max_pipeline_lag = 0.0
+
+    def subscribe_book(self, order_book, maxsize=1000):
+        """
+        Subscribes to the book's changes. Needs to be called before start().
+
+        :param order_book: MarketObjects.OrderBooks.OrderLevelBook.OrderLevelBook. Registered with the handler.
+        :param maxsize: int. how many updates the subscriber's queue holds before dropping the oldest
+        :return: asyncio.Queue of BookUpdate. Gets None after the last update.
+        """
+        subscriber = _Subscriber(maxsize + 1)  # room for the end marker
+        for book, _, subscribers in self._book_collectors:
+            if book is order_book:
+                subscribers.append(subscriber)
+                return subscriber.queue
+        collector = _BookUpdateCollector(self._logger)
+        order_book.add_order_level_book_listener("streaming pipeline %d" % id(self), collector)
+        self._book_collectors.append((order_book, collector, [subscriber]))
+        return subscriber.queue
+
+    def subscribe_events(self, maxsize=1000):
+        """
+        Subscribes to the events processed, a micro-batch list at a time. Needs to be called before start().
+
+        :param maxsize: int. how many batches the subscriber's queue holds before dropping the oldest
+        :return: asyncio.Queue of lists of MarketObjects.Events.OrderEvents.OrderEvent. Gets None after the last batch.
+        """
+        subscriber = _Subscriber(maxsize + 1)
+        self._event_subscribers.append(subscriber)
+        return subscriber.queue
+
+    def start(self):
+        """
+        Starts the decoding and processing tasks on the running event loop.
+        """
+        if self._tasks:
+            raise Exception("%s is already started" % self.__class__.__name__)
+        self._raw_queue = asyncio.Queue(self._max_queue_size)
+        self._decoded_queue = asyncio.Queue(self._max_pending_batches)
+        self._tasks = [asyncio.ensure_future(self._decode_loop()), asyncio.ensure_future(self._process_loop())]
+
+    async def put(self, message):
+        """
+        Queues a raw message, waiting while the queue is full.
+        """
+        await self._raw_queue.put((message, time.time()))
+        self._received += 1
+
+    async def close(self):
+        """
+        Waits for everything queued to be processed, then tells the subscribers the stream is done.
+        """
+        await self._raw_queue.put(_END)
+        await asyncio.gather(*self._tasks)
+        for _, _, subscribers in self._book_collectors:
+            for subscriber in subscribers:
+                subscriber.publish(None)
+        for subscriber in self._event_subscribers:
+            subscriber.publish(None)
+
+    async def run(self, source):
+        """
+        Starts the pipeline, feeds it everything from the source and closes it.
+
+        :param source: async iterable of raw messages, such as stream_reader_source or file_source
+        """
+        self.start()
+        async for message in source:
+            await self.put(message)
+        await self.close()
+
+    async def _decode_loop(self):
+        loop = asyncio.get_running_loop()
+        raw_queue = self._raw_queue
+        batch_size = self._batch_size
+        done = False
+        while not done:
+            item = await raw_queue.get()
+            if item is _END:
+                break
+            messages = [item[0]]
+            first_queued = item[1]
+            while len(messages) < batch_size and not raw_queue.empty():
+                item = raw_queue.get_nowait()
+                if item is _END:
+                    done = True
+                    break
+                messages.append(item[0])
+            errors = []
+            try:
+                events = await loop.run_in_executor(self._executor, self._decoder.decode_batch, messages, errors)
+            except Exception as e:
+                self._decode_errors += len(messages)
+                self._logger.error("%s: failed to decode a batch of %d messages: %s" %
+                                   (self.__class__.__name__, len(messages), str(e)))
+                continue
+            self._decode_errors += len(errors)
+            for message, e in errors:
+                self._logger.error("%s: failed to decode %s: %s" % (self.__class__.__name__, str(message), str(e)))
+            self._decoded += len(events)
+            await self._decoded_queue.put((events, first_queued))
+        try:
+            events = await loop.run_in_executor(self._executor, self._decoder.flush)
+        except Exception as e:
+            self._decode_errors += 1
+            self._logger.error("%s: failed to flush the decoder: %s" % (self.__class__.__name__, str(e)))
+            events = None
+        if events:
+            self._decoded += len(events)
+            await self._decoded_queue.put((events, time.time()))
+        await self._decoded_queue.put(_END)
+
+    async def _process_loop(self):
+        decoded_queue = self._decoded_queue
+        process = self._handler.process
+        while True:
+            item = await decoded_queue.get()
+            if item is _END:
+                break
+            events, first_queued = item
+            errors = 0
+            for event in events:
+                try:
+                    process(event)
+                except Exception as e:
+                    # the rest of the stream still needs processing, and a dead consumer would leave the decoder
+                    #  waiting on a full queue forever
+                    errors += 1
+                    self._logger.error("%s: failed to process %s: %s" %
+                                       (self.__class__.__name__, str(event), str(e)))
+            self._process_errors += errors
+            self._processed += len(events) - errors
+            self._batches += 1
+            if events:
+                self._last_event_timestamp = events[-1].timestamp()
+            lag = time.time() - first_queued
+            self._last_pipeline_lag = lag
+            if lag > self._max_pipeline_lag:
+                self._max_pipeline_lag = lag
+            self._publish(events)
+            # let the feed and the decoder have a turn between batches
+            await asyncio.sleep(0)
+
+    def _publish(self, events):
+        for order_book, collector, subscribers in self._book_collectors:
+            if collector.num_updates > 0:
+                update = BookUpdate(order_book, order_book.last_update_time(), collector.num_updates,
+                                    collector.tob_updated)
+                for subscriber in subscribers:
+                    subscriber.publish(update)
+                collector.num_updates = 0
+                collector.tob_updated = False
+        if events:
+            for subscriber in self._event_subscribers:
+                subscriber.publish(events)
+
+    def metrics(self):
+        """
+        A snapshot of how the pipeline is doing:
+          * received, decoded and processed: counts of messages put and events decoded and processed
+          * batches: micro-batches processed
+          * decode_errors: messages the decoder failed on, and failed flushes, which are logged and skipped
+          * process_errors: events the handler raised on, which are logged and skipped
+          * raw_queue_depth and decoded_queue_depth: messages waiting to be decoded and batches waiting for the
+            handler
+          * pipeline_lag and max_pipeline_lag: seconds from the first message of the last batch being put to the batch
+            being processed, and the most that has been
+          * feed_lag: seconds between now and the timestamp of the last event processed, for live feeds whose
+            timestamps are wall clock times
+          * dropped: items subscribers have lost by falling behind
+
+        :return: dict
+        """
+        dropped = sum(subscriber.dropped for subscriber in self._event_subscribers)
+        for _, _, subscribers in self._book_collectors:
+            dropped += sum(subscriber.dropped for subscriber in subscribers)
+        return {"received": self._received,
+                "decoded": self._decoded,
+                "processed": self._processed,
+                "batches": self._batches,
+                "decode_errors": self._decode_errors,
+                "process_errors": self._process_errors,
+                "raw_queue_depth": 0 if self._raw_queue is None else self._raw_queue.qsize(),
+                "decoded_queue_depth": 0 if self._decoded_queue is None else self._decoded_queue.qsize(),
+                "pipeline_lag": self._last_pipeline_lag,
+                "max_pipeline_lag": self._max_pipeline_lag,
+                "feed_lag": None if self._last_event_timestamp is None else time.time() - self._last_event_timestamp,
+                "dropped": dropped}
+
+
+async def stream_reader_source(reader):
+    """
+    Lines from an asyncio.StreamReader, such as one from asyncio.open_connection to a drop copy or market data
+     gateway, without the line endings.
+
+    :param reader: asyncio.StreamReader
+    :return: async generator of bytes
+    """
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        yield line.rstrip(b"\r\n")
+
+
+async def file_source(path, lines_per_read=1000, executor=None):
+    """
+    Lines from a file, for replaying a recorded feed through a pipeline. The file is read in the executor so reading
+     doesn't block the event loop.
+
+    :param path: str
+    :param lines_per_read: int
+    :param executor: concurrent.futures.Executor. Optional. Defaults to the loop's default executor.
+    :return: async generator of str, without the line endings
+    """
+    loop = asyncio.get_running_loop()
+
+    def read_lines(f):
+        lines = []
+        for line in f:
+            lines.append(line.rstrip("\r\n"))
+            if len(lines) >= lines_per_read:
+                break
+        return lines
+
+    with open(path) as f:
+        while True:
+            lines = await loop.run_in_executor(executor, read_lines, f)
+            if not lines:
+                return
+            for line in lines:
+                yield line
@@ -0,0 +1,168 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from array import array
+from math import ceil
+from math import floor
+from buttonwood.utils.columns import Columns
+
+
+class BucketedCounter(object):
+    """
+    Counts (volume, events, etc.) in fixed interval time buckets, keeping the most recent num_buckets buckets in a ring
+     buffer.
+
+    Along with each bucket's amount the ring holds the running total through the end of that bucket, so the amount
+     in any window of retained buckets is the difference of two running totals: O(1) no matter how big the window.
+     Adding to the newest bucket is O(1) as well. Adding to an older, still retained, bucket is allowed but has to
+     update the running totals of the buckets after it. Adds older than the retained buckets are dropped.
+
+    Window queries are at bucket granularity: a window covers the bucket "now" falls in and the buckets before it,
+     rounded up to a whole number of buckets.
+
+    :param interval: float. seconds per bucket
+    :param num_buckets: int. number of buckets retained
+    """
+
+    def __init__(self, interval, num_buckets):
+        assert interval > 0
+        assert isinstance(num_buckets, int) and num_buckets > 0
+        self._interval = interval
+        self._num_buckets = num_buckets
+        # one extra slot so the running total from just before the oldest retained bucket is still around
+        self._size = num_buckets + 1
+        self._amounts = array("q", [0]) * self._size
+        self._running_totals = array("q", [0]) * self._size
+        self._first_bucket = None
+        self._current_bucket = None
+        self._total = 0
+
+    def interval(self):
+        return self._interval
+
+    def num_buckets(self):
+        return self._num_buckets
+
+    def _bucket(self, timestamp):
+        return int(floor(timestamp / self._interval))
+
+    def _advance(self, bucket):
+        if self._current_bucket is None:
+            self._first_bucket = bucket
+            start = bucket
+        else:
+            start = max(self._current_bucket + 1, bucket - self._size + 1)
+        for b in range(start, bucket + 1):
+            slot = b % self._size
+            self._amounts[slot] = 0
+            self._running_totals[slot] = self._total
+        self._current_bucket = bucket
+
+    def add(self, timestamp, amount=1):
+        """
+        Adds the amount to the bucket the timestamp falls in.
+
+        :param timestamp: float
+        :param amount: int
+        :return: bool. False if the timestamp is older than the retained buckets and the amount was dropped
+        """
+        bucket = self._bucket(timestamp)
+        if self._current_bucket is None or bucket > self._current_bucket:
+            self._advance(bucket)
+        elif bucket <= self._current_bucket - self._num_buckets:
+            return False
+        self._amounts[bucket % self._size] += amount
+        self._total += amount
+        for b in range(bucket, self._current_bucket + 1):
+            self._running_totals[b % self._size] += amount
+        if bucket < self._first_bucket:
+            self._first_bucket = bucket
+        return True
+
+    def _total_through(self, bucket):
+        if self._current_bucket is None or bucket < self._first_bucket:
+            return 0
+        if bucket >= self._current_bucket:
+            return self._total
+        if bucket <= self._current_bucket - self._size:
+            raise Exception("Bucket %d is no longer retained" % bucket)
+        return self._running_totals[bucket % self._size]
+
+    def total(self):
+        """
+        :return: int. everything ever added, including what is no longer retained
+        """
+        return self._total
+
+    def total_in_last(self, window, now=None):
+        """
+        Gets the amount in the window of seconds ending at now. O(1). Like amount_at, buckets that are no longer
+         retained count as 0.
+
+        :param window: float. seconds. Can't be longer than the retained buckets.
+        :param now: float. Optional. Defaults to the newest bucket.
+        :return: int
+        """
+        num_buckets = int(ceil(window / self._interval - 1e-9))
+        if num_buckets > self._num_buckets:
+            raise Exception("Window of %s seconds is longer than the %d retained buckets" % (window, self._num_buckets))
+        if self._current_bucket is None:
+            return 0
+        end = self._current_bucket if now is None else self._bucket(now)
+        oldest_retained = self._current_bucket - self._num_buckets + 1
+        if end < oldest_retained:
+            return 0
+        start = max(end - num_buckets, oldest_retained - 1)
+        return self._total_through(end) - self._total_through(start)
+
+    def amount_at(self, timestamp):
+        """
+        Gets the amount in the bucket the timestamp falls in. 0 if the bucket is not retained.
+
+        :param timestamp: float
+        :return: int
+        """
+        bucket = self._bucket(timestamp)
+        if self._current_bucket is None or bucket > self._current_bucket or \
+                bucket <= self._current_bucket - self._num_buckets or bucket < self._first_bucket:
+            return 0
+        return self._amounts[bucket % self._size]
+
+    def to_columns(self):
+        """
+        Exports the retained buckets, oldest first.
+
+        :return: buttonwood.utils.columns.Columns with columns bucket_start (float) and amount (int)
+        """
+        columns = Columns([("bucket_start", "d"), ("amount", "q")])
+        if self._current_bucket is not None:
+            for b in range(max(self._first_bucket, self._current_bucket - self._num_buckets + 1),
+                           self._current_bucket + 1):
+                columns.append(b * self._interval, self._amounts[b % self._size])
+        return columns
@@ -0,0 +1,119 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from array import array
+
+
+class Columns(object):
+    """
+    A small table of named, growable, typed columns. Each column is a python array.array of the typecode it was
+     declared with, so numeric data is stored compactly and can be handed straight to anything that understands the
+     buffer protocol (ex: numpy.frombuffer) without copying.
+
+    A column declared with a typecode of None is kept as a plain list, which is what is used for things like event ids
+     that can be ints or strings.
+
+    Rows are appended (or inserted) one at a time, in the order the columns were declared.
+
+    :param column_defs: list of (str, str) tuples of (column name, array typecode or None)
+    """
+
+    def __init__(self, column_defs):
+        assert len(column_defs) > 0, "Columns needs at least one column definition"
+        self._names = []
+        self._columns = []
+        self._name_to_column = {}
+        for name, typecode in column_defs:
+            assert isinstance(name, str)
+            if name in self._name_to_column:
+                raise Exception("Column %s is defined more than once" % name)
+            column = [] if typecode is None else array(typecode)
+            self._names.append(name)
+            self._columns.append(column)
+            self._name_to_column[name] = column
+        # binding the appends up front saves the attribute lookups on every row appended
+        self._appends = tuple(column.append for column in self._columns)
+
+    def names(self):
+        """
+        The column names in the order they were declared.
+
+        :return: list of str
+        """
+        return self._names
+
+    def append(self, *row):
+        """
+        Appends one row. Values must be passed in the same order as the column definitions.
+        """
+        assert len(row) == len(self._appends), "Row has %d values but there are %d columns" % (len(row), len(self._appends))
+        for append, value in zip(self._appends, row):
+            append(value)
+
+    def insert(self, index, *row):
+        """
+        Inserts one row before the index. Values must be passed in the same order as the column definitions.
+        """
+        assert len(row) == len(self._columns), "Row has %d values but there are %d columns" % (len(row), len(self._columns))
+        for column, value in zip(self._columns, row):
+            column.insert(index, value)
+
+    def column(self, name):
+        """
+        Gets the underlying column for the name. This is the live column, not a copy, so it should be treated as read
+         only.
+
+        :param name: str
+        :return: array.array or list
+        """
+        return self._name_to_column[name]
+
+    def row(self, index):
+        """
+        Gets the row at the index as a tuple in column definition order.
+
+        :param index: int
+        :return: tuple
+        """
+        return tuple(column[index] for column in self._columns)
+
+    def to_dict(self):
+        """
+        Gets a dict of column name -> column. Useful for handing off to something like a pandas DataFrame.
+
+        :return: dict
+        """
+        return dict(self._name_to_column)
+
+    def clear(self):
+        for column in self._columns:
+            del column[:]
+
+    def __len__(self):
+        return len(self._columns[0])
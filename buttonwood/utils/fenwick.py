@@ -0,0 +1,176 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+class FenwickTree(object):
+    """
+    A Fenwick tree (binary indexed tree) of ints that can grow at the end. Gives O(log n) point updates and prefix
+     sums, which is what is needed to answer "how much is ahead of position i" for a queue that is mostly appended to.
+
+    The current value of every position is also kept so that a position can be set to a new value, rather than only
+     added to.
+
+    :param values: iterable of int. Optional. The initial values, built in O(n).
+    """
+
+    def __init__(self, values=None):
+        self._values = [] if values is None else list(values)
+        n = len(self._values)
+        # tree is 1 indexed, with tree[0] unused
+        self._tree = [0] + self._values
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                self._tree[parent] += self._tree[i]
+        self._total = sum(self._values)
+
+    def append(self, value):
+        """
+        Adds a new position at the end with the value. O(log n).
+
+        :param value: int
+        :return: int. the index of the new position
+        """
+        index = len(self._values)
+        self._values.append(value)
+        i = index + 1
+        # the new node covers (i - lowbit(i), i], so it is the value plus the nodes that make up the rest of that range
+        node = value
+        j = i - 1
+        stop = i - (i & -i)
+        while j > stop:
+            node += self._tree[j]
+            j -= j & -j
+        self._tree.append(node)
+        self._total += value
+        return index
+
+    def add(self, index, delta):
+        """
+        Adds delta to the value at index. O(log n).
+
+        :param index: int
+        :param delta: int
+        """
+        self._values[index] += delta
+        self._total += delta
+        i = index + 1
+        n = len(self._tree)
+        while i < n:
+            self._tree[i] += delta
+            i += i & -i
+
+    def set(self, index, value):
+        """
+        Sets the value at index. O(log n).
+
+        :param index: int
+        :param value: int
+        """
+        delta = value - self._values[index]
+        if delta != 0:
+            self.add(index, delta)
+
+    def value(self, index):
+        return self._values[index]
+
+    def prefix_sum(self, end):
+        """
+        The sum of the values of positions [0, end). O(log n).
+
+        :param end: int
+        :return: int
+        """
+        total = 0
+        i = end
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def total(self):
+        return self._total
+
+    def __len__(self):
+        return len(self._values)
+
+
+class PrefixMaxFenwickTree(object):
+    """
+    A sparse Fenwick tree that answers "what is the max value at any index <= i" in O(log size).
+
+    Values at an index can only go up, which is the case when the values are times that are recorded in order. Nodes
+     are kept in a dict, so the index range can be huge (ex: every tick of a price ladder) while only the indexes that
+     have been updated take up memory.
+
+    :param size: int. indexes go from 1 to size
+    """
+
+    def __init__(self, size):
+        assert isinstance(size, int) and size > 0
+        self._size = size
+        self._tree = {}
+
+    def size(self):
+        return self._size
+
+    def update(self, index, value):
+        """
+        Sets the value at index to value if value is greater than what is there.
+
+        :param index: int. 1 to size
+        :param value: comparable
+        """
+        if index < 1 or index > self._size:
+            raise Exception("Index %d is outside of 1 to %d" % (index, self._size))
+        tree = self._tree
+        size = self._size
+        i = index
+        while i <= size:
+            current = tree.get(i)
+            if current is None or current < value:
+                tree[i] = value
+            i += i & -i
+
+    def prefix_max(self, index):
+        """
+        The max value at any index from 1 to index (inclusive). None if none of those indexes have a value.
+
+        :param index: int
+        :return: comparable. Can be None
+        """
+        tree = self._tree
+        result = None
+        i = min(index, self._size)
+        while i > 0:
+            value = tree.get(i)
+            if value is not None and (result is None or value > result):
+                result = value
+            i -= i & -i
+        return result
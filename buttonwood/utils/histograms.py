@@ -0,0 +1,149 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from collections import defaultdict
+
+
+class LogHistogram(object):
+    """
+    A log bucketed histogram of non-negative ints (such as nanoseconds), in the style of an HDR histogram: values
+     below 2^precision_bits each get their own bucket and above that each power of 2 is split into 2^precision_bits
+     buckets, so a bucket's width is never more than 1 / 2^precision_bits of its values. With the default of 5 bits
+     that is about 3%.
+
+    Recording is O(1) and memory is one dict entry per bucket that has been used. Percentiles are reported as the
+     upper end of the bucket they fall in, so they never understate.
+
+    :param precision_bits: int. Defaults to 5.
+    """
+
+    def __init__(self, precision_bits=5):
+        assert isinstance(precision_bits, int) and 0 < precision_bits < 16
+        self._precision_bits = precision_bits
+        self._counts = defaultdict(int)
+        self._count = 0
+        self._total = 0
+        self._min = None
+        self._max = None
+
+    def _bucket(self, value):
+        shift = value.bit_length() - self._precision_bits
+        if shift <= 0:
+            return 0, value
+        return shift, value >> shift
+
+    @staticmethod
+    def _bucket_upper(bucket):
+        shift, mantissa = bucket
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value, count=1):
+        """
+        :param value: int. Can't be negative.
+        :param count: int. how many times value happened. Defaults to 1.
+        """
+        if value < 0:
+            raise Exception("LogHistogram can't record negative value %s" % str(value))
+        self._counts[self._bucket(value)] += count
+        self._count += count
+        self._total += value * count
+        if self._min is None or value < self._min:
+            self._min = value
+        if self._max is None or value > self._max:
+            self._max = value
+
+    def count(self):
+        return self._count
+
+    def total(self):
+        return self._total
+
+    def min(self):
+        return self._min
+
+    def max(self):
+        return self._max
+
+    def mean(self):
+        """
+        :return: float. None if nothing has been recorded
+        """
+        return None if self._count == 0 else self._total / float(self._count)
+
+    def percentile(self, percent):
+        """
+        The value at or below which percent of the recorded values fall, to the precision of the buckets.
+
+        :param percent: float. 0 to 100
+        :return: int. None if nothing has been recorded
+        """
+        assert 0 <= percent <= 100
+        if self._count == 0:
+            return None
+        target = max(1, percent / 100.0 * self._count)
+        seen = 0
+        for bucket in sorted(self._counts):
+            seen += self._counts[bucket]
+            if seen >= target:
+                return min(self._bucket_upper(bucket), self._max)
+        return self._max
+
+    def merge(self, other):
+        """
+        Adds in what another LogHistogram, with the same precision, has recorded.
+
+        :param other: LogHistogram
+        """
+        assert isinstance(other, LogHistogram)
+        assert other._precision_bits == self._precision_bits
+        for bucket, count in other._counts.items():
+            self._counts[bucket] += count
+        self._count += other._count
+        self._total += other._total
+        if other._min is not None and (self._min is None or other._min < self._min):
+            self._min = other._min
+        if other._max is not None and (self._max is None or other._max > self._max):
+            self._max = other._max
+
+    def reset(self):
+        self._counts = defaultdict(int)
+        self._count = 0
+        self._total = 0
+        self._min = None
+        self._max = None
+
+    def summary(self, percents=(50, 90, 99, 99.9)):
+        """
+        :param percents: iterable of the percentiles to include
+        :return: dict with count, min, max, mean and a "p<percent>" entry per percentile, e.g. "p99.9"
+        """
+        summary = {"count": self._count, "min": self._min, "max": self._max, "mean": self.mean()}
+        for percent in percents:
+            summary["p%s" % ("%g" % percent)] = self.percentile(percent)
+        return summary
@@ -0,0 +1,414 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import pickle
+import struct
+import tempfile
+from array import array
+from collections import OrderedDict
+from collections import deque
+
+
+class ResultStore(object):
+    """
+    Where a metrics listener keeps its per event (or per order chain) results, keyed by event id or a tuple that
+     includes it. Listeners default to the DictResultStore, which keeps everything until it is removed, but can be
+     handed one of the other stores to keep a long replay within a fixed memory budget.
+
+    Every put comes with the timestamp of the event that produced the result, which stores that evict by time use.
+    """
+
+    def put(self, key, value, timestamp):
+        raise NotImplementedError()
+
+    def get(self, key, default=None):
+        raise NotImplementedError()
+
+    def remove(self, key):
+        """
+        Removes the result for the key. Does nothing if the key is not in the store.
+        """
+        raise NotImplementedError()
+
+    def __contains__(self, key):
+        raise NotImplementedError()
+
+    def __len__(self):
+        raise NotImplementedError()
+
+
+class DictResultStore(ResultStore):
+    """
+    Keeps every result in memory until it is removed.
+    """
+
+    def __init__(self):
+        self._results = {}
+
+    def put(self, key, value, timestamp):
+        self._results[key] = value
+
+    def get(self, key, default=None):
+        return self._results.get(key, default)
+
+    def remove(self, key):
+        self._results.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._results
+
+    def __len__(self):
+        return len(self._results)
+
+
+class LRUResultStore(ResultStore):
+    """
+    Keeps at most max_size results in memory. When full, the least recently put or gotten result is evicted.
+
+    :param max_size: int
+    """
+
+    def __init__(self, max_size):
+        assert isinstance(max_size, int) and max_size > 0
+        self._max_size = max_size
+        self._results = OrderedDict()
+
+    def max_size(self):
+        return self._max_size
+
+    def put(self, key, value, timestamp):
+        results = self._results
+        if key in results:
+            results.move_to_end(key)
+        results[key] = value
+        if len(results) > self._max_size:
+            results.popitem(last=False)
+
+    def get(self, key, default=None):
+        results = self._results
+        if key not in results:
+            return default
+        results.move_to_end(key)
+        return results[key]
+
+    def remove(self, key):
+        self._results.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._results
+
+    def __len__(self):
+        return len(self._results)
+
+
+class TimeWindowResultStore(ResultStore):
+    """
+    Keeps the results put within window seconds of the most recent put's timestamp. Older results are evicted as
+     newer ones come in.
+
+    Assumes timestamps are put in non-decreasing order, which they are when replaying events in order.
+
+    :param window: float. seconds
+    """
+
+    def __init__(self, window):
+        assert window > 0
+        self._window = window
+        self._results = {}
+        self._puts = deque()  # (timestamp, key) in the order they were put
+
+    def window(self):
+        return self._window
+
+    def put(self, key, value, timestamp):
+        self._results[key] = (timestamp, value)
+        self._puts.append((timestamp, key))
+        cutoff = timestamp - self._window
+        puts = self._puts
+        results = self._results
+        while puts and puts[0][0] < cutoff:
+            put_timestamp, put_key = puts.popleft()
+            result = results.get(put_key)
+            # the key might have been removed or put again more recently, in which case it stays
+            if result is not None and result[0] == put_timestamp:
+                del results[put_key]
+
+    def get(self, key, default=None):
+        result = self._results.get(key)
+        return default if result is None else result[1]
+
+    def remove(self, key):
+        self._results.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._results
+
+    def __len__(self):
+        return len(self._results)
+
+
+class ResultCodec(object):
+    """
+    How a result value gets broken up into a fixed set of columns, so it can be written to disk, and put back
+     together again.
+
+    :param typecodes: str. one array typecode per column (ex: "qdq")
+    :param to_row: function taking a value and returning a tuple with one entry per column
+    :param from_row: function taking that tuple and returning the value
+    """
+
+    def __init__(self, typecodes, to_row, from_row):
+        self._typecodes = typecodes
+        self._to_row = to_row
+        self._from_row = from_row
+
+    def typecodes(self):
+        return self._typecodes
+
+    def to_row(self, value):
+        return self._to_row(value)
+
+    def from_row(self, row):
+        return self._from_row(row)
+
+
+class SpillToDiskResultStore(ResultStore):
+    """
+    Keeps results in memory until there are block_size of them, then writes them out to a file as a block of
+     columns (one packed array per column of the codec) along with their keys, each pickled on its own so one key can
+     be read back without unpickling the rest of the block.
+
+    Only a compact index of the results written out is kept in memory: an open addressing hash table of two int64
+     arrays, the key's hash and its block and row. That is 16 bytes a slot, and the table is rebuilt at most half full
+     once it is 2/3 full, so 24 to 64 bytes a key however big the keys are. Keys whose hashes match are checked against the keys read back
+     from the block, so hashes that collide are still told apart.
+
+    Getting a result that has been written out reads its block back in. The cached_blocks most recently read blocks
+     are kept, since results tend to be looked up close to each other.
+
+    None values are supported without the codec needing to handle them. Keys need to be picklable.
+
+    :param codec: ResultCodec
+    :param block_size: int. Optional. Number of results per block written to disk.
+    :param path: str. Optional. File to write to. If None a temporary file is used, which is deleted on close().
+    :param cached_blocks: int. Optional. Number of blocks read back in to keep in memory.
+    """
+
+    _BLOCK_HEADER = struct.Struct("<q")
+    _EMPTY = -1  # index slot never used
+    _REMOVED = -2  # index slot of a key since removed or put again
+    _MIN_INDEX_SLOTS = 1024
+
+    def __init__(self, codec, block_size=65536, path=None, cached_blocks=8):
+        assert isinstance(codec, ResultCodec)
+        assert isinstance(block_size, int) and block_size > 0
+        assert block_size < 2 ** 32
+        assert isinstance(cached_blocks, int) and cached_blocks > 0
+        self._codec = codec
+        self._block_size = block_size
+        if path is None:
+            self._file = tempfile.TemporaryFile()
+        else:
+            self._file = open(path, "w+b")
+        self._pending = {}  # key -> value, in the order put, not written out yet
+        self._block_offsets = array("q")  # file offset of each block written out
+        self._index_hashes = array("q", [0]) * self._MIN_INDEX_SLOTS
+        self._index_locations = array("q", [self._EMPTY]) * self._MIN_INDEX_SLOTS  # block << 32 | row
+        self._index_used = 0  # slots that aren't empty, removed ones included
+        self._num_written = 0  # keys written out that haven't been removed or put again since
+        self._cached_blocks = cached_blocks
+        self._block_cache = OrderedDict()  # block offset -> (is_none, columns, key offsets, key bytes), oldest first
+
+    def _index_slots(self, key_hash):
+        # the slots to probe for the hash, in order, using the same recurrence as python's dict
+        mask = len(self._index_locations) - 1
+        perturb = key_hash & 0xFFFFFFFFFFFFFFFF
+        slot = perturb & mask
+        while True:
+            yield slot
+            perturb >>= 5
+            slot = (slot * 5 + perturb + 1) & mask
+
+    def _find_slot(self, key):
+        """
+        The index slot of the key if it has been written out and not removed or put again since, otherwise None.
+        """
+        if self._num_written == 0:
+            return None
+        key_hash = hash(key)
+        hashes = self._index_hashes
+        locations = self._index_locations
+        for slot in self._index_slots(key_hash):
+            location = locations[slot]
+            if location == self._EMPTY:
+                return None
+            if location != self._REMOVED and hashes[slot] == key_hash:
+                if self._read_key(location) == key:
+                    return slot
+
+    def _insert(self, key_hash, location):
+        hashes = self._index_hashes
+        locations = self._index_locations
+        for slot in self._index_slots(key_hash):
+            if locations[slot] == self._EMPTY:
+                hashes[slot] = key_hash
+                locations[slot] = location
+                self._index_used += 1
+                return
+
+    def _grow_index(self, num_new):
+        # keeps the index under 2/3 full, rebuilding it at most half full and dropping the removed slots
+        if (self._index_used + num_new) * 3 < len(self._index_locations) * 2:
+            return
+        old_hashes = self._index_hashes
+        old_locations = self._index_locations
+        num_slots = self._MIN_INDEX_SLOTS
+        while (self._num_written + num_new) * 2 > num_slots:
+            num_slots *= 2
+        self._index_hashes = array("q", [0]) * num_slots
+        self._index_locations = array("q", [self._EMPTY]) * num_slots
+        self._index_used = 0
+        for key_hash, location in zip(old_hashes, old_locations):
+            if location >= 0:
+                self._insert(key_hash, location)
+
+    def _remove_written(self, key):
+        slot = self._find_slot(key)
+        if slot is not None:
+            self._index_locations[slot] = self._REMOVED
+            self._num_written -= 1
+
+    def put(self, key, value, timestamp):
+        if key not in self._pending:
+            self._remove_written(key)
+        self._pending[key] = value
+        if len(self._pending) >= self._block_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the results held in memory out to disk.
+        """
+        keys = list(self._pending.keys())
+        if len(keys) == 0:
+            return
+        typecodes = self._codec.typecodes()
+        is_none = array("b")
+        columns = [array(typecode) for typecode in typecodes]
+        empty_row = tuple(float("nan") if typecode in "fd" else 0 for typecode in typecodes)
+        for key in keys:
+            value = self._pending[key]
+            is_none.append(value is None)
+            row = empty_row if value is None else self._codec.to_row(value)
+            for column, field in zip(columns, row):
+                column.append(field)
+        self._file.seek(0, os.SEEK_END)
+        offset = self._file.tell()
+        self._file.write(self._BLOCK_HEADER.pack(len(keys)))
+        self._file.write(is_none.tobytes())
+        for column in columns:
+            self._file.write(column.tobytes())
+        key_offsets = array("q", [0])
+        key_bytes = []
+        for key in keys:
+            key_bytes.append(pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL))
+            key_offsets.append(key_offsets[-1] + len(key_bytes[-1]))
+        self._file.write(key_offsets.tobytes())
+        self._file.write(b"".join(key_bytes))
+        self._grow_index(len(keys))
+        block = len(self._block_offsets) << 32
+        self._block_offsets.append(offset)
+        for row, key in enumerate(keys):
+            self._insert(hash(key), block | row)
+        self._num_written += len(keys)
+        self._pending = {}
+
+    def _read_block(self, offset):
+        block = self._block_cache.get(offset)
+        if block is not None:
+            self._block_cache.move_to_end(offset)
+            return block
+        self._file.seek(offset)
+        num_rows = self._BLOCK_HEADER.unpack(self._file.read(self._BLOCK_HEADER.size))[0]
+        is_none = array("b")
+        is_none.frombytes(self._file.read(num_rows * is_none.itemsize))
+        columns = []
+        for typecode in self._codec.typecodes():
+            column = array(typecode)
+            column.frombytes(self._file.read(num_rows * column.itemsize))
+            columns.append(column)
+        key_offsets = array("q")
+        key_offsets.frombytes(self._file.read((num_rows + 1) * key_offsets.itemsize))
+        key_bytes = self._file.read(key_offsets[-1])
+        block = (is_none, columns, key_offsets, key_bytes)
+        self._block_cache[offset] = block
+        if len(self._block_cache) > self._cached_blocks:
+            self._block_cache.popitem(last=False)
+        return block
+
+    def _read_key(self, location):
+        row = location & 0xFFFFFFFF
+        key_offsets, key_bytes = self._read_block(self._block_offsets[location >> 32])[2:]
+        return pickle.loads(key_bytes[key_offsets[row]:key_offsets[row + 1]])
+
+    def get(self, key, default=None):
+        if key in self._pending:
+            return self._pending[key]
+        slot = self._find_slot(key)
+        if slot is None:
+            return default
+        location = self._index_locations[slot]
+        row = location & 0xFFFFFFFF
+        is_none, columns = self._read_block(self._block_offsets[location >> 32])[:2]
+        if is_none[row]:
+            return None
+        return self._codec.from_row(tuple(column[row] for column in columns))
+
+    def remove(self, key):
+        # anything already written out stays in the file, it just can't be gotten any more
+        self._pending.pop(key, None)
+        self._remove_written(key)
+
+    def index_nbytes(self):
+        """
+        :return: int. bytes of memory used by the index of the results written out
+        """
+        return (self._index_hashes.itemsize * len(self._index_hashes) +
+                self._index_locations.itemsize * len(self._index_locations) +
+                self._block_offsets.itemsize * len(self._block_offsets))
+
+    def close(self):
+        self._file.close()
+
+    def __contains__(self, key):
+        return key in self._pending or self._find_slot(key) is not None
+
+    def __len__(self):
+        return len(self._pending) + self._num_written
@@ -0,0 +1,291 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+Structured tracing for the event handler, order books and order chains.
+
+Anything traceable takes an optional tracer when it is constructed and binds either the tracer's trace method or
+ no_trace to self._trace right there, so when tracing is off each trace point is one call to a function that does
+ nothing, with no string formatting. Trace points pass the raw values and it is up to the tracer to decide what to do
+ with them: keep them in a ring buffer, write them to a binary file or format them for a logger.
+
+Every trace is (source, action, event_id, chain_id, price, qty), where source is the name of what traced it (the order
+ book's name, for example), action is one of the constants below and any of the other values can be None.
+"""
+
+from collections import namedtuple
+import logging
+import struct
+
+# event handler
+PROCESS = 1
+APPLY_TO_BOOK = 2
+# order chains
+NEW_CHAIN = 10
+NEW_SUBCHAIN = 11
+ADD_TO_SUBCHAIN = 12
+# order books
+ACK_NEW_ORDER = 20
+ACK_PRICE_CHANGE = 21
+ACK_QTY_INCREASE = 22
+ACK_QTY_DECREASE = 23
+ACK_QTY_TO_ZERO = 24
+PASSIVE_PARTIAL_FILL = 25
+VISIBLE_QTY_REFRESH = 26
+REMOVE_NO_VISIBLE_QTY = 27
+PASSIVE_FULL_FILL = 28
+CANCEL_CONFIRM = 29
+# price levels
+ADD_TO_LEVEL = 40
+REMOVE_FROM_LEVEL = 41
+
+ACTION_STRINGS = {PROCESS: "Process",
+                  APPLY_TO_BOOK: "Apply To Order Book",
+                  NEW_CHAIN: "New Order Chain",
+                  NEW_SUBCHAIN: "New SubChain",
+                  ADD_TO_SUBCHAIN: "Add To SubChain",
+                  ACK_NEW_ORDER: "Ack New Order",
+                  ACK_PRICE_CHANGE: "Cancel Replace Ack Price Change",
+                  ACK_QTY_INCREASE: "Cancel Replace Ack Qty Increase",
+                  ACK_QTY_DECREASE: "Cancel Replace Ack Qty Decrease",
+                  ACK_QTY_TO_ZERO: "Cancel Replace Ack Qty To Zero",
+                  PASSIVE_PARTIAL_FILL: "Passive Partial Fill",
+                  VISIBLE_QTY_REFRESH: "Visible Qty Refresh",
+                  REMOVE_NO_VISIBLE_QTY: "Remove No Visible Qty",
+                  PASSIVE_FULL_FILL: "Passive Full Fill",
+                  CANCEL_CONFIRM: "Cancel Confirm",
+                  ADD_TO_LEVEL: "Add To Level",
+                  REMOVE_FROM_LEVEL: "Remove From Level",
+                  }
+
+TraceRecord = namedtuple("TraceRecord", ["source", "action", "event_id", "chain_id", "price", "qty"])
+
+
+def action_str(action):
+    assert isinstance(action, int)
+    if action not in ACTION_STRINGS:
+        raise Exception("%d is an unknown trace action" % action)
+    return ACTION_STRINGS[action]
+
+
+def no_trace(source, action, event_id, chain_id, price, qty):
+    """
+    What gets bound as the trace hook when tracing is off.
+    """
+    pass
+
+
+def trace_hook(tracer):
+    """
+    The trace hook to bind at construction for the tracer, which can be None for no tracing.
+
+    :param tracer: Tracer. Can be None.
+    :return: callable taking (source, action, event_id, chain_id, price, qty)
+    """
+    assert tracer is None or isinstance(tracer, Tracer)
+    return no_trace if tracer is None else tracer.trace
+
+
+class Tracer(object):
+
+    def trace(self, source, action, event_id, chain_id, price, qty):
+        raise NotImplementedError("trace to be implemented by inheriting class.")
+
+
+class RingBufferTracer(Tracer):
+    """
+    Keeps the most recent capacity trace records in memory.
+
+    :param capacity: int
+    """
+
+    def __init__(self, capacity):
+        assert isinstance(capacity, int) and capacity > 0
+        self._capacity = capacity
+        self._records = [None] * capacity
+        self._count = 0
+
+    def trace(self, source, action, event_id, chain_id, price, qty):
+        self._records[self._count % self._capacity] = (source, action, event_id, chain_id, price, qty)
+        self._count += 1
+
+    def capacity(self):
+        return self._capacity
+
+    def count(self):
+        """
+        :return: int. the number of records traced, including the ones no longer held
+        """
+        return self._count
+
+    def records(self):
+        """
+        The records still held, oldest first.
+
+        :return: list of TraceRecord
+        """
+        if self._count <= self._capacity:
+            held = self._records[:self._count]
+        else:
+            start = self._count % self._capacity
+            held = self._records[start:] + self._records[:start]
+        return [TraceRecord(*record) for record in held]
+
+    def clear(self):
+        self._records = [None] * self._capacity
+        self._count = 0
+
+
+# binary trace file layout, all little endian:
+#  a string definition: kind (B) = 0, string id (I), length (I) then the utf-8 bytes
+#  a trace record: kind (B) = 1, action (B), flags (B), source string id (I), event id (q), chain id (q),
+#   price (d), qty (q)
+# sources, and event and chain ids that aren't ints, are written once as string definitions and referenced by id
+_STRING = 0
+_RECORD = 1
+_STRING_HEADER = struct.Struct("<BII")
+_RECORD_STRUCT = struct.Struct("<BBBIqqdq")
+_EVENT_ID_IS_STRING = 1
+_CHAIN_ID_IS_STRING = 2
+_NO_EVENT_ID = 4
+_NO_CHAIN_ID = 8
+_NO_PRICE = 16
+_NO_QTY = 32
+
+
+class BinaryFileTracer(Tracer):
+    """
+    Writes trace records to a file in a fixed size binary format, which read_binary_trace reads back. Prices are
+     written as floats.
+
+    :param file_obj: a file opened for binary writing
+    """
+
+    def __init__(self, file_obj):
+        self._file = file_obj
+        self._write = file_obj.write
+        self._string_ids = {}
+
+    def _string_id(self, value):
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = len(self._string_ids)
+            self._string_ids[value] = string_id
+            encoded = str(value).encode("utf-8")
+            self._write(_STRING_HEADER.pack(_STRING, string_id, len(encoded)))
+            self._write(encoded)
+        return string_id
+
+    def _id(self, value, is_string_flag, none_flag):
+        if value is None:
+            return 0, none_flag
+        if isinstance(value, int):
+            return value, 0
+        return self._string_id(value), is_string_flag
+
+    def trace(self, source, action, event_id, chain_id, price, qty):
+        event_id, event_flag = self._id(event_id, _EVENT_ID_IS_STRING, _NO_EVENT_ID)
+        chain_id, chain_flag = self._id(chain_id, _CHAIN_ID_IS_STRING, _NO_CHAIN_ID)
+        flags = event_flag | chain_flag
+        if price is None:
+            flags |= _NO_PRICE
+            price = 0.0
+        if qty is None:
+            flags |= _NO_QTY
+            qty = 0
+        self._write(_RECORD_STRUCT.pack(_RECORD, action, flags, self._string_id(source), event_id, chain_id,
+                                        float(price), qty))
+
+    def flush(self):
+        self._file.flush()
+
+
+def read_binary_trace(file_obj):
+    """
+    Reads back what a BinaryFileTracer wrote. Event and chain ids that weren't ints come back as strings and prices
+     come back as floats.
+
+    :param file_obj: a file opened for binary reading
+    :return: generator of TraceRecord
+    """
+    strings = {}
+    while True:
+        kind = file_obj.read(1)
+        if not kind:
+            return
+        if kind[0] == _STRING:
+            _, string_id, length = _STRING_HEADER.unpack(kind + file_obj.read(_STRING_HEADER.size - 1))
+            strings[string_id] = file_obj.read(length).decode("utf-8")
+        elif kind[0] == _RECORD:
+            _, action, flags, source_id, event_id, chain_id, price, qty = \
+                _RECORD_STRUCT.unpack(kind + file_obj.read(_RECORD_STRUCT.size - 1))
+            if flags & _NO_EVENT_ID:
+                event_id = None
+            elif flags & _EVENT_ID_IS_STRING:
+                event_id = strings[event_id]
+            if flags & _NO_CHAIN_ID:
+                chain_id = None
+            elif flags & _CHAIN_ID_IS_STRING:
+                chain_id = strings[chain_id]
+            yield TraceRecord(strings[source_id], action, event_id, chain_id,
+                              None if flags & _NO_PRICE else price, None if flags & _NO_QTY else qty)
+        else:
+            raise Exception("Unknown trace record kind %d" % kind[0])
+
+
+class LoggingTracer(Tracer):
+    """
+    Formats each trace and logs it at DEBUG. This is what an OrderEventHandler or OrderLevelBook uses when no tracer
+     is given and its logger is enabled for DEBUG when it is constructed, so debug logging works as it always has,
+     but the formatting only happens when DEBUG was on to begin with.
+
+    :param logger: logging.Logger
+    """
+
+    def __init__(self, logger):
+        self._logger = logger
+
+    def trace(self, source, action, event_id, chain_id, price, qty):
+        self._logger.debug("%s: %s. Chain %s Event %s. %s @ %s" %
+                           (source, ACTION_STRINGS.get(action, action), str(chain_id), str(event_id), str(qty),
+                            str(price)))
+
+
+def default_trace_hook(tracer, logger):
+    """
+    The trace hook for the tracer or, if there isn't one, a LoggingTracer when the logger is enabled for DEBUG and
+     no_trace otherwise.
+
+    :param tracer: Tracer. Can be None.
+    :param logger: logging.Logger
+    :return: callable taking (source, action, event_id, chain_id, price, qty)
+    """
+    if tracer is None and logger.isEnabledFor(logging.DEBUG):
+        tracer = LoggingTracer(logger)
+    return trace_hook(tracer)
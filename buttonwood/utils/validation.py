@@ -0,0 +1,89 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+Trusted input mode.
+
+Events, price levels, quotes, match series and price factories check the types and values of what they are given
+ every time one is created (or a fill is added, or a price is made). That is what you want for hand built objects
+ and data of unknown quality, but for a replay of data that has already been checked -- for example with
+ MarketObjects.Events.EventValidation.validate_event_stream -- it is a noticeable part of the time spent.
+
+While validation is turned off those per object checks are skipped:
+
+    with trusted_input():
+        for event in events:
+            handler.process(event)
+
+Validation is global and on by default. It only skips the checks of arguments; nothing else about how the objects
+ behave changes. Python's -O flag strips the same checks, since they are asserts, for the whole process.
+"""
+
+from contextlib import contextmanager
+
+
+class _Validation(object):
+    __slots__ = ("enabled",)
+
+    def __init__(self):
+        self.enabled = True
+
+
+# checked by the constructors as VALIDATION.enabled; use the functions below to change it
+VALIDATION = _Validation()
+
+
+def validation_enabled():
+    """
+    :return: bool. True unless in trusted input mode.
+    """
+    return VALIDATION.enabled
+
+
+def set_validation_enabled(enabled):
+    """
+    Turns per object validation on or off for everything created from here on.
+
+    :param enabled: bool
+    """
+    assert isinstance(enabled, bool)
+    VALIDATION.enabled = enabled
+
+
+@contextmanager
+def trusted_input():
+    """
+    Turns per object validation off for the with block, then back to what it was.
+    """
+    previous = VALIDATION.enabled
+    VALIDATION.enabled = False
+    try:
+        yield
+    finally:
+        VALIDATION.enabled = previous
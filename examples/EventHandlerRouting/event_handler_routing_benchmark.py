@@ -0,0 +1,189 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import logging
+import sys
+import time
+from buttonwood.MarketObjects.CancelReasons import USER_CANCEL
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReport
+from buttonwood.MarketObjects.Events.OrderEvents import FullFillReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Events.OrderEvents import PartialFillReport
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.MarketObjects.Side import BID_SIDE
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.INFO)
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+
+
+class PerBookDispatchHandler(OrderEventHandler):
+    """
+    Applies events to order books the way OrderEventHandler used to: iterating a set of the market's books and
+     checking the event type again for each of them. Only here to compare against.
+    """
+
+    def __init__(self, logger):
+        OrderEventHandler.__init__(self, logger)
+        self._market_to_book_set = {}
+
+    def register_orderbook(self, market, order_book_id, order_book):
+        OrderEventHandler.register_orderbook(self, market, order_book_id, order_book)
+        self._market_to_book_set.setdefault(market, set()).add(order_book)
+
+    def _apply_to_orderbooks(self, event, order_chain):
+        markets_updated = set()
+        if order_chain is not None:
+            market = event.market()
+            if market in self._market_to_book_set:
+                for order_book in self._market_to_book_set[market]:
+                    order_book_updated = False
+                    if isinstance(event, AcknowledgementReport):
+                        order_book_updated, tob_updated = order_book.handle_acknowledgement_report(event, order_chain)
+                    elif isinstance(event, CancelReport):
+                        order_book_updated, tob_updated = order_book.handle_cancel_report(event, order_chain)
+                    elif isinstance(event, PartialFillReport):
+                        order_book_updated, tob_updated = order_book.handle_partial_fill_report(event, order_chain)
+                    elif isinstance(event, FullFillReport):
+                        order_book_updated, tob_updated = order_book.handle_full_fill_report(event, order_chain)
+                    if order_book_updated:
+                        markets_updated.add(market)
+        return markets_updated
+
+
+class NullBook(OrderLevelBook):
+    """
+    An order book that ignores everything applied to it, so timing it is timing the handler's routing alone.
+    """
+
+    def handle_acknowledgement_report(self, acknowledgement_report, order_chain):
+        return False, False
+
+    def handle_cancel_report(self, cancel_report, order_chain):
+        return False, False
+
+    def handle_partial_fill_report(self, partial_fill_report, order_chain):
+        return False, False
+
+    def handle_full_fill_report(self, full_fill_report, order_chain):
+        return False, False
+
+
+def build_events(num_orders):
+    """
+    For each order: the new order, its acknowledgement, the cancel and the cancel report. Prices spread over 20
+     levels a side so the books stay a realistic size.
+    """
+    events = []
+    event_id = 1
+    for i in range(num_orders):
+        side = BID_SIDE if i % 2 == 0 else ASK_SIDE
+        offset = 0.01 * (1 + i % 20)
+        price = MARKET.get_price("%.2f" % (34.50 - offset if side.is_bid() else 34.50 + offset))
+        chain_id = i + 1
+        new_order = NewOrderCommand(event_id, 1.0, chain_id, "user", MARKET, side, FAR, price, 10)
+        ack = AcknowledgementReport(event_id + 1, 1.0, chain_id, "user", MARKET, new_order, price, 10, None)
+        cancel = CancelCommand(event_id + 2, 2.0, chain_id, "user", MARKET, USER_CANCEL)
+        cancel_report = CancelReport(event_id + 3, 2.0, chain_id, "user", MARKET, cancel, USER_CANCEL)
+        events.append((new_order, ack))
+        events.append((cancel, cancel_report))
+        event_id += 4
+    # orders rest for a while before they are cancelled: all the adds, then all the cancels
+    return [event for pair in events[0::2] + events[1::2] for event in pair]
+
+
+def build_handler(handler_class, book_class, books_per_market):
+    handler = handler_class(logger)
+    for i in range(books_per_market):
+        name = "book %d" % i
+        handler.register_orderbook(MARKET, name, book_class(MARKET, logger, name=name))
+    return handler
+
+
+def time_process(handler_class, books_per_market, events):
+    """
+    Seconds per event for all of process() with real order books.
+    """
+    handler = build_handler(handler_class, OrderLevelBook, books_per_market)
+    start = time.perf_counter()
+    for event in events:
+        handler.process(event)
+    return (time.perf_counter() - start) / len(events)
+
+
+def time_routing(handler_class, books_per_market, events, repeats=5):
+    """
+    Seconds per execution report for applying it to books that do nothing: the routing overhead alone. The best of
+     repeats runs.
+    """
+    handler = build_handler(handler_class, NullBook, books_per_market)
+    reports = []
+    for event in events:
+        handler.process(event)
+        if isinstance(event, (AcknowledgementReport, CancelReport)):
+            reports.append((event, handler.order_chain(event.chain_id())))
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for report, order_chain in reports:
+            handler._apply_to_orderbooks(report, order_chain)
+        elapsed = (time.perf_counter() - start) / len(reports)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    num_orders = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    events = build_events(num_orders)
+    logger.info("routing only, us per execution report:")
+    logger.info("%-6s %12s %12s %12s" % ("books", "compiled", "per book", "saved"))
+    for books_per_market in [1, 4, 16, 64]:
+        compiled = time_routing(OrderEventHandler, books_per_market, events)
+        per_book = time_routing(PerBookDispatchHandler, books_per_market, events)
+        logger.info("%-6d %12.3f %12.3f %12.3f" % (books_per_market, compiled * 1e6, per_book * 1e6,
+                                                   (per_book - compiled) * 1e6))
+
+    logger.info("\nprocess() with order level books, us per event:")
+    logger.info("%-6s %12s %12s" % ("books", "compiled", "per book"))
+    for books_per_market in [1, 4, 16]:
+        logger.info("%-6d %12.2f %12.2f" % (books_per_market,
+                                            time_process(OrderEventHandler, books_per_market, events) * 1e6,
+                                            time_process(PerBookDispatchHandler, books_per_market, events) * 1e6))
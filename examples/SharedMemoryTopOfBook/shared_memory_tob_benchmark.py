@@ -0,0 +1,168 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+import logging
+import multiprocessing
+import sys
+import time
+from buttonwood.MarketMetrics.OrderLevelBookListeners.SharedMemoryTopOfBookListener import SharedMemoryTopOfBookListener
+from buttonwood.MarketMetrics.OrderLevelBookListeners.SharedMemoryTopOfBookListener import SharedMemoryTopOfBookReader
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.MarketObjects.Side import BID_SIDE
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler())
+logger.setLevel(logging.INFO)
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+
+
+def build_book(base_price, num_levels, orders_per_level=3):
+    """
+    An order book with num_levels prices on each side, bids below base_price and asks above it.
+    """
+    handler = OrderEventHandler(logger)
+    book = OrderLevelBook(MARKET, logger)
+    handler.register_orderbook(MARKET, "book", book)
+    event_id = 1
+    for level in range(num_levels):
+        for side, price in [(BID_SIDE, MARKET.get_price("%.2f" % (base_price - 0.01 * (level + 1)))),
+                            (ASK_SIDE, MARKET.get_price("%.2f" % (base_price + 0.01 * (level + 1))))]:
+            for _ in range(orders_per_level):
+                command = NewOrderCommand(event_id, 1.0, event_id, "user", MARKET, side, FAR, price, 10)
+                handler.process(command)
+                handler.process(AcknowledgementReport(event_id + 1, 1.0, event_id, "user", MARKET, command, price,
+                                                      10, 10))
+                event_id += 2
+    return book
+
+
+def time_publish(book, depth, iterations):
+    listener = SharedMemoryTopOfBookListener(logger, depth=depth)
+    try:
+        chain = book.best_priority_chain(BID_SIDE)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            listener.notify_book_update(book, chain, True)
+        return iterations / (time.perf_counter() - start)
+    finally:
+        listener.close()
+        listener.unlink()
+
+
+def time_read(book, depth, iterations):
+    listener = SharedMemoryTopOfBookListener(logger, depth=depth)
+    try:
+        listener.notify_book_update(book, book.best_priority_chain(BID_SIDE), True)
+        reader = SharedMemoryTopOfBookReader(listener.name())
+        market_name = str(MARKET)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            reader.snapshot(market_name)
+        rate = iterations / (time.perf_counter() - start)
+        reader.close()
+        return rate
+    finally:
+        listener.close()
+        listener.unlink()
+
+
+def read_while_publishing(name, seconds, results):
+    """
+    Runs in the reader process. The publisher alternates between two books whose prices don't overlap, so a snapshot
+     with prices from both of them would be a torn read.
+    """
+    reader = SharedMemoryTopOfBookReader(name)
+    market_name = str(MARKET)
+    reads = 0
+    torn = 0
+    last_update_count = 0
+    out_of_order = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        snapshot = reader.snapshot(market_name)
+        if snapshot is None:
+            continue
+        timestamp, update_count, bids, asks = snapshot
+        reads += 1
+        prices = [level[0] for level in bids + asks]
+        if len(set(price > 100.0 for price in prices)) > 1:
+            torn += 1
+        if update_count < last_update_count:
+            out_of_order += 1
+        last_update_count = update_count
+    results.put((reads, reader.retries(), torn, out_of_order))
+    reader.close()
+
+
+def concurrent(depth, seconds):
+    books = [build_book(34.50, depth), build_book(134.50, depth)]
+    chains = [book.best_priority_chain(BID_SIDE) for book in books]
+    listener = SharedMemoryTopOfBookListener(logger, depth=depth)
+    try:
+        listener.notify_book_update(books[0], chains[0], True)
+        results = multiprocessing.Queue()
+        reader = multiprocessing.Process(target=read_while_publishing, args=(listener.name(), seconds, results))
+        reader.start()
+        writes = 0
+        while reader.is_alive():
+            for _ in range(1000):
+                listener.notify_book_update(books[writes & 1], chains[writes & 1], True)
+                writes += 1
+        reads, retries, torn, out_of_order = results.get()
+        reader.join()
+        return writes, reads, retries, torn, out_of_order
+    finally:
+        listener.close()
+        listener.unlink()
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    logger.info("%-6s %16s %16s" % ("depth", "publishes/sec", "snapshots/sec"))
+    for depth in [1, 5, 10]:
+        book = build_book(34.50, 10)
+        logger.info("%-6d %16.0f %16.0f" % (depth, time_publish(book, depth, iterations),
+                                            time_read(book, depth, iterations)))
+
+    seconds = 2.0
+    writes, reads, retries, torn, out_of_order = concurrent(5, seconds)
+    logger.info("\nconcurrent writer and reader process, depth 5, %.1f seconds:" % seconds)
+    logger.info("  writes %d (%.0f/sec), reads %d (%.0f/sec), retried reads %d, torn reads %d, out of order reads %d" %
+                (writes, writes / seconds, reads, reads / seconds, retries, torn, out_of_order))
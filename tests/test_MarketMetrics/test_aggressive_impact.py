@@ -0,0 +1,95 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+from buttonwood.MarketMetrics.OrderLevelBookListeners.AggressiveImpactListener import AggressiveImpactListener
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAK
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import FullFillReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Events.OrderEvents import PartialFillReport
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects.Side import ASK_SIDE
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def _rest(handler, event_id, chain_id, user_id, side, price, qty):
+    command = NewOrderCommand(event_id, 1234000.0 + event_id, chain_id, user_id, MARKET, side, FAR, Price(price), qty)
+    handler.process(command)
+    handler.process(AcknowledgementReport(event_id + 1, 1234000.0 + event_id, chain_id, user_id, MARKET, command,
+                                          Price(price), qty, qty))
+    return command
+
+
+def test_aggressive_impact_sweep():
+    handler = OrderEventHandler(LOGGER)
+    ob = OrderLevelBook(MARKET, LOGGER)
+    handler.register_orderbook(MARKET, "book", ob)
+    listener = AggressiveImpactListener(LOGGER)
+    handler.register_event_listener("impact", listener)
+    ob.add_order_level_book_listener("impact", listener)
+
+    _rest(handler, 1, 1001, "user_a", ASK_SIDE, "34.52", 10)
+    _rest(handler, 3, 1002, "user_b", ASK_SIDE, "34.53", 20)
+    _rest(handler, 5, 1003, "user_c", ASK_SIDE, "34.55", 20)
+
+    # buy 20 sweeps all of 34.52 and half of 34.53
+    agg = NewOrderCommand(7, 1234010.0, 1004, "user_z", MARKET, BID_SIDE, FAK, Price("34.53"), 20)
+    handler.process(agg)
+    handler.process(PartialFillReport(8, 1234010.0, 1004, "user_z", MARKET, agg, 10, Price("34.52"), BID_SIDE, 1, 10))
+    handler.process(FullFillReport(9, 1234010.0, 1001, "user_a", MARKET, agg, 10, Price("34.52"), ASK_SIDE, 1))
+    handler.process(FullFillReport(10, 1234010.0, 1004, "user_z", MARKET, agg, 10, Price("34.53"), BID_SIDE, 1))
+    # aggressor is done but not balanced yet, so still open
+    assert listener.aggressive_act(MARKET, 7) is not None
+    assert len(listener.aggressive_impacts_table()) == 0
+    handler.process(PartialFillReport(11, 1234010.0, 1002, "user_b", MARKET, agg, 10, Price("34.53"), ASK_SIDE, 1,
+                                      10))
+    assert listener.aggressive_act(MARKET, 7) is None
+    assert listener.get_aggressive_impact(MARKET, 7) == 1.5
+    assert listener.get_aggressive_qty(MARKET, 7) == 20
+    table = listener.aggressive_impacts_table()
+    assert len(table) == 1
+    assert table.row(0) == (MARKET, 7, 1234010.0, 2, 1, 1, 20, 30, 1.5)
+
+    # a second aggression into what is left
+    agg2 = NewOrderCommand(12, 1234011.0, 1005, "user_y", MARKET, BID_SIDE, FAK, Price("34.53"), 5)
+    handler.process(agg2)
+    handler.process(FullFillReport(13, 1234011.0, 1005, "user_y", MARKET, agg2, 5, Price("34.53"), BID_SIDE, 2))
+    handler.process(PartialFillReport(14, 1234011.0, 1002, "user_b", MARKET, agg2, 5, Price("34.53"), ASK_SIDE, 2, 5))
+    assert list(listener.aggressive_impacts(MARKET, [7, 12, 99])) == [1.5, 0.5, 0.0]
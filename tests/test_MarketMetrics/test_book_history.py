@@ -0,0 +1,119 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+import math
+from buttonwood.MarketMetrics.OrderLevelBookListeners.BookHistoryListener import BookHistoryListener
+from buttonwood.MarketObjects.CancelReasons import USER_CANCEL
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAK
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReplaceCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReport
+from buttonwood.MarketObjects.Events.OrderEvents import FullFillReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Events.OrderEvents import PartialFillReport
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects.Side import ASK_SIDE
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def _rest(handler, event_id, timestamp, user_id, side, price, qty):
+    command = NewOrderCommand(event_id, timestamp, event_id, user_id, MARKET, side, FAR, Price(price), qty)
+    handler.process(command)
+    handler.process(AcknowledgementReport(event_id + 1, timestamp, event_id, user_id, MARKET, command, Price(price),
+                                          qty, qty))
+    return command
+
+
+def _levels(state, side):
+    return [(str(p), state.visible_qty_at_price(side, p), state.num_orders_at_price(side, p))
+            for p in state.prices(side)]
+
+
+def _run(snapshot_every):
+    handler = OrderEventHandler(LOGGER)
+    ob = OrderLevelBook(MARKET, LOGGER)
+    handler.register_orderbook(MARKET, "book", ob)
+    listener = BookHistoryListener(LOGGER, snapshot_every=snapshot_every)
+    ob.add_order_level_book_listener("history", listener)
+
+    _rest(handler, 1, 100.0, "user_a", BID_SIDE, "34.50", 10)
+    _rest(handler, 3, 101.0, "user_b", BID_SIDE, "34.50", 5)
+    _rest(handler, 5, 102.0, "user_c", ASK_SIDE, "34.53", 20)
+    # move user_a's bid up a tick
+    replace = CancelReplaceCommand(7, 103.0, 1, "user_a", MARKET, BID_SIDE, Price("34.51"), 10)
+    handler.process(replace)
+    handler.process(AcknowledgementReport(8, 103.0, 1, "user_a", MARKET, replace, Price("34.51"), 10, 10))
+    # buyer takes half the offer
+    agg = NewOrderCommand(9, 104.0, 9, "user_z", MARKET, BID_SIDE, FAK, Price("34.53"), 8)
+    handler.process(agg)
+    handler.process(FullFillReport(10, 104.0, 9, "user_z", MARKET, agg, 8, Price("34.53"), BID_SIDE, 1))
+    handler.process(PartialFillReport(11, 104.0, 5, "user_c", MARKET, agg, 8, Price("34.53"), ASK_SIDE, 1, 12))
+    # user_b cancels
+    cancel = CancelCommand(12, 105.0, 3, "user_b", MARKET, USER_CANCEL)
+    handler.process(cancel)
+    handler.process(CancelReport(13, 105.0, 3, "user_b", MARKET, cancel, USER_CANCEL))
+    return listener
+
+
+def test_book_at():
+    for snapshot_every in [1, 2, 1000]:
+        listener = _run(snapshot_every)
+        assert listener.book_at(MARKET, 99.0) is None
+        state = listener.book_at(MARKET, 101.5)
+        assert _levels(state, BID_SIDE) == [("34.50", 15, 2)]
+        assert _levels(state, ASK_SIDE) == []
+        state = listener.book_at(MARKET, 103.0)
+        assert _levels(state, BID_SIDE) == [("34.51", 10, 1), ("34.50", 5, 1)]
+        assert _levels(state, ASK_SIDE) == [("34.53", 20, 1)]
+        state = listener.book_at(MARKET, 104.5)
+        assert _levels(state, ASK_SIDE) == [("34.53", 12, 1)]
+        state = listener.book_at(MARKET, 1000.0)
+        assert _levels(state, BID_SIDE) == [("34.51", 10, 1)]
+        assert state.best_price(ASK_SIDE) == Price("34.53")
+
+
+def test_tob_at():
+    listener = _run(1000)
+    tob = listener.tob_at(MARKET, [50.0, 100.0, 102.5, 103.0, 104.0, 200.0])
+    assert list(tob.column("bid_qty")) == [0, 10, 15, 10, 10, 10]
+    assert math.isnan(tob.column("bid")[0])
+    assert list(tob.column("bid"))[1:] == [34.50, 34.50, 34.51, 34.51, 34.51]
+    assert list(tob.column("ask_qty")) == [0, 0, 20, 20, 12, 12]
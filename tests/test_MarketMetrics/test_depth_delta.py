@@ -0,0 +1,191 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import io
+import json
+import logging
+import random
+from buttonwood.MarketMetrics.OrderLevelBookListeners.DepthDeltaListener import DepthDeltaDecoder
+from buttonwood.MarketMetrics.OrderLevelBookListeners.DepthDeltaListener import DepthDeltaListener
+from buttonwood.MarketMetrics.OrderLevelBookListeners.DepthDeltaListener import read_depth_deltas
+from buttonwood.MarketObjects.CancelReasons import USER_CANCEL
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReplaceCommand
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.Simulation.MatchingEngine import MatchingEngine
+from buttonwood.utils.IDGenerators import MonotonicIntID
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def _random_events(seed, num_actions=1500):
+    rng = random.Random(seed)
+    ids = MonotonicIntID()
+    engine = MatchingEngine(MARKET, LOGGER, event_id_generator=ids)
+    events = []
+    resting = []
+    timestamp = 1000.0
+    for _ in range(num_actions):
+        timestamp += 1
+        action = rng.random()
+        if action < 0.6 or not resting:
+            event_id = ids.id()
+            command = NewOrderCommand(event_id, timestamp, event_id, "user_%d" % rng.randint(1, 5), MARKET,
+                                      rng.choice([BID_SIDE, ASK_SIDE]), FAR, Price("34.%02d" % rng.randint(40, 60)),
+                                      rng.randint(1, 20), iceberg_peak_qty=rng.choice([None, None, 3]))
+            resting.append(command)
+        else:
+            resting_command = resting.pop(rng.randrange(len(resting)))
+            if not engine.is_resting(resting_command.chain_id()):
+                continue
+            if action < 0.8:
+                command = CancelCommand(ids.id(), timestamp, resting_command.chain_id(), resting_command.user_id(),
+                                        MARKET, USER_CANCEL)
+            else:
+                side = resting_command.side()
+                # stay on the same side of the book as the order so replaces don't cross
+                price = "34.%02d" % (rng.randint(40, 49) if side.is_bid() else rng.randint(51, 60))
+                command = CancelReplaceCommand(ids.id(), timestamp, resting_command.chain_id(),
+                                               resting_command.user_id(), MARKET, side, Price(price),
+                                               rng.randint(1, 20))
+                resting.append(resting_command)
+        events.append(command)
+        events.extend(engine.process(command))
+    return events
+
+
+def _book_levels(book):
+    return dict(((side, price), (book.visible_qty_at_price(side, price), book.hidden_qty_at_price(side, price),
+                                 book.num_orders_at_price(side, price)))
+                for side in [BID_SIDE, ASK_SIDE] for price in book.prices(side))
+
+
+def _apply(levels, batch):
+    for side, price, visible_qty, hidden_qty, num_orders in batch.deltas():
+        if visible_qty == 0 and hidden_qty == 0:
+            del levels[(side, price)]
+        else:
+            levels[(side, price)] = (visible_qty, hidden_qty, num_orders)
+
+
+def test_deltas_rebuild_the_book():
+    handler = OrderEventHandler(LOGGER)
+    book = OrderLevelBook(MARKET, LOGGER, name="nsdq")
+    handler.register_orderbook(MARKET, "book", book)
+    out = io.BytesIO()
+    listener = DepthDeltaListener(LOGGER, out)
+    book.add_order_level_book_listener("deltas", listener)
+    decoder = DepthDeltaDecoder()
+    rng = random.Random(5)
+    levels = {}
+    snapshot_bytes = 0
+    read = 0
+    for event in _random_events(3):
+        handler.process(event)
+        data = out.getvalue()[read:]
+        read += len(data)
+        # feed the decoder in pieces, like reads off a socket
+        while data:
+            piece = rng.randint(1, 7)
+            for batch in decoder.decode(data[:piece]):
+                assert batch.book_name() == "nsdq"
+                assert batch.market_name() == str(MARKET)
+                assert batch.event_id() == event.event_id()
+                assert batch.timestamp() == event.timestamp()
+                assert len(batch.deltas()) > 0
+                _apply(levels, batch)
+            data = data[piece:]
+        assert levels == _book_levels(book)
+        # an L2 snapshot of the book, without even the order chains
+        snapshot_bytes += len(json.dumps([[str(side), str(price)] + list(level)
+                                          for (side, price), level in _book_levels(book).items()]))
+    assert decoder.pending_bytes() == 0
+    assert listener.num_bytes() == read
+    assert listener.num_batches() > 1000
+    # a few bytes per touched level versus the whole book every time
+    assert snapshot_bytes > 20 * listener.num_bytes()
+
+
+def test_cancel_replace_touches_both_prices_and_snapshot():
+    handler = OrderEventHandler(LOGGER)
+    book = OrderLevelBook(MARKET, LOGGER)
+    handler.register_orderbook(MARKET, "book", book)
+
+    bid = NewOrderCommand(1, 1.0, "a1", "user_a", MARKET, BID_SIDE, FAR, Price("34.50"), 10)
+    handler.process(bid)
+    handler.process(AcknowledgementReport(2, 1.0, "a1", "user_a", MARKET, bid, Price("34.50"), 10, 10))
+    # added after the book already has an order, so start with a snapshot
+    listener = DepthDeltaListener(LOGGER)
+    book.add_order_level_book_listener("deltas", listener)
+    listener.write_snapshot(book)
+
+    cr = CancelReplaceCommand("e3", 2.0, "a1", "user_a", MARKET, BID_SIDE, Price("34.48"), 5)
+    handler.process(cr)
+    handler.process(AcknowledgementReport("e4", 2.0, "a1", "user_a", MARKET, cr, Price("34.48"), 5, 5))
+    # a change at a price the listener has not seen, with nothing there before and after, isn't emitted
+    handler.process(NewOrderCommand(5, 3.0, "a2", "user_b", MARKET, ASK_SIDE, FAR, Price("34.60"), 10))
+
+    batches = DepthDeltaDecoder().decode(listener.encoded())
+    assert [batch.event_id() for batch in batches] == [None, "e4"]
+    assert batches[0].deltas() == [(BID_SIDE, Price("34.50"), 10, 0, 1)]
+    assert batches[0].timestamp() == 1.0
+    assert sorted(batches[1].deltas(), key=lambda delta: delta[1]) == [(BID_SIDE, Price("34.48"), 5, 0, 1),
+                                                                      (BID_SIDE, Price("34.50"), 0, 0, 0)]
+    assert listener.num_deltas() == 3
+
+
+def test_read_depth_deltas_file(tmp_path):
+    handler = OrderEventHandler(LOGGER)
+    book = OrderLevelBook(MARKET, LOGGER)
+    handler.register_orderbook(MARKET, "book", book)
+    path = str(tmp_path / "deltas.bin")
+    with open(path, "wb") as f:
+        listener = DepthDeltaListener(LOGGER, f)
+        book.add_order_level_book_listener("deltas", listener)
+        for event in _random_events(9, 300):
+            handler.process(event)
+    levels = {}
+    count = 0
+    for batch in read_depth_deltas(path, chunk_size=10):
+        _apply(levels, batch)
+        count += 1
+    assert count == listener.num_batches()
+    assert levels == _book_levels(book)
@@ -0,0 +1,103 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+from buttonwood.MarketMetrics.OrderLevelBookListeners.LastTimeTOBListener import LastTimeTOBListener
+from buttonwood.MarketObjects.CancelReasons import USER_CANCEL
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.utils.fenwick import PrefixMaxFenwickTree
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def test_prefix_max_fenwick_tree():
+    tree = PrefixMaxFenwickTree(2 ** 20)
+    assert tree.prefix_max(100) is None
+    tree.update(10, 1.0)
+    tree.update(500, 2.0)
+    tree.update(7, 3.0)
+    assert tree.prefix_max(6) is None
+    assert tree.prefix_max(7) == 3.0
+    assert tree.prefix_max(499) == 3.0
+    tree.update(300, 4.0)
+    assert tree.prefix_max(299) == 3.0
+    assert tree.prefix_max(2 ** 20) == 4.0
+
+
+def test_last_time_crossed_and_tob():
+    handler = OrderEventHandler(LOGGER)
+    ob = OrderLevelBook(MARKET, LOGGER)
+    handler.register_orderbook(MARKET, "book", ob)
+    listener = LastTimeTOBListener(LOGGER)
+    handler.register_event_listener("last_time", listener)
+    ob.add_order_level_book_listener("last_time", listener)
+
+    a1 = NewOrderCommand(1, 1.0, 1001, "user_a", MARKET, ASK_SIDE, FAR, Price("34.55"), 10)
+    handler.process(a1)
+    handler.process(AcknowledgementReport(2, 1.0, 1001, "user_a", MARKET, a1, Price("34.55"), 10, 10))
+    a2 = NewOrderCommand(3, 2.0, 1002, "user_b", MARKET, ASK_SIDE, FAR, Price("34.52"), 10)
+    handler.process(a2)
+    handler.process(AcknowledgementReport(4, 2.0, 1002, "user_b", MARKET, a2, Price("34.52"), 10, 10))
+
+    # would cross 34.52, which is top of book right now
+    handler.process(NewOrderCommand(5, 5.0, 1003, "user_c", MARKET, BID_SIDE, FAR, Price("34.53"), 10))
+    assert listener.last_time_crossed(5) == 5.0
+    # never would have crossed
+    handler.process(NewOrderCommand(6, 5.5, 1004, "user_c", MARKET, BID_SIDE, FAR, Price("34.51"), 10))
+    assert listener.last_time_crossed(6) is None
+
+    # cancel 34.52 so 34.55 becomes top of book
+    cancel = CancelCommand(7, 6.0, 1002, "user_b", MARKET, USER_CANCEL)
+    handler.process(cancel)
+    handler.process(CancelReport(8, 6.0, 1002, "user_b", MARKET, cancel, USER_CANCEL))
+
+    # 34.54 would only have crossed 34.52, which was last top of book at 6.0
+    handler.process(NewOrderCommand(9, 8.0, 1005, "user_d", MARKET, BID_SIDE, FAR, Price("34.54"), 10))
+    assert listener.last_time_crossed(9) == 6.0
+    assert listener.last_time_was_tob(9) is None
+    # 34.55 crosses the current top of book
+    handler.process(NewOrderCommand(10, 9.0, 1006, "user_d", MARKET, BID_SIDE, FAR, Price("34.56"), 10))
+    assert listener.last_time_crossed(10) == 9.0
+    # an ask at 34.52 was top of book at 6.0
+    handler.process(NewOrderCommand(11, 10.0, 1007, "user_e", MARKET, ASK_SIDE, FAR, Price("34.52"), 10))
+    assert listener.last_time_was_tob(11) == 6.0
@@ -0,0 +1,68 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+from buttonwood.MarketMetrics.EventListeners.MatchSeriesTracker import MatchSeriesTracker
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAK
+from buttonwood.MarketObjects.Events.OrderEvents import FullFillReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects.Side import ASK_SIDE
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def _match(tracker, event_id, timestamp, side, match_id):
+    agg = NewOrderCommand(event_id, timestamp, event_id, "user_z", MARKET, side, FAK, Price("34.52"), 10)
+    tracker.handle_full_fill_report(FullFillReport(event_id + 1, timestamp, event_id, "user_z", MARKET, agg, 10,
+                                                   Price("34.52"), side, match_id), None)
+    tracker.handle_full_fill_report(FullFillReport(event_id + 2, timestamp, 5000 + event_id, "user_a", MARKET, agg,
+                                                   10, Price("34.52"), side.other_side(), match_id), None)
+
+
+def test_side_and_time_views():
+    tracker = MatchSeriesTracker(LOGGER)
+    _match(tracker, 10, 100.0, BID_SIDE, 1)
+    _match(tracker, 20, 101.0, ASK_SIDE, 2)
+    _match(tracker, 30, 102.0, BID_SIDE, 3)
+    _match(tracker, 40, 101.5, BID_SIDE, 4)  # out of time order
+
+    assert [s.series_id() for s in tracker.match_series_for_side(BID_SIDE)] == [1, 3, 4]
+    assert [s.series_id() for s in tracker.match_series_for_side(ASK_SIDE)] == [2]
+    assert [s.series_id() for s in tracker.match_series_between(100.0, 102.0)] == [1, 2, 4]
+    assert [s.series_id() for s in tracker.match_series_between(100.5, 103.0, BID_SIDE)] == [4, 3]
+    assert tracker.match_series_between(103.0, 104.0) == []
+    assert tracker.aggressor_match_series(20).series_id() == 2
+    assert tracker.fill_event_id_match_series(32).series_id() == 3
@@ -0,0 +1,149 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+import math
+from buttonwood.MarketMetrics.MicroPrice import depth_metrics
+from buttonwood.MarketMetrics.MicroPrice import depth_row_metrics
+from buttonwood.MarketMetrics.MicroPrice import order_book_imbalances
+from buttonwood.MarketMetrics.MicroPrice import size_weighted_midpoints
+from buttonwood.MarketMetrics.OrderLevelBookListeners.MicroPriceListener import MicroPriceListener
+from buttonwood.MarketObjects.Events.EventChains import OrderEventChain
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.utils.IDGenerators import MonotonicIntID
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+SUBCHAIN_ID_GENERATOR = MonotonicIntID()
+
+
+def _add_order(ob, event_id, chain_id, side, price, qty):
+    command = NewOrderCommand(event_id, 1234000.0 + event_id, chain_id, "user_a", MARKET, side, FAR, Price(price), qty)
+    chain = OrderEventChain(command, LOGGER, SUBCHAIN_ID_GENERATOR)
+    ack = AcknowledgementReport(event_id + 1, 1234000.0 + event_id, chain_id, "user_a", MARKET, command, Price(price),
+                                qty, qty)
+    chain.apply_acknowledgement_report(ack)
+    ob.handle_acknowledgement_report(ack, chain)
+    return chain
+
+
+def test_size_weighted_midpoints():
+    micro = size_weighted_midpoints([10.0, 10.0, 10.0], [10, 30, 0], [11.0, 11.0, 11.0], [10, 10, 0])
+    assert micro[0] == 10.5
+    assert micro[1] == 10.75
+    assert math.isnan(micro[2])
+
+
+def test_order_book_imbalances():
+    imbalances = order_book_imbalances([10, 30, 0, 5], [10, 10, 0, 0])
+    assert imbalances[0] == 0.0
+    assert imbalances[1] == 0.5
+    assert math.isnan(imbalances[2])
+    assert imbalances[3] == 1.0
+
+
+def test_depth_metrics():
+    bid_prices = [[10.0, 9.0], [10.0], []]
+    bid_qtys = [[10, 10], [10], []]
+    ask_prices = [[11.0, 12.0], [11.0, 12.0], [11.0]]
+    ask_qtys = [[10, 30], [10, 30], [5]]
+    micro, weighted, imbalance = depth_metrics(bid_prices, bid_qtys, ask_prices, ask_qtys)
+    assert list(micro)[:2] == [10.5, 10.5]
+    # bid vwap 9.5 for 20, ask vwap 11.75 for 40
+    assert weighted[0] == (40 * 9.5 + 20 * 11.75) / 60
+    assert weighted[1] == (40 * 10.0 + 10 * 11.75) / 50
+    assert imbalance[0] == -20.0 / 60
+    assert math.isnan(micro[2])
+    assert math.isnan(weighted[2])
+    assert imbalance[2] == -1.0
+
+    # depth of 1 makes the weighted mid the micro price
+    micro, weighted, imbalance = depth_metrics(bid_prices, bid_qtys, ask_prices, ask_qtys, depth=1)
+    assert list(micro)[:2] == list(weighted)[:2]
+    assert imbalance[1] == 0.0
+
+
+def test_micro_price_listener():
+    ob = OrderLevelBook(MARKET, LOGGER)
+    tob_listener = MicroPriceListener(LOGGER)
+    depth_listener = MicroPriceListener(LOGGER, depth=2)
+    ob.add_order_level_book_listener("tob", tob_listener)
+    ob.add_order_level_book_listener("depth", depth_listener)
+    _add_order(ob, 1, 1001, BID_SIDE, "10.00", 30)
+    assert tob_listener.micro_price(MARKET) is None
+    assert tob_listener.imbalance(MARKET) == 1.0
+    _add_order(ob, 3, 1002, ASK_SIDE, "11.00", 10)
+    assert tob_listener.micro_price(MARKET) == 10.75
+    assert tob_listener.weighted_mid(MARKET) == 10.75
+    assert tob_listener.imbalance(MARKET) == 0.5
+    # a level behind the top of book only changes the depth listener
+    _add_order(ob, 5, 1003, ASK_SIDE, "12.00", 30)
+    assert tob_listener.imbalance(MARKET) == 0.5
+    assert depth_listener.micro_price(MARKET) == 10.75
+    assert depth_listener.weighted_mid(MARKET) == (40 * 10.0 + 30 * 11.75) / 70
+    assert depth_listener.imbalance(MARKET) == -10.0 / 70
+
+
+class _NoVisibleBidsBook(object):
+    # a book with bid levels that have no visible qty, as only the prices and qtys are looked at
+    def market(self):
+        return MARKET
+
+    def prices(self, side):
+        return [Price("10.00"), Price("9.00")] if side.is_bid() else [Price("11.00"), Price("12.00")]
+
+    def visible_qty_at_price(self, side, price):
+        return 0 if side.is_bid() else 10
+
+
+def test_weighted_mid_without_visible_qty():
+    micro, weighted, imbalance = depth_row_metrics([10.0, 9.0], [0, 0], [11.0, 12.0], [10, 10])
+    assert micro == 10.0
+    assert weighted is None
+    assert imbalance == -1.0
+    micros, weighteds, imbalances = depth_metrics([[10.0, 9.0]], [[0, 0]], [[11.0, 12.0]], [[10, 10]])
+    assert micros[0] == 10.0
+    assert math.isnan(weighteds[0])
+    assert imbalances[0] == -1.0
+
+    listener = MicroPriceListener(LOGGER, depth=2)
+    listener.notify_book_update(_NoVisibleBidsBook(), None, True)
+    assert listener.micro_price(MARKET) == 10.0
+    assert listener.weighted_mid(MARKET) is None
+    assert listener.imbalance(MARKET) == -1.0
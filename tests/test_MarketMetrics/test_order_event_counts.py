@@ -0,0 +1,111 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+import math
+from buttonwood.MarketMetrics.EventListeners.BucketedOrderEventCountListener import BucketedOrderEventCountListener
+from buttonwood.MarketMetrics.EventListeners.OrderEventCountListener import OrderEventCountListener
+from buttonwood.MarketObjects.CancelReasons import USER_CANCEL
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAK
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import FullFillReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def _new(listener, event_id, timestamp, user_id, time_in_force=FAR):
+    command = NewOrderCommand(event_id, timestamp, event_id, user_id, MARKET, BID_SIDE, time_in_force,
+                              Price("34.52"), 10)
+    listener.handle_new_order_command(command, None)
+    return command
+
+
+def _cancel(listener, event_id, timestamp, user_id, chain_id):
+    listener.handle_cancel_command(CancelCommand(event_id, timestamp, chain_id, user_id, MARKET, USER_CANCEL), None)
+
+
+def _fill(listener, event_id, timestamp, command):
+    listener.handle_full_fill_report(FullFillReport(event_id, timestamp, command.chain_id(), command.user_id(),
+                                                    MARKET, command, 10, Price("34.52"), BID_SIDE, event_id), None)
+
+
+def test_cumulative_counts():
+    listener = OrderEventCountListener(LOGGER)
+    command = _new(listener, 1, 1.0, "user_a", FAK)
+    _fill(listener, 2, 1.0, command)
+    assert listener.get_count(MARKET, "user_a", OrderEventCountListener.NEW_ORDER) == 1
+    assert listener.get_count(MARKET, "user_a", OrderEventCountListener.NEW_FAK) == 1
+    assert listener.get_count(MARKET, "user_a", OrderEventCountListener.FULL_FILL) == 1
+
+
+def test_windowed_ratios_and_peak_rates():
+    listener = BucketedOrderEventCountListener(LOGGER, 1.0, 60)
+    # user_a: lots of orders and cancels, one trade
+    for i in range(10):
+        _new(listener, 100 + i, 10.2, "user_a")
+        _cancel(listener, 200 + i, 10.5, "user_a", 100 + i)
+    _fill(listener, 300, 40.0, _new(listener, 301, 40.0, "user_a", FAK))
+    # user_b: one order that trades, and one that doesn't, 30 seconds before
+    _fill(listener, 400, 45.0, _new(listener, 401, 45.0, "user_b", FAK))
+    _new(listener, 402, 15.0, "user_b")
+
+    ratios = listener.order_to_trade_ratios(MARKET, 60.0)
+    by_user = dict((ratios.column("user_id")[i], ratios.row(i)) for i in range(len(ratios)))
+    assert by_user["user_a"] == ("user_a", 21, 1, 21.0)
+    assert by_user["user_b"] == ("user_b", 2, 1, 2.0)
+
+    ratios = listener.order_to_trade_ratios(MARKET, 10.0)
+    by_user = dict((ratios.column("user_id")[i], ratios.row(i)) for i in range(len(ratios)))
+    assert by_user["user_b"] == ("user_b", 1, 1, 1.0)
+    assert by_user["user_a"][1:3] == (1, 1)
+
+    cancels = listener.cancel_ratios(MARKET, 60.0, now=20.0)
+    by_user = dict((cancels.column("user_id")[i], cancels.row(i)) for i in range(len(cancels)))
+    assert by_user["user_a"] == ("user_a", 10, 10, 1.0)
+    assert by_user["user_b"] == ("user_b", 0, 1, 0.0)
+
+    user_ids, counts = listener.window_counts(MARKET, [OrderEventCountListener.FULL_FILL], 60.0)
+    assert dict(zip(user_ids, counts)) == {"user_a": 1, "user_b": 1}
+
+    peaks = listener.peak_message_rates(MARKET)
+    by_user = dict((peaks.column("user_id")[i], peaks.row(i)) for i in range(len(peaks)))
+    assert by_user["user_a"] == ("user_a", 10.0, 20, 20.0)
+    assert by_user["user_b"][2] == 1
+
+    ratios = listener.order_to_trade_ratios(MARKET, 1.0, now=10.0)
+    assert math.isnan(ratios.column("ratio")[ratios.column("user_id").index("user_a")])
@@ -0,0 +1,147 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+import multiprocessing
+from buttonwood.MarketMetrics.OrderLevelBookListeners.SharedMemoryTopOfBookListener import SharedMemoryTopOfBookListener
+from buttonwood.MarketMetrics.OrderLevelBookListeners.SharedMemoryTopOfBookListener import SharedMemoryTopOfBookReader
+from buttonwood.MarketObjects.CancelReasons import USER_CANCEL
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects.Side import ASK_SIDE
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+MARKET_2 = Market(Product("AAPL", "Apple"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def _setup(listener, markets):
+    handler = OrderEventHandler(LOGGER)
+    for market in markets:
+        book = OrderLevelBook(market, LOGGER)
+        handler.register_orderbook(market, "book", book)
+        book.add_order_level_book_listener("shm", listener)
+    return handler
+
+
+def _add(handler, event_id, timestamp, chain_id, market, side, price, qty):
+    command = NewOrderCommand(event_id, timestamp, chain_id, "user_a", market, side, FAR, Price(price), qty)
+    handler.process(command)
+    handler.process(AcknowledgementReport(event_id + 1, timestamp, chain_id, "user_a", market, command, Price(price),
+                                          qty, qty))
+
+
+def _read_in_other_process(name, market_name, results):
+    reader = SharedMemoryTopOfBookReader(name)
+    results.put((reader.markets(), reader.snapshot(market_name)))
+    reader.close()
+
+
+def test_publish_and_read_depth():
+    listener = SharedMemoryTopOfBookListener(LOGGER, depth=2, max_markets=4)
+    try:
+        handler = _setup(listener, [MARKET, MARKET_2])
+        reader = SharedMemoryTopOfBookReader(listener.name())
+        assert reader.depth() == 2
+        assert reader.markets() == []
+        assert reader.snapshot(str(MARKET)) is None
+
+        _add(handler, 1, 1.0, 1001, MARKET, BID_SIDE, "34.50", 10)
+        _add(handler, 3, 2.0, 1002, MARKET, BID_SIDE, "34.51", 5)
+        _add(handler, 5, 3.0, 1003, MARKET, BID_SIDE, "34.49", 7)
+        _add(handler, 7, 4.0, 1004, MARKET, BID_SIDE, "34.51", 3)
+        _add(handler, 9, 5.0, 1005, MARKET, ASK_SIDE, "34.55", 20)
+        _add(handler, 11, 6.0, 2001, MARKET_2, ASK_SIDE, "150.00", 100)
+
+        assert reader.markets() == [str(MARKET), str(MARKET_2)]
+        timestamp, update_count, bids, asks = reader.snapshot(str(MARKET))
+        assert timestamp == 5.0
+        assert update_count == 5
+        # only 2 levels deep, so 34.49 isn't published
+        assert bids == [(34.51, 8, 0, 2), (34.50, 10, 0, 1)]
+        assert asks == [(34.55, 20, 0, 1)]
+        assert reader.update_count(str(MARKET_2)) == 1
+        assert reader.snapshot(str(MARKET_2))[2:] == ([], [(150.0, 100, 0, 1)])
+
+        bid, ask = reader.best_levels(str(MARKET))
+        assert bid.price() == Price("34.51")
+        assert bid.visible_qty() == 8
+        assert bid.number_of_orders() == 2
+        assert ask.price() == Price("34.55")
+        assert reader.best_levels(str(MARKET_2))[0] is None
+
+        # cancelling the ask empties that side
+        cancel = CancelCommand(13, 7.0, 1005, "user_a", MARKET, USER_CANCEL)
+        handler.process(cancel)
+        handler.process(CancelReport(14, 7.0, 1005, "user_a", MARKET, cancel, USER_CANCEL))
+        timestamp, update_count, bids, asks = reader.snapshot(str(MARKET))
+        assert (timestamp, update_count, asks) == (7.0, 6, [])
+        assert len(bids) == 2
+
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(target=_read_in_other_process,
+                                          args=(listener.name(), str(MARKET), results))
+        process.start()
+        markets, snapshot = results.get(timeout=30)
+        process.join(timeout=30)
+        assert markets == [str(MARKET), str(MARKET_2)]
+        assert snapshot == reader.snapshot(str(MARKET))
+        reader.close()
+    finally:
+        listener.close()
+        listener.unlink()
+
+
+def test_market_slots_run_out():
+    listener = SharedMemoryTopOfBookListener(LOGGER, depth=1, max_markets=1)
+    try:
+        handler = _setup(listener, [MARKET, MARKET_2])
+        _add(handler, 1, 1.0, 1001, MARKET, BID_SIDE, "34.50", 10)
+        _add(handler, 3, 2.0, 2001, MARKET_2, BID_SIDE, "150.00", 10)
+        # not top of book, so with depth 1 nothing is written
+        _add(handler, 5, 3.0, 1002, MARKET, BID_SIDE, "34.40", 10)
+        reader = SharedMemoryTopOfBookReader(listener.name())
+        assert reader.markets() == [str(MARKET)]
+        assert reader.snapshot(str(MARKET)) == (1.0, 1, [(34.50, 10, 0, 1)], [])
+        assert reader.snapshot(str(MARKET_2)) is None
+        reader.close()
+    finally:
+        listener.close()
+        listener.unlink()
@@ -0,0 +1,210 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+from buttonwood.MarketMetrics.OrderLevelBookListeners.SpoofingSurveillanceListener import SpoofingSurveillanceListener
+from buttonwood.MarketObjects.CancelReasons import USER_CANCEL
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAK
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReplaceCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReport
+from buttonwood.MarketObjects.Events.OrderEvents import FullFillReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects.Side import ASK_SIDE
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def _setup(**kwargs):
+    handler = OrderEventHandler(LOGGER)
+    ob = OrderLevelBook(MARKET, LOGGER)
+    handler.register_orderbook(MARKET, "book", ob)
+    listener = SpoofingSurveillanceListener(LOGGER, 10.0, 1.0, **kwargs)
+    ob.add_order_level_book_listener("spoofing", listener)
+    return handler, listener
+
+
+def _rest(handler, event_id, timestamp, user_id, side, price, qty):
+    command = NewOrderCommand(event_id, timestamp, event_id, user_id, MARKET, side, FAR, Price(price), qty)
+    handler.process(command)
+    handler.process(AcknowledgementReport(event_id + 1, timestamp, event_id, user_id, MARKET, command, Price(price),
+                                          qty, qty))
+    return command
+
+
+def _cancel(handler, event_id, timestamp, user_id, chain_id):
+    command = CancelCommand(event_id, timestamp, chain_id, user_id, MARKET, USER_CANCEL)
+    handler.process(command)
+    handler.process(CancelReport(event_id + 1, timestamp, chain_id, user_id, MARKET, command, USER_CANCEL))
+
+
+def _lift(handler, event_id, timestamp, user_id, passive_command):
+    qty = passive_command.qty()
+    agg = NewOrderCommand(event_id, timestamp, event_id, user_id, MARKET, BID_SIDE, FAK, passive_command.price(), qty)
+    handler.process(agg)
+    handler.process(FullFillReport(event_id + 1, timestamp, event_id, user_id, MARKET, agg, qty,
+                                   passive_command.price(), BID_SIDE, event_id))
+    handler.process(FullFillReport(event_id + 2, timestamp, passive_command.chain_id(), passive_command.user_id(),
+                                   MARKET, agg, qty, passive_command.price(), ASK_SIDE, event_id))
+
+
+def test_layering_alert():
+    handler, listener = _setup()
+    _rest(handler, 1, 100.0, "user_m", BID_SIDE, "34.50", 10)
+    _rest(handler, 3, 100.0, "user_m", ASK_SIDE, "34.56", 10)
+    offer = _rest(handler, 5, 100.0, "user_s", ASK_SIDE, "34.55", 5)
+    # layers of bids behind the top of book, all quickly cancelled
+    for i, price in enumerate(["34.48", "34.47", "34.46"]):
+        _rest(handler, 10 + 10 * i, 101.0, "user_s", BID_SIDE, price, 100)
+    _lift(handler, 50, 101.2, "user_x", offer)
+    assert listener.pop_alerts() == []
+    _cancel(handler, 60, 101.5, "user_s", 10)
+    _cancel(handler, 62, 101.5, "user_s", 20)
+    assert listener.pop_alerts() == []
+    _cancel(handler, 64, 101.5, "user_s", 30)
+    alerts = listener.pop_alerts()
+    assert len(alerts) == 1
+    alert = alerts[0]
+    assert alert.user_id() == "user_s"
+    assert alert.spoof_side() == BID_SIDE
+    assert alert.cancel_count() == 3
+    assert alert.cancelled_qty() == 300
+    assert alert.opposite_fill_qty() == 5
+    assert alert.size_imbalance() == 295.0 / 305.0
+    assert listener.pop_alerts() == []
+
+
+def test_no_alert_for_slow_cancels_or_orders_at_the_top():
+    handler, listener = _setup()
+    _rest(handler, 1, 100.0, "user_m", BID_SIDE, "34.50", 10)
+    offer = _rest(handler, 5, 100.0, "user_s", ASK_SIDE, "34.55", 5)
+    _rest(handler, 10, 101.0, "user_s", BID_SIDE, "34.48", 100)  # cancelled too late
+    _rest(handler, 20, 101.0, "user_s", BID_SIDE, "34.50", 100)  # at the top of book
+    _rest(handler, 30, 101.0, "user_s", BID_SIDE, "34.51", 100)  # improves the top of book
+    _lift(handler, 50, 101.2, "user_x", offer)
+    _cancel(handler, 60, 102.5, "user_s", 10)
+    _cancel(handler, 62, 101.5, "user_s", 20)
+    _cancel(handler, 64, 101.5, "user_s", 30)
+    assert listener.pop_alerts() == []
+
+
+def test_bounded_users():
+    handler, listener = _setup(max_users=2)
+    for i in range(5):
+        _rest(handler, 10 * i + 10, 100.0, "user_%d" % i, BID_SIDE, "34.50", 10)
+    assert listener.num_tracked_users() == 2
+
+
+def test_crossing_cancel_replace_fills_counted_once():
+    handler, listener = _setup()
+    _rest(handler, 1, 100.0, "user_m", BID_SIDE, "34.50", 10)
+    offer = _rest(handler, 3, 100.0, "user_m", ASK_SIDE, "34.55", 5)
+    bid = _rest(handler, 5, 100.0, "user_s", BID_SIDE, "34.48", 5)
+    # user_s replaces up through the offer and buys it, so user_s has only bought
+    replace = CancelReplaceCommand(7, 101.0, bid.chain_id(), "user_s", MARKET, BID_SIDE, Price("34.55"), 5)
+    handler.process(replace)
+    handler.process(FullFillReport(8, 101.0, bid.chain_id(), "user_s", MARKET, replace, 5, Price("34.55"), BID_SIDE,
+                                   8))
+    handler.process(FullFillReport(9, 101.0, offer.chain_id(), "user_m", MARKET, replace, 5, Price("34.55"), ASK_SIDE,
+                                   8))
+    # layering bids with no sells on the other side isn't an alert
+    for i, price in enumerate(["34.48", "34.47", "34.46"]):
+        _rest(handler, 10 + 10 * i, 101.0, "user_s", BID_SIDE, price, 100)
+    for chain_id in [10, 20, 30]:
+        _cancel(handler, 50 + chain_id, 101.5, "user_s", chain_id)
+    assert listener.pop_alerts() == []
+    # layering asks against the buy is
+    _rest(handler, 90, 102.0, "user_m", ASK_SIDE, "34.56", 10)
+    for i, price in enumerate(["34.58", "34.59", "34.60"]):
+        _rest(handler, 100 + 10 * i, 102.0, "user_s", ASK_SIDE, price, 100)
+    for chain_id in [100, 110, 120]:
+        _cancel(handler, 50 + chain_id, 102.5, "user_s", chain_id)
+    alerts = listener.pop_alerts()
+    assert len(alerts) == 1
+    assert alerts[0].spoof_side() == ASK_SIDE
+    assert alerts[0].opposite_fill_qty() == 5
+
+
+def _amend(handler, event_id, timestamp, user_id, command, price, qty):
+    replace = CancelReplaceCommand(event_id, timestamp, command.chain_id(), user_id, MARKET, command.side(),
+                                   Price(price), qty)
+    handler.process(replace)
+    handler.process(AcknowledgementReport(event_id + 1, timestamp, command.chain_id(), user_id, MARKET, replace,
+                                          Price(price), qty, qty))
+
+
+def test_amends_count_only_the_qty_they_add():
+    handler, listener = _setup()
+    _rest(handler, 1, 100.0, "user_m", BID_SIDE, "34.50", 10)
+    _rest(handler, 3, 100.0, "user_m", ASK_SIDE, "34.56", 10)
+    offer = _rest(handler, 5, 100.0, "user_s", ASK_SIDE, "34.55", 5)
+    layers = [_rest(handler, 10 + 10 * i, 101.0, "user_s", BID_SIDE, price, 100)
+              for i, price in enumerate(["34.48", "34.47", "34.46"])]
+    # the first layer is amended up and then down, at the same price
+    _amend(handler, 40, 101.1, "user_s", layers[0], "34.48", 150)
+    _amend(handler, 42, 101.2, "user_s", layers[0], "34.48", 200)
+    _amend(handler, 44, 101.3, "user_s", layers[0], "34.48", 120)
+    _lift(handler, 50, 101.4, "user_x", offer)
+    for layer in layers:
+        _cancel(handler, 60 + layer.chain_id(), 101.5, "user_s", layer.chain_id())
+    alerts = listener.pop_alerts()
+    assert len(alerts) == 1
+    assert alerts[0].cancelled_qty() == 320
+    # placed on the bid: 3 * 100 for the layers and 50 + 50 for the amends up
+    assert alerts[0].size_imbalance() == 395.0 / 405.0
+
+
+def test_amends_keep_the_placement_time():
+    handler, listener = _setup(min_cancel_count=1)
+    _rest(handler, 1, 100.0, "user_m", BID_SIDE, "34.50", 10)
+    _rest(handler, 3, 100.0, "user_m", ASK_SIDE, "34.56", 10)
+    offer = _rest(handler, 5, 100.0, "user_s", ASK_SIDE, "34.55", 5)
+    layers = [_rest(handler, 10 + 10 * i, 100.0, "user_s", BID_SIDE, price, 100)
+              for i, price in enumerate(["34.48", "34.47", "34.46"])]
+    # a qty amend doesn't make an order placed long ago a quick cancel, but moving its price does
+    _amend(handler, 40, 101.0, "user_s", layers[0], "34.48", 150)
+    _amend(handler, 42, 101.0, "user_s", layers[1], "34.45", 100)
+    _lift(handler, 50, 101.2, "user_x", offer)
+    for layer in layers:
+        _cancel(handler, 60 + layer.chain_id(), 101.5, "user_s", layer.chain_id())
+    alerts = listener.pop_alerts()
+    assert len(alerts) == 1
+    assert alerts[0].cancel_count() == 1
+    assert alerts[0].cancelled_qty() == 100
@@ -0,0 +1,116 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+import math
+from buttonwood.MarketMetrics.OrderLevelBookListeners.TopOfBookSeriesListener import TopOfBookSeriesListener
+from buttonwood.MarketMetrics import TopOfBookStatistics
+from buttonwood.MarketObjects.Events.EventChains import OrderEventChain
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.utils.IDGenerators import MonotonicIntID
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+SUBCHAIN_ID_GENERATOR = MonotonicIntID()
+NAN = float("nan")
+
+
+def _add_order(ob, event_id, timestamp, chain_id, side, price, qty):
+    command = NewOrderCommand(event_id, timestamp, chain_id, "user_a", MARKET, side, FAR, Price(price), qty)
+    chain = OrderEventChain(command, LOGGER, SUBCHAIN_ID_GENERATOR)
+    ack = AcknowledgementReport(event_id + 1, timestamp, chain_id, "user_a", MARKET, command, Price(price), qty, qty)
+    chain.apply_acknowledgement_report(ack)
+    ob.handle_acknowledgement_report(ack, chain)
+    return chain
+
+
+def test_listener_records_tob_updates():
+    ob = OrderLevelBook(MARKET, LOGGER)
+    listener = TopOfBookSeriesListener(LOGGER)
+    ob.add_order_level_book_listener("tob_series", listener)
+    _add_order(ob, 1, 100.0, 1001, BID_SIDE, "34.50", 50)
+    _add_order(ob, 3, 101.0, 1002, ASK_SIDE, "34.52", 10)
+    _add_order(ob, 5, 102.0, 1003, BID_SIDE, "34.49", 10)  # not top of book so not recorded
+    _add_order(ob, 7, 103.0, 1004, ASK_SIDE, "34.52", 20)
+    series = listener.series(MARKET)
+    assert len(series) == 3
+    assert list(series.timestamps()) == [100.0, 101.0, 103.0]
+    assert series.event_ids() == [2, 4, 8]
+    assert list(series.bid_prices()) == [34.50, 34.50, 34.50]
+    assert list(series.bid_qtys()) == [50, 50, 50]
+    assert math.isnan(series.ask_prices()[0])
+    assert list(series.ask_prices())[1:] == [34.52, 34.52]
+    assert list(series.ask_qtys()) == [0, 10, 30]
+
+
+def test_time_weighted_spread():
+    timestamps = [0.0, 1.0, 4.0, 5.0]
+    bids = [NAN, 10.0, 10.0, 10.0]
+    asks = [11.0, 11.0, 10.5, 12.0]
+    # first row has no bid so it is left out; last row only counts with an end time
+    assert TopOfBookStatistics.time_weighted_spread(timestamps, bids, asks) == (3 * 1.0 + 1 * 0.5) / 4
+    assert TopOfBookStatistics.time_weighted_spread(timestamps, bids, asks, end_time=9.0) == \
+        (3 * 1.0 + 1 * 0.5 + 4 * 2.0) / 8
+    assert TopOfBookStatistics.time_weighted_spread([0.0], [NAN], [11.0]) is None
+
+
+def test_time_weighted_micro_price():
+    timestamps = [0.0, 1.0, 3.0]
+    bids = [10.0, 10.0, 10.0]
+    bid_qtys = [10, 30, 30]
+    asks = [11.0, 11.0, 11.0]
+    ask_qtys = [10, 10, 10]
+    # 10.5 for 1 second, 10.75 for 2 seconds
+    assert TopOfBookStatistics.time_weighted_micro_price(timestamps, bids, bid_qtys, asks, ask_qtys) == \
+        (10.5 + 2 * 10.75) / 3
+
+
+def test_crossed_time():
+    timestamps = [0.0, 1.0, 3.0, 6.0]
+    bids = [10.0, 11.0, 12.0, 10.0]
+    asks = [11.0, 11.0, 11.0, NAN]
+    assert TopOfBookStatistics.crossed_time(timestamps, bids, asks, end_time=10.0) == 5.0
+    assert TopOfBookStatistics.crossed_time(timestamps, bids, asks, end_time=10.0, include_locked=False) == 3.0
+
+
+def test_quote_lifetimes():
+    timestamps = [0.0, 1.0, 3.0, 4.0, 6.0, 7.0]
+    prices = [10.0, 10.0, 10.5, NAN, 10.5, 10.5]
+    assert list(TopOfBookStatistics.quote_lifetimes(timestamps, prices)) == [3.0, 1.0, 1.0]
+    assert list(TopOfBookStatistics.quote_lifetimes(timestamps, prices, end_time=8.0)) == [3.0, 1.0, 2.0]
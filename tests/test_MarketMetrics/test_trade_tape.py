@@ -0,0 +1,163 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+import math
+from buttonwood.MarketMetrics.EventListeners.TradeTape import TradeTape
+from buttonwood.MarketMetrics import TradeStatistics
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAK
+from buttonwood.MarketObjects.Events.OrderEventConstants import LIMIT
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import FullFillReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Events.OrderEvents import PartialFillReport
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects.Side import ASK_SIDE
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def _fill(tape, event_id, timestamp, agg, qty, price, side, match_id, passive_chain_id):
+    tape.handle_full_fill_report(FullFillReport(event_id, timestamp, passive_chain_id, "user_a", MARKET, agg, qty,
+                                                Price(price), side.other_side(), match_id), None)
+
+
+def test_sweep_written_when_aggressor_fully_filled():
+    tape = TradeTape(LOGGER)
+    agg = NewOrderCommand(1, 100.0, 1, "user_z", MARKET, BID_SIDE, FAK, Price("34.53"), 15)
+    tape.handle_partial_fill_report(PartialFillReport(2, 100.0, 1, "user_z", MARKET, agg, 10, Price("34.52"),
+                                                      BID_SIDE, 7, 5), None)
+    _fill(tape, 3, 100.0, agg, 10, "34.52", BID_SIDE, 7, 50)
+    assert tape.tape(MARKET) is None
+    tape.handle_full_fill_report(FullFillReport(4, 100.0, 1, "user_z", MARKET, agg, 5, Price("34.53"), BID_SIDE, 7),
+                                 None)
+    assert tape.tape(MARKET) is None  # passive side hasn't balanced yet
+    _fill(tape, 5, 100.0, agg, 5, "34.53", BID_SIDE, 7, 51)
+    row = tape.tape(MARKET).row(0)
+    assert len(tape.tape(MARKET)) == 1
+    assert row == (100.0, 7, 1, 15, (10 * 34.52 + 5 * 34.53) / 15.0, 2, 34.52, 34.53)
+
+
+def test_partially_filled_aggressor_written_on_ack_and_flush():
+    tape = TradeTape(LOGGER)
+    agg = NewOrderCommand(1, 100.0, 1, "user_z", MARKET, ASK_SIDE, LIMIT, Price("34.50"), 15)
+    tape.handle_partial_fill_report(PartialFillReport(2, 100.0, 1, "user_z", MARKET, agg, 10, Price("34.51"),
+                                                      ASK_SIDE, 7, 5), None)
+    _fill(tape, 3, 100.0, agg, 10, "34.51", ASK_SIDE, 7, 50)
+    assert tape.tape(MARKET) is None
+    tape.handle_acknowledgement_report(AcknowledgementReport(4, 100.0, 1, "user_z", MARKET, agg, Price("34.50"), 5,
+                                                             None), None)
+    assert tape.tape(MARKET).column("sign")[0] == -1
+    assert tape.tape(MARKET).column("qty")[0] == 10
+
+    agg2 = NewOrderCommand(5, 101.0, 5, "user_z", MARKET, ASK_SIDE, LIMIT, Price("34.50"), 15)
+    tape.handle_partial_fill_report(PartialFillReport(6, 101.0, 5, "user_z", MARKET, agg2, 3, Price("34.50"),
+                                                      ASK_SIDE, 8, 12), None)
+    _fill(tape, 7, 101.0, agg2, 3, "34.50", ASK_SIDE, 8, 52)
+    assert len(tape.tape(MARKET)) == 1
+    tape.flush()
+    assert list(tape.tape(MARKET).column("match_id")) == [7, 8]
+    starts, volumes = tape.volume_by_interval(MARKET, 1.0)
+    assert list(starts) == [100.0, 101.0]
+    assert list(volumes) == [10, 3]
+
+
+def test_overlapping_aggressors_kept_in_time_order():
+    tape = TradeTape(LOGGER)
+    agg_a = NewOrderCommand(1, 100.0, 1, "user_y", MARKET, ASK_SIDE, LIMIT, Price("34.50"), 15)
+    tape.handle_partial_fill_report(PartialFillReport(2, 100.0, 1, "user_y", MARKET, agg_a, 10, Price("34.51"),
+                                                      ASK_SIDE, 7, 5), None)
+    _fill(tape, 3, 100.0, agg_a, 10, "34.51", ASK_SIDE, 7, 50)
+    # a second aggressor starts and finishes its match while the first is still open
+    agg_b = NewOrderCommand(4, 101.0, 4, "user_z", MARKET, BID_SIDE, FAK, Price("34.53"), 5)
+    tape.handle_full_fill_report(FullFillReport(5, 101.0, 4, "user_z", MARKET, agg_b, 5, Price("34.53"), BID_SIDE, 8),
+                                 None)
+    _fill(tape, 6, 101.0, agg_b, 5, "34.53", BID_SIDE, 8, 51)
+    assert list(tape.tape(MARKET).column("match_id")) == [8]
+    tape.handle_acknowledgement_report(AcknowledgementReport(7, 102.0, 1, "user_y", MARKET, agg_a, Price("34.50"), 5,
+                                                             None), None)
+    assert list(tape.tape(MARKET).column("match_id")) == [7, 8]
+    assert list(tape.tape(MARKET).column("timestamp")) == [100.0, 101.0]
+    vwaps = tape.rolling_vwap(MARKET, 0.5)
+    assert abs(vwaps[0] - 34.51) < 1e-9 and abs(vwaps[1] - 34.53) < 1e-9
+    vols = tape.rolling_realized_volatility(MARKET, 0.5)
+    assert vols[0] == 0.0 and abs(vols[1] - math.log(vwaps[1] / vwaps[0])) < 1e-12
+
+
+def test_volume_by_interval_with_gaps():
+    starts, volumes = TradeStatistics.volume_by_interval([0.0, 0.5, 2.5], [1, 2, 4], 1.0)
+    assert list(starts) == [0.0, 1.0, 2.0]
+    assert list(volumes) == [3, 0, 4]
+    starts, volumes = TradeStatistics.volume_by_interval([], [], 1.0)
+    assert len(starts) == 0 and len(volumes) == 0
+
+
+def test_volume_by_interval_out_of_order():
+    # rows are written as aggressors finish, so an earlier trade can come last
+    starts, volumes = TradeStatistics.volume_by_interval([1.5, 3.2, 0.4, 2.0], [1, 2, 4, 8], 1.0)
+    assert list(starts) == [0.4, 1.4, 2.4]
+    assert list(volumes) == [4, 9, 2]
+    starts, volumes = TradeStatistics.volume_by_interval([1.5, 3.2, 0.4], [1, 2, 4], 1.0, start_time=0.0)
+    assert list(volumes) == [4, 1, 0, 2]
+
+
+def test_queries_do_not_add_markets():
+    tape = TradeTape(LOGGER)
+    starts, volumes = tape.volume_by_interval(MARKET, 1.0)
+    assert len(volumes) == 0
+    assert len(tape.rolling_vwap(MARKET, 1.0)) == 0
+    assert len(tape.rolling_realized_volatility(MARKET, 1.0)) == 0
+    assert all(math.isnan(value) for value in tape.trade_sign_autocorrelation(MARKET, 2))
+    assert tape.tape(MARKET) is None
+    assert len(tape.markets()) == 0
+
+
+def test_rolling_vwap():
+    vwaps = TradeStatistics.rolling_vwap([0.0, 1.0, 2.0, 5.0], [1, 1, 2, 1], [10.0, 20.0, 30.0, 40.0], 2.0)
+    assert list(vwaps) == [10.0, 15.0, (20.0 + 60.0) / 3, 40.0]
+
+
+def test_trade_sign_autocorrelation():
+    result = TradeStatistics.trade_sign_autocorrelation([1, -1, 1, -1, 1, -1], 2)
+    assert result[0] < 0 < result[1]
+    assert math.isnan(TradeStatistics.trade_sign_autocorrelation([1, 1, 1], 1)[0])
+
+
+def test_rolling_realized_volatility():
+    vols = TradeStatistics.rolling_realized_volatility([0.0, 1.0, 2.0, 10.0], [100.0, 101.0, 100.0, 100.0], 1.5)
+    assert vols[0] == 0.0
+    assert abs(vols[1] - abs(math.log(1.01))) < 1e-12
+    assert abs(vols[2] - math.sqrt(math.log(1.01) ** 2 + math.log(100.0 / 101.0) ** 2)) < 1e-12
+    assert vols[3] == 0.0
@@ -0,0 +1,69 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+from buttonwood.MarketMetrics.EventListeners.VolumeTrackingListener import VolumeTrackingListener
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAK
+from buttonwood.MarketObjects.Events.OrderEvents import FullFillReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def _trade(listener, event_id, timestamp, aggressor, passive, qty):
+    agg = NewOrderCommand(event_id, timestamp, event_id, aggressor, MARKET, BID_SIDE, FAK, Price("34.52"), qty)
+    listener.handle_full_fill_report(FullFillReport(event_id + 1, timestamp, 5000 + event_id, passive, MARKET, agg,
+                                                    qty, Price("34.52"), BID_SIDE.other_side(), event_id), None)
+
+
+def test_totals_and_rolling_volume():
+    listener = VolumeTrackingListener(LOGGER, bucket_interval=1.0, num_buckets=300)
+    _trade(listener, 10, 100.0, "user_z", "user_a", 10)
+    _trade(listener, 20, 150.5, "user_z", "user_b", 5)
+    _trade(listener, 30, 220.0, "user_a", "user_b", 3)
+
+    tracker = listener.volume_tracker(MARKET, "user_z")
+    assert tracker.total_aggressive_volume() == 15
+    assert tracker.total_passive_volume() == 0
+    assert listener.volume_tracker(MARKET, "user_b").total_volume() == 8
+
+    assert listener.volume_in_last(MARKET, 300.0) == 18
+    assert listener.volume_in_last(MARKET, 60.0) == 3
+    assert listener.volume_in_last(MARKET, 60.0, now=200.0) == 5
+    assert listener.volume_in_last(MARKET, 60.0, user_id="user_a") == 3
+    assert listener.volume_in_last(MARKET, 300.0, user_id="user_a") == 13
+    assert listener.volume_in_last(MARKET, 60.0, user_id="user_q") == 0
+    assert listener.volume_buckets(MARKET, "user_b").total() == 8
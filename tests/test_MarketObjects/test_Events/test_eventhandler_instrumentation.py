@@ -0,0 +1,137 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+from buttonwood.MarketMetrics.EventListeners.OrderEventCountListener import OrderEventCountListener
+from buttonwood.MarketMetrics.OrderLevelBookListeners.LastTimeTOBListener import LastTimeTOBListener
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Events.OrderEvents import RejectReport
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects import CancelReasons
+from buttonwood.MarketObjects import RejectReasons
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def _run(handler):
+    book = OrderLevelBook(MARKET, LOGGER, name="book")
+    book.add_order_level_book_listener("tob", LastTimeTOBListener(LOGGER))
+    handler.register_orderbook(MARKET, "book", book)
+    handler.register_event_listener("counts", OrderEventCountListener(LOGGER))
+    for i in range(10):
+        chain_id = 100 + i
+        new_order = NewOrderCommand(i * 10 + 1, 1000.0 + i, chain_id, "user_a", MARKET, BID_SIDE, FAR,
+                                    Price("34.50"), 10)
+        handler.process(new_order)
+        handler.process(AcknowledgementReport(i * 10 + 2, 1000.1 + i, chain_id, "user_a", MARKET, new_order,
+                                              Price("34.50"), 10, None))
+    cancel = CancelCommand(500, 2000.0, 100, "user_a", MARKET, CancelReasons.USER_CANCEL)
+    handler.process(cancel)
+    handler.process(RejectReport(501, 2000.1, 100, "user_a", MARKET, cancel, RejectReasons.ORDER_CLOSED))
+    return book
+
+
+def test_instrumented_stats():
+    handler = OrderEventHandler(LOGGER, instrument=True)
+    assert handler.is_instrumented()
+    _run(handler)
+    stats = handler.stats()
+    assert set(stats.keys()) == {"total", "chain", "listener:counts", "book:Microsoft@Nasdaq:book",
+                                 "book listener:Microsoft@Nasdaq:book:tob"}
+    assert stats["total"]["NewOrderCommand"]["count"] == 10
+    assert stats["total"]["AcknowledgementReport"]["count"] == 10
+    assert stats["total"]["RejectReport"]["count"] == 1
+    assert stats["listener:counts"]["RejectReport"]["count"] == 1
+    assert stats["book:Microsoft@Nasdaq:book"]["AcknowledgementReport"]["count"] == 10
+    assert stats["book listener:Microsoft@Nasdaq:book:tob"]["AcknowledgementReport"]["count"] == 10
+    assert "NewOrderCommand" not in stats["book:Microsoft@Nasdaq:book"]
+    total = handler.stage_histogram("total", "AcknowledgementReport")
+    book = handler.stage_histogram("book:Microsoft@Nasdaq:book", "AcknowledgementReport")
+    assert book.total() <= total.total()
+    assert "book listener:Microsoft@Nasdaq:book:tob" in handler.format_stats()
+    handler.reset_stats()
+    assert handler.stats() == {}
+
+
+def test_not_instrumented():
+    handler = OrderEventHandler(LOGGER)
+    book = _run(handler)
+    assert not handler.is_instrumented()
+    assert handler.stats() == {}
+    assert "process" not in handler.__dict__
+    assert "_notify_listeners" not in book.__dict__
+    assert book.best_price(BID_SIDE) == Price("34.50")
+
+
+def test_dump_stats(caplog):
+    handler = OrderEventHandler(LOGGER, instrument=True, dump_stats_every=5)
+    with caplog.at_level(logging.INFO):
+        _run(handler)
+    assert sum("stats after" in record.getMessage() for record in caplog.records) == 4
+
+
+class _CountingHandler(OrderEventHandler):
+    def __init__(self, logger, instrument=False):
+        self.processed = 0
+        OrderEventHandler.__init__(self, logger, instrument=instrument)
+
+    def process(self, event):
+        self.processed += 1
+        return OrderEventHandler.process(self, event)
+
+
+def test_books_with_the_same_name_and_subclassed_process():
+    handler = _CountingHandler(LOGGER, instrument=True)
+    # both books get the default name
+    first = OrderLevelBook(MARKET, LOGGER)
+    second = OrderLevelBook(MARKET, LOGGER)
+    assert first.name() == second.name()
+    first.add_order_level_book_listener("tob", LastTimeTOBListener(LOGGER))
+    second.add_order_level_book_listener("tob", LastTimeTOBListener(LOGGER))
+    handler.register_orderbook(MARKET, "first", first)
+    handler.register_orderbook(MARKET, "second", second)
+    new_order = NewOrderCommand(1, 1000.0, 1, "user_a", MARKET, BID_SIDE, FAR, Price("34.50"), 10)
+    handler.process(new_order)
+    handler.process(AcknowledgementReport(2, 1000.1, 1, "user_a", MARKET, new_order, Price("34.50"), 10, None))
+    assert handler.processed == 2
+    stats = handler.stats()
+    for book_id in ["first", "second"]:
+        assert stats["book:Microsoft@Nasdaq:%s" % book_id]["AcknowledgementReport"]["count"] == 1
+        assert stats["book listener:Microsoft@Nasdaq:%s:tob" % book_id]["AcknowledgementReport"]["count"] == 1
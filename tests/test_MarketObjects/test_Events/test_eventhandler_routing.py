@@ -0,0 +1,124 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Events.OrderEvents import RejectReport
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.OrderBookListeners.OrderLevelBookListener import OrderLevelBookListener
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import AggregateOrderLevelBook
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects import CancelReasons
+from buttonwood.MarketObjects import RejectReasons
+from buttonwood.utils.tracing import APPLY_TO_BOOK
+from buttonwood.utils.tracing import RingBufferTracer
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+class UpdateOrderListener(OrderLevelBookListener):
+    def __init__(self, logger, updates):
+        OrderLevelBookListener.__init__(self, logger)
+        self._updates = updates
+
+    def notify_book_update(self, order_book, causing_order_chain, tob_updated):
+        self._updates.append(order_book.name())
+
+    def clean_up_order_chain(self, order_chain):
+        pass
+
+
+def _process_order(handler, chain_id):
+    new_order = NewOrderCommand(chain_id * 10, 1000.0, chain_id, "user_a", MARKET, BID_SIDE, FAR, Price("34.50"), 10)
+    handler.process(new_order)
+    handler.process(AcknowledgementReport(chain_id * 10 + 1, 1000.1, chain_id, "user_a", MARKET, new_order,
+                                          Price("34.50"), 10, None))
+    return new_order
+
+
+def test_books_updated_in_registration_order():
+    updates = []
+    handler = OrderEventHandler(LOGGER)
+    names = ["book %d" % i for i in range(20)]
+    for name in names:
+        book = OrderLevelBook(MARKET, LOGGER, name=name)
+        book.add_order_level_book_listener("updates", UpdateOrderListener(LOGGER, updates))
+        handler.register_orderbook(MARKET, name, book)
+    assert [book.name() for book in handler.order_books(MARKET)] == names
+    _process_order(handler, 1)
+    assert updates == names
+    _process_order(handler, 2)
+    assert updates == names + names
+
+
+def test_aggregate_books_updated_last():
+    handler = OrderEventHandler(LOGGER)
+    aggregate = AggregateOrderLevelBook(MARKET, LOGGER, name="aggregate")
+    handler.register_orderbook(MARKET, "aggregate", aggregate)
+    first = OrderLevelBook(MARKET, LOGGER, name="first")
+    handler.register_orderbook(MARKET, "first", first)
+    second = OrderLevelBook(MARKET, LOGGER, name="second")
+    handler.register_orderbook(MARKET, "second", second)
+    assert handler.order_books(MARKET) == (first, second, aggregate)
+
+    # the same book registered again under another id is still only updated once
+    handler.register_orderbook(MARKET, "first again", first)
+    assert handler.order_book(MARKET, "first again") is first
+    assert handler.order_books(MARKET) == (first, second, aggregate)
+    assert handler.order_books(Market(Product("AAPL", "Apple"), Endpoint("Nasdaq", "NSDQ"),
+                                      PriceFactory("0.01"))) == ()
+
+
+def test_traced_and_rejects_not_applied(caplog):
+    tracer = RingBufferTracer(100)
+    handler = OrderEventHandler(LOGGER, tracer=tracer)
+    handler.register_orderbook(MARKET, "a", OrderLevelBook(MARKET, LOGGER, name="a"))
+    handler.register_orderbook(MARKET, "b", OrderLevelBook(MARKET, LOGGER, name="b"))
+    new_order = _process_order(handler, 1)
+    cancel = CancelCommand(20, 1001.0, 1, "user_a", MARKET, CancelReasons.USER_CANCEL)
+    handler.process(cancel)
+    with caplog.at_level(logging.WARNING):
+        handler.process(RejectReport(21, 1001.1, 1, "user_a", MARKET, cancel, RejectReasons.ORDER_CLOSED))
+    assert not caplog.records
+    handler.process(CancelReport(22, 1001.2, 1, "user_a", MARKET, cancel, CancelReasons.USER_CANCEL))
+    applied = [(record.source, record.event_id) for record in tracer.records() if record.action == APPLY_TO_BOOK]
+    assert applied == [("a", 11), ("b", 11), ("a", 22), ("b", 22)]
+    assert handler.order_book(MARKET, "a").best_price(BID_SIDE) is None
+    assert new_order.chain_id() not in handler.chain_ids()
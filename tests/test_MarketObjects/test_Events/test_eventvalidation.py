@@ -0,0 +1,89 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+import random
+from buttonwood.MarketObjects.CancelReasons import USER_CANCEL
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Events.EventValidation import validate_event_stream
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.Simulation.MatchingEngine import MatchingEngine
+from buttonwood.utils.IDGenerators import MonotonicIntID
+from buttonwood.utils.validation import trusted_input
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def test_valid_stream():
+    rng = random.Random(3)
+    ids = MonotonicIntID()
+    engine = MatchingEngine(MARKET, LOGGER, event_id_generator=ids)
+    events = []
+    for i in range(300):
+        event_id = ids.id()
+        side = BID_SIDE if rng.random() < 0.5 else ASK_SIDE
+        command = NewOrderCommand(event_id, 1000.0 + i, event_id, "user_a", MARKET, side, FAR,
+                                  Price("34.%02d" % rng.randint(45, 55)), rng.randint(1, 10))
+        events.append(command)
+        events.extend(engine.process(command))
+    assert validate_event_stream(events) == []
+    assert validate_event_stream(iter(events)) == []
+
+
+def test_invalid_stream():
+    with trusted_input():
+        new_order = NewOrderCommand(1, 1000.0, 1, "user_a", MARKET, BID_SIDE, FAR, Price("34.505"), 10)
+        events = [new_order,
+                  AcknowledgementReport(2, 1000.1, 1, "user_a", MARKET, new_order, Price("34.505"), -1, None),
+                  NewOrderCommand(3, 999.0, 1, "user_b", MARKET, BID_SIDE, 99, Price("34.50"), 0),
+                  CancelCommand(4, 1001.0, 7, "user_a", MARKET, USER_CANCEL),
+                  "not an event"]
+    errors = validate_event_stream(events)
+    assert [(error.index(), error.message()) for error in errors] == [
+        (0, "price 34.505 is not a valid price for %s" % str(MARKET)),
+        (1, "price 34.505 is not a valid price for %s" % str(MARKET)),
+        (1, "qty -1 is not a non-negative int"),
+        (2, "timestamp 999.0 is before the previous event's 1000.1"),
+        (2, "chain id 1 is already used"),
+        (2, "qty 0 is not a positive int"),
+        (2, "time in force 99 is not known"),
+        (3, "chain id 7 has no earlier new order"),
+        (4, "str is not an OrderEvent")]
+    assert len(validate_event_stream(events, max_errors=2)) == 2
+    assert str(errors[-1]) == "Event 4 (id None): str is not an OrderEvent"
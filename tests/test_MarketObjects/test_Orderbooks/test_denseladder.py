@@ -0,0 +1,190 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+import random
+from decimal import Decimal
+from buttonwood.MarketObjects.CancelReasons import USER_CANCEL
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReplaceCommand
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import DenseSideLadder
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import SideDict
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.Simulation.MatchingEngine import MatchingEngine
+from buttonwood.utils.IDGenerators import MonotonicIntID
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def _assert_same(ladder, side_dict):
+    assert len(ladder) == len(side_dict)
+    assert ladder.max_price() == side_dict.max_price()
+    assert ladder.min_price() == side_dict.min_price()
+    assert ladder.sorted_prices() == side_dict.sorted_prices()
+    assert ladder.sorted_prices(reverse=True) == side_dict.sorted_prices(reverse=True)
+    assert sorted(ladder.items()) == sorted(side_dict.items())
+
+
+def test_basics():
+    ladder = DenseSideLadder(Decimal("0.01"), band=16)
+    assert ladder.max_price() is None
+    assert ladder.min_price() is None
+    assert ladder.sorted_prices() == []
+    assert ladder.get(Price("34.50")) is None
+    assert Price("34.50") not in ladder
+
+    ladder[Price("34.50")] = "a"
+    ladder[Price("34.45")] = "b"
+    ladder[Price("34.52")] = "c"
+    ladder[Price("34.50")] = "d"
+    assert ladder.is_dense()
+    assert len(ladder) == 3
+    assert ladder[Price("34.50")] == "d"
+    assert ladder.max_price() == Price("34.52")
+    assert ladder.min_price() == Price("34.45")
+    assert ladder.sorted_prices() == [Price("34.45"), Price("34.50"), Price("34.52")]
+    assert ladder.sorted_prices(reverse=True) == [Price("34.52"), Price("34.50"), Price("34.45")]
+
+    del ladder[Price("34.52")]
+    assert ladder.max_price() == Price("34.50")
+    try:
+        del ladder[Price("34.52")]
+        assert False, "deleting a price that isn't there should raise a KeyError"
+    except KeyError:
+        pass
+    try:
+        ladder[Price("99.99")]
+        assert False, "getting a price that isn't there should raise a KeyError"
+    except KeyError:
+        pass
+
+
+def test_recenter_then_sparse_then_dense_again():
+    ladder = DenseSideLadder(Decimal("0.01"), band=16)
+    ladder[Price("34.50")] = 1
+    ladder[Price("34.45")] = 2
+    # out of the band, but the live prices still fit once it is moved
+    ladder[Price("34.57")] = 3
+    assert ladder.is_dense()
+    assert ladder.sorted_prices() == [Price("34.45"), Price("34.50"), Price("34.57")]
+    assert ladder[Price("34.45")] == 2
+    # too wide for the band
+    ladder[Price("35.00")] = 4
+    assert not ladder.is_dense()
+    assert ladder.sorted_prices() == [Price("34.45"), Price("34.50"), Price("34.57"), Price("35.00")]
+    assert ladder.max_price() == Price("35.00")
+    for price in ladder.sorted_prices()[:]:
+        del ladder[price]
+    assert ladder.is_dense()
+    assert len(ladder) == 0
+    # an empty ladder moves its band to wherever the next price is
+    ladder[Price("80.00")] = 5
+    assert ladder.is_dense()
+    assert ladder.max_price() == Price("80.00")
+
+
+def test_random_against_side_dict():
+    rng = random.Random(2)
+    ladder = DenseSideLadder(Decimal("0.01"), band=64)
+    side_dict = SideDict()
+    for i in range(5000):
+        # mostly in a narrow band, occasionally far away
+        if rng.random() < 0.01:
+            price = Price("%d.%02d" % (rng.randint(40, 60), rng.randint(0, 99)))
+        else:
+            price = Price("34.%02d" % rng.randint(20, 70))
+        if price in side_dict and rng.random() < 0.5:
+            del ladder[price]
+            del side_dict[price]
+        else:
+            ladder[price] = i
+            side_dict[price] = i
+        assert ladder.get(price) == side_dict.get(price)
+        assert (price in ladder) == (price in side_dict)
+        if i % 50 == 0:
+            _assert_same(ladder, side_dict)
+    _assert_same(ladder, side_dict)
+
+
+def test_dense_order_level_book_matches_sparse():
+    rng = random.Random(4)
+    ids = MonotonicIntID()
+    engine = MatchingEngine(MARKET, LOGGER, event_id_generator=ids)
+    handler = OrderEventHandler(LOGGER)
+    sparse = OrderLevelBook(MARKET, LOGGER)
+    handler.register_orderbook(MARKET, "sparse", sparse)
+    dense = OrderLevelBook(MARKET, LOGGER, dense_band=32)
+    handler.register_orderbook(MARKET, "dense", dense)
+    resting = []
+    for i in range(3000):
+        timestamp = float(i)
+        if rng.random() < 0.6 or not resting:
+            event_id = ids.id()
+            # now and then far enough away to push the dense ladders to sparse
+            cents = rng.randint(40, 60) if rng.random() < 0.99 else rng.randint(0, 99)
+            command = NewOrderCommand(event_id, timestamp, event_id, "user_a", MARKET,
+                                      rng.choice([BID_SIDE, ASK_SIDE]), FAR,
+                                      Price("%d.%02d" % (34 if cents >= 40 else 33, cents)), rng.randint(1, 20),
+                                      iceberg_peak_qty=rng.choice([None, 3]))
+        else:
+            resting_command = resting.pop(rng.randrange(len(resting)))
+            if not engine.is_resting(resting_command.chain_id()):
+                continue
+            if rng.random() < 0.5:
+                command = CancelCommand(ids.id(), timestamp, resting_command.chain_id(), "user_a", MARKET,
+                                        USER_CANCEL)
+            else:
+                command = CancelReplaceCommand(ids.id(), timestamp, resting_command.chain_id(), "user_a", MARKET,
+                                               resting_command.side(), Price("34.%02d" % rng.randint(40, 60)),
+                                               rng.randint(1, 20))
+        handler.process(command)
+        for report in engine.process(command):
+            handler.process(report)
+        if engine.is_resting(command.chain_id()):
+            resting.append(command)
+        for side in [BID_SIDE, ASK_SIDE]:
+            assert dense.best_price(side) == sparse.best_price(side)
+            assert dense.prices(side) == sparse.prices(side)
+        if i % 100 == 0:
+            for side in [BID_SIDE, ASK_SIDE]:
+                for price in sparse.prices(side):
+                    assert [c.chain_id() for c in dense.order_chains_at_price(side, price)] == \
+                        [c.chain_id() for c in sparse.order_chains_at_price(side, price)]
+                    assert dense.visible_qty_at_price(side, price) == sparse.visible_qty_at_price(side, price)
@@ -675,3 +675,82 @@ def test_cancel_confirm_entire_price_level():
     assert bid_prices[0] == Price("34.50")
     assert ob.best_bid_price() == Price("34.50")
     assert ob.best_bid_level() == PriceLevel(Price("34.50"), 120, 0, 2)
+
+
+def test_visible_qty_ahead():
+    ob = build_base_order_book()
+    # bids at 34.50 are 1001 for 50 then 1004 for 70
+    assert ob.visible_qty_ahead(BID_SIDE, Price("34.50"), 1001) == 0
+    assert ob.visible_qty_ahead(BID_SIDE, Price("34.50"), 1004) == 50
+    assert ob.visible_qty_ahead(BID_SIDE, Price("34.49"), 1004) is None
+    assert ob.visible_qty_ahead(BID_SIDE, Price("34.50"), 1002) is None
+    # asks at 34.52 are 1002 for 10 (25 hidden) then 1003 for 20
+    assert ob.visible_qty_ahead(ASK_SIDE, Price("34.52"), 1003) == 10
+
+    # partial fill of the first ask reduces the qty ahead of the second
+    chain_aggressed_into = ob.best_priority_chain(ASK_SIDE)
+    agg_new = NewOrderCommand(101, 1234002.123, 1008, "user_z", MARKET, BID_SIDE, FAR,
+                              Price("34.52"), 5)
+    pf = PartialFillReport(102, 1234002.123, 1002, "user_b", MARKET, agg_new, 5, Price('34.52'),
+                           ASK_SIDE, 3333, 30)
+    chain_aggressed_into.apply_partial_fill_report(pf)
+    ob.handle_partial_fill_report(pf, chain_aggressed_into)
+    assert ob.visible_qty_ahead(ASK_SIDE, Price("34.52"), 1003) == 5
+
+    # cancel replace down in qty of the first bid reduces the qty ahead of the second
+    chain = ob.best_priority_chain(BID_SIDE)
+    cr = CancelReplaceCommand(77, 1234012.123, chain.chain_id(), chain.user_id(), MARKET, chain.side(),
+                              chain.current_price(), 40)
+    chain.apply_cancel_replace_command(cr)
+    cr_ack = AcknowledgementReport(78, 1234012.123, chain.chain_id(), chain.user_id(), MARKET, cr,
+                                   chain.current_price(), 40, 40)
+    chain.apply_acknowledgement_report(cr_ack)
+    ob.handle_acknowledgement_report(cr_ack, chain)
+    assert ob.visible_qty_ahead(BID_SIDE, Price("34.50"), 1004) == 40
+    assert ob.visible_qty_at_price(BID_SIDE, Price("34.50")) == 110
+
+    # cancel the first bid and nothing is ahead of the second
+    cancel = CancelCommand(79, 1234013.123, chain.chain_id(), chain.user_id(), MARKET, USER_CANCEL)
+    chain.apply_cancel_command(cancel)
+    cancel_report = CancelReport(80, 1234013.123, chain.chain_id(), chain.user_id(), MARKET, cancel, USER_CANCEL)
+    chain.apply_cancel_report(cancel_report)
+    ob.handle_cancel_report(cancel_report, chain)
+    assert ob.visible_qty_ahead(BID_SIDE, Price("34.50"), 1004) == 0
+    assert ob.visible_qty_at_price(BID_SIDE, Price("34.50")) == 70
+
+
+def test_cancel_replace_same_price_and_qty_removing_iceberg_peak():
+    ob = build_base_order_book()
+    # asks at 34.52 are 1002 for 10 (25 hidden) then 1003 for 20
+    chain = ob.best_priority_chain(ASK_SIDE)
+    assert chain.chain_id() == 1002
+    cr = CancelReplaceCommand(77, 1234012.123, chain.chain_id(), chain.user_id(), MARKET, chain.side(),
+                              chain.current_price(), chain.current_qty())
+    chain.apply_cancel_replace_command(cr)
+    cr_ack = AcknowledgementReport(78, 1234012.123, chain.chain_id(), chain.user_id(), MARKET, cr,
+                                   chain.current_price(), chain.current_qty(), None)
+    chain.apply_acknowledgement_report(cr_ack)
+    assert chain.visible_qty() == 35
+    assert ob.handle_acknowledgement_report(cr_ack, chain) == (True, True)
+    # no priority change, but all of it is visible now
+    assert ob.best_priority_chain(ASK_SIDE).chain_id() == 1002
+    assert ob.visible_qty_at_price(ASK_SIDE, Price("34.52")) == 55
+    assert ob.hidden_qty_at_price(ASK_SIDE, Price("34.52")) == 0
+    assert ob.visible_qty_ahead(ASK_SIDE, Price("34.52"), 1003) == 35
+
+
+def test_qty_and_best_price_excluding():
+    ob = build_base_order_book()
+    assert ob.qty_at_price_excluding(ASK_SIDE, Price("34.52"), {1002}) == 20
+    assert ob.qty_at_price_excluding(ASK_SIDE, Price("34.52"), {1003}) == 35
+    assert ob.qty_at_price_excluding(ASK_SIDE, Price("34.52"), {1003}, include_hidden=False) == 10
+    assert ob.qty_at_price_excluding(ASK_SIDE, Price("34.52"), set()) == 55
+    assert ob.qty_at_price_excluding(ASK_SIDE, Price("34.55"), {1003}) == 0
+    assert ob.best_price_excluding(BID_SIDE, {1001}) == Price("34.50")
+    assert ob.best_price_excluding(BID_SIDE, {1001, 1004}) is None
+    b3 = NewOrderCommand(11, 1234003.123, 1005, "user_y", MARKET, BID_SIDE, FAR, Price("34.49"), 10)
+    bid_oec3 = OrderEventChain(b3, LOGGER, SUBCHAIN_ID_GENERATOR)
+    b3_ack = AcknowledgementReport(12, 1234003.123, 1005, "user_y", MARKET, b3, Price("34.49"), 10, 10)
+    bid_oec3.apply_acknowledgement_report(b3_ack)
+    ob.handle_acknowledgement_report(b3_ack, bid_oec3)
+    assert ob.best_price_excluding(BID_SIDE, {1001, 1004}) == Price("34.49")
@@ -0,0 +1,214 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+import random
+from buttonwood.MarketMetrics.OrderLevelBookListeners.DepthDeltaListener import DepthDeltaDecoder
+from buttonwood.MarketMetrics.OrderLevelBookListeners.DepthDeltaListener import DepthDeltaListener
+from buttonwood.MarketMetrics.OrderLevelBookListeners.MicroPriceListener import MicroPriceListener
+from buttonwood.MarketMetrics.OrderLevelBookListeners.TopOfBookSeriesListener import TopOfBookSeriesListener
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.OrderBooks.PriceLevelBook import PriceLevelBook
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.Simulation.MatchingEngine import MatchingEngine
+from buttonwood.utils.IDGenerators import MonotonicIntID
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def test_level_updates():
+    book = PriceLevelBook(MARKET, LOGGER)
+    assert book.best_price(BID_SIDE) is None
+    assert book.prices(ASK_SIDE) == []
+    assert book.apply_updates([(BID_SIDE, Price("34.50"), 100, 0, 3),
+                               (BID_SIDE, Price("34.48"), 50, 10, None),
+                               (ASK_SIDE, Price("34.53"), 70, 0, 2),
+                               (ASK_SIDE, Price("34.55"), 20, 0, 1)], 1.0, event_id=1)
+    assert book.last_update_time() == 1.0
+    assert book.prices(BID_SIDE) == [Price("34.50"), Price("34.48")]
+    assert book.ask_prices() == [Price("34.53"), Price("34.55")]
+    assert book.best_bid_price() == Price("34.50")
+    assert book.visible_qty_at_price(BID_SIDE, Price("34.48")) == 50
+    assert book.hidden_qty_at_price(BID_SIDE, Price("34.48")) == 10
+    assert book.total_qty_at_price(BID_SIDE, Price("34.48")) == 60
+    assert book.num_orders_at_price(BID_SIDE, Price("34.48")) is None
+    assert book.num_orders_at_price(BID_SIDE, Price("34.50")) == 3
+    assert book.num_orders_at_price(BID_SIDE, Price("34.49")) == 0
+    assert book.visible_qty_at_price(ASK_SIDE, Price("34.50")) == 0
+    # far outside the ladder
+    assert book.visible_qty_at_price(ASK_SIDE, Price("340.50")) == 0
+    level = book.best_level(ASK_SIDE)
+    assert (level.price(), level.visible_qty(), level.number_of_orders()) == (Price("34.53"), 70, 2)
+    assert book.level_at_price(ASK_SIDE, Price("34.54")) is None
+    assert book.price_is_bid(Price("34.49"))
+    assert book.price_is_ask(Price("34.60"))
+
+    # a change behind the top of book
+    assert not book.apply_level(BID_SIDE, Price("34.48"), 40, 10, None, 2.0)
+    # removing the best bid moves the top of book to the next level
+    assert book.apply_level(BID_SIDE, Price("34.50"), 0, 0, 0, 3.0)
+    assert book.best_price(BID_SIDE) == Price("34.48")
+    assert book.num_levels(BID_SIDE) == 1
+    # removing a level that isn't there changes nothing
+    assert not book.apply_level(BID_SIDE, Price("34.40"), 0, 0, 0, 4.0)
+    assert book.levels(ASK_SIDE) == [(Price("34.53"), 70, 0, 2), (Price("34.55"), 20, 0, 1)]
+    assert book.levels(ASK_SIDE, depth=1) == [(Price("34.53"), 70, 0, 2)]
+
+    assert book.apply_snapshot([(ASK_SIDE, Price("34.60"), 5, 0, 1)], 5.0)
+    assert book.prices(BID_SIDE) == []
+    assert book.prices(ASK_SIDE) == [Price("34.60")]
+    assert book.visible_qty_at_price(ASK_SIDE, Price("34.53")) == 0
+
+
+def test_ladders_grow_and_move():
+    book = PriceLevelBook(MARKET, LOGGER, ladder_size=8)
+    book.apply_level(BID_SIDE, Price("34.50"), 10, 0, 1, 1.0)
+    book.apply_updates([(BID_SIDE, Price("80.00"), 20, 0, 1), (BID_SIDE, Price("1.00"), 30, 0, 1)], 2.0)
+    assert book.prices(BID_SIDE) == [Price("80.00"), Price("34.50"), Price("1.00")]
+    assert book.visible_qty_at_price(BID_SIDE, Price("1.00")) == 30
+    book.apply_updates([(BID_SIDE, price, 0, 0, 0) for price in book.prices(BID_SIDE)], 3.0)
+    assert book.best_price(BID_SIDE) is None
+    # an empty ladder just moves to where the prices are
+    book.apply_level(BID_SIDE, Price("500.00"), 10, 0, 1, 4.0)
+    assert book.prices(BID_SIDE) == [Price("500.00")]
+    book.apply_level(ASK_SIDE, Price("-2.00"), 10, 0, 1, 4.0)
+    assert book.best_price(ASK_SIDE) == Price("-2.00")
+
+
+def test_far_away_levels_stay_outside_the_ladder():
+    book = PriceLevelBook(MARKET, LOGGER)
+    book.apply_updates([(ASK_SIDE, Price("100.00"), 10, 0, 1), (ASK_SIDE, Price("100.02"), 5, 0, 1)], 1.0)
+    # a stub quote far from the rest of the book doesn't grow the ladder to cover it
+    book.apply_level(ASK_SIDE, Price("99999.00"), 1, 0, 1, 2.0)
+    ladder = book._ladders[ASK_SIDE]
+    assert ladder.size == 1024
+    assert book.prices(ASK_SIDE) == [Price("100.00"), Price("100.02"), Price("99999.00")]
+    assert book.levels(ASK_SIDE, depth=2) == [(Price("100.00"), 10, 0, 1), (Price("100.02"), 5, 0, 1)]
+    assert book.visible_qty_at_price(ASK_SIDE, Price("99999.00")) == 1
+    assert book.num_levels(ASK_SIDE) == 3
+    # and deleting something far away that isn't there doesn't either
+    assert not book.apply_level(ASK_SIDE, Price("0.01"), 0, 0, 0, 3.0)
+    assert ladder.size == 1024
+    book.apply_updates([(ASK_SIDE, Price("100.00"), 0, 0, 0), (ASK_SIDE, Price("100.02"), 0, 0, 0)], 4.0)
+    assert book.best_price(ASK_SIDE) == Price("99999.00")
+    # once the ladder is empty it moves to the next price, taking in the far level if it now covers it
+    book.apply_level(ASK_SIDE, Price("99998.00"), 3, 0, 1, 5.0)
+    assert len(ladder.outside) == 0
+    assert book.levels(ASK_SIDE) == [(Price("99998.00"), 3, 0, 1), (Price("99999.00"), 1, 0, 1)]
+    assert book.apply_level(ASK_SIDE, Price("99998.00"), 0, 0, 0, 6.0)
+    assert book.best_level(ASK_SIDE).visible_qty() == 1
+
+
+def test_random_updates_match_dict_book():
+    for ladder_size, max_ladder_size in [(4, 65536), (4, 16)]:
+        _check_random_updates(ladder_size, max_ladder_size)
+
+
+def _check_random_updates(ladder_size, max_ladder_size):
+    rng = random.Random(3)
+    book = PriceLevelBook(MARKET, LOGGER, ladder_size=ladder_size, max_ladder_size=max_ladder_size)
+    expected = {BID_SIDE: {}, ASK_SIDE: {}}
+    for i in range(3000):
+        updates = []
+        for _ in range(rng.randint(1, 4)):
+            side = rng.choice([BID_SIDE, ASK_SIDE])
+            price = Price("%d.%02d" % (rng.choice([34, 34, 34, 35, 60]), rng.randint(0, 99)))
+            visible_qty = rng.choice([0, 0, rng.randint(1, 100)])
+            num_orders = rng.choice([None, rng.randint(1, 5)])
+            updates.append((side, price, visible_qty, 0, num_orders))
+            if visible_qty == 0:
+                expected[side].pop(price, None)
+            else:
+                expected[side][price] = (visible_qty, num_orders)
+        book.apply_updates(updates, float(i))
+        for side in [BID_SIDE, ASK_SIDE]:
+            prices = sorted(expected[side], reverse=side.is_bid())
+            assert book.prices(side) == prices
+            assert book.best_price(side) == (prices[0] if prices else None)
+    for side in [BID_SIDE, ASK_SIDE]:
+        assert book.levels(side) == [(price, visible_qty, 0, num_orders) for price, (visible_qty, num_orders) in
+                                     sorted(expected[side].items(), reverse=side.is_bid())]
+
+
+def test_listeners_and_depth_deltas():
+    # an order level book's depth deltas drive a price level book, which feeds the same listeners
+    handler = OrderEventHandler(LOGGER)
+    order_book = OrderLevelBook(MARKET, LOGGER)
+    handler.register_orderbook(MARKET, "book", order_book)
+    deltas = DepthDeltaListener(LOGGER)
+    order_book.add_order_level_book_listener("deltas", deltas)
+    order_micro_price = MicroPriceListener(LOGGER)
+    order_book.add_order_level_book_listener("micro", order_micro_price)
+    order_tob = TopOfBookSeriesListener(LOGGER)
+    order_book.add_order_level_book_listener("tob", order_tob)
+
+    level_book = PriceLevelBook(MARKET, LOGGER)
+    level_micro_price = MicroPriceListener(LOGGER)
+    level_book.add_order_level_book_listener("micro", level_micro_price)
+    level_tob = TopOfBookSeriesListener(LOGGER)
+    level_book.add_order_level_book_listener("tob", level_tob)
+
+    rng = random.Random(8)
+    ids = MonotonicIntID()
+    engine = MatchingEngine(MARKET, LOGGER, event_id_generator=ids)
+    decoder = DepthDeltaDecoder()
+    read = 0
+    for i in range(1000):
+        event_id = ids.id()
+        command = NewOrderCommand(event_id, float(i), event_id, "user_a", MARKET, rng.choice([BID_SIDE, ASK_SIDE]),
+                                  FAR, Price("34.%02d" % rng.randint(40, 60)), rng.randint(1, 20))
+        handler.process(command)
+        for report in engine.process(command):
+            handler.process(report)
+        encoded = deltas.encoded()
+        for batch in decoder.decode(encoded[read:]):
+            level_book.apply_updates(batch.deltas(), batch.timestamp(), batch.event_id())
+        read = len(encoded)
+        for side in [BID_SIDE, ASK_SIDE]:
+            assert level_book.prices(side) == order_book.prices(side)
+            for price in order_book.prices(side):
+                assert level_book.visible_qty_at_price(side, price) == order_book.visible_qty_at_price(side, price)
+                assert level_book.num_orders_at_price(side, price) == order_book.num_orders_at_price(side, price)
+        assert level_micro_price.micro_price(MARKET) == order_micro_price.micro_price(MARKET)
+    level_series = level_tob.series(MARKET).columns().to_dict()
+    order_series = order_tob.series(MARKET).columns().to_dict()
+    assert level_series.keys() == order_series.keys()
+    for name in order_series:
+        # repr so that NaNs (an empty side) compare equal
+        assert [repr(value) for value in level_series[name]] == [repr(value) for value in order_series[name]]
@@ -0,0 +1,98 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from buttonwood.MarketObjects.Allocation import FIFOAllocation
+from buttonwood.MarketObjects.Allocation import LMMAllocation
+from buttonwood.MarketObjects.Allocation import ProRataAllocation
+from buttonwood.MarketObjects.Allocation import TopOrderProRataAllocation
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+
+
+def test_fifo():
+    allocation = FIFOAllocation()
+    assert allocation.is_time_priority()
+    assert allocation.allocate(15, [10, 10, 10]) == [10, 5, 0]
+    assert allocation.allocate(50, [10, 10, 10]) == [10, 10, 10]
+    assert allocation.qty_ahead([10, 20, 30], 2) == 30
+    assert allocation.top_priority_index([10, 20, 30]) == 0
+    assert allocation.top_priority_index([]) is None
+
+
+def test_pro_rata():
+    allocation = ProRataAllocation()
+    assert not allocation.is_time_priority()
+    # 10 * 10/40 = 2.5 -> 2, 10 * 30/40 = 7.5 -> 7, 1 left goes to the first in line
+    assert allocation.allocate(10, [10, 30]) == [3, 7]
+    assert allocation.allocate(100, [10, 30]) == [10, 30]
+    assert sum(allocation.allocate(17, [5, 9, 13, 2])) == 17
+    assert allocation.qty_ahead([10, 30, 5], 1) == 15
+    assert allocation.top_priority_index([10, 30, 30]) == 1
+
+
+def test_pro_rata_min_allocation():
+    allocation = ProRataAllocation(min_allocation=3)
+    # shares of 1, 2 and 7 -> 0, 0 and 7 then the 3 left over go to the first in line
+    assert allocation.allocate(10, [10, 20, 70]) == [3, 0, 7]
+
+
+def test_top_order_pro_rata():
+    allocation = TopOrderProRataAllocation()
+    assert allocation.allocate(20, [10, 10, 30]) == [10, 3, 7]
+    assert allocation.qty_ahead([10, 10, 30], 0) == 0
+    assert allocation.qty_ahead([10, 10, 30], 1) == 40
+    capped = TopOrderProRataAllocation(top_order_max=4)
+    # 4 to the top order then 16 pro rata over 6, 10, 30
+    assert capped.allocate(20, [10, 10, 30]) == [4 + 3, 3, 10]
+    assert capped.qty_ahead([10, 10, 30], 0) == 40
+    assert capped.top_priority_index([10, 10, 30]) == 0
+
+
+def test_lmm():
+    allocation = LMMAllocation(["lmm"], 0.5)
+    # 10 carved out for the lmm, then 10 pro rata over 10, 20, 10 -> 2.5, 5, 2.5 -> 2, 5, 2 plus 1 to the first
+    assert allocation.allocate(20, [10, 20, 20], ["a", "b", "lmm"]) == [3, 5, 12]
+    # no lmm at the level is just the underlying allocation
+    assert allocation.allocate(20, [10, 30], ["a", "b"]) == ProRataAllocation().allocate(20, [10, 30])
+    assert allocation.top_priority_index([10, 20, 5], ["a", "b", "lmm"]) == 2
+    assert allocation.top_priority_index([10, 20, 5], ["a", "b", "c"]) == 1
+    fifo_lmm = LMMAllocation(["lmm"], 0.25, FIFOAllocation())
+    assert fifo_lmm.allocate(20, [10, 20, 20], ["a", "b", "lmm"]) == [10, 5, 5]
+    assert fifo_lmm.qty_ahead([10, 20, 20], 1, ["a", "b", "c"]) == 10
+
+
+def test_market_allocation():
+    market = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+    assert isinstance(market.allocation(), FIFOAllocation)
+    allocation = ProRataAllocation()
+    market = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"),
+                    allocation=allocation)
+    assert market.allocation() is allocation
@@ -0,0 +1,83 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import pytest
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAK
+from buttonwood.MarketObjects.Events.OrderEvents import FullFillReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Events.OrderEvents import PartialFillReport
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.MatchSeries import MatchSeries
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects.Side import ASK_SIDE
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+AGGRESSOR = NewOrderCommand(1, 1234000.0, 1001, "user_z", MARKET, BID_SIDE, FAK, Price("34.53"), 20)
+
+
+def test_running_aggregates():
+    series = MatchSeries(77)
+    series.add_fill(PartialFillReport(2, 1234000.0, 1001, "user_z", MARKET, AGGRESSOR, 10, Price("34.52"), BID_SIDE,
+                                      77, 10))
+    assert series.aggressive_qty() == 10
+    assert series.passive_qty() == 0
+    assert not series.balanced_match_qty()
+    with pytest.raises(Exception):
+        series.match_qty()
+    series.add_fill(FullFillReport(3, 1234000.0, 1002, "user_a", MARKET, AGGRESSOR, 10, Price("34.52"), ASK_SIDE, 77))
+    assert series.balanced_match_qty()
+    assert series.match_qty() == 10
+    series.add_fill(FullFillReport(4, 1234000.0, 1001, "user_z", MARKET, AGGRESSOR, 10, Price("34.53"), BID_SIDE, 77))
+    series.add_fill(PartialFillReport(5, 1234000.0, 1003, "user_b", MARKET, AGGRESSOR, 4, Price("34.53"), ASK_SIDE,
+                                      77, 6))
+    with pytest.raises(Exception):
+        series.qty_at_price(Price("34.53"))
+    series.add_fill(PartialFillReport(6, 1234000.0, 1003, "user_b", MARKET, AGGRESSOR, 6, Price("34.53"), ASK_SIDE,
+                                      77, 0))
+    assert series.match_qty() == 20
+    assert series.qty_at_price(Price("34.53")) == 10
+    assert series.notional() == pytest.approx(34.52 * 10 + 34.53 * 10)
+    assert series.average_price() == pytest.approx(34.525)
+    assert series.aggressor_fully_filled()
+    series.run_sanity_checks()
+
+
+def test_sanity_check_different_prices():
+    series = MatchSeries(78)
+    series.add_fill(FullFillReport(2, 1234000.0, 1001, "user_z", MARKET, AGGRESSOR, 10, Price("34.52"), BID_SIDE, 78))
+    series.add_fill(FullFillReport(3, 1234000.0, 1002, "user_a", MARKET, AGGRESSOR, 10, Price("34.53"), ASK_SIDE, 78))
+    assert series.balanced_match_qty()
+    with pytest.raises(Exception, match="does not have same prices"):
+        series.prices()
+    with pytest.raises(Exception, match="does not have same prices"):
+        series.run_sanity_checks()
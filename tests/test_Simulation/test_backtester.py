@@ -0,0 +1,250 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+import random
+from buttonwood.MarketObjects.CancelReasons import USER_CANCEL
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import FullFillReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.Simulation.Backtester import Backtester
+from buttonwood.Simulation.Backtester import FixedLatency
+from buttonwood.Simulation.Backtester import QueueDependentLatency
+from buttonwood.Simulation.Backtester import SampledLatency
+from buttonwood.Simulation.Backtester import Strategy
+from buttonwood.Simulation.MatchingEngine import MatchingEngine
+from buttonwood.utils.IDGenerators import MonotonicIntID
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def _history(num_commands, seed):
+    # commands and the reports a matching engine sent back for them, as a venue's event stream would have them
+    rng = random.Random(seed)
+    ids = MonotonicIntID()
+    engine = MatchingEngine(MARKET, LOGGER, event_id_generator=ids)
+    events = []
+    resting = []
+    timestamp = 1000.0
+    for _ in range(num_commands):
+        timestamp += 0.5
+        if rng.random() < 0.7 or not resting:
+            event_id = ids.id()
+            side = BID_SIDE if rng.random() < 0.5 else ASK_SIDE
+            command = NewOrderCommand(event_id, timestamp, event_id, "user_%d" % rng.randint(1, 3), MARKET, side, FAR,
+                                      Price("34.%02d" % rng.randint(45, 55)), rng.randint(1, 10))
+            resting.append(command)
+        else:
+            resting_command = resting.pop(rng.randrange(len(resting)))
+            if not engine.is_resting(resting_command.chain_id()):
+                continue
+            command = CancelCommand(ids.id(), timestamp, resting_command.chain_id(), resting_command.user_id(),
+                                    MARKET, USER_CANCEL)
+        events.append(command)
+        events.extend(engine.process(command))
+    return events
+
+
+class _Recorder(Strategy):
+
+    def __init__(self):
+        Strategy.__init__(self, LOGGER)
+        self.book_updates = 0
+        self.reports = []
+        self.timers = []
+
+    def on_book_update(self, backtester, order_book, causing_order_chain, tob_updated):
+        self.book_updates += 1
+
+    def on_report(self, backtester, report):
+        self.reports.append((backtester.now(), report))
+
+    def on_timer(self, backtester, timestamp, payload):
+        self.timers.append((timestamp, payload))
+
+
+def test_book_only_replay_matches_handler():
+    events = _history(500, 3)
+    strategy = _Recorder()
+    backtester = Backtester(MARKET, strategy, LOGGER, use_matching_engine=False)
+    backtester.run(events)
+    handler = OrderEventHandler(LOGGER)
+    book = OrderLevelBook(MARKET, LOGGER)
+    handler.register_orderbook(MARKET, "book", book)
+    for event in events:
+        handler.process(event)
+    for side in [BID_SIDE, ASK_SIDE]:
+        assert backtester.order_book().prices(side) == book.prices(side)
+        for price in book.prices(side):
+            assert backtester.order_book().visible_qty_at_price(side, price) == book.visible_qty_at_price(side, price)
+    assert backtester.historical_event_count() == len(events)
+    assert strategy.book_updates > 0
+
+
+def test_matching_engine_replay_rebuilds_history():
+    events = _history(500, 5)
+    backtester = Backtester(MARKET, _Recorder(), LOGGER)
+    backtester.run(events)
+    handler = OrderEventHandler(LOGGER)
+    book = OrderLevelBook(MARKET, LOGGER)
+    handler.register_orderbook(MARKET, "book", book)
+    for event in events:
+        handler.process(event)
+    for side in [BID_SIDE, ASK_SIDE]:
+        assert backtester.order_book().prices(side) == book.prices(side)
+
+
+class _TakeAtStart(Strategy):
+
+    def __init__(self):
+        Strategy.__init__(self, LOGGER)
+        self.chain_id = None
+        self.reports = []
+
+    def on_book_update(self, backtester, order_book, causing_order_chain, tob_updated):
+        best_ask = order_book.best_price(ASK_SIDE)
+        if self.chain_id is None and best_ask is not None:
+            self.chain_id = backtester.new_order(BID_SIDE, best_ask, 1)
+
+    def on_report(self, backtester, report):
+        self.reports.append((backtester.now(), report))
+
+
+def test_latency_and_fill_delivery():
+    ask_id = 1
+    events = [NewOrderCommand(ask_id, 1000.0, ask_id, "user_a", MARKET, ASK_SIDE, FAR, Price("34.52"), 5),
+              CancelCommand(2, 1000.5, ask_id, "user_a", MARKET, USER_CANCEL),
+              NewOrderCommand(3, 1002.0, 3, "user_b", MARKET, BID_SIDE, FAR, Price("34.50"), 5)]
+    strategy = _TakeAtStart()
+    backtester = Backtester(MARKET, strategy, LOGGER, latency_model=FixedLatency(0.1))
+    backtester.run(events)
+    # the buy got to the venue at 1000.1, ahead of the cancel, and the fill got back at 1000.2
+    assert strategy.chain_id < 0
+    assert [(timestamp, type(report)) for timestamp, report in strategy.reports] == [(1000.2, FullFillReport)]
+    assert strategy.reports[0][1].timestamp() == 1000.1
+    assert backtester.open_chain_ids() == []
+    # and the rest of the ask was cancelled
+    assert backtester.order_book().best_price(ASK_SIDE) is None
+    assert backtester.order_book().best_price(BID_SIDE) == Price("34.50")
+
+    # with more latency than the cancel, the buy misses and rests
+    strategy = _TakeAtStart()
+    backtester = Backtester(MARKET, strategy, LOGGER, latency_model=FixedLatency(1.0))
+    backtester.run(events)
+    assert [type(report).__name__ for _, report in strategy.reports] == ["AcknowledgementReport"]
+    assert backtester.open_chain_ids() == [strategy.chain_id]
+    assert backtester.order_book().best_price(BID_SIDE) == Price("34.52")
+
+
+class _Burst(Strategy):
+
+    def __init__(self):
+        Strategy.__init__(self, LOGGER)
+        self.acks = []
+
+    def on_start(self, backtester):
+        backtester.schedule_timer(1000.0, "burst")
+
+    def on_timer(self, backtester, timestamp, payload):
+        for i in range(3):
+            backtester.new_order(BID_SIDE, Price("34.4%d" % i), 1)
+        backtester.idle_until(2000.0)
+
+    def on_report(self, backtester, report):
+        self.acks.append(report.timestamp())
+
+
+def test_timers_idle_and_queue_latency():
+    events = _history(100, 9)
+    strategy = _Burst()
+    backtester = Backtester(MARKET, strategy, LOGGER, latency_model=QueueDependentLatency(0.01, 0.01))
+    backtester.run([NewOrderCommand(-100, 999.0, -100, "user_a", MARKET, ASK_SIDE, FAR, Price("34.60"), 1)] + events)
+    assert strategy.acks == [1000.01, 1000.02, 1000.03]
+    assert backtester.in_flight() == 0
+
+
+def test_sampled_latency_and_idle():
+    rng = random.Random(1)
+    latency = SampledLatency(lambda: rng.uniform(-1, 1))
+    assert all(0 <= latency.latency(0.0, 0) <= 1 for _ in range(100))
+    strategy = _Recorder()
+    backtester = Backtester(MARKET, strategy, LOGGER)
+    backtester.idle_until(float("inf"))
+    backtester.run(_history(100, 2))
+    assert strategy.book_updates == 0
+
+
+class _RestAtStart(Strategy):
+
+    def __init__(self):
+        Strategy.__init__(self, LOGGER)
+        self.chain_id = None
+        self.reports = []
+
+    def on_start(self, backtester):
+        self.chain_id = backtester.new_order(BID_SIDE, Price("34.50"), 5)
+
+    def on_report(self, backtester, report):
+        self.reports.append((backtester.now(), type(report).__name__))
+
+
+def test_order_at_start():
+    events = [NewOrderCommand(1, 1000.0, 1, "user_a", MARKET, ASK_SIDE, FAR, Price("34.52"), 5),
+              NewOrderCommand(2, 1001.0, 2, "user_b", MARKET, ASK_SIDE, FAR, Price("34.50"), 2)]
+    strategy = _RestAtStart()
+    backtester = Backtester(MARKET, strategy, LOGGER, latency_model=FixedLatency(0.1))
+    backtester.run(events)
+    # sent at the first event's time, acked then partially filled by user_b's sell
+    assert strategy.reports == [(1000.2, "AcknowledgementReport"), (1001.1, "PartialFillReport")]
+    assert backtester.open_chain_ids() == [strategy.chain_id]
+
+    # with an explicit start time, and no history at all
+    strategy = _RestAtStart()
+    backtester = Backtester(MARKET, strategy, LOGGER, latency_model=FixedLatency(0.5))
+    backtester.run([], start_time=500.0)
+    assert strategy.reports == [(501.0, "AcknowledgementReport")]
+
+    # with neither there is no time to send the order at
+    backtester = Backtester(MARKET, _RestAtStart(), LOGGER)
+    try:
+        backtester.run([])
+        assert False, "sending an order without a start time should raise"
+    except Exception as e:
+        assert "start_time" in str(e)
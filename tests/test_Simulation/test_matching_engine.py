@@ -0,0 +1,233 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+import random
+from buttonwood.MarketObjects import CancelReasons
+from buttonwood.MarketObjects.Allocation import ProRataAllocation
+from buttonwood.MarketObjects import RejectReasons
+from buttonwood.MarketObjects.CancelReasons import USER_CANCEL
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAK
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEventConstants import FOK
+from buttonwood.MarketObjects.Events.OrderEventConstants import MARKET as MARKET_ORDER
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReplaceCommand
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.Simulation.MatchingEngine import MatchingEngine
+from buttonwood.utils.IDGenerators import MonotonicIntID
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+class _Sim(object):
+
+    def __init__(self, market=MARKET):
+        self.market = market
+        self.ids = MonotonicIntID()
+        self.engine = MatchingEngine(market, LOGGER, event_id_generator=self.ids)
+        self.handler = OrderEventHandler(LOGGER)
+        self.book = OrderLevelBook(market, LOGGER)
+        self.handler.register_orderbook(market, "book", self.book)
+        self.timestamp = 1000.0
+
+    def send(self, command):
+        self.handler.process(command)
+        reports = self.engine.process(command)
+        for report in reports:
+            self.handler.process(report)
+        return reports
+
+    def new(self, user_id, side, price, qty, time_in_force=FAR, peak=None, limit_or_market=None):
+        self.timestamp += 1
+        event_id = self.ids.id()
+        kwargs = {} if limit_or_market is None else {"limit_or_market": limit_or_market}
+        command = NewOrderCommand(event_id, self.timestamp, event_id, user_id, self.market, side, time_in_force,
+                                  Price(price), qty, iceberg_peak_qty=peak, **kwargs)
+        return command, self.send(command)
+
+    def replace(self, chain_id, user_id, side, price, qty):
+        self.timestamp += 1
+        return self.send(CancelReplaceCommand(self.ids.id(), self.timestamp, chain_id, user_id, self.market, side,
+                                              Price(price), qty))
+
+    def cancel(self, chain_id, user_id):
+        self.timestamp += 1
+        return self.send(CancelCommand(self.ids.id(), self.timestamp, chain_id, user_id, self.market, USER_CANCEL))
+
+    def assert_books_match(self):
+        for side in [BID_SIDE, ASK_SIDE]:
+            assert self.book.best_price(side) == self.engine.best_price(side)
+            for price in self.book.prices(side):
+                assert self.engine.qty_at_price(side, price) == \
+                    self.book.visible_qty_at_price(side, price) + self.book.hidden_qty_at_price(side, price)
+
+
+def _types(reports):
+    return [type(r).__name__ for r in reports]
+
+
+def test_far_sweep_then_rest():
+    sim = _Sim()
+    a, _ = sim.new("user_a", ASK_SIDE, "34.52", 10)
+    b, _ = sim.new("user_b", ASK_SIDE, "34.52", 10)
+    c, _ = sim.new("user_c", ASK_SIDE, "34.53", 10)
+    buy, reports = sim.new("user_z", BID_SIDE, "34.53", 35)
+    assert _types(reports) == ["PartialFillReport", "FullFillReport"] * 3 + ["AcknowledgementReport"]
+    assert [r.chain_id() for r in reports] == [buy.chain_id(), a.chain_id(), buy.chain_id(), b.chain_id(),
+                                               buy.chain_id(), c.chain_id(), buy.chain_id()]
+    assert len(set(r.match_id() for r in reports[:-1])) == 1
+    assert reports[-1].qty() == 5
+    assert sim.book.best_price(BID_SIDE) == Price("34.53")
+    assert sim.book.best_price(ASK_SIDE) is None
+    sim.assert_books_match()
+
+
+def test_fak_fok_and_market_orders():
+    sim = _Sim()
+    sim.new("user_a", ASK_SIDE, "34.52", 10)
+    sim.new("user_a", ASK_SIDE, "34.54", 10)
+    _, reports = sim.new("user_z", BID_SIDE, "34.53", 15, time_in_force=FAK)
+    assert _types(reports) == ["PartialFillReport", "FullFillReport", "CancelReport"]
+    assert reports[-1].cancel_reason() == CancelReasons.FAK_REMAINDER
+    _, reports = sim.new("user_z", BID_SIDE, "34.54", 15, time_in_force=FOK)
+    assert _types(reports) == ["CancelReport"]
+    assert reports[0].cancel_reason() == CancelReasons.FOK_CANCEL
+    assert sim.book.visible_qty_at_price(ASK_SIDE, Price("34.54")) == 10
+    _, reports = sim.new("user_z", BID_SIDE, "34.54", 10, time_in_force=FOK)
+    assert _types(reports) == ["FullFillReport", "FullFillReport"]
+    sim.new("user_a", ASK_SIDE, "34.60", 10)
+    _, reports = sim.new("user_z", BID_SIDE, "34.50", 15, limit_or_market=MARKET_ORDER)
+    assert _types(reports) == ["PartialFillReport", "FullFillReport", "CancelReport"]
+    sim.assert_books_match()
+
+
+def test_iceberg_refresh_goes_to_back():
+    sim = _Sim()
+    iceberg, reports = sim.new("user_a", ASK_SIDE, "34.52", 30, peak=10)
+    assert reports[0].iceberg_peak_qty() == 10
+    other, _ = sim.new("user_b", ASK_SIDE, "34.52", 10)
+    _, reports = sim.new("user_z", BID_SIDE, "34.52", 15)
+    # all 10 visible of the iceberg, then 5 of user_b, who is now ahead of the refreshed iceberg
+    assert [(r.chain_id(), r.fill_qty()) for r in reports if not r.is_aggressor()] == \
+        [(iceberg.chain_id(), 10), (other.chain_id(), 5)]
+    assert sim.book.best_priority_chain(ASK_SIDE).chain_id() == other.chain_id()
+    sim.assert_books_match()
+
+
+def test_cancel_replace_priority_and_rejects():
+    sim = _Sim()
+    a, _ = sim.new("user_a", BID_SIDE, "34.50", 10)
+    b, _ = sim.new("user_b", BID_SIDE, "34.50", 10)
+    # qty down keeps priority
+    reports = sim.replace(a.chain_id(), "user_a", BID_SIDE, "34.50", 5)
+    assert _types(reports) == ["AcknowledgementReport"]
+    assert sim.book.best_priority_chain(BID_SIDE).chain_id() == a.chain_id()
+    # qty up goes to the back
+    sim.replace(a.chain_id(), "user_a", BID_SIDE, "34.50", 20)
+    assert sim.book.best_priority_chain(BID_SIDE).chain_id() == b.chain_id()
+    # replace to a crossing price trades first
+    sim.new("user_c", ASK_SIDE, "34.55", 5)
+    reports = sim.replace(b.chain_id(), "user_b", BID_SIDE, "34.55", 10)
+    assert _types(reports) == ["PartialFillReport", "FullFillReport", "AcknowledgementReport"]
+    assert sim.book.best_price(BID_SIDE) == Price("34.55")
+    # replace to 0 closes the order
+    reports = sim.replace(a.chain_id(), "user_a", BID_SIDE, "34.50", 0)
+    assert reports[0].cancel_reason() == CancelReasons.CANCEL_REPLACE_TO_ZERO
+    assert not sim.engine.is_resting(a.chain_id())
+    reports = sim.cancel(b.chain_id(), "user_b")
+    assert _types(reports) == ["CancelReport"]
+    reports = sim.engine.process(CancelCommand(sim.ids.id(), 2000.0, b.chain_id(), "user_b", MARKET, USER_CANCEL))
+    assert _types(reports) == ["RejectReport"]
+    assert reports[0].reject_reason() == RejectReasons.ORDER_CLOSED
+    assert sim.book.best_price(BID_SIDE) is None
+    sim.assert_books_match()
+
+
+def test_pro_rata_allocation():
+    market = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"),
+                    allocation=ProRataAllocation())
+    sim = _Sim(market)
+    a, _ = sim.new("user_a", ASK_SIDE, "34.52", 10)
+    b, _ = sim.new("user_b", ASK_SIDE, "34.52", 30)
+    assert sim.book.best_priority_chain(ASK_SIDE).chain_id() == b.chain_id()
+    assert sim.book.visible_qty_ahead(ASK_SIDE, Price("34.52"), a.chain_id()) == 30
+    _, reports = sim.new("user_z", BID_SIDE, "34.52", 10)
+    # 2.5 -> 2 and 7.5 -> 7 with the 1 left over going to user_a, who was first in line
+    assert [(r.chain_id(), r.fill_qty()) for r in reports if not r.is_aggressor()] == \
+        [(a.chain_id(), 3), (b.chain_id(), 7)]
+    assert sim.book.visible_qty_at_price(ASK_SIDE, Price("34.52")) == 30
+    sim.assert_books_match()
+
+
+def _random_flow(sim, seed):
+    rng = random.Random(seed)
+    resting = []
+    for _ in range(2000):
+        action = rng.random()
+        side = BID_SIDE if rng.random() < 0.5 else ASK_SIDE
+        price = "34.%02d" % (rng.randint(40, 60))
+        if action < 0.6 or not resting:
+            tif = rng.choice([FAR, FAR, FAR, FAK, FOK])
+            peak = rng.choice([None, None, 3])
+            command, _ = sim.new("user_%d" % rng.randint(1, 5), side, price, rng.randint(1, 20), tif, peak)
+            if sim.engine.is_resting(command.chain_id()):
+                resting.append(command)
+        else:
+            command = resting.pop(rng.randrange(len(resting)))
+            if not sim.engine.is_resting(command.chain_id()):
+                continue
+            if action < 0.8:
+                sim.cancel(command.chain_id(), command.user_id())
+            else:
+                sim.replace(command.chain_id(), command.user_id(), command.side(), price if side == command.side()
+                            else str(command.price()), rng.randint(0, 20))
+                if sim.engine.is_resting(command.chain_id()):
+                    resting.append(command)
+    sim.assert_books_match()
+
+
+def test_random_flow_matches_rebuilt_book():
+    _random_flow(_Sim(), 7)
+
+
+def test_random_pro_rata_flow_matches_rebuilt_book():
+    market = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"),
+                    allocation=ProRataAllocation())
+    _random_flow(_Sim(market), 11)
@@ -0,0 +1,242 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import logging
+import random
+from buttonwood.MarketObjects.CancelReasons import USER_CANCEL
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAK
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import CancelCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReplaceCommand
+from buttonwood.MarketObjects.Events.OrderEvents import CancelReport
+from buttonwood.MarketObjects.Events.OrderEvents import FillReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.Simulation.MatchingEngine import MatchingEngine
+from buttonwood.Streaming.MarketByOrder import ADD
+from buttonwood.Streaming.MarketByOrder import DELETE
+from buttonwood.Streaming.MarketByOrder import EXECUTE
+from buttonwood.Streaming.MarketByOrder import MODIFY
+from buttonwood.Streaming.MarketByOrder import MarketByOrderAdapter
+from buttonwood.Streaming.MarketByOrder import MarketByOrderMessage
+from buttonwood.Streaming.Pipeline import StreamingPipeline
+from buttonwood.utils.IDGenerators import MonotonicIntID
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def _handler_and_book():
+    handler = OrderEventHandler(LOGGER)
+    book = OrderLevelBook(MARKET, LOGGER)
+    handler.register_orderbook(MARKET, "book", book)
+    return handler, book
+
+
+def _types(events):
+    return [type(event).__name__ for event in events]
+
+
+def test_adds_modifies_deletes_and_executions():
+    adapter = MarketByOrderAdapter(MARKET, LOGGER)
+    handler, book = _handler_and_book()
+    messages = [MarketByOrderMessage(ADD, 1.0, 101, ASK_SIDE, Price("34.52"), 10),
+                MarketByOrderMessage(ADD, 1.1, 102, ASK_SIDE, Price("34.52"), 10),
+                MarketByOrderMessage(ADD, 1.2, 103, ASK_SIDE, Price("34.53"), 10),
+                MarketByOrderMessage(ADD, 1.3, 201, BID_SIDE, Price("34.50"), 10),
+                # qty down keeps priority, new price moves the order
+                MarketByOrderMessage(MODIFY, 2.0, 101, qty=8),
+                MarketByOrderMessage(MODIFY, 2.1, 201, price=Price("34.49"), qty=10),
+                # one buyer sweeping both ask levels
+                MarketByOrderMessage(EXECUTE, 3.0, 101, qty=8),
+                MarketByOrderMessage(EXECUTE, 3.0, 102, qty=10),
+                MarketByOrderMessage(EXECUTE, 3.0, 103, price=Price("34.53"), qty=4),
+                # a seller hitting the bid with a match group from the feed
+                MarketByOrderMessage(EXECUTE, 4.0, 201, qty=3, match_group="T1"),
+                MarketByOrderMessage(DELETE, 5.0, 201),
+                MarketByOrderMessage(DELETE, 5.1, 999)]
+    events = []
+    for message in messages:
+        new_events = adapter.process(message)
+        for event in new_events:
+            handler.process(event)
+        events.extend(new_events)
+    events.extend(adapter.flush())
+
+    assert _types(events[:12]) == ["NewOrderCommand", "AcknowledgementReport"] * 4 + \
+        ["CancelReplaceCommand", "AcknowledgementReport"] * 2
+    sweep = events[12:19]
+    assert _types(sweep) == ["NewOrderCommand", "PartialFillReport", "FullFillReport", "PartialFillReport",
+                             "FullFillReport", "FullFillReport", "PartialFillReport"]
+    aggressor = sweep[0]
+    assert aggressor.side() == BID_SIDE
+    assert aggressor.time_in_force() == FAK
+    assert aggressor.price() == Price("34.53")
+    assert aggressor.qty() == 22
+    assert aggressor.chain_id() < 0
+    assert len(set(event.match_id() for event in sweep[1:])) == 1
+    assert [event.chain_id() for event in sweep[1:]] == [aggressor.chain_id(), 101, aggressor.chain_id(), 102,
+                                                         aggressor.chain_id(), 103]
+    hit = events[19:22]
+    assert _types(hit) == ["NewOrderCommand", "FullFillReport", "PartialFillReport"]
+    assert hit[0].side() == ASK_SIDE
+    assert hit[1].match_id() == "T1"
+    assert _types(events[22:]) == ["CancelCommand", "CancelReport"]
+
+    assert book.prices(BID_SIDE) == []
+    assert book.prices(ASK_SIDE) == [Price("34.53")]
+    assert book.visible_qty_at_price(ASK_SIDE, Price("34.53")) == 6
+    assert handler.chain_ids() == [103]
+    assert adapter.num_live_orders() == 1
+    assert adapter.num_unknown_orders() == 1
+    assert adapter.num_messages() == len(messages)
+    assert adapter.num_events() == len(events)
+
+
+def _engine_flow(seed, num_actions=2000):
+    # random order flow through the matching engine. Cancel replaces stay away from the other side of the book, so
+    #  orders only trade as aggressors when they are new
+    rng = random.Random(seed)
+    ids = MonotonicIntID()
+    engine = MatchingEngine(MARKET, LOGGER, event_id_generator=ids)
+    events = []
+    resting = []
+    timestamp = 1000.0
+    for _ in range(num_actions):
+        timestamp += 1
+        action = rng.random()
+        if action < 0.6 or not resting:
+            event_id = ids.id()
+            command = NewOrderCommand(event_id, timestamp, event_id, "user_%d" % rng.randint(1, 5), MARKET,
+                                      rng.choice([BID_SIDE, ASK_SIDE]), rng.choice([FAR, FAR, FAK]),
+                                      Price("34.%02d" % rng.randint(45, 55)), rng.randint(1, 20))
+        else:
+            resting_command = resting.pop(rng.randrange(len(resting)))
+            if not engine.is_resting(resting_command.chain_id()):
+                continue
+            if action < 0.8:
+                command = CancelCommand(ids.id(), timestamp, resting_command.chain_id(), resting_command.user_id(),
+                                        MARKET, USER_CANCEL)
+            else:
+                side = resting_command.side()
+                price = "34.%02d" % (rng.randint(40, 44) if side.is_bid() else rng.randint(56, 60))
+                command = CancelReplaceCommand(ids.id(), timestamp, resting_command.chain_id(),
+                                               resting_command.user_id(), MARKET, side, Price(price),
+                                               rng.randint(0, 20))
+        reports = engine.process(command)
+        if engine.is_resting(command.chain_id()):
+            resting.append(command)
+        events.append(command)
+        events.extend(reports)
+    return events
+
+
+def _to_market_by_order(events):
+    # what a public feed would have shown of the engine's flow
+    messages = []
+    live = set()
+    for event in events:
+        if isinstance(event, AcknowledgementReport):
+            if isinstance(event.acknowledged_command(), NewOrderCommand):
+                messages.append(MarketByOrderMessage(ADD, event.timestamp(), event.chain_id(),
+                                                     event.acknowledged_command().side(), event.price(), event.qty()))
+                live.add(event.chain_id())
+            else:
+                messages.append(MarketByOrderMessage(MODIFY, event.timestamp(), event.chain_id(), price=event.price(),
+                                                     qty=event.qty()))
+        elif isinstance(event, FillReport) and not event.is_aggressor():
+            messages.append(MarketByOrderMessage(EXECUTE, event.timestamp(), event.chain_id(),
+                                                 price=event.fill_price(), qty=event.fill_qty(),
+                                                 match_group=event.match_id()))
+        elif isinstance(event, CancelReport) and event.chain_id() in live:
+            messages.append(MarketByOrderMessage(DELETE, event.timestamp(), event.chain_id()))
+            live.discard(event.chain_id())
+    return messages
+
+
+def _assert_same_book(book, expected):
+    for side in [BID_SIDE, ASK_SIDE]:
+        assert book.prices(side) == expected.prices(side)
+        for price in expected.prices(side):
+            assert book.visible_qty_at_price(side, price) == expected.visible_qty_at_price(side, price)
+            assert [chain.chain_id() for chain in book.order_chains_at_price(side, price)] == \
+                [chain.chain_id() for chain in expected.order_chains_at_price(side, price)]
+
+
+def test_market_by_order_rebuilds_the_venue_book():
+    events = _engine_flow(17)
+    expected_handler, expected = _handler_and_book()
+    for event in events:
+        expected_handler.process(event)
+    messages = _to_market_by_order(events)
+
+    adapter = MarketByOrderAdapter(MARKET, LOGGER)
+    handler, book = _handler_and_book()
+    max_live_chains = 0
+    for event in adapter.adapt(messages):
+        handler.process(event)
+        max_live_chains = max(max_live_chains, len(handler.chain_ids()))
+    _assert_same_book(book, expected)
+    assert adapter.num_unknown_orders() == 0
+    # synthesized aggressors close as soon as their group is done, so only live orders are kept
+    assert sorted(handler.chain_ids()) == sorted(expected_handler.chain_ids())
+    assert adapter.num_live_orders() == len(handler.chain_ids())
+    assert max_live_chains <= len(expected_handler.chain_ids()) + 50
+
+
+def test_market_by_order_as_pipeline_decoder():
+    events = _engine_flow(23, 500)
+    expected_handler, expected = _handler_and_book()
+    for event in events:
+        expected_handler.process(event)
+    messages = _to_market_by_order(events)
+    # the last message is an execution, so the pipeline has to flush the adapter to finish the book
+    messages.append(MarketByOrderMessage(ADD, 9999.0, "last", ASK_SIDE, Price("34.70"), 1))
+    messages.append(MarketByOrderMessage(EXECUTE, 9999.0, "last", qty=1))
+
+    handler, book = _handler_and_book()
+    pipeline = StreamingPipeline(handler, MarketByOrderAdapter(MARKET, LOGGER), LOGGER, batch_size=7)
+
+    async def source():
+        for message in messages:
+            yield message
+
+    asyncio.run(pipeline.run(source()))
+    _assert_same_book(book, expected)
+    assert sorted(handler.chain_ids()) == sorted(expected_handler.chain_ids())
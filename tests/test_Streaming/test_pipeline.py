@@ -0,0 +1,254 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import logging
+import random
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import ASK_SIDE
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.Simulation.MatchingEngine import MatchingEngine
+from buttonwood.Streaming.Pipeline import FunctionDecoder
+from buttonwood.Streaming.Pipeline import StreamingPipeline
+from buttonwood.Streaming.Pipeline import file_source
+from buttonwood.Streaming.Pipeline import stream_reader_source
+from buttonwood.utils.IDGenerators import MonotonicIntID
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def _events(num_commands, seed):
+    rng = random.Random(seed)
+    ids = MonotonicIntID()
+    engine = MatchingEngine(MARKET, LOGGER, event_id_generator=ids)
+    events = []
+    for i in range(num_commands):
+        event_id = ids.id()
+        side = BID_SIDE if rng.random() < 0.5 else ASK_SIDE
+        command = NewOrderCommand(event_id, 1000.0 + i, event_id, "user_a", MARKET, side, FAR,
+                                  Price("34.%02d" % rng.randint(45, 55)), rng.randint(1, 10))
+        events.append(command)
+        events.extend(engine.process(command))
+    return events
+
+
+def _decoder(events):
+    # the "feed" sends each event's position in the list, one per line
+    def decode(message):
+        return [events[int(message)]]
+    return FunctionDecoder(decode)
+
+
+def _pipeline(events, **kwargs):
+    handler = OrderEventHandler(LOGGER)
+    book = OrderLevelBook(MARKET, LOGGER)
+    handler.register_orderbook(MARKET, "book", book)
+    return StreamingPipeline(handler, _decoder(events), LOGGER, **kwargs), book
+
+
+def _assert_book_matches(book, events):
+    handler = OrderEventHandler(LOGGER)
+    expected = OrderLevelBook(MARKET, LOGGER)
+    handler.register_orderbook(MARKET, "book", expected)
+    for event in events:
+        handler.process(event)
+    for side in [BID_SIDE, ASK_SIDE]:
+        assert book.prices(side) == expected.prices(side)
+        for price in expected.prices(side):
+            assert book.visible_qty_at_price(side, price) == expected.visible_qty_at_price(side, price)
+
+
+async def _drain(queue):
+    items = []
+    while True:
+        item = await queue.get()
+        if item is None:
+            return items
+        items.append(item)
+
+
+def test_pipeline_with_back_pressure_and_subscribers():
+    events = _events(400, 1)
+    pipeline, book = _pipeline(events, max_queue_size=16, batch_size=8, max_pending_batches=2)
+    book_updates = pipeline.subscribe_book(book, maxsize=100000)
+    event_batches = pipeline.subscribe_events(maxsize=100000)
+    max_depth = []
+
+    async def feed():
+        for i in range(len(events)):
+            await pipeline.put(str(i))
+            max_depth.append(pipeline.metrics()["raw_queue_depth"])
+
+    async def main():
+        pipeline.start()
+        drained = asyncio.gather(_drain(book_updates), _drain(event_batches))
+        await feed()
+        await pipeline.close()
+        return await drained
+
+    updates, batches = asyncio.run(main())
+    _assert_book_matches(book, events)
+    assert max(max_depth) <= 16
+    assert [event for batch in batches for event in batch] == events
+    assert all(len(batch) <= 8 for batch in batches)
+    assert sum(update.num_updates() for update in updates) > 0
+    assert updates[-1].timestamp() == book.last_update_time()
+    metrics = pipeline.metrics()
+    assert metrics["received"] == metrics["decoded"] == metrics["processed"] == len(events)
+    assert metrics["raw_queue_depth"] == 0
+    assert metrics["dropped"] == 0
+    assert metrics["max_pipeline_lag"] >= metrics["pipeline_lag"] >= 0
+
+
+def test_slow_subscriber_drops_oldest():
+    events = _events(100, 2)
+    pipeline, book = _pipeline(events, batch_size=1)
+    event_batches = pipeline.subscribe_events(maxsize=5)
+
+    async def main():
+        pipeline.start()
+        for i in range(len(events)):
+            await pipeline.put(str(i))
+        await pipeline.close()
+        return await _drain(event_batches)
+
+    batches = asyncio.run(main())
+    assert len(batches) == 5
+    assert batches[-1] == [events[-1]]
+    assert pipeline.metrics()["dropped"] == len(events) - 5
+
+
+def test_file_and_socket_sources(tmp_path):
+    events = _events(200, 3)
+    path = tmp_path / "feed.txt"
+    path.write_text("\n".join(str(i) for i in range(len(events))) + "\n")
+    pipeline, book = _pipeline(events)
+    asyncio.run(pipeline.run(file_source(str(path), lines_per_read=64)))
+    _assert_book_matches(book, events)
+
+    async def serve(reader, writer):
+        for i in range(len(events)):
+            writer.write(b"%d\r\n" % i)
+        await writer.drain()
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(serve, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        pipeline, book = _pipeline(events)
+        await pipeline.run(stream_reader_source(reader))
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return pipeline, book
+
+    pipeline, book = asyncio.run(main())
+    _assert_book_matches(book, events)
+    assert pipeline.metrics()["processed"] == len(events)
+
+
+def test_decode_errors_are_counted():
+    events = _events(20, 4)
+    pipeline, book = _pipeline(events, batch_size=1)
+
+    async def main():
+        pipeline.start()
+        await pipeline.put("not a number")
+        for i in range(len(events)):
+            await pipeline.put(str(i))
+        await pipeline.close()
+
+    asyncio.run(main())
+    assert pipeline.metrics()["decode_errors"] == 1
+    assert pipeline.metrics()["processed"] == len(events)
+
+
+def test_decode_errors_only_drop_the_bad_messages():
+    events = _events(40, 5)
+    pipeline, book = _pipeline(events, batch_size=500)
+
+    async def main():
+        pipeline.start()
+        for i in range(len(events)):
+            await pipeline.put(str(i))
+            if i % 10 == 5:
+                await pipeline.put("not a number")
+        await pipeline.close()
+
+    asyncio.run(main())
+    _assert_book_matches(book, events)
+    assert pipeline.metrics()["decode_errors"] == len(range(5, len(events), 10))
+    assert pipeline.metrics()["decoded"] == len(events)
+    assert pipeline.metrics()["processed"] == len(events)
+
+
+class _FailingHandler(OrderEventHandler):
+    # raises after processing every event whose id is in fail_event_ids, so later events still apply cleanly
+    def __init__(self, logger, fail_event_ids):
+        OrderEventHandler.__init__(self, logger)
+        self._fail_event_ids = fail_event_ids
+
+    def process(self, event):
+        result = OrderEventHandler.process(self, event)
+        if event.event_id() in self._fail_event_ids:
+            raise Exception("can't process %s" % str(event.event_id()))
+        return result
+
+
+def test_process_errors_are_counted():
+    events = _events(50, 6)
+    fail_event_ids = set(event.event_id() for event in events[5:30:5])
+    handler = _FailingHandler(LOGGER, fail_event_ids)
+    # small queues so a consumer that died would leave put() and close() waiting forever
+    pipeline = StreamingPipeline(handler, _decoder(events), LOGGER, max_queue_size=2, batch_size=2,
+                                 max_pending_batches=1)
+    subscriber = pipeline.subscribe_events(maxsize=1000)
+
+    async def main():
+        pipeline.start()
+        for i in range(len(events)):
+            await pipeline.put(str(i))
+        await asyncio.wait_for(pipeline.close(), 10.0)
+        return await _drain(subscriber)
+
+    batches = asyncio.run(main())
+    metrics = pipeline.metrics()
+    assert metrics["process_errors"] == len(fail_event_ids)
+    assert metrics["processed"] == len(events) - len(fail_event_ids)
+    assert sum(len(batch) for batch in batches) == len(events)
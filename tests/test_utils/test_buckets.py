@@ -0,0 +1,93 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import pytest
+from buttonwood.utils.buckets import BucketedCounter
+
+
+def test_rolling_totals():
+    counter = BucketedCounter(60.0, 5)
+    assert counter.total_in_last(300.0) == 0
+    counter.add(0.0, 10)
+    counter.add(30.0, 5)
+    counter.add(61.0, 7)
+    counter.add(250.0, 1)
+    assert counter.total() == 23
+    assert counter.total_in_last(60.0) == 1
+    assert counter.total_in_last(300.0) == 23
+    assert counter.total_in_last(180.0) == 1
+    assert counter.total_in_last(240.0) == 8
+    assert counter.total_in_last(120.0, now=90.0) == 22
+    # moving forward drops the oldest buckets from the window but not the lifetime total
+    counter.add(310.0, 2)
+    assert counter.total_in_last(300.0) == 10
+    assert counter.amount_at(30.0) == 0
+    assert counter.amount_at(70.0) == 7
+    assert counter.total() == 25
+    # nothing has happened since, so the later window is empty
+    assert counter.total_in_last(60.0, now=500.0) == 0
+    with pytest.raises(Exception):
+        counter.total_in_last(301.0)
+
+
+def test_late_adds_and_gaps():
+    counter = BucketedCounter(1.0, 3)
+    counter.add(10.5, 1)
+    counter.add(12.5, 1)
+    assert counter.add(11.2, 4)
+    assert counter.total_in_last(2.0) == 5
+    assert counter.total_in_last(1.0, now=11.0) == 4
+    assert not counter.add(9.0, 100)
+    assert counter.total() == 6
+    counter.add(100.0, 3)
+    assert counter.total_in_last(3.0) == 3
+    columns = counter.to_columns()
+    assert list(columns.column("bucket_start")) == [98.0, 99.0, 100.0]
+    assert list(columns.column("amount")) == [0, 0, 3]
+
+
+def test_late_add_before_first_bucket():
+    counter = BucketedCounter(1.0, 5)
+    counter.add(10.0, 1)
+    counter.add(8.0, 2)
+    assert counter.total_in_last(5.0) == 3
+    assert counter.total_in_last(2.0) == 1
+    assert list(counter.to_columns().column("amount")) == [2, 0, 1]
+
+
+def test_window_older_than_retained_buckets():
+    counter = BucketedCounter(1.0, 10)
+    for i in range(100):
+        counter.add(float(i), 1)
+    # buckets no longer retained count as 0, the same as amount_at
+    assert counter.amount_at(50.0) == 0
+    assert counter.total_in_last(10.0, now=50.0) == 0
+    # a window that is only partly retained counts just the retained buckets
+    assert counter.total_in_last(5.0, now=92.0) == 3
+    assert counter.total_in_last(10.0, now=99.0) == 10
@@ -0,0 +1,64 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import pytest
+from array import array
+from buttonwood.utils.columns import Columns
+
+
+def test_append_and_columns():
+    c = Columns([("time", "d"), ("name", None), ("qty", "q")])
+    assert c.names() == ["time", "name", "qty"]
+    assert len(c) == 0
+    c.append(1.5, "a", 10)
+    c.append(2.5, "b", 20)
+    assert len(c) == 2
+    assert isinstance(c.column("time"), array)
+    assert list(c.column("time")) == [1.5, 2.5]
+    assert c.column("name") == ["a", "b"]
+    assert list(c.column("qty")) == [10, 20]
+    assert c.row(1) == (2.5, "b", 20)
+    assert c.to_dict()["name"] == ["a", "b"]
+    c.clear()
+    assert len(c) == 0
+    assert len(c.column("qty")) == 0
+
+
+def test_insert():
+    c = Columns([("time", "d"), ("name", None)])
+    c.append(1.0, "a")
+    c.append(3.0, "c")
+    c.insert(1, 2.0, "b")
+    assert list(c.column("time")) == [1.0, 2.0, 3.0]
+    assert c.column("name") == ["a", "b", "c"]
+
+
+def test_duplicate_column_name():
+    with pytest.raises(Exception):
+        Columns([("time", "d"), ("time", "q")])
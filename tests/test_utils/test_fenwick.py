@@ -0,0 +1,58 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from buttonwood.utils.fenwick import FenwickTree
+
+
+def test_append_and_prefix_sum():
+    tree = FenwickTree()
+    values = [5, 0, 3, 7, 2, 9, 1, 4, 6]
+    for i, value in enumerate(values):
+        assert tree.append(value) == i
+    assert len(tree) == len(values)
+    assert tree.total() == sum(values)
+    for end in range(len(values) + 1):
+        assert tree.prefix_sum(end) == sum(values[:end])
+
+
+def test_set_and_add():
+    values = [5, 0, 3, 7, 2, 9, 1, 4, 6]
+    tree = FenwickTree(values)
+    for end in range(len(values) + 1):
+        assert tree.prefix_sum(end) == sum(values[:end])
+    tree.set(3, 1)
+    values[3] = 1
+    tree.add(0, 4)
+    values[0] += 4
+    tree.append(8)
+    values.append(8)
+    assert tree.value(3) == 1
+    assert tree.total() == sum(values)
+    for end in range(len(values) + 1):
+        assert tree.prefix_sum(end) == sum(values[:end])
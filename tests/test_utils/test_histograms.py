@@ -0,0 +1,71 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from buttonwood.utils.histograms import LogHistogram
+
+
+def test_small_values_are_exact():
+    histogram = LogHistogram()
+    for value in range(1, 11):
+        histogram.record(value)
+    assert histogram.count() == 10
+    assert histogram.min() == 1
+    assert histogram.max() == 10
+    assert histogram.mean() == 5.5
+    assert histogram.percentile(50) == 5
+    assert histogram.percentile(100) == 10
+
+
+def test_large_values_within_precision():
+    histogram = LogHistogram(precision_bits=5)
+    values = [1000 * i for i in range(1, 1001)]
+    for value in values:
+        histogram.record(value)
+    for percent in [1, 50, 90, 99, 99.9]:
+        exact = values[int(percent / 100.0 * len(values)) - 1]
+        reported = histogram.percentile(percent)
+        assert exact <= reported <= exact * (1 + 1 / 16.0)
+    assert histogram.percentile(100) == 1000000
+
+
+def test_merge_summary_and_reset():
+    a = LogHistogram()
+    b = LogHistogram()
+    a.record(100, count=3)
+    b.record(5000)
+    a.merge(b)
+    summary = a.summary()
+    assert summary["count"] == 4
+    assert summary["min"] == 100
+    assert summary["max"] == 5000
+    assert summary["p50"] == 103  # 100 is in the 96 to 103 bucket
+    assert summary["p99.9"] == 5000
+    a.reset()
+    assert a.count() == 0
+    assert a.percentile(50) is None
@@ -0,0 +1,155 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import math
+import os
+from buttonwood.utils.resultstores import DictResultStore
+from buttonwood.utils.resultstores import LRUResultStore
+from buttonwood.utils.resultstores import ResultCodec
+from buttonwood.utils.resultstores import SpillToDiskResultStore
+from buttonwood.utils.resultstores import TimeWindowResultStore
+
+
+def test_dict_result_store():
+    store = DictResultStore()
+    store.put(1, "a", 100.0)
+    store.put(2, "b", 101.0)
+    assert store.get(1) == "a"
+    assert store.get(3) is None
+    assert store.get(3, "x") == "x"
+    store.remove(1)
+    store.remove(1)  # removing something not there is fine
+    assert 1 not in store
+    assert 2 in store
+    assert len(store) == 1
+
+
+def test_lru_result_store():
+    store = LRUResultStore(2)
+    store.put(1, "a", 100.0)
+    store.put(2, "b", 101.0)
+    assert store.get(1) == "a"  # 1 is now more recently used than 2
+    store.put(3, "c", 102.0)
+    assert 2 not in store
+    assert store.get(1) == "a"
+    assert store.get(3) == "c"
+    assert len(store) == 2
+
+
+def test_time_window_result_store():
+    store = TimeWindowResultStore(10.0)
+    store.put(1, "a", 100.0)
+    store.put(2, "b", 105.0)
+    store.put(1, "a2", 106.0)  # put again so it is kept longer
+    store.put(3, "c", 112.0)
+    assert store.get(1) == "a2"
+    assert store.get(2) == "b"
+    store.put(4, "d", 115.5)
+    assert 2 not in store
+    assert store.get(1) == "a2"
+    store.put(5, "e", 117.0)
+    assert 1 not in store
+    assert len(store) == 3
+
+
+def test_spill_to_disk_result_store(tmp_path):
+    codec = ResultCodec("qd", lambda value: (value[0], value[1]), lambda row: (row[0], row[1]))
+    store = SpillToDiskResultStore(codec, block_size=3, path=str(tmp_path / "results.bin"))
+    for i in range(10):
+        store.put(i, (i * 10, i / 2.0), 100.0 + i)
+    store.put(10, None, 110.0)
+    assert len(store) == 11
+    for i in range(10):
+        assert store.get(i) == (i * 10, i / 2.0)
+    assert 10 in store
+    assert store.get(10) is None
+    assert store.get(11, "missing") == "missing"
+    # a key put again after being written out gets its new value
+    store.put(1, (-1, math.inf), 111.0)
+    store.flush()
+    assert store.get(1) == (-1, math.inf)
+    store.remove(2)
+    assert 2 not in store
+    assert store.get(2) is None
+    assert len(store) == 10
+    store.close()
+
+
+def test_spill_to_disk_colliding_hashes():
+    # -1 and -2 hash the same
+    assert hash(-1) == hash(-2)
+    codec = ResultCodec("q", lambda value: (value,), lambda row: row[0])
+    store = SpillToDiskResultStore(codec, block_size=2)
+    store.put(-1, 1, 1.0)
+    store.put(-2, 2, 1.0)
+    store.put(-2, 3, 1.0)
+    store.flush()
+    assert store.get(-1) == 1
+    assert store.get(-2) == 3
+    assert len(store) == 2
+    store.remove(-2)
+    assert -2 not in store
+    assert store.get(-1) == 1
+    assert len(store) == 1
+    store.put(-2, 4, 2.0)
+    store.flush()
+    assert store.get(-2) == 4
+    assert len(store) == 2
+    store.close()
+
+
+def test_spill_to_disk_index_memory_flat():
+    codec = ResultCodec("qd", lambda value: value, lambda row: row)
+    store = SpillToDiskResultStore(codec, block_size=1000)
+    for num_keys in [1000, 10000, 100000]:
+        for i in range(len(store), num_keys):
+            store.put((i, "chain"), (i, 1.0), float(i))
+        store.flush()
+        # the index is all that is kept in memory per key, and it stays a few tens of bytes a key
+        assert 24 * num_keys <= store.index_nbytes() <= 64 * num_keys
+    for i in range(0, 100000, 997):
+        assert store.get((i, "chain")) == (i, 1.0)
+    assert len(store) == 100000
+    store.close()
+
+
+def test_spill_to_disk_caches_recent_blocks(tmp_path):
+    path = tmp_path / "results.bin"
+    codec = ResultCodec("q", lambda value: (value,), lambda row: row[0])
+    store = SpillToDiskResultStore(codec, block_size=2, path=str(path), cached_blocks=2)
+    for i in range(6):
+        store.put(("chain", i), i, float(i))
+    assert store.get(("chain", 0)) == 0
+    assert store.get(("chain", 5)) == 5
+    # with the file emptied out only the two most recently read blocks can still be gotten
+    os.truncate(str(path), 0)
+    for _ in range(3):
+        assert store.get(("chain", 1)) == 1
+        assert store.get(("chain", 4)) == 4
+    store.close()
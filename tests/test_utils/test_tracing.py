@@ -0,0 +1,105 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import io
+import logging
+from buttonwood.MarketObjects.Events.EventHandler import OrderEventHandler
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import AcknowledgementReport
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.OrderBooks.OrderLevelBook import OrderLevelBook
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.utils import tracing
+from buttonwood.utils.tracing import BinaryFileTracer
+from buttonwood.utils.tracing import RingBufferTracer
+from buttonwood.utils.tracing import TraceRecord
+from buttonwood.utils.tracing import read_binary_trace
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+LOGGER = logging.getLogger()
+
+
+def test_ring_buffer():
+    tracer = RingBufferTracer(3)
+    for i in range(5):
+        tracer.trace("book", tracing.ACK_NEW_ORDER, i, "chain", None, i * 10)
+    assert tracer.count() == 5
+    assert [record.event_id for record in tracer.records()] == [2, 3, 4]
+    assert tracer.records()[0] == TraceRecord("book", tracing.ACK_NEW_ORDER, 2, "chain", None, 20)
+    tracer.clear()
+    assert tracer.records() == []
+
+
+def test_binary_file_round_trip():
+    stream = io.BytesIO()
+    tracer = BinaryFileTracer(stream)
+    tracer.trace("book", tracing.PASSIVE_FULL_FILL, 12, 34, Price("34.52"), 100)
+    tracer.trace("book", tracing.CANCEL_CONFIRM, "abc", None, None, None)
+    tracer.trace("other book", tracing.ADD_TO_LEVEL, None, "abc", None, 5)
+    stream.seek(0)
+    assert list(read_binary_trace(stream)) == [TraceRecord("book", tracing.PASSIVE_FULL_FILL, 12, 34, 34.52, 100),
+                                               TraceRecord("book", tracing.CANCEL_CONFIRM, "abc", None, None, None),
+                                               TraceRecord("other book", tracing.ADD_TO_LEVEL, None, "abc", None, 5)]
+
+
+def test_handler_and_book_tracing():
+    tracer = RingBufferTracer(100)
+    handler = OrderEventHandler(LOGGER, tracer=tracer)
+    book = OrderLevelBook(MARKET, LOGGER, name="traced", tracer=tracer)
+    handler.register_orderbook(MARKET, "book", book)
+    new_order = NewOrderCommand(1, 1000.0, 77, "user_a", MARKET, BID_SIDE, FAR, Price("34.50"), 10)
+    handler.process(new_order)
+    handler.process(AcknowledgementReport(2, 1000.1, 77, "user_a", MARKET, new_order, Price("34.50"), 10, None))
+    actions = [(record.source, record.action) for record in tracer.records()]
+    assert actions == [("OrderEventHandler", tracing.PROCESS),
+                       ("OrderEventChain", tracing.NEW_CHAIN),
+                       ("OrderEventHandler", tracing.PROCESS),
+                       # the subchain opens with the acknowledgement
+                       ("SubChain", tracing.NEW_SUBCHAIN),
+                       ("SubChain", tracing.ADD_TO_SUBCHAIN),
+                       ("SubChain", tracing.ADD_TO_SUBCHAIN),
+                       ("traced", tracing.APPLY_TO_BOOK),
+                       ("TimePriorityOrderLevel", tracing.ADD_TO_LEVEL),
+                       ("traced", tracing.ACK_NEW_ORDER)]
+    assert tracer.records()[-1] == TraceRecord("traced", tracing.ACK_NEW_ORDER, 2, 77, Price("34.50"), 10)
+
+
+def test_no_tracer_is_no_trace():
+    logger = logging.getLogger("test_no_tracer_is_no_trace")
+    logger.setLevel(logging.INFO)
+    book = OrderLevelBook(MARKET, logger)
+    assert book._trace is tracing.no_trace
+    logger.setLevel(logging.DEBUG)
+    book = OrderLevelBook(MARKET, logger)
+    assert isinstance(book._trace.__self__, tracing.LoggingTracer)
@@ -0,0 +1,75 @@
+"""
+This file is part of Buttonwood.
+
+Buttonwood is a python software package created to help quickly create, (re)build, or
+analyze markets, market structures, and market participants.
+
+MIT License
+
+Copyright (c) 2016-2020 Peter F. Nabicht
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import pytest
+from buttonwood.MarketObjects.Endpoint import Endpoint
+from buttonwood.MarketObjects.Events.OrderEventConstants import FAR
+from buttonwood.MarketObjects.Events.OrderEvents import NewOrderCommand
+from buttonwood.MarketObjects.Market import Market
+from buttonwood.MarketObjects.Price import InvalidPriceException
+from buttonwood.MarketObjects.Price import Price
+from buttonwood.MarketObjects.Price import PriceFactory
+from buttonwood.MarketObjects.PriceLevel import PriceLevel
+from buttonwood.MarketObjects.Product import Product
+from buttonwood.MarketObjects.Side import BID_SIDE
+from buttonwood.utils.validation import set_validation_enabled
+from buttonwood.utils.validation import trusted_input
+from buttonwood.utils.validation import validation_enabled
+
+MARKET = Market(Product("MSFT", "Microsoft"), Endpoint("Nasdaq", "NSDQ"), PriceFactory("0.01"))
+
+
+def test_trusted_input_skips_checks():
+    with pytest.raises(AssertionError):
+        NewOrderCommand(1, 1000.0, 1, "user_a", MARKET, BID_SIDE, FAR, Price("34.505"), 10)
+    with pytest.raises(AssertionError):
+        PriceLevel(Price("34.50"), 0)
+    with pytest.raises(InvalidPriceException):
+        MARKET.get_price("34.505")
+    with trusted_input():
+        assert not validation_enabled()
+        command = NewOrderCommand(1, 1000.0, 1, "user_a", MARKET, BID_SIDE, FAR, Price("34.505"), 10)
+        assert command.price() == Price("34.505")
+        assert PriceLevel(Price("34.50"), 0).visible_qty() == 0
+        assert MARKET.get_price("34.505") == Price("34.505")
+    assert validation_enabled()
+
+
+def test_trusted_input_restores_on_error():
+    with pytest.raises(ValueError):
+        with trusted_input():
+            raise ValueError()
+    assert validation_enabled()
+    set_validation_enabled(False)
+    try:
+        with trusted_input():
+            pass
+        assert not validation_enabled()
+    finally:
+        set_validation_enabled(True)